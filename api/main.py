@@ -4,6 +4,9 @@
 import os
 import sys
 import math
+import contextvars
+import ipaddress
+import asyncio
 import glob
 import pyarrow.dataset as ds
 from typing import Dict, List, Tuple, Optional
@@ -31,13 +34,16 @@ try:
 except Exception:
     BRAND_REGISTRY = {}
 try:
-    from graph.csr_utils import build_rev_csr
+    import graph.ch_cache  # noqa: F401  (requires the native module)
+    from graph.bundle import GraphBundle
 except Exception:
-    build_rev_csr = None  # type: ignore
-try:
-    from graph.ch_cache import load_or_build_ch
-except Exception:
-    load_or_build_ch = None  # type: ignore
+    GraphBundle = None  # type: ignore
+from serving.shards import ShardRegistry, StateShard
+from serving.snapshots import DatasetSnapshot, SnapshotManager
+from serving.admission import AdmissionController, Overloaded
+from serving.isochrone import HexIndex, LRUCache, min_time_by_hex, seconds_to_minutes
+from serving.hex_lookup import HexLookupIndex, best_anchor, dense_d_anchor
+from serving.adhoc import AnchorSetIndex, anchor_nodes_for, anchor_set_key
 
 APP_NAME = "vicinity D_anchor API"
 
@@ -55,8 +61,32 @@ _TRAUMA_SLUG_TO_LEVEL = {
 # Paths
 # Unify d_anchor locations under data/d_anchor_{category|brand}
 STATE = os.environ.get("TS_STATE", "massachusetts")
-_DANCHOR_CATEGORY_DIR = os.environ.get("TS_DANCHOR_CATEGORY_DIR", os.path.join("data", "d_anchor_category"))
-_DANCHOR_BRAND_DIR = os.environ.get("TS_DANCHOR_BRAND_DIR", os.path.join("data", "d_anchor_brand"))
+# Optional comma-separated allow-list of states to serve; default serves every state found under data/
+SERVED_STATES = [s.strip() for s in os.environ.get("TS_STATES", "").split(",") if s.strip()]
+# Resident graph/anchor budget across state shards (0 = unlimited) and idle unload timeout (0 = never)
+SHARD_MEMORY_MB = int(os.environ.get("TS_SHARD_MEMORY_MB", "0"))
+SHARD_IDLE_S = float(os.environ.get("TS_SHARD_IDLE_S", "0"))
+# Explicit overrides; by default both live under the served snapshot's data/ directory
+_DANCHOR_CATEGORY_DIR = os.environ.get("TS_DANCHOR_CATEGORY_DIR")
+_DANCHOR_BRAND_DIR = os.environ.get("TS_DANCHOR_BRAND_DIR")
+# Versioned dataset releases (releases/<version>/ + CURRENT pointer) and how often to poll for a new one (0 = never)
+RELEASES_DIR = os.environ.get("TS_RELEASES_DIR", "releases")
+RELOAD_POLL_S = float(os.environ.get("TS_RELOAD_POLL_S", "10"))
+# Dedicated executor for CPU-heavy custom routing, kept apart from the shared request threadpool
+ROUTING_WORKERS = int(os.environ.get("TS_ROUTING_WORKERS", str(min(4, os.cpu_count() or 1))))
+ROUTING_QUEUE = int(os.environ.get("TS_ROUTING_QUEUE", "16"))
+ROUTING_PER_CLIENT = int(os.environ.get("TS_ROUTING_PER_CLIENT", "2"))
+ROUTING_RETRY_AFTER_S = float(os.environ.get("TS_ROUTING_RETRY_AFTER_S", "2"))
+ROUTING_MAX_WAIT_S = float(os.environ.get("TS_ROUTING_MAX_WAIT_S", "10"))
+# Reverse proxies (IPs or CIDRs) whose X-Forwarded-For is trusted when identifying clients
+TRUSTED_PROXIES = [ipaddress.ip_network(p.strip(), strict=False) for p in os.environ.get("TS_TRUSTED_PROXIES", "").split(",") if p.strip()]
+# Isochrones: H3 resolution of the cached per-node ids, max cutoff and cached results per snapshot
+ISOCHRONE_RES = 8
+ISOCHRONE_MAX_MINUTES = int(os.environ.get("TS_ISOCHRONE_MAX_MINUTES", "90"))
+ISOCHRONE_CACHE_ENTRIES = int(os.environ.get("TS_ISOCHRONE_CACHE_ENTRIES", "256"))
+# Ad-hoc D_anchor (brand/category unions, explicit POI ids): max cutoff and cached vectors per snapshot
+ADHOC_MAX_MINUTES = int(os.environ.get("TS_ADHOC_MAX_MINUTES", "180"))
+ADHOC_CACHE_ENTRIES = int(os.environ.get("TS_ADHOC_CACHE_ENTRIES", "128"))
 
 _FRONTEND_ENV = (os.environ.get("TS_FRONTEND_ORIGIN") or os.environ.get("vicinity_FRONTEND_ORIGIN") or "").strip()
 _DEFAULT_FRONTEND_ORIGIN = os.environ.get("TS_DEFAULT_FRONTEND_ORIGIN", "http://localhost:3000").strip() or None
@@ -251,12 +281,53 @@ def _place_path_segment(place_id: str) -> str:
         pid = pid.split("places/", 1)[1]
     return pid
 
+# ---------- Dataset snapshots ----------
+# Every data read goes through the snapshot pinned to the current request, so a release
+# published mid-request never mixes versions. Without releases/CURRENT the working tree is served.
+def _make_registry(data_root: str) -> ShardRegistry:
+    registry = ShardRegistry(
+        _load_shard,
+        data_root=data_root,
+        states=SERVED_STATES or None,
+        memory_budget_bytes=SHARD_MEMORY_MB * 1024 * 1024,
+        idle_ttl_s=SHARD_IDLE_S,
+    )
+    # Idle shards are unloaded even when no request arrives; stopped when the snapshot is released.
+    registry.start_sweeper()
+    return registry
+
+
+_SNAPSHOTS = SnapshotManager(
+    _make_registry,
+    releases_dir=RELEASES_DIR,
+    poll_s=RELOAD_POLL_S,
+)
+_REQUEST_SNAPSHOT: contextvars.ContextVar[Optional[DatasetSnapshot]] = contextvars.ContextVar("dataset_snapshot", default=None)
+
+
+def _snapshot() -> DatasetSnapshot:
+    return _REQUEST_SNAPSHOT.get() or _SNAPSHOTS.current()
+
+
+def _data_path(*parts: str) -> str:
+    return os.path.join(_snapshot().data_root, *parts)
+
+
+def _snapshot_cache(name: str) -> dict:
+    """Per-snapshot memo dict; dropped together with the snapshot on hot reload."""
+    return _snapshot().cache.setdefault(name, {})
+
+
+def _danchor_category_dir() -> str:
+    return _DANCHOR_CATEGORY_DIR or _data_path("d_anchor_category")
+
+
+def _danchor_brand_dir() -> str:
+    return _DANCHOR_BRAND_DIR or _data_path("d_anchor_brand")
+
 # Column & sentinel conventions
 UNREACH_U16 = np.uint16(65535)
 
-# Lazily loaded CSR graph + anchors cache for custom D_anchor
-_GRAPH_CACHE: dict[str, dict[str, object]] = {}
-_ANCHOR_CACHE: dict[str, dict[str, object]] = {}
 def _mode_to_partition(mode: str) -> int:
     return {"drive": 0, "walk": 2}.get(mode, 0)
 
@@ -333,15 +404,15 @@ def load_D_anchor(mode: str) -> pd.DataFrame:
         "snapshot_ts",
     ]
 
-    part_dir = os.path.join(_DANCHOR_CATEGORY_DIR, f"mode={mode_code}")
-    legacy_dir = os.path.join("data", "minutes", f"mode={mode_code}")
+    part_dir = os.path.join(_danchor_category_dir(), f"mode={mode_code}")
+    legacy_dir = _data_path("minutes", f"mode={mode_code}")
 
     for base in (part_dir, legacy_dir):
         df = _read_hive_dataset(base, requested_cols)
         if df is not None:
             return _finalize_category_df(df, mode_code)
 
-    path = os.path.join("data", "minutes", f"{STATE}_anchor_to_category_{mode}.parquet")
+    path = _data_path("minutes", f"{STATE}_anchor_to_category_{mode}.parquet")
     if os.path.exists(path):
         df = pd.read_parquet(path)
         return _finalize_category_df(df, mode_code)
@@ -390,7 +461,7 @@ def load_D_anchor_category(mode: str, category_id: int) -> pd.DataFrame:
     Columns: anchor_id:uint32, category_id:uint32, mode:uint8, seconds_u16:uint16(nullable), snapshot_ts:date
     """
     mode_code = _mode_to_partition(mode)
-    base = os.path.join(_DANCHOR_CATEGORY_DIR, f"mode={mode_code}", f"category_id={category_id}")
+    base = os.path.join(_danchor_category_dir(), f"mode={mode_code}", f"category_id={category_id}")
     print(f"[DEBUG] Loading category from: {base}")
     df = _read_hive_dataset(
         base,
@@ -419,7 +490,7 @@ def load_D_anchor_brand(mode: str, brand_id: str) -> pd.DataFrame:
     Columns: anchor_id:uint32, brand_id:str, mode:uint8, seconds_u16:uint16(nullable), snapshot_ts:date
     """
     mode_code = _mode_to_partition(mode)
-    base = os.path.join(_DANCHOR_BRAND_DIR, f"mode={mode_code}", f"brand_id={brand_id}")
+    base = os.path.join(_danchor_brand_dir(), f"mode={mode_code}", f"brand_id={brand_id}")
     print(f"[DEBUG] Loading from: {base}")
     df = _read_hive_dataset(
         base,
@@ -496,7 +567,7 @@ def _resolve_brand_id(raw: str) -> str:
 
 def list_available_categories(mode: str) -> list[int]:
     """Return sorted list of available category_id from Hive partitions for given mode, if present."""
-    base = os.path.join(_DANCHOR_CATEGORY_DIR, f"mode={_mode_to_partition(mode)}")
+    base = os.path.join(_danchor_category_dir(), f"mode={_mode_to_partition(mode)}")
     ids: list[int] = []
     if os.path.isdir(base):
         for name in os.listdir(base):
@@ -513,7 +584,7 @@ def _load_category_label_to_id() -> Dict[str, int]:
     
     Falls back to legacy category_label_to_id.json if CSV doesn't exist.
     """
-    base = os.path.join("data", "taxonomy")
+    base = _data_path("taxonomy")
     csv_path = os.path.join(base, "POI_category_registry.csv")
     
     # Try CSV first (new approach with explicit IDs)
@@ -544,12 +615,21 @@ def _load_category_label_to_id() -> Dict[str, int]:
     return {}
 
 def _load_category_labels() -> Dict[str, str]:
+    """Category id -> display name, read once per snapshot (see _read_category_labels)."""
+    cache = _snapshot_cache("category_labels")
+    if "map" in cache:
+        return cache["map"]
+    labels = _read_category_labels()
+    cache["map"] = labels
+    return labels
+
+def _read_category_labels() -> Dict[str, str]:
     """Load category id -> display name mapping from POI_category_registry.csv.
     Returns mapping with string numeric_id keys (e.g. {"1": "Airport"}).
     
     Falls back to legacy category_labels.json if CSV doesn't exist.
     """
-    base = os.path.join("data", "taxonomy")
+    base = _data_path("taxonomy")
     csv_path = os.path.join(base, "POI_category_registry.csv")
     
     # Try CSV first (new approach)
@@ -606,15 +686,14 @@ def _load_category_labels() -> Dict[str, str]:
 
 
 # ---------- Derived category labels (fallback) ----------
-_CACHED_CAT_LABELS: dict[str, dict[str, str]] = {}
 
 def _find_sites_parquet(mode: str) -> Optional[str]:
     """Locate an anchors/sites parquet for the given mode.
     Preference order:
       data/anchors/*_{mode}_sites.parquet -> data/minutes/*_{mode}_sites.parquet
     """
-    pat1 = os.path.join("data", "anchors", f"*_{mode}_sites.parquet")
-    pat2 = os.path.join("data", "minutes", f"*_{mode}_sites.parquet")
+    pat1 = _data_path("anchors", f"*_{mode}_sites.parquet")
+    pat2 = _data_path("minutes", f"*_{mode}_sites.parquet")
     cands = sorted(glob.glob(pat1)) or sorted(glob.glob(pat2))
     return cands[0] if cands else None
 
@@ -633,8 +712,9 @@ def _infer_category_labels_from_data(mode: str) -> Dict[str, str]:
     tally the most frequent category string per numeric id, and prettify the label.
     Results are cached per mode.
     """
-    if mode in _CACHED_CAT_LABELS:
-        return _CACHED_CAT_LABELS[mode]
+    label_cache = _snapshot_cache("inferred_category_labels")
+    if mode in label_cache:
+        return label_cache[mode]
 
     try:
         D = load_D_anchor(mode)
@@ -679,7 +759,7 @@ def _infer_category_labels_from_data(mode: str) -> Dict[str, str]:
     best = vc.groupby("category_id").first().reset_index()
 
     out: Dict[str, str] = {str(int(r["category_id"])): _prettify(str(r["category_label"])) for _, r in best.iterrows()}
-    _CACHED_CAT_LABELS[mode] = out
+    label_cache[mode] = out
     return out
 
 def resolve_category_id(category: str, mode: str) -> int:
@@ -708,6 +788,49 @@ app = FastAPI(title=APP_NAME)
 app.mount("/static", StaticFiles(directory="tiles/web"), name="static")
 app.mount("/tiles/web", StaticFiles(directory="tiles/web"), name="tiles-web")
 
+@app.on_event("startup")
+def _start_dataset_watcher():
+    _SNAPSHOTS.start()
+
+
+@app.on_event("shutdown")
+def _stop_dataset_watcher():
+    _SNAPSHOTS.stop()
+    _SNAPSHOTS.current().shards.stop_sweeper()
+    _ROUTING.shutdown()
+
+
+@app.middleware("http")
+async def _pin_dataset_snapshot(request: Request, call_next):
+    """Pin each request to the snapshot current at its start; it is released only after the last pinned request.
+
+    The lease is held until the response body has been sent, so streamed and file responses
+    never read from a snapshot that was released under them.
+    """
+    lease = _SNAPSHOTS.lease()
+    snap = lease.__enter__()
+    token = _REQUEST_SNAPSHOT.set(snap)
+    try:
+        response = await call_next(request)
+    except BaseException:
+        lease.__exit__(None, None, None)
+        raise
+    finally:
+        _REQUEST_SNAPSHOT.reset(token)
+    response.headers["X-Dataset-Version"] = snap.version
+    body = response.body_iterator
+
+    async def _body_then_release():
+        try:
+            async for chunk in body:
+                yield chunk
+        finally:
+            lease.__exit__(None, None, None)
+
+    response.body_iterator = _body_then_release()
+    return response
+
+
 # Basic CORS for frontend access
 app.add_middleware(
     CORSMiddleware,
@@ -729,6 +852,18 @@ async def serve_frontend():
         }
     )
 
+@app.get("/api/shards")
+def shards():
+    """Discovered state shards with residency, memory accounting and eviction counters."""
+    return _shard_registry().stats()
+
+
+@app.get("/api/dataset")
+def dataset():
+    """Served dataset version, watcher status and swap counters."""
+    return _SNAPSHOTS.stats()
+
+
 @app.get("/health")
 def health():
     return {"ok": True, "app": APP_NAME}
@@ -770,10 +905,9 @@ def catalog(mode: str = Query("drive", description="Travel mode, e.g. 'drive' or
     brands: list[dict[str, str]] = []
     present: set[str] = set()
     try:
-        canon_path = os.path.join("data", "poi", f"{STATE}_canonical.parquet")
-        if os.path.exists(canon_path):
-            cdf = pd.read_parquet(canon_path, columns=["brand_id"])  # type: ignore
-            present = set(str(b) for b in cdf["brand_id"].dropna().unique().tolist())
+        canon = _load_canonical_pois()
+        if "brand_id" in canon.columns:
+            present = set(str(b) for b in canon["brand_id"].dropna().unique().tolist())
     except Exception:
         present = set()
 
@@ -786,11 +920,9 @@ def catalog(mode: str = Query("drive", description="Travel mode, e.g. 'drive' or
     # Build category -> brands mapping via canonical POIs if possible
     cat_to_brands: dict[str, list[str]] = {str(c['id']): [] for c in categories}
     try:
-        state = STATE
-        canon_path = os.path.join("data", "poi", f"{state}_canonical.parquet")
-        if os.path.exists(canon_path):
-            cdf = pd.read_parquet(canon_path, columns=["brand_id", "category"])  # best-effort
-            cdf = cdf.dropna(subset=["brand_id", "category"])
+        cdf = _load_canonical_pois()
+        if {"brand_id", "category"}.issubset(cdf.columns):
+            cdf = cdf[["brand_id", "category"]].dropna(subset=["brand_id", "category"]).drop_duplicates()
             # Load the label -> id mapping (e.g., "fast_food" -> 5)
             label_to_id = _load_category_label_to_id()
             # Accumulate mapping
@@ -983,96 +1115,128 @@ def places_details(
 # ---------- Custom D_anchor (one-off for a user-picked point) ----------
 # Reuse graph + anchors and compute anchor->custom seconds via a single-source run on the CSR transpose.
 
-def _load_graph_and_anchors(mode: str):
-    key = mode
-    if key not in _GRAPH_CACHE:
-        print(f"[_load_graph_and_anchors] Loading graph for mode={mode} (first-time load, may take 30-60 seconds)...")
-        # Locate PBF by STATE name
-        state = os.environ.get("TS_STATE", "massachusetts")
-        pbf = os.path.join("data", "osm", f"{state}.osm.pbf")
-        cache_dir = os.path.join("data", "osm", "cache_csr", f"{state}_{mode}.npycache")
-        if not os.path.isfile(pbf) and not os.path.isdir(cache_dir):
-            raise RuntimeError(f"OSM PBF not found and no CSR cache available: {pbf}")
-        # Deferred import to avoid hard dependency at import time
-        from graph.pyrosm_csr import load_or_build_csr  # type: ignore
-        import time
-        start = time.time()
-        node_ids, indptr, indices, w_sec, node_lats, node_lons, node_h3_by_res, res_used = load_or_build_csr(pbf, mode, [8], False)
-        elapsed = time.time() - start
-        print(f"[_load_graph_and_anchors] Graph loaded in {elapsed:.1f}s: {len(node_ids)} nodes, {len(indices)} edges")
-        if load_or_build_ch is None or build_rev_csr is None:
-            raise RuntimeError("CH helpers unavailable; native module not built")
-        print(f"[_load_graph_and_anchors] Building CSR transpose for CH (one-time)...")
-        rev_start = time.time()
-        indptr_rev, indices_rev, w_rev = build_rev_csr(indptr, indices, w_sec)
-        rev_elapsed = time.time() - rev_start
-        print(f"[_load_graph_and_anchors] CSR transpose built in {rev_elapsed:.1f}s")
-        print(f"[_load_graph_and_anchors] Preparing CH graph (cached, reverse edges) for mode={mode}...")
-        ch_graph = load_or_build_ch(cache_dir, indptr_rev, indices_rev, w_rev, suffix="_rev")
-        try:
-            ch_nodes = getattr(ch_graph, "num_nodes", None)
-        except Exception:
-            ch_nodes = None
-        if isinstance(ch_nodes, int):
-            print(f"[_load_graph_and_anchors] CH ready with {ch_nodes:,} nodes")
-        _GRAPH_CACHE[key] = {
-            "node_ids": node_ids,
-            "indptr": indptr,
-            "indices": indices,
-            "w_sec": w_sec,
-            "indptr_rev": indptr_rev,
-            "indices_rev": indices_rev,
-            "w_rev": w_rev,
-            "lats": node_lats,
-            "lons": node_lons,
-            "ch_rev": ch_graph,
-        }
-    if key not in _ANCHOR_CACHE:
-        print(f"[_load_graph_and_anchors] Loading anchor sites for mode={mode}...")
-        sites_path = _find_sites_parquet(mode)
-        if not sites_path:
-            print(f"WARNING: No anchor sites parquet found for mode={mode}. Creating empty anchor cache.")
-            # Create empty anchor cache to allow graceful degradation
-            _ANCHOR_CACHE[key] = {
-                "anchors_df": pd.DataFrame(),
-                "anchor_idx": np.array([], dtype=np.int32),
-                "anchor_nodes": np.array([], dtype=np.int32),
-                "anchor_ids": np.array([], dtype=np.int32),
-                "anchor_lats": np.array([], dtype=np.float32),
-                "anchor_lons": np.array([], dtype=np.float32),
-            }
-            return _GRAPH_CACHE[key], _ANCHOR_CACHE[key]
-        anchors_df = pd.read_parquet(sites_path)
-        if "anchor_int_id" not in anchors_df.columns:
-            anchors_df = anchors_df.sort_values("site_id").reset_index(drop=True)
-            anchors_df["anchor_int_id"] = anchors_df.index.astype("int32")
-        # Build mapping from node id -> anchor_int_id aligned to CSR node order
-        node_ids = _GRAPH_CACHE[key]["node_ids"]  # type: ignore
-        nid_to_idx = {int(n): i for i, n in enumerate(node_ids.tolist())}
-        anchor_idx = np.full(len(node_ids), -1, dtype=np.int32)
-        for node_id, aint in anchors_df[["node_id", "anchor_int_id"]].itertuples(index=False):
-            j = nid_to_idx.get(int(node_id))
-            if j is not None:
-                anchor_idx[j] = int(aint)
-        anchor_nodes = np.flatnonzero(anchor_idx >= 0).astype(np.int32, copy=False)
-        anchor_ids = anchor_idx[anchor_nodes].astype(np.int32, copy=False)
-        lats = _GRAPH_CACHE[key]["lats"]  # type: ignore
-        lons = _GRAPH_CACHE[key]["lons"]  # type: ignore
-        anchor_lats = lats[anchor_nodes].astype(np.float32, copy=False)
-        anchor_lons = lons[anchor_nodes].astype(np.float32, copy=False)
-        print(f"[_load_graph_and_anchors] Loaded {len(anchors_df)} anchor sites")
-        _ANCHOR_CACHE[key] = {
-            "anchors_df": anchors_df,
-            "anchor_idx": anchor_idx,
-            "anchor_nodes": anchor_nodes,
-            "anchor_ids": anchor_ids,
-            "anchor_lats": anchor_lats,
-            "anchor_lons": anchor_lons,
+def _load_shard(shard: StateShard) -> Tuple[Dict[str, object], Dict[str, object]]:
+    """Load one state's CSR graph, reverse CH and anchor mappings (called lazily by the shard registry)."""
+    state, mode, cache_dir = shard.state, shard.mode, shard.cache_dir
+    print(f"[_load_graph_and_anchors] Loading graph for state={state} mode={mode} (first-time load, may take 30-60 seconds)...")
+    if not os.path.isfile(shard.pbf_path) and not os.path.isdir(cache_dir):
+        raise RuntimeError(f"OSM PBF not found and no CSR cache available: {shard.pbf_path}")
+    # Deferred import to avoid hard dependency at import time
+    from graph.pyrosm_csr import load_csr_npy, load_or_build_csr  # type: ignore
+    import time
+    start = time.time()
+    if os.path.isfile(shard.pbf_path):
+        node_ids, indptr, indices, w_sec, node_lats, node_lons, node_h3_by_res, res_used = load_or_build_csr(shard.pbf_path, mode, [ISOCHRONE_RES], False)
+    else:
+        # Published releases ship the validated cache without the source PBF
+        node_ids, indptr, indices, w_sec, node_lats, node_lons, node_h3_by_res = load_csr_npy(cache_dir, [ISOCHRONE_RES])
+    elapsed = time.time() - start
+    print(f"[_load_graph_and_anchors] Graph loaded in {elapsed:.1f}s: {len(node_ids)} nodes, {len(indices)} edges")
+    if GraphBundle is None:
+        raise RuntimeError("CH helpers unavailable; native module not built")
+    rev_start = time.time()
+    bundle = GraphBundle(cache_dir)
+    indptr_rev, indices_rev, w_rev = bundle.rev_csr()
+    print(f"[_load_graph_and_anchors] CSR transpose ready in {time.time() - rev_start:.1f}s (cache bundle)")
+    print(f"[_load_graph_and_anchors] Preparing CH graph (cached, reverse edges) for state={state} mode={mode}...")
+    ch_graph = bundle.ch("_rev", threads=os.cpu_count() or 1)
+    try:
+        ch_nodes = getattr(ch_graph, "num_nodes", None)
+    except Exception:
+        ch_nodes = None
+    if isinstance(ch_nodes, int):
+        print(f"[_load_graph_and_anchors] CH ready with {ch_nodes:,} nodes")
+    # [N,R] matrix from load_or_build_csr, list of per-res arrays from load_csr_npy
+    if isinstance(node_h3_by_res, np.ndarray):
+        node_h3 = node_h3_by_res[:, 0] if node_h3_by_res.ndim == 2 and node_h3_by_res.shape[1] else None
+    else:
+        node_h3 = node_h3_by_res[0] if node_h3_by_res else None
+    graph: Dict[str, object] = {
+        "state": state,
+        "node_ids": node_ids,
+        "indptr": indptr,
+        "indices": indices,
+        "w_sec": w_sec,
+        "indptr_rev": indptr_rev,
+        "indices_rev": indices_rev,
+        "w_rev": w_rev,
+        "lats": node_lats,
+        "lons": node_lons,
+        "ch_rev": ch_graph,
+        f"h3_r{ISOCHRONE_RES}": node_h3,
+    }
+
+    print(f"[_load_graph_and_anchors] Loading anchor sites for state={state} mode={mode}...")
+    if not shard.sites_path:
+        print(f"WARNING: No anchor sites parquet found for state={state} mode={mode}. Creating empty anchor cache.")
+        # Create empty anchor cache to allow graceful degradation
+        return graph, {
+            "anchors_df": pd.DataFrame(),
+            "anchor_idx": np.array([], dtype=np.int32),
+            "anchor_nodes": np.array([], dtype=np.int32),
+            "anchor_ids": np.array([], dtype=np.int32),
+            "anchor_lats": np.array([], dtype=np.float32),
+            "anchor_lons": np.array([], dtype=np.float32),
         }
-    return _GRAPH_CACHE[key], _ANCHOR_CACHE[key]
+    anchors_df = pd.read_parquet(shard.sites_path)
+    if "anchor_int_id" not in anchors_df.columns:
+        anchors_df = anchors_df.sort_values("site_id").reset_index(drop=True)
+        anchors_df["anchor_int_id"] = anchors_df.index.astype("int32")
+    # Build mapping from node id -> anchor_int_id aligned to CSR node order
+    nid_to_idx = {int(n): i for i, n in enumerate(node_ids.tolist())}
+    anchor_idx = np.full(len(node_ids), -1, dtype=np.int32)
+    for node_id, aint in anchors_df[["node_id", "anchor_int_id"]].itertuples(index=False):
+        j = nid_to_idx.get(int(node_id))
+        if j is not None:
+            anchor_idx[j] = int(aint)
+    anchor_nodes = np.flatnonzero(anchor_idx >= 0).astype(np.int32, copy=False)
+    anchor_ids = anchor_idx[anchor_nodes].astype(np.int32, copy=False)
+    anchor_lats = node_lats[anchor_nodes].astype(np.float32, copy=False)
+    anchor_lons = node_lons[anchor_nodes].astype(np.float32, copy=False)
+    print(f"[_load_graph_and_anchors] Loaded {len(anchors_df)} anchor sites")
+    return graph, {
+        "anchors_df": anchors_df,
+        "anchor_idx": anchor_idx,
+        "anchor_nodes": anchor_nodes,
+        "anchor_ids": anchor_ids,
+        "anchor_lats": anchor_lats,
+        "anchor_lons": anchor_lons,
+    }
 
 
-    
+def _shard_registry() -> ShardRegistry:
+    """Per-state graph + anchor shards of the pinned snapshot, loaded on first use and unloaded LRU-first."""
+    return _snapshot().shards
+
+
+def _default_state(mode: str) -> str:
+    states = _shard_registry().states(mode)
+    if STATE in states or not states:
+        return STATE
+    return states[0]
+
+
+def _resolve_state(mode: str, state: Optional[str], lon: Optional[float] = None, lat: Optional[float] = None) -> str:
+    """Explicit state if served, else the shard covering (lon, lat), else the default state."""
+    registry = _shard_registry()
+    if state:
+        if registry.shard(state, mode) is None:
+            raise HTTPException(status_code=404, detail=f"No dataset for state={state} mode={mode}")
+        return state
+    if lon is not None and lat is not None:
+        routed = registry.route_point(float(lon), float(lat), mode)
+        if routed:
+            return routed
+    return _default_state(mode)
+
+
+def _load_graph_and_anchors(mode: str, state: Optional[str] = None):
+    state = state or _default_state(mode)
+    registry = _shard_registry()
+    if registry.shard(state, mode) is None:
+        pbf = _data_path("osm", f"{state}.osm.pbf")
+        raise RuntimeError(f"OSM PBF not found and no CSR cache available: {pbf}")
+    return registry.get(state, mode)
 
 
 def _nearest_node_index(lons: np.ndarray, lats: np.ndarray, lon: float, lat: float) -> int:
@@ -1118,117 +1282,493 @@ def _approx_anchor_mask(
     return dist2 <= (radius_m * radius_m)
 
 
+_ROUTING = AdmissionController(
+    max_workers=ROUTING_WORKERS,
+    max_queue=ROUTING_QUEUE,
+    per_client=ROUTING_PER_CLIENT,
+    retry_after_s=ROUTING_RETRY_AFTER_S,
+    max_wait_s=ROUTING_MAX_WAIT_S,
+)
+
+
+def _trusted_proxy(host: str) -> bool:
+    try:
+        addr = ipaddress.ip_address(host)
+    except ValueError:
+        return False
+    return any(addr in net for net in TRUSTED_PROXIES)
+
+
+def _client_id(request: Request) -> str:
+    """Socket peer; behind a trusted proxy, the nearest X-Forwarded-For hop that is not a trusted proxy.
+
+    X-Forwarded-For is client-controlled, so it is only read when the peer is listed in
+    TS_TRUSTED_PROXIES, and then walked from the right (the hops our proxies appended).
+    """
+    peer = request.client.host if request.client else "unknown"
+    fwd = request.headers.get("x-forwarded-for")
+    if not fwd or not _trusted_proxy(peer):
+        return peer
+    for hop in reversed([h.strip() for h in fwd.split(",") if h.strip()]):
+        if not _trusted_proxy(hop):
+            return hop
+    return peer
+
+
+def _overloaded(e: Overloaded) -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail=f"Routing busy ({e.reason}); retry shortly",
+        headers={"Retry-After": str(max(1, int(math.ceil(e.retry_after_s))))},
+    )
+
+
+async def _run_routing(request: Request, fn, *args):
+    """Run CPU-heavy routing on the admission-controlled executor; 503 fast when saturated."""
+    try:
+        fut = _ROUTING.submit(_client_id(request), fn, *args)
+    except Overloaded as e:
+        raise _overloaded(e)
+    try:
+        return await asyncio.wrap_future(fut)
+    except Overloaded as e:
+        raise _overloaded(e)
+
+
+def _compute_d_anchor_custom(lon: float, lat: float, mode: str, state: Optional[str], cutoff: int, overflow_cutoff: int) -> Dict[str, int]:
+    state = _resolve_state(mode, state, lon, lat)
+    print(f"[d_anchor_custom] Request: lon={lon}, lat={lat}, mode={mode}, state={state}, cutoff={cutoff}min")
+    G, A = _load_graph_and_anchors(mode, state)
+    
+    # Check if anchor cache is empty (e.g., walk mode data missing)
+    anchor_nodes = A.get("anchor_nodes")
+    if anchor_nodes is None or len(anchor_nodes) == 0:
+        print(f"WARNING: No anchor data available for mode={mode}. Returning empty result.")
+        return {}
+    node_ids = G["node_ids"]  # type: ignore
+    lats = G["lats"]  # type: ignore
+    lons = G["lons"]  # type: ignore
+    anchor_idx = A["anchor_idx"]  # type: ignore
+    anchor_nodes = A.get("anchor_nodes")  # type: ignore
+    anchor_ids = A.get("anchor_ids")  # type: ignore
+    anchor_lats = A.get("anchor_lats")  # type: ignore
+    anchor_lons = A.get("anchor_lons")  # type: ignore
+    if anchor_nodes is None or anchor_ids is None or anchor_lats is None or anchor_lons is None:
+        anchor_nodes = np.flatnonzero(anchor_idx >= 0).astype(np.int32, copy=False)
+        anchor_ids = anchor_idx[anchor_nodes].astype(np.int32, copy=False)
+        anchor_lats = lats[anchor_nodes].astype(np.float32, copy=False)
+        anchor_lons = lons[anchor_nodes].astype(np.float32, copy=False)
+        A["anchor_nodes"] = anchor_nodes
+        A["anchor_ids"] = anchor_ids
+        A["anchor_lats"] = anchor_lats
+        A["anchor_lons"] = anchor_lons
+    anchor_nodes = np.asarray(anchor_nodes, dtype=np.int32)
+    anchor_ids = np.asarray(anchor_ids, dtype=np.int32)
+    anchor_lats = np.asarray(anchor_lats, dtype=np.float32)
+    anchor_lons = np.asarray(anchor_lons, dtype=np.float32)
+    if anchor_nodes.size == 0:
+        return {}
+
+    # Find nearest node to the custom lon/lat
+    j_custom = _nearest_node_index(lons, lats, lon, lat)
+    print(f"[d_anchor_custom] Nearest node: {node_ids[j_custom]} at index {j_custom}")
+
+    ch_graph = G.get("ch_rev")
+    if ch_graph is None:
+        raise RuntimeError("CH graph missing from graph cache")
+        
+    cutoff_s = int(cutoff) * 60
+    overflow_s = int(overflow_cutoff) * 60
+    limit_s = max(cutoff_s, overflow_s)
+    print(
+        f"[d_anchor_custom] Running CH+PHAST query to {len(anchor_nodes)} anchors (cutoff={cutoff}min, overflow={overflow_cutoff}min)..."
+    )
+    import time
+    start = time.time()
+    # Use query_subset to target only anchor nodes - much faster than query_all
+    ts_anchor = np.asarray(ch_graph.query_subset(int(j_custom), anchor_nodes, limit_s), dtype=np.uint32)
+    elapsed = time.time() - start
+    print(f"[d_anchor_custom] CH query completed in {elapsed:.3f}s")
+
+    out: Dict[str, int] = {}
+    reachable_count = 0
+    inf_val = np.uint32(0xFFFFFFFF)
+    sentinel_u32 = np.uint32(int(UNREACH_U16))
+    ts_anchor = np.where(ts_anchor == inf_val, sentinel_u32, ts_anchor)
+    ts_anchor = np.minimum(ts_anchor, sentinel_u32)
+    ts_anchor_u16 = ts_anchor.astype(np.uint16, copy=False)
+    for aid, t_raw in zip(anchor_ids, ts_anchor_u16):
+        t = int(t_raw)
+        if t < int(UNREACH_U16):
+            reachable_count += 1
+        out[str(int(aid))] = t
+    print(f"[d_anchor_custom] Computed {len(out)} anchor times, {reachable_count} reachable within cutoff")
+    return out
+
+
 @app.get("/api/d_anchor_custom")
-def get_d_anchor_custom(
+async def get_d_anchor_custom(
+    request: Request,
     lon: float = Query(..., description="Longitude of custom location"),
     lat: float = Query(..., description="Latitude of custom location"),
     mode: str = Query("drive", description="Travel mode, e.g. 'drive' or 'walk'"),
     cutoff: int = Query(30, description="Primary cutoff in minutes"),
     overflow_cutoff: int = Query(90, description="Overflow cutoff in minutes"),
+    state: Optional[str] = Query(None, description="State shard to route on (default: the shard covering lon/lat)"),
 ):
     """
     One-off D_anchor for a custom point. Returns {anchor_int_id: seconds} suitable
-    for GPU composition with T_hex tiles.
+    for GPU composition with T_hex tiles. Runs on the bounded routing executor;
+    returns 503 + Retry-After when it is saturated.
     """
-    print(f"[d_anchor_custom] Request: lon={lon}, lat={lat}, mode={mode}, cutoff={cutoff}min")
     try:
-        G, A = _load_graph_and_anchors(mode)
-        
-        # Check if anchor cache is empty (e.g., walk mode data missing)
-        anchor_nodes = A.get("anchor_nodes")
-        if anchor_nodes is None or len(anchor_nodes) == 0:
-            print(f"WARNING: No anchor data available for mode={mode}. Returning empty result.")
-            return {}
-        node_ids = G["node_ids"]  # type: ignore
-        lats = G["lats"]  # type: ignore
-        lons = G["lons"]  # type: ignore
-        anchor_idx = A["anchor_idx"]  # type: ignore
-        anchor_nodes = A.get("anchor_nodes")  # type: ignore
-        anchor_ids = A.get("anchor_ids")  # type: ignore
-        anchor_lats = A.get("anchor_lats")  # type: ignore
-        anchor_lons = A.get("anchor_lons")  # type: ignore
-        if anchor_nodes is None or anchor_ids is None or anchor_lats is None or anchor_lons is None:
-            anchor_nodes = np.flatnonzero(anchor_idx >= 0).astype(np.int32, copy=False)
-            anchor_ids = anchor_idx[anchor_nodes].astype(np.int32, copy=False)
-            anchor_lats = lats[anchor_nodes].astype(np.float32, copy=False)
-            anchor_lons = lons[anchor_nodes].astype(np.float32, copy=False)
-            A["anchor_nodes"] = anchor_nodes
-            A["anchor_ids"] = anchor_ids
-            A["anchor_lats"] = anchor_lats
-            A["anchor_lons"] = anchor_lons
-        anchor_nodes = np.asarray(anchor_nodes, dtype=np.int32)
-        anchor_ids = np.asarray(anchor_ids, dtype=np.int32)
-        anchor_lats = np.asarray(anchor_lats, dtype=np.float32)
-        anchor_lons = np.asarray(anchor_lons, dtype=np.float32)
-        if anchor_nodes.size == 0:
-            return {}
+        return await _run_routing(request, _compute_d_anchor_custom, lon, lat, mode, state, cutoff, overflow_cutoff)
+    except HTTPException:
+        raise
+    except Exception as e:
+        import traceback
+        print(f"ERROR in d_anchor_custom: {e}\n{traceback.format_exc()}")
+        raise HTTPException(status_code=500, detail="Internal Server Error")
+
+
+# ---------- Ad-hoc D_anchor (arbitrary POI sets) ----------
+def _adhoc_index(A: Dict[str, object]) -> AnchorSetIndex:
+    """Brand/category/POI -> anchor index for a loaded shard, built once on first ad-hoc query."""
+    idx = A.get("adhoc_index")
+    if idx is None:
+        sites = A.get("anchors_df")
+        idx = AnchorSetIndex.from_sites(sites if isinstance(sites, pd.DataFrame) else pd.DataFrame())
+        A["adhoc_index"] = idx
+    return idx  # type: ignore[return-value]
+
+
+def _adhoc_cache() -> LRUCache:
+    cache = _snapshot_cache("d_anchor_adhoc")
+    if "lru" not in cache:
+        cache["lru"] = LRUCache(ADHOC_CACHE_ENTRIES)
+    return cache["lru"]
+
+
+def _adhoc_category_slugs(categories: List[str], mode: str, idx: AnchorSetIndex) -> List[str]:
+    """Category slugs as stored on anchor sites; numeric ids and labels are mapped through the registry."""
+    out: List[str] = []
+    id_to_slug = None
+    for raw in categories:
+        term = str(raw).strip()
+        if term in idx.by_category:
+            out.append(term)
+            continue
+        if id_to_slug is None:
+            id_to_slug = _load_category_id_to_slug()
+        slug = id_to_slug.get(str(resolve_category_id(term, mode)))
+        if slug:
+            out.append(slug)
+    return out
+
 
-        # Find nearest node to the custom lon/lat
-        j_custom = _nearest_node_index(lons, lats, lon, lat)
-        print(f"[d_anchor_custom] Nearest node: {node_ids[j_custom]} at index {j_custom}")
-
-        ch_graph = G.get("ch_rev")
-        if ch_graph is None:
-            raise RuntimeError("CH graph missing from graph cache")
-            
-        cutoff_s = int(cutoff) * 60
-        overflow_s = int(overflow_cutoff) * 60
-        limit_s = max(cutoff_s, overflow_s)
-        print(
-            f"[d_anchor_custom] Running CH+PHAST query to {len(anchor_nodes)} anchors (cutoff={cutoff}min, overflow={overflow_cutoff}min)..."
+def _compute_d_anchor_adhoc(
+    mode: str,
+    state: Optional[str],
+    brands: List[str],
+    categories: List[str],
+    poi_ids: List[str],
+    cutoff: int,
+) -> Tuple[str, int, Dict[str, int]]:
+    """(set key, source anchor count, {anchor_int_id: seconds}) for the union of the requested POI sets."""
+    state = _resolve_state(mode, state)
+    G, A = _load_graph_and_anchors(mode, state)
+    idx = _adhoc_index(A)
+    anchor_ids = idx.resolve(
+        brands=[_resolve_brand_id(b) for b in brands],
+        categories=_adhoc_category_slugs(categories, mode, idx),
+        poi_ids=[str(p).strip() for p in poi_ids],
+    )
+    if anchor_ids.size == 0:
+        raise HTTPException(status_code=404, detail="No anchors match the requested brands/categories/POIs")
+    key = anchor_set_key(anchor_ids)
+    limit_s = int(cutoff) * 60
+    cache_key = (state, mode, key, limit_s)
+    lru = _adhoc_cache()
+    hit = lru.get(cache_key)
+    if hit is not None:
+        return hit
+
+    ch_graph = G.get("ch_rev")
+    if ch_graph is None:
+        raise RuntimeError("CH graph missing from graph cache")
+    shard_nodes = np.asarray(A["anchor_nodes"], dtype=np.int32)  # type: ignore[arg-type]
+    shard_ids = np.asarray(A["anchor_ids"], dtype=np.int32)  # type: ignore[arg-type]
+    sources = anchor_nodes_for(anchor_ids, shard_ids, shard_nodes)
+    if sources.size == 0:
+        # Matching anchors all live in other states' shards (e.g. POI ids from another state)
+        raise HTTPException(status_code=404, detail="No anchors match the requested brands/categories/POIs")
+    import time
+    start = time.time()
+    # Reverse CH: PHAST from the source union gives anchor -> nearest source, same direction as D_anchor
+    ts = np.asarray(ch_graph.query_multi(sources, shard_nodes, limit_s), dtype=np.uint32)
+    ts = np.minimum(ts, np.uint32(int(UNREACH_U16))).astype(np.uint16)
+    out = {str(int(a)): int(t) for a, t in zip(shard_ids, ts)}
+    print(
+        f"[d_anchor_adhoc] state={state} mode={mode} set={key} sources={sources.size} cutoff={cutoff}min: "
+        f"{int((ts < UNREACH_U16).sum())}/{ts.size} anchors reachable in {time.time() - start:.3f}s"
+    )
+    result = (key, int(sources.size), out)
+    lru.put(cache_key, result)
+    return result
+
+
+def _split_terms(values: Optional[List[str]]) -> List[str]:
+    """Accept repeated params and comma-separated lists (brand=costco,bjs)."""
+    out: List[str] = []
+    for v in values or []:
+        out.extend(t.strip() for t in str(v).split(",") if t.strip())
+    return out
+
+
+async def _d_anchor_adhoc_response(request: Request, mode: str, state: Optional[str], brands, categories, poi_ids, cutoff: int):
+    brands, categories, poi_ids = _split_terms(brands), _split_terms(categories), _split_terms(poi_ids)
+    if not (brands or categories or poi_ids):
+        raise HTTPException(status_code=400, detail="Provide at least one brand, category or poi_id")
+    if not 1 <= int(cutoff) <= ADHOC_MAX_MINUTES:
+        raise HTTPException(status_code=400, detail=f"cutoff must be between 1 and {ADHOC_MAX_MINUTES} minutes")
+    try:
+        key, n_sources, out = await _run_routing(
+            request, _compute_d_anchor_adhoc, mode, state, brands, categories, poi_ids, int(cutoff)
         )
-        import time
-        start = time.time()
-        # Use query_subset to target only anchor nodes - much faster than query_all
-        ts_anchor = np.asarray(ch_graph.query_subset(int(j_custom), anchor_nodes, limit_s), dtype=np.uint32)
-        elapsed = time.time() - start
-        print(f"[d_anchor_custom] CH query completed in {elapsed:.3f}s")
-
-        out: Dict[str, int] = {}
-        reachable_count = 0
-        inf_val = np.uint32(0xFFFFFFFF)
-        sentinel_u32 = np.uint32(int(UNREACH_U16))
-        ts_anchor = np.where(ts_anchor == inf_val, sentinel_u32, ts_anchor)
-        ts_anchor = np.minimum(ts_anchor, sentinel_u32)
-        ts_anchor_u16 = ts_anchor.astype(np.uint16, copy=False)
-        for aid, t_raw in zip(anchor_ids, ts_anchor_u16):
-            t = int(t_raw)
-            if t < int(UNREACH_U16):
-                reachable_count += 1
-            out[str(int(aid))] = t
-        print(f"[d_anchor_custom] Computed {len(out)} anchor times, {reachable_count} reachable within cutoff")
-        return out
+    except HTTPException:
+        raise
     except Exception as e:
         import traceback
-        print(f"ERROR in d_anchor_custom: {e}\n{traceback.format_exc()}")
+        print(f"ERROR in d_anchor_adhoc: {e}\n{traceback.format_exc()}")
+        raise HTTPException(status_code=500, detail="Internal Server Error")
+    return JSONResponse(content=out, headers={"X-D-Anchor-Set": key, "X-D-Anchor-Sources": str(n_sources)})
+
+
+@app.get("/api/d_anchor_adhoc")
+async def get_d_anchor_adhoc(
+    request: Request,
+    brand: Optional[List[str]] = Query(None, description="Brand ids/aliases (repeat or comma-separate)"),
+    category: Optional[List[str]] = Query(None, description="Category ids, slugs or labels (repeat or comma-separate)"),
+    poi_id: Optional[List[str]] = Query(None, description="Explicit POI ids (repeat or comma-separate)"),
+    mode: str = Query("drive", description="Travel mode, e.g. 'drive' or 'walk'"),
+    cutoff: int = Query(60, description="Cutoff in minutes"),
+    state: Optional[str] = Query(None, description="State shard (default: TS_STATE)"),
+):
+    """
+    D_anchor for the union of the given brands, categories and POIs, computed on demand:
+    one multi-source PHAST over the reverse CH from every matching anchor. Returns
+    {anchor_int_id: seconds} like /api/d_anchor (65535 = beyond cutoff). Results are cached
+    per snapshot by a hash of the resolved anchor set (``X-D-Anchor-Set`` header), so
+    "costco,bjs" and "bjs,costco" share one entry.
+    """
+    return await _d_anchor_adhoc_response(request, mode, state, brand, category, poi_id, cutoff)
+
+
+@app.post("/api/d_anchor_adhoc")
+async def post_d_anchor_adhoc(request: Request):
+    """Same as GET, for long pasted lists: JSON body {brands, categories, poi_ids, mode, cutoff, state}."""
+    try:
+        body = await request.json()
+    except Exception:
+        raise HTTPException(status_code=400, detail="Body must be JSON")
+    if not isinstance(body, dict):
+        raise HTTPException(status_code=400, detail="Body must be a JSON object")
+
+    def _terms(name: str) -> List[str]:
+        val = body.get(name) or []
+        return [str(v) for v in (val if isinstance(val, list) else [val])]
+
+    # Bad field types are client errors (422, as query validation answers on the GET route), not 500s.
+    try:
+        cutoff = int(body.get("cutoff", 60))
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=422, detail="cutoff must be an integer number of minutes")
+    state = body.get("state")
+    if state is not None and not isinstance(state, str):
+        raise HTTPException(status_code=422, detail="state must be a string")
+
+    return await _d_anchor_adhoc_response(
+        request,
+        str(body.get("mode", "drive")),
+        state,
+        _terms("brands"),
+        _terms("categories"),
+        _terms("poi_ids"),
+        cutoff,
+    )
+
+
+@app.get("/api/admission")
+def admission():
+    """Routing executor queue depth, concurrency and rejection counters."""
+    return _ROUTING.metrics()
+
+
+# ---------- Isochrones ----------
+def _hex_index(G: Dict[str, object]) -> HexIndex:
+    """Node -> hex ordinal index for a loaded shard, built once on first isochrone."""
+    idx = G.get("hex_index")
+    if idx is None:
+        node_h3 = G.get(f"h3_r{ISOCHRONE_RES}")
+        if node_h3 is None:
+            raise HTTPException(status_code=503, detail=f"Graph cache has no h3_r{ISOCHRONE_RES} ids")
+        idx = HexIndex.from_node_h3(node_h3, ISOCHRONE_RES)  # type: ignore[arg-type]
+        G["hex_index"] = idx
+    return idx  # type: ignore[return-value]
+
+
+def _isochrone_cache() -> LRUCache:
+    cache = _snapshot_cache("isochrones")
+    if "lru" not in cache:
+        cache["lru"] = LRUCache(ISOCHRONE_CACHE_ENTRIES)
+    return cache["lru"]
+
+
+def _compute_isochrone(lon: float, lat: float, mode: str, state: Optional[str], cutoff: int) -> Dict[str, Any]:
+    state = _resolve_state(mode, state, lon, lat)
+    G, _ = _load_graph_and_anchors(mode, state)
+    j = _nearest_node_index(G["lons"], G["lats"], lon, lat)  # type: ignore[arg-type]
+    key = (state, mode, int(j), int(cutoff))
+    lru = _isochrone_cache()
+    hit = lru.get(key)
+    if hit is not None:
+        return hit
+    idx = _hex_index(G)
+    ch_graph = G.get("ch_rev")
+    if ch_graph is None:
+        raise RuntimeError("CH graph missing from graph cache")
+    import time
+    start = time.time()
+    limit_s = int(cutoff) * 60
+    node_times = np.asarray(ch_graph.query_all(int(j), limit_s), dtype=np.uint32)
+    ords, secs = min_time_by_hex(node_times, idx.node_hex, limit_s)
+    out = {
+        "state": state,
+        "mode": mode,
+        "res": idx.res,
+        "node": int(j),
+        "cutoff": int(cutoff),
+        "hex_count": int(idx.hex_ids.size),
+        "ordinals": ords.tolist(),
+        "minutes": seconds_to_minutes(secs).tolist(),
+    }
+    print(f"[isochrone] state={state} mode={mode} node={j} cutoff={cutoff}min: {ords.size} hexes in {time.time() - start:.3f}s")
+    lru.put(key, out)
+    return out
+
+
+@app.get("/api/isochrone")
+async def get_isochrone(
+    request: Request,
+    lon: float = Query(..., description="Longitude of the origin"),
+    lat: float = Query(..., description="Latitude of the origin"),
+    mode: str = Query("drive", description="Travel mode, e.g. 'drive' or 'walk'"),
+    cutoff: int = Query(20, ge=1, description="Cutoff in minutes"),
+    state: Optional[str] = Query(None, description="State shard to route on (default: the shard covering lon/lat)"),
+):
+    """
+    Hexes reachable within ``cutoff`` minutes, as parallel ``ordinals``/``minutes`` arrays.
+    Ordinals index the list from /api/isochrone/hexes for the same state and mode. Times
+    are node->origin on the reverse CH (same direction as /api/d_anchor_custom), minimum
+    over the hex's road nodes, rounded up to whole minutes. Cached by snapped node + cutoff.
+    """
+    if cutoff > ISOCHRONE_MAX_MINUTES:
+        raise HTTPException(status_code=400, detail=f"cutoff must be <= {ISOCHRONE_MAX_MINUTES} minutes")
+    try:
+        return await _run_routing(request, _compute_isochrone, lon, lat, mode, state, cutoff)
+    except HTTPException:
+        raise
+    except Exception as e:
+        import traceback
+        print(f"ERROR in isochrone: {e}\n{traceback.format_exc()}")
         raise HTTPException(status_code=500, detail="Internal Server Error")
 
+
+@app.get("/api/isochrone/hexes")
+def get_isochrone_hexes(
+    mode: str = Query("drive", description="Travel mode, e.g. 'drive' or 'walk'"),
+    state: Optional[str] = Query(None, description="State shard (default: TS_STATE)"),
+):
+    """Ordinal -> H3 id table for a shard's isochrones (fetch once per state/mode/dataset version)."""
+    state = _resolve_state(mode, state)
+    try:
+        G, _ = _load_graph_and_anchors(mode, state)
+    except RuntimeError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    idx = _hex_index(G)
+    return {
+        "state": state,
+        "mode": mode,
+        "res": idx.res,
+        "hex_count": int(idx.hex_ids.size),
+        "h3": [format(int(h), "x") for h in idx.hex_ids],
+    }
+
 # ---------- POI Pins (GeoJSON) ----------
-_CANON_POI_CACHE: Optional[pd.DataFrame] = None
-_CATEGORY_ID_TO_SLUG_CACHE: Optional[Dict[str, str]] = None
 
 
 def _load_category_id_to_slug() -> Dict[str, str]:
     """Invert the label->id mapping to id->label slug."""
-    global _CATEGORY_ID_TO_SLUG_CACHE
-    if _CATEGORY_ID_TO_SLUG_CACHE is not None:
-        return _CATEGORY_ID_TO_SLUG_CACHE
+    cache = _snapshot_cache("category_id_to_slug")
+    if "map" in cache:
+        return cache["map"]
     label_to_id = _load_category_label_to_id()
     inverted = {str(v): str(k) for k, v in label_to_id.items()}
-    _CATEGORY_ID_TO_SLUG_CACHE = inverted
+    cache["map"] = inverted
     return inverted
 
-def _load_canonical_pois() -> pd.DataFrame:
-    global _CANON_POI_CACHE
-    if _CANON_POI_CACHE is not None:
-        return _CANON_POI_CACHE
-    path = os.path.join("data", "poi", f"{STATE}_canonical.parquet")
+def _canonical_poi_states() -> List[str]:
+    """States with a canonical POI file (restricted to TS_STATES when set)."""
+    suffix = "_canonical.parquet"
+    states = sorted(
+        os.path.basename(p)[: -len(suffix)]
+        for p in glob.glob(_data_path("poi", f"*{suffix}"))
+    )
+    if SERVED_STATES:
+        states = [s for s in states if s in SERVED_STATES]
+    return states or [STATE]
+
+
+def _states_for_bbox(bbox: Optional[str]) -> List[str]:
+    """Canonical POI states whose shard extent intersects a lonmin,latmin,lonmax,latmax bbox."""
+    states = _canonical_poi_states()
+    if not bbox:
+        return states
+    try:
+        x0, y0, x1, y1 = [float(x) for x in bbox.split(",")]
+    except Exception:
+        return states
+    xmin, xmax = (min(x0, x1), max(x0, x1))
+    ymin, ymax = (min(y0, y1), max(y0, y1))
+    registry = _shard_registry()
+    keep = []
+    for state in states:
+        boxes = [sh.bbox for sh in (registry.shard(state, m) for m in registry.modes) if sh is not None and sh.bbox]
+        # Unknown extent: keep the state rather than risk dropping its POIs
+        if not boxes or any(b[0] <= xmax and b[2] >= xmin and b[1] <= ymax and b[3] >= ymin for b in boxes):
+            keep.append(state)
+    return keep
+
+
+def _load_canonical_pois(state: Optional[str] = None, states: Optional[List[str]] = None) -> pd.DataFrame:
+    """Canonical POIs for one state, or the union across ``states`` (default: every served state)."""
+    if state is None:
+        frames = [_load_canonical_pois(s) for s in (states if states is not None else _canonical_poi_states())]
+        frames = [f for f in frames if not f.empty]
+        if not frames:
+            return pd.DataFrame(columns=["brand_id", "category", "lon", "lat", "name", "address", "approx_address"])  # type: ignore
+        return frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
+    poi_cache = _snapshot_cache("canonical_pois")
+    cached = poi_cache.get(state)
+    if cached is not None:
+        return cached
+    path = _data_path("poi", f"{state}_canonical.parquet")
     if not os.path.exists(path):
         # Empty dataframe with expected columns
-        _CANON_POI_CACHE = pd.DataFrame(
+        poi_cache[state] = pd.DataFrame(
             columns=["brand_id", "category", "lon", "lat", "name", "address", "approx_address"]
         )  # type: ignore
-        return _CANON_POI_CACHE
+        return poi_cache[state]
     try:
         desired_columns = ["brand_id", "category", "lon", "lat", "name", "address", "approx_address"]
         try:
@@ -1252,14 +1792,14 @@ def _load_canonical_pois() -> pd.DataFrame:
             df["lat"] = pd.to_numeric(df["lat"], errors="coerce")
         # Drop invalid rows
         df = df.dropna(subset=["lon", "lat"]).copy()
-        _CANON_POI_CACHE = df
+        poi_cache[state] = df
         return df
     except Exception as e:
         print(f"[warn] Failed to read canonical POIs at {path}: {e}")
-        _CANON_POI_CACHE = pd.DataFrame(
+        poi_cache[state] = pd.DataFrame(
             columns=["brand_id", "category", "lon", "lat", "name", "address", "approx_address"]
         )  # type: ignore
-        return _CANON_POI_CACHE
+        return poi_cache[state]
 
 
 def _normalize_category_query(value: Optional[str]) -> Optional[str]:
@@ -1303,7 +1843,7 @@ def poi_points(
     if not brand_list and not category_slug:
         return {"type": "FeatureCollection", "features": []}
 
-    df = _load_canonical_pois()
+    df = _load_canonical_pois(states=_states_for_bbox(bbox))
     if df.empty:
         return {"type": "FeatureCollection", "features": []}
 
@@ -1451,6 +1991,155 @@ def get_d_anchor_brand(
 
 # --------- PMTiles byte-serving (HTTP Range) ---------
 
+# ---------- Hex lookup (hover tooltips) ----------
+def _hex_lookup_index(res: int) -> HexLookupIndex:
+    cache = _snapshot_cache("hex_lookup_index")
+    idx = cache.get(res)
+    if idx is None:
+        path = _data_path("hex_index", f"r{res}")
+        if not os.path.isfile(os.path.join(path, "meta.json")):
+            raise HTTPException(status_code=404, detail=f"Hex index for r{res} not built (run scripts/build_hex_index.py)")
+        idx = HexLookupIndex.open(path)
+        cache[res] = idx
+    return idx
+
+
+def _dense_d_anchor(kind: str, mode: str, key: Any) -> np.ndarray:
+    """Resident D_anchor for one category/brand as a uint16 array indexed by anchor id."""
+    cache = _snapshot_cache("dense_d_anchor")
+    ck = (kind, mode, key)
+    dense = cache.get(ck)
+    if dense is None:
+        D = load_D_anchor_category(mode, int(key)) if kind == "category" else load_D_anchor_brand(mode, str(key))
+        D = D[D["anchor_id"].notna()]
+        dense = dense_d_anchor(
+            D["anchor_id"].to_numpy(dtype=np.int64),
+            D["seconds_clamped"].to_numpy(dtype=np.uint16, na_value=UNREACH_U16),
+        )
+        cache[ck] = dense
+    return dense
+
+
+def _anchor_poi_ids(mode: str) -> Dict[Tuple[str, int], List[str]]:
+    """(state, anchor_int_id) -> POI ids; anchor ids are numbered per state, so they are namespaced by it."""
+    cache = _snapshot_cache("anchor_poi_ids")
+    if mode not in cache:
+        out: Dict[Tuple[str, int], List[str]] = {}
+        suffix = f"_{mode}_sites.parquet"
+        for path in sorted(glob.glob(_data_path("anchors", f"*{suffix}"))):
+            state = os.path.basename(path)[: -len(suffix)]
+            try:
+                sites = pd.read_parquet(path, columns=["anchor_int_id", "poi_ids"])
+            except Exception as e:
+                print(f"[warn] Failed to read anchor POI ids from {path}: {e}")
+                continue
+            for aid, pids in sites.itertuples(index=False):
+                if pids is not None:
+                    out[(state, int(aid))] = [str(p) for p in pids]
+        cache[mode] = out
+    return cache[mode]
+
+
+def _poi_details() -> Dict[str, Tuple[Optional[str], Optional[str], Optional[str]]]:
+    """poi_id -> (name, brand_id, category) across served states."""
+    cache = _snapshot_cache("poi_details")
+    if "map" not in cache:
+        out: Dict[str, Tuple[Optional[str], Optional[str], Optional[str]]] = {}
+        for state in _canonical_poi_states():
+            path = _data_path("poi", f"{state}_canonical.parquet")
+            if not os.path.exists(path):
+                continue
+            try:
+                df = pd.read_parquet(path, columns=["poi_id", "name", "brand_id", "category"])
+            except Exception as e:
+                print(f"[warn] Failed to read POI names from {path}: {e}")
+                continue
+            for pid, name, bid, cat in df.itertuples(index=False):
+                out[str(pid)] = (
+                    name if isinstance(name, str) else None,
+                    bid if isinstance(bid, str) else None,
+                    cat if isinstance(cat, str) else None,
+                )
+        cache["map"] = out
+    return cache["map"]
+
+
+def _poi_name_for(anchor_id: int, state: Optional[str], mode: str, kind: str, key: Any) -> Optional[str]:
+    """Name of the state's anchor POI matching the requested category/brand (first named POI as fallback)."""
+    if state is None:
+        return None
+    details = _poi_details()
+    slug = _load_category_id_to_slug().get(str(key)) if kind == "category" else None
+    fallback = None
+    for pid in _anchor_poi_ids(mode).get((state, int(anchor_id)), []):
+        name, bid, cat = details.get(pid, (None, None, None))
+        if not name:
+            continue
+        if (kind == "brand" and bid == key) or (kind == "category" and slug is not None and cat == slug):
+            return name
+        fallback = fallback or name
+    return fallback
+
+
+def _parse_h3(value: str) -> int:
+    raw = str(value).strip()
+    try:
+        cell = int(raw) if raw.isdigit() and len(raw) > 16 else int(raw, 16)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid h3 id '{value}'")
+    if not h3.is_valid_cell(h3.int_to_str(cell)):
+        raise HTTPException(status_code=400, detail=f"Invalid h3 id '{value}'")
+    return cell
+
+
+@app.get("/api/hex_lookup")
+def hex_lookup(
+    h3_id: str = Query(..., alias="h3", description="H3 cell (hex string or decimal uint64)"),
+    categories: Optional[str] = Query(None, description="Comma-separated category ids or labels"),
+    brands: Optional[str] = Query(None, description="Comma-separated brand ids or aliases"),
+    mode: str = Query("drive", description="Travel mode, e.g. 'drive' or 'walk'"),
+):
+    """
+    Hover-tooltip detail for one hex: per requested category/brand, the minimum of
+    a{i}_s + D_anchor[a{i}_id] over the hex's anchor slots, the winning anchor and its POI name.
+    Served from the mmap'd hex index and resident dense D_anchor arrays (no parquet scans after warmup).
+    """
+    cell = _parse_h3(h3_id)
+    idx = _hex_lookup_index(h3.get_resolution(h3.int_to_str(cell)))
+    ordinal = idx.ordinal(cell)
+    targets: List[Tuple[str, Any, str]] = []
+    labels = _load_category_labels()
+    for raw in [c.strip() for c in (categories or "").split(",") if c.strip()]:
+        cid = resolve_category_id(raw, mode)
+        targets.append(("category", cid, labels.get(str(cid), f"Category {cid}")))
+    for raw in [b.strip() for b in (brands or "").split(",") if b.strip()]:
+        bid = _resolve_brand_id(raw)
+        targets.append(("brand", bid, BRAND_REGISTRY.get(bid, (None, []))[0] or bid.replace("_", " ").title()))
+
+    # Anchor ids are per state: name POIs from the state whose shard covers the hex.
+    registry = _shard_registry()
+    lat, lon = h3.cell_to_latlng(h3.int_to_str(cell))
+    state = registry.route_point(lon, lat, mode)
+    if state is None and len(registry.states(mode)) == 1:
+        state = registry.states(mode)[0]
+    results = []
+    a_id, a_s = idx.row(ordinal) if ordinal is not None else (np.zeros(0, np.int32), np.zeros(0, np.uint16))
+    for kind, key, label in targets:
+        hit = best_anchor(a_id, a_s, _dense_d_anchor(kind, mode, key)) if a_id.size else None
+        entry: Dict[str, Any] = {"kind": kind, "id": key, "label": label, "seconds": None, "anchor_id": None, "poi_name": None}
+        if hit is not None:
+            total, aid, slot = hit
+            entry.update({
+                "seconds": total,
+                "minutes": round(total / 60.0, 1),
+                "anchor_id": aid,
+                "access_seconds": int(a_s[slot]),
+                "poi_name": _poi_name_for(aid, state, mode, kind, key),
+            })
+        results.append(entry)
+    return {"h3": format(cell, "x"), "res": idx.res, "mode": mode, "state": state, "indexed": ordinal is not None, "results": results}
+
+
 def _etag_for_path(path: str) -> str:
     try:
         stat = os.stat(path)
@@ -1467,7 +2156,10 @@ async def serve_pmtiles(file_path: str, request: Request):
     Also serves other files in the tiles directory (non-pmtiles) for convenience,
     but .pmtiles must support Range to work with the PMTiles protocol.
     """
-    full_path = os.path.join("tiles", file_path)
+    full_path = os.path.join(_snapshot().tiles_root, file_path)
+    if not os.path.isfile(full_path) and not file_path.endswith(".pmtiles"):
+        # Auxiliary files are not versioned; serve them from the working tree
+        full_path = os.path.join("tiles", file_path)
 
     if not os.path.isfile(full_path):
         raise HTTPException(status_code=404, detail="File not found")
@@ -1549,6 +2241,6 @@ if __name__ == "__main__":
     # For local dev, allow overriding the port
     port = int(os.environ.get("PORT", 5174)) # Default to 5174 to avoid conflict with frontend
     print(f"Starting vicinity D_anchor server on http://0.0.0.0:{port}")
-    print(f"Using STATE={STATE}")
+    print(f"Using STATE={STATE}" + (f" (serving {', '.join(SERVED_STATES)})" if SERVED_STATES else ""))
     # Pass app directly instead of module path to avoid import issues
     uvicorn.run(app, host="0.0.0.0", port=port, reload=False)
@@ -2,6 +2,10 @@
 """
 Parse serial logs for telemetry summaries.
 
+This covers machine-level CPU/vmstat samples. Per-kernel work (pops, relaxations, pruning,
+per-phase wall time) is in the --report JSON written by 04/06 (data/reports/, uploaded to
+<results>/reports on remote runs).
+
 Usage:
   python scripts/analyze_telemetry.py logs/remote_runs/<run>-serial.log \
     [--after "starting make d_anchor_category"] [--until "uploaded build.log"]
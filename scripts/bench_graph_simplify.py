@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Benchmark degree-2 chain contraction (graph.simplify) for the T_hex K-best stage.
+
+Loads a state's CSR cache and anchor sites, contracts through nodes (keeping anchor nodes), and
+runs the same K-best kernel on the full and the contracted graph. Prints the node/edge reduction,
+contraction, kernel and label-expansion wall times, and checks the expanded labels against the
+full-graph labels (times and source indices; both kernels order ties by (time, source)).
+Kernel times are the best of --repeat runs; --json-out records the before/after numbers.
+
+Usage:
+  python scripts/bench_graph_simplify.py --pbf data/osm/massachusetts.osm.pbf \
+      --anchors data/anchors/massachusetts_drive_sites.parquet --k 20 --threads 16 --json-out simplify.json
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "src"))
+
+from graph.anchors import build_anchor_mappings  # noqa: E402
+from graph.csr_utils import build_rev_csr  # noqa: E402
+from graph.pyrosm_csr import load_or_build_csr  # noqa: E402
+from graph.simplify import contract_degree2  # noqa: E402
+from t_hex import kbest_multisource_bucket_csr, kbest_multisource_frontier_csr  # noqa: E402
+
+
+def _timed(fn, repeat: int = 1):
+    best, out = float("inf"), None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, out
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark K-best on the full vs. degree-2 contracted graph.")
+    ap.add_argument("--pbf", default=os.path.join("data", "osm", "massachusetts.osm.pbf"))
+    ap.add_argument("--anchors", default=os.path.join("data", "anchors", "massachusetts_drive_sites.parquet"),
+                    help="Anchor sites parquet (node_id, anchor_int_id)")
+    ap.add_argument("--mode", default="drive", choices=["drive", "walk"])
+    ap.add_argument("--k", type=int, default=20)
+    ap.add_argument("--cutoff", type=int, default=30, help="Primary cutoff minutes")
+    ap.add_argument("--overflow-cutoff", type=int, default=60, help="Overflow cutoff minutes")
+    ap.add_argument("--kernel", choices=["chunked", "frontier"], default="frontier")
+    ap.add_argument("--threads", type=int, default=os.cpu_count() or 1)
+    ap.add_argument("--repeat", type=int, default=1)
+    ap.add_argument("--json-out", default=None, help="Write results as JSON")
+    args = ap.parse_args()
+
+    node_ids, indptr, indices, w_sec, *_ = load_or_build_csr(args.pbf, args.mode, [8], False)
+    anchor_idx, _ = build_anchor_mappings(pd.read_parquet(args.anchors, columns=["site_id", "node_id", "anchor_int_id"]), node_ids)
+    sources = np.flatnonzero(anchor_idx >= 0).astype(np.int32)
+    kbest = kbest_multisource_frontier_csr if args.kernel == "frontier" else kbest_multisource_bucket_csr
+    cp, co = args.cutoff * 60, args.overflow_cutoff * 60
+
+    t_contract, g = _timed(lambda: contract_degree2(indptr, indices, w_sec, anchor_idx >= 0))
+    n, m = len(node_ids), int(indices.shape[0])
+    print(f"[info] {len(sources)} anchors, k={args.k}, kernel={args.kernel}, threads={args.threads}")
+    print(f"[ok] nodes {n} -> {g.n_nodes} (-{100.0 * (1 - g.n_nodes / n):.1f}%), "
+          f"edges {m} -> {g.n_edges} (-{100.0 * (1 - g.n_edges / m):.1f}%), contraction {t_contract:.2f}s")
+
+    rev_full = build_rev_csr(indptr, indices, w_sec)
+    rev_c = build_rev_csr(g.indptr, g.indices, g.w_sec)
+    t_full, (full_src, full_t) = _timed(lambda: kbest(*rev_full, sources, args.k, cp, co, args.threads, False), args.repeat)
+    t_c, (c_src, c_t) = _timed(lambda: kbest(*rev_c, g.new_index[sources], args.k, cp, co, args.threads, False), args.repeat)
+    t_expand, (src, t) = _timed(lambda: g.expand_labels(c_src, c_t, co))
+
+    same_t = np.array_equal(t, np.asarray(full_t))
+    same_src = np.array_equal(src, np.asarray(full_src))
+    print(f"[ok] k-best full {t_full:.2f}s, contracted {t_c:.2f}s + expand {t_expand:.2f}s "
+          f"({t_full / max(t_c + t_expand, 1e-9):.2f}x); times {'match' if same_t else 'DIFFER'}, "
+          f"sources {'match' if same_src else 'differ'}")
+
+    if args.json_out:
+        with open(args.json_out, "w") as f:
+            json.dump({
+                "pbf": args.pbf, "kernel": args.kernel, "k": args.k, "threads": args.threads, "anchors": int(len(sources)),
+                "nodes": [n, int(g.n_nodes)], "edges": [m, int(g.n_edges)], "contract_s": round(t_contract, 3),
+                "kbest_full_s": round(t_full, 3), "kbest_contracted_s": round(t_c, 3), "expand_s": round(t_expand, 3),
+                "times_match": bool(same_t), "sources_match": bool(same_src),
+            }, f, indent=2)
+        print(f"[ok] Wrote {args.json_out}")
+
+
+if __name__ == "__main__":
+    main()
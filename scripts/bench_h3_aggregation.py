@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Benchmark the native H3 top-K aggregations: hash maps (aggregate_h3_topk_precached)
+vs. radix sort + linear pass (aggregate_h3_topk_sorted).
+
+Node labels are synthetic (random anchors, sorted times) unless --pbf is given, in
+which case node→H3 ids come from that state's CSR cache. Both outputs are
+checked for identical (res, h3_id, time_s) multisets before timings are reported.
+
+Usage:
+  python scripts/bench_h3_aggregation.py --k 20 50
+  python scripts/bench_h3_aggregation.py --pbf data/osm/massachusetts.osm.pbf --k 20 50 --threads 16
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "src"))
+
+import config  # noqa: E402
+from t_hex import aggregate_h3_topk_precached, aggregate_h3_topk_sorted, compute_h3_for_nodes  # noqa: E402
+
+UNREACH_U16 = int(config.UNREACH_U16)
+
+
+def _node_h3(args, rng) -> np.ndarray:
+    res = np.array(args.res, dtype=np.int32)
+    if args.pbf:
+        from graph.pyrosm_csr import load_or_build_csr
+
+        *_, h3_mat, _ = load_or_build_csr(args.pbf, args.mode, list(args.res), False)
+        return np.ascontiguousarray(h3_mat, dtype=np.uint64)
+    bbox = config.STATE_BOUNDING_BOXES["massachusetts"]
+    lats = rng.uniform(bbox["south"], bbox["north"], args.nodes).astype(np.float32)
+    lons = rng.uniform(bbox["west"], bbox["east"], args.nodes).astype(np.float32)
+    return np.ascontiguousarray(compute_h3_for_nodes(lats, lons, res, args.threads, False))
+
+
+def _labels(n: int, k: int, n_anchors: int, rng):
+    sites = rng.integers(0, n_anchors, size=(n, k)).astype(np.int32)
+    times = np.sort(rng.integers(0, 5400, size=(n, k)), axis=1).astype(np.uint16)
+    empty = rng.random((n, k)) < 0.05
+    sites[empty] = -1
+    times[empty] = UNREACH_U16
+    return sites, times
+
+
+def _canonical(out) -> np.ndarray:
+    h, s, t, r = (np.asarray(x) for x in out)
+    order = np.lexsort((s, t, h, r))
+    return np.stack([r[order].astype(np.uint64), h[order], t[order].astype(np.uint64)])
+
+
+def _best_of(fn, repeat: int):
+    best, out = float("inf"), None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, out
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark hash vs. sort H3 top-K aggregation.")
+    ap.add_argument("--pbf", default=None, help="Use node H3 ids from this state's CSR cache instead of random points")
+    ap.add_argument("--mode", default="drive", choices=["drive", "walk"])
+    ap.add_argument("--nodes", type=int, default=1_000_000, help="Synthetic node count (ignored with --pbf)")
+    ap.add_argument("--anchors", type=int, default=20_000, help="Distinct anchor ids in synthetic labels")
+    ap.add_argument("--res", nargs="+", type=int, default=[7, 8])
+    ap.add_argument("--k", nargs="+", type=int, default=[20, 50])
+    ap.add_argument("--threads", type=int, default=os.cpu_count() or 1)
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--seed", type=int, default=7)
+    args = ap.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    h3_mat = _node_h3(args, rng)
+    res = np.array(args.res, dtype=np.int32)
+    print(f"[info] {h3_mat.shape[0]} nodes, res {args.res}, threads {args.threads}")
+
+    for k in args.k:
+        sites, times = _labels(h3_mat.shape[0], k, args.anchors, rng)
+        t_hash, out_hash = _best_of(lambda: aggregate_h3_topk_precached(
+            h3_mat, sites, times, res, k, UNREACH_U16, args.threads, False), args.repeat)
+        t_sort, out_sort = _best_of(lambda: aggregate_h3_topk_sorted(
+            h3_mat, sites, times, res, k, UNREACH_U16, args.threads, False), args.repeat)
+        same = np.array_equal(_canonical(out_hash), _canonical(out_sort))
+        print(f"[ok] K={k}: hash {t_hash:.2f}s, sort {t_sort:.2f}s ({t_hash / max(t_sort, 1e-9):.2f}x), "
+              f"rows {len(out_sort[0])}, outputs {'match' if same else 'DIFFER'}")
+
+
+if __name__ == "__main__":
+    main()
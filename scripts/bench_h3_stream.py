@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Benchmark the fused streaming T_hex path (t_hex.kbest_h3_topk_stream, 04 --fused) against the
+materializing path (K-best kernel, [N,K] anchor mapping, aggregate_h3_topk_precached, one table).
+
+Each path runs in a fresh child process so ru_maxrss is not polluted by the other, and writes
+its (h3_id, anchor_int_id, time_s, res) rows to Parquet like step 04. The parent reports wall
+time and peak RSS per path and checks that the two files hold the same rows.
+
+Usage:
+  python scripts/bench_h3_stream.py --pbf data/osm/massachusetts.osm.pbf \
+      --anchors data/anchors/massachusetts_drive_sites.parquet --k 20 50 --threads 16 --json-out stream.json
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "src"))
+
+PATHS = ("materialize", "stream")
+SORT_KEYS = [("res", "ascending"), ("h3_id", "ascending"), ("time_s", "ascending"), ("anchor_int_id", "ascending")]
+
+
+def _rss_mb() -> float:
+    # ru_maxrss is KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def run_child(args) -> dict:
+    import numpy as np
+    import pandas as pd
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    import t_hex
+
+    import config
+    from graph.anchors import build_anchor_mappings
+    from graph.csr_utils import build_rev_csr
+    from graph.pyrosm_csr import load_or_build_csr
+
+    node_ids, indptr, indices, w_sec, *_, h3_mat, _ = load_or_build_csr(args.pbf, args.mode, list(args.res), False)
+    anchor_idx, _ = build_anchor_mappings(pd.read_parquet(args.anchors), node_ids)
+    sources = np.flatnonzero(anchor_idx >= 0).astype(np.int32)
+    rev = build_rev_csr(indptr, indices, w_sec)
+    h3_mat = np.ascontiguousarray(h3_mat, dtype=np.uint64)
+    res = np.array(args.res, dtype=np.int32)
+    k, cp, co = args.k[0], args.cutoff * 60, args.overflow_cutoff * 60
+    rss_before = _rss_mb()
+
+    t0 = time.perf_counter()
+    if args.path == "materialize":
+        best_src, time_s = t_hex.kbest_multisource_bucket_csr(*rev, sources, k, cp, co, args.threads, False)
+        best_anchor = np.where(best_src >= 0, anchor_idx[best_src], -1).astype(np.int32)
+        batch = pa.record_batch(t_hex.aggregate_h3_topk_precached(
+            h3_mat, best_anchor, time_s, res, k, int(config.UNREACH_U16), args.threads, False, arrow=True))
+        pq.write_table(pa.Table.from_batches([batch]), args.out_parquet, compression="zstd")
+        rows = batch.num_rows
+    else:
+        writer = None
+
+        def _sink(batch):
+            nonlocal writer
+            rb = pa.record_batch(batch)
+            writer = writer or pq.ParquetWriter(args.out_parquet, rb.schema, compression="zstd")
+            writer.write_batch(rb)
+
+        rows = t_hex.kbest_h3_topk_stream(
+            *rev, sources, anchor_idx, h3_mat, res, k, cp, co, args.threads, False, _sink, args.batch_rows,
+            "bucket", None, arrow=True,
+        )
+        if writer is not None:
+            writer.close()
+    elapsed = time.perf_counter() - t0
+    return {
+        "path": args.path,
+        "k": k,
+        "threads": args.threads,
+        "nodes": int(node_ids.size),
+        "rows": int(rows),
+        "seconds": round(elapsed, 2),
+        "rss_before_mb": round(rss_before, 1),
+        "peak_rss_mb": round(_rss_mb(), 1),
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark fused streaming vs. materialized T_hex aggregation.")
+    ap.add_argument("--pbf", default=os.path.join("data", "osm", "massachusetts.osm.pbf"))
+    ap.add_argument("--anchors", default=os.path.join("data", "anchors", "massachusetts_drive_sites.parquet"))
+    ap.add_argument("--mode", default="drive", choices=["drive", "walk"])
+    ap.add_argument("--res", nargs="+", type=int, default=[7, 8])
+    ap.add_argument("--k", nargs="+", type=int, default=[20, 50])
+    ap.add_argument("--cutoff", type=int, default=30, help="Primary cutoff minutes")
+    ap.add_argument("--overflow-cutoff", type=int, default=60, help="Overflow cutoff minutes")
+    ap.add_argument("--threads", type=int, default=os.cpu_count() or 1)
+    ap.add_argument("--batch-rows", type=int, default=1_000_000, help="Rows per streamed record batch")
+    ap.add_argument("--json-out", default=None, help="Write results as JSON")
+    ap.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    ap.add_argument("--path", choices=PATHS, help=argparse.SUPPRESS)
+    ap.add_argument("--out-parquet", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.child:
+        print(json.dumps(run_child(args)))
+        return
+
+    import pyarrow.parquet as pq
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for k in args.k:
+            tables = {}
+            for path in PATHS:
+                out_parquet = os.path.join(tmpdir, f"{path}_k{k}.parquet")
+                cmd = [sys.executable, __file__, "--child", "--pbf", args.pbf, "--anchors", args.anchors,
+                       "--mode", args.mode, "--res", *map(str, args.res), "--k", str(k), "--cutoff", str(args.cutoff),
+                       "--overflow-cutoff", str(args.overflow_cutoff), "--threads", str(args.threads),
+                       "--batch-rows", str(args.batch_rows), "--path", path, "--out-parquet", out_parquet]
+                out = subprocess.run(cmd, check=True, capture_output=True, text=True)
+                row = json.loads(out.stdout.strip().splitlines()[-1])
+                results.append(row)
+                tables[path] = pq.read_table(out_parquet).sort_by(SORT_KEYS)
+                print(f"[ok] {path} K={k}: {row['seconds']}s, peak RSS {row['peak_rss_mb']} MB "
+                      f"(+{row['peak_rss_mb'] - row['rss_before_mb']:.1f} MB), rows {row['rows']}")
+            same = tables["materialize"].select(tables["stream"].schema.names).equals(tables["stream"])
+            before, after = results[-2], results[-1]
+            print(f"[info] K={k}: peak RSS {before['peak_rss_mb']} -> {after['peak_rss_mb']} MB, "
+                  f"time {before['seconds']} -> {after['seconds']}s; outputs {'match' if same else 'DIFFER'}")
+
+    if args.json_out:
+        with open(args.json_out, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"[ok] Wrote {args.json_out}")
+
+
+if __name__ == "__main__":
+    main()
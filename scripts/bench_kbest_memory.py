@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Measure peak memory and wall time of the native K-best kernels for several K values.
+
+Each (kernel, K) run happens in a fresh child process so ru_maxrss is not polluted
+by earlier runs. The graph is loaded from the CSR cache exactly as in step 04.
+Write results with --json-out and compare two builds (e.g. before/after a kernel
+change) with --compare.
+
+Usage:
+  python scripts/bench_kbest_memory.py --pbf data/osm/massachusetts.osm.pbf \
+      --anchors data/anchors/massachusetts_drive_sites.parquet --k 20 35 50 --json-out after.json
+  python scripts/bench_kbest_memory.py ... --compare before.json
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "src"))
+
+
+def _rss_mb() -> float:
+    # ru_maxrss is KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def run_child(args) -> dict:
+    import numpy as np
+    import pandas as pd
+    import t_hex
+
+    from graph.anchors import build_anchor_mappings
+    from graph.csr_utils import build_rev_csr
+    from graph.pyrosm_csr import load_or_build_csr
+
+    node_ids, indptr, indices, w_sec, _, _, _, _ = load_or_build_csr(args.pbf, args.mode, [8], False)
+    anchor_idx, _ = build_anchor_mappings(pd.read_parquet(args.anchors), node_ids)
+    source_idxs = np.flatnonzero(anchor_idx >= 0).astype(np.int32)
+    indptr_rev, indices_rev, w_rev = build_rev_csr(indptr, indices, w_sec)
+    rss_before = _rss_mb()
+
+    fn = getattr(t_hex, f"kbest_multisource_{args.kernel}_csr")
+    t0 = time.perf_counter()
+    _, time_s = fn(indptr_rev, indices_rev, w_rev, source_idxs, args.k[0],
+                   args.cutoff * 60, args.overflow_cutoff * 60, args.threads, False)
+    elapsed = time.perf_counter() - t0
+    return {
+        "kernel": args.kernel,
+        "k": args.k[0],
+        "threads": args.threads,
+        "nodes": int(node_ids.size),
+        "sources": int(source_idxs.size),
+        "seconds": round(elapsed, 2),
+        "rss_before_mb": round(rss_before, 1),
+        "peak_rss_mb": round(_rss_mb(), 1),
+        "output_mb": round((time_s.nbytes * 3) / 1e6, 1),  # i32 + u16 label arrays
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Peak-memory benchmark for the native K-best kernels.")
+    ap.add_argument("--pbf", default=os.path.join("data", "osm", "massachusetts.osm.pbf"))
+    ap.add_argument("--anchors", default=os.path.join("data", "anchors", "massachusetts_drive_sites.parquet"))
+    ap.add_argument("--mode", default="drive", choices=["drive", "walk"])
+    ap.add_argument("--k", nargs="+", type=int, default=[20, 35, 50])
+    ap.add_argument("--kernel", nargs="+", default=["bucket"], choices=["bucket", "frontier"],
+                    help="Kernels to measure (default: bucket)")
+    ap.add_argument("--cutoff", type=int, default=30, help="Primary cutoff minutes")
+    ap.add_argument("--overflow-cutoff", type=int, default=60, help="Overflow cutoff minutes")
+    ap.add_argument("--threads", type=int, default=1)
+    ap.add_argument("--json-out", default=None, help="Write results as JSON")
+    ap.add_argument("--compare", default=None, help="Earlier --json-out file to report reductions against")
+    ap.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.child:
+        args.kernel = args.kernel[0]
+        print(json.dumps(run_child(args)))
+        return
+
+    results = []
+    for kernel in args.kernel:
+        for k in args.k:
+            cmd = [sys.executable, __file__, "--child", "--pbf", args.pbf, "--anchors", args.anchors,
+                   "--mode", args.mode, "--k", str(k), "--kernel", kernel, "--cutoff", str(args.cutoff),
+                   "--overflow-cutoff", str(args.overflow_cutoff), "--threads", str(args.threads)]
+            out = subprocess.run(cmd, check=True, capture_output=True, text=True)
+            row = json.loads(out.stdout.strip().splitlines()[-1])
+            results.append(row)
+            print(f"[ok] {kernel} K={k}: {row['seconds']}s, peak RSS {row['peak_rss_mb']} MB "
+                  f"(+{row['peak_rss_mb'] - row['rss_before_mb']:.1f} MB in kernel, labels {row['output_mb']} MB)")
+
+    if args.compare:
+        with open(args.compare, "r") as f:
+            before = {(r["kernel"], r["k"]): r for r in json.load(f)}
+        for row in results:
+            prev = before.get((row["kernel"], row["k"]))
+            if not prev:
+                continue
+            d_prev = prev["peak_rss_mb"] - prev["rss_before_mb"]
+            d_now = row["peak_rss_mb"] - row["rss_before_mb"]
+            pct = 100.0 * (1.0 - d_now / d_prev) if d_prev > 0 else 0.0
+            print(f"[info] {row['kernel']} K={row['k']}: kernel memory {d_prev:.1f} -> {d_now:.1f} MB "
+                  f"({pct:.0f}% less), time {prev['seconds']} -> {row['seconds']}s")
+
+    if args.json_out:
+        with open(args.json_out, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"[ok] Wrote {args.json_out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Benchmark thread scaling of the native K-best kernels.
+
+Loads a state's CSR cache and anchor sites exactly as step 04 does and runs the bucket and
+frontier kernels at each requested thread count. Prints wall time, speedup over one thread and
+parallel efficiency per run, and checks every run's labels against the single-threaded bucket
+kernel (both kernels settle equal-time labels in the same order, so sources must match too).
+
+Usage:
+  python scripts/bench_kbest_threads.py --pbf data/osm/massachusetts.osm.pbf \
+      --anchors data/anchors/massachusetts_drive_sites.parquet --k 20 --threads 1 2 4 8 16
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "src"))
+
+from graph.anchors import build_anchor_mappings  # noqa: E402
+from graph.csr_utils import build_rev_csr  # noqa: E402
+from graph.pyrosm_csr import load_or_build_csr  # noqa: E402
+from t_hex import kbest_multisource_bucket_csr, kbest_multisource_frontier_csr  # noqa: E402
+
+KERNELS = {"bucket": kbest_multisource_bucket_csr, "frontier": kbest_multisource_frontier_csr}
+
+
+def _timed(fn):
+    t0 = time.perf_counter()
+    out = fn()
+    return time.perf_counter() - t0, out
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark K-best kernel thread scaling.")
+    ap.add_argument("--pbf", required=True)
+    ap.add_argument("--anchors", required=True, help="Anchor sites parquet (node_id, anchor_int_id)")
+    ap.add_argument("--mode", default="drive", choices=["drive", "walk"])
+    ap.add_argument("--k", type=int, default=20)
+    ap.add_argument("--cutoff", type=int, default=30, help="Primary cutoff minutes")
+    ap.add_argument("--overflow-cutoff", type=int, default=60, help="Overflow cutoff minutes")
+    ap.add_argument("--kernels", nargs="+", choices=sorted(KERNELS), default=["bucket", "frontier"])
+    ap.add_argument("--threads", type=int, nargs="+", default=[1, 2, 4, 8])
+    args = ap.parse_args()
+
+    node_ids, indptr, indices, w_sec, *_ = load_or_build_csr(args.pbf, args.mode, [8], False)
+    anchor_idx, _ = build_anchor_mappings(pd.read_parquet(args.anchors, columns=["site_id", "node_id", "anchor_int_id"]), node_ids)
+    sources = np.flatnonzero(anchor_idx >= 0).astype(np.int32)
+    rev = build_rev_csr(indptr, indices, w_sec)
+    cp, co = args.cutoff * 60, args.overflow_cutoff * 60
+    print(f"[info] {len(node_ids)} nodes, {len(sources)} anchors, k={args.k}, cpu_count={os.cpu_count()}")
+
+    ref_src, ref_t = (np.asarray(a) for a in kbest_multisource_bucket_csr(*rev, sources, args.k, cp, co, 1, False))
+    for name in args.kernels:
+        base = None
+        for threads in args.threads:
+            elapsed, (src, t) = _timed(lambda: KERNELS[name](*rev, sources, args.k, cp, co, threads, False))
+            base = elapsed if base is None else base
+            same = np.array_equal(np.asarray(t), ref_t) and np.array_equal(np.asarray(src), ref_src)
+            speedup = base / max(elapsed, 1e-9)
+            print(f"[ok] {name:8s} threads={threads:3d} {elapsed:7.2f}s  speedup {speedup:5.2f}x  "
+                  f"efficiency {100.0 * speedup / threads * args.threads[0]:5.1f}%  "
+                  f"labels {'match' if same else 'DIFFER'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Measure peak memory and wall time of category D_anchor routing: one k=1 bucket search per
+category (the sharded 06 path) vs. the 64-label word-packed t_hex.nearest_multilabel_csr
+(06 --multi-label).
+
+Each mode runs in a fresh child process so ru_maxrss is not polluted by the other. Both route
+every category of the anchors file with the cutoffs from d_anchor_limits.json to the anchor
+nodes and save the [anchors, categories] seconds matrix, which the parent compares for parity.
+Write results with --json-out to record the before/after numbers.
+
+Usage:
+  python scripts/bench_multilabel_memory.py --pbf data/osm/massachusetts.osm.pbf \
+      --anchors data/anchors/massachusetts_drive_sites.parquet --threads 8 --json-out multilabel.json
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "src"))
+
+MODES = ("per-label", "multi-label")
+
+
+def _rss_mb() -> float:
+    # ru_maxrss is KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def run_child(args) -> dict:
+    import numpy as np
+    import pandas as pd
+    import t_hex
+
+    from d_anchor_common import build_graph_context, get_entity_limits
+
+    anchors_df = pd.read_parquet(args.anchors)
+    graph_ctx = build_graph_context(args.pbf, args.mode, anchors_df)
+    by_anchor = dict(zip(anchors_df["anchor_int_id"].astype(int), anchors_df["categories"]))
+    sources = defaultdict(list)
+    for node_idx, aint in zip(graph_ctx.anchor_nodes, graph_ctx.anchor_int_ids):
+        cats = by_anchor.get(int(aint))
+        for c in (cats if cats is not None else []):
+            sources[str(c)].append(int(node_idx))
+    labels = sorted(sources)
+    label_sources = [np.asarray(sources[c], dtype=np.int32) for c in labels]
+    cutoffs = np.array([get_entity_limits("category", c)["max_minutes"] * 60 for c in labels], dtype=np.uint16)
+    targets = graph_ctx.anchor_nodes
+    rev = (graph_ctx.indptr_rev, graph_ctx.indices_rev, graph_ctx.w_rev)
+    rss_before = _rss_mb()
+
+    t0 = time.perf_counter()
+    if args.bench_mode == "per-label":
+        out = np.empty((targets.size, len(labels)), dtype=np.uint16)
+        for j, (src, c) in enumerate(zip(label_sources, cutoffs.tolist())):
+            _, time_s = t_hex.kbest_multisource_bucket_csr(*rev, src, 1, c, c, args.threads, False, None, targets)
+            out[:, j] = np.asarray(time_s)[targets, 0]
+    else:
+        label_indptr = np.zeros(len(labels) + 1, dtype=np.int64)
+        np.cumsum([s.size for s in label_sources], out=label_indptr[1:])
+        out = np.asarray(t_hex.nearest_multilabel_csr(
+            *rev, label_indptr, np.concatenate(label_sources), cutoffs, targets, args.threads, False))
+    elapsed = time.perf_counter() - t0
+    np.save(args.out_npy, out)
+    return {
+        "mode": args.bench_mode,
+        "threads": args.threads,
+        "nodes": int(graph_ctx.node_count),
+        "anchors": int(targets.size),
+        "categories": len(labels),
+        "seconds": round(elapsed, 2),
+        "rss_before_mb": round(rss_before, 1),
+        "peak_rss_mb": round(_rss_mb(), 1),
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Peak-memory benchmark for per-label vs multi-label category routing.")
+    ap.add_argument("--pbf", default=os.path.join("data", "osm", "massachusetts.osm.pbf"))
+    ap.add_argument("--anchors", default=os.path.join("data", "anchors", "massachusetts_drive_sites.parquet"))
+    ap.add_argument("--mode", default="drive", choices=["drive", "walk"])
+    ap.add_argument("--threads", type=int, default=1)
+    ap.add_argument("--json-out", default=None, help="Write results as JSON")
+    ap.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    ap.add_argument("--bench-mode", choices=MODES, help=argparse.SUPPRESS)
+    ap.add_argument("--out-npy", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.child:
+        print(json.dumps(run_child(args)))
+        return
+
+    import numpy as np
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for mode in MODES:
+            out_npy = os.path.join(tmpdir, f"{mode}.npy")
+            cmd = [sys.executable, __file__, "--child", "--pbf", args.pbf, "--anchors", args.anchors,
+                   "--mode", args.mode, "--threads", str(args.threads), "--bench-mode", mode, "--out-npy", out_npy]
+            out = subprocess.run(cmd, check=True, capture_output=True, text=True)
+            row = json.loads(out.stdout.strip().splitlines()[-1])
+            results.append(row)
+            print(f"[ok] {mode}: {row['categories']} categories x {row['anchors']} anchors in {row['seconds']}s, "
+                  f"peak RSS {row['peak_rss_mb']} MB (+{row['peak_rss_mb'] - row['rss_before_mb']:.1f} MB routing)")
+        same = np.array_equal(np.load(os.path.join(tmpdir, "per-label.npy")), np.load(os.path.join(tmpdir, "multi-label.npy")))
+
+    before, after = results
+    d_before = before["peak_rss_mb"] - before["rss_before_mb"]
+    d_after = after["peak_rss_mb"] - after["rss_before_mb"]
+    print(f"[info] routing memory {d_before:.1f} -> {d_after:.1f} MB, time {before['seconds']} -> {after['seconds']}s; "
+          f"outputs {'match' if same else 'DIFFER'}")
+
+    if args.json_out:
+        with open(args.json_out, "w") as f:
+            json.dump({"results": results, "outputs_match": bool(same)}, f, indent=2)
+        print(f"[ok] Wrote {args.json_out}")
+
+
+if __name__ == "__main__":
+    main()
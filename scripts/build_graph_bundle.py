@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Build and verify the derived artifacts of a state's CSR cache bundle (graph.bundle).
+
+Writes the reverse CSR, weak component ids and the reverse-graph CH next to the CSR cache under
+data/osm/cache_csr/<state>_<mode>.npycache, registers them in bundle.json against the forward
+CSR digest, then re-hashes every registered file. Run before publishing so the API and the
+D_anchor stages load the artifacts instead of rebuilding them.
+
+Usage:
+  python scripts/build_graph_bundle.py --pbf data/osm/massachusetts.osm.pbf [--mode drive] [--no-ch] [--threads 8]
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "src"))
+
+from graph.bundle import GraphBundle  # noqa: E402
+from graph.pyrosm_csr import _csr_cache_dir, load_or_build_csr  # noqa: E402
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Build and verify the CSR cache bundle.")
+    ap.add_argument("--pbf", required=True)
+    ap.add_argument("--mode", default="drive", choices=["drive", "walk"])
+    ap.add_argument("--no-ch", action="store_true", help="Skip the reverse-graph CH")
+    ap.add_argument("--threads", type=int, default=os.cpu_count() or 1, help="CH contraction threads (1 = sequential fast_paths)")
+    args = ap.parse_args()
+
+    load_or_build_csr(args.pbf, args.mode, [7, 8], False)
+    bundle = GraphBundle(_csr_cache_dir(args.pbf, args.mode))
+    print(f"[info] {bundle.cache_dir}: CSR digest {bundle.digest}")
+    steps = [("rev_csr", bundle.rev_csr), ("components", bundle.components)]
+    if not args.no_ch:
+        steps.append(("ch_rev", lambda: bundle.ch("_rev", threads=args.threads, progress=True)))
+    for name, build in steps:
+        t0 = time.perf_counter()
+        cached = bundle.has(name)
+        build()
+        print(f"[info] {name}: {'cached' if cached else 'built'} in {time.perf_counter() - t0:.2f}s")
+    bad = [name for name, ok in bundle.verify().items() if not ok]
+    if bad:
+        raise SystemExit(f"[error] Checksum mismatch for {', '.join(bad)}; delete them to rebuild")
+    print("[ok] Bundle verified")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+"""
+Build the mmap'd hex-ordinal index used by /api/hex_lookup.
+
+Reads the merged wide T_hex tables (state_tiles/us_r{res}.parquet) and writes
+data/hex_index/r{res}/{hex_ids,a_id,a_s}.npy + meta.json.
+
+Usage:
+  python scripts/build_hex_index.py --res 7 8
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "src"))
+
+from serving.hex_lookup import build_hex_index  # noqa: E402
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Build the hex-ordinal lookup index from merged T_hex tables.")
+    ap.add_argument("--res", nargs="+", type=int, default=[7, 8], help="H3 resolutions (default: 7 8)")
+    ap.add_argument("--tiles-dir", default="state_tiles", help="Directory with us_r{res}.parquet (default: state_tiles)")
+    ap.add_argument("--out-dir", default=os.path.join("data", "hex_index"), help="Output root (default: data/hex_index)")
+    args = ap.parse_args()
+
+    for res in args.res:
+        src = os.path.join(args.tiles_dir, f"us_r{res}.parquet")
+        if not os.path.exists(src):
+            print(f"[warn] {src} not found; skipping r{res}")
+            continue
+        meta = build_hex_index(src, os.path.join(args.out_dir, f"r{res}"), res)
+        print(f"[ok] r{res}: {meta['rows']} hexes x {meta['k']} anchors -> {os.path.join(args.out_dir, f'r{res}')}")
+
+
+if __name__ == "__main__":
+    main()
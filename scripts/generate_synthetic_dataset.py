@@ -0,0 +1,590 @@
+#!/usr/bin/env python3
+"""
+Generate a Deterministic Synthetic Dataset Bundle
+
+Emits a consistent, road-like dataset from a seed and size parameters so that
+kernels, pipeline stages and the API can be benchmarked without a real PBF or
+Overture extract, and at 10×/100× today's Massachusetts size.
+
+Outputs (relative to --root, default data/):
+- osm/<state>.osm.pbf                              (empty placeholder; anchors the cache mtime check)
+- osm/cache_csr/<state>_drive.npycache/            (pyrosm_csr layout: node_ids, indptr, indices,
+                                                    w_sec, lats, lons, h3_r7, h3_r8, meta.json)
+- poi/<state>_canonical.parquet                    (canonical POI schema, WKB geometry)
+- anchors/<state>_drive_sites.parquet              (+ <state>_drive_site_id_map.parquet)
+- minutes/<state>_drive_t_hex.parquet              (long format, top-K anchors per hex)
+- d_anchor_category/mode=0/category_id=<id>/part-000.parquet
+- d_anchor_brand/mode=0/brand_id=<id>/part-000.parquet
+- climate/<state>_hex_climate.parquet              (quantized climate columns)
+- power_corridors/<state>_near_power_corridor.parquet
+- politics/<state>_political_lean.parquet
+
+Notes:
+- The same seed and sizes always produce byte-identical arrays.
+- T_hex and D_anchor times are geometric estimates (straight-line distance ×
+  detour factor / speed), not graph routes. They are consistent with the graph
+  in ids, hexes and anchors; run `04`/`05`/`06` on the synthetic cache when
+  routed times are needed.
+- Use a distinct --state (e.g. synthetic_x10) so real artifacts are never overwritten.
+
+Usage:
+  PYTHONPATH=.:src python scripts/generate_synthetic_dataset.py --state synthetic_x10 --scale 10
+  PYTHONPATH=.:src python scripts/generate_synthetic_dataset.py --state synthetic --nodes 20000 --pois 2000
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import json
+import math
+import os
+import time
+import uuid
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from h3.api import basic_int as h3i
+from scipy.spatial import cKDTree
+
+# Sizes at scale=1 roughly match the Massachusetts drive build.
+BASE_NODES = 800_000
+BASE_POIS = 60_000
+
+UNREACH_U16 = 65535
+SNAPSHOT_TS = "2024-07-01"
+MONTHS = ("jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec")
+
+_M_PER_DEG = 111_320.0
+# Road classes: (speed m/s, grid period); rows/columns divisible by the period use that class.
+_HIGHWAY = (29.0, 40)
+_ARTERIAL = (17.9, 8)
+_LOCAL_SPEED = 11.2
+_DETOUR_FACTOR = 1.35
+_ESTIMATE_SPEED_MPS = 15.0
+
+
+@dataclass
+class SyntheticSpec:
+    """Size and shape parameters for one synthetic bundle."""
+
+    state: str = "synthetic"
+    seed: int = 42
+    nodes: int = BASE_NODES
+    pois: int = BASE_POIS
+    k_best: int = 20
+    cutoff_minutes: int = 30
+    overflow_minutes: int = 60
+    spacing_m: float = 180.0
+    origin_lat: float = 41.5
+    origin_lon: float = -73.5
+    drop_fraction: float = 0.12
+    oneway_fraction: float = 0.04
+    resolutions: Tuple[int, ...] = (7, 8)
+    mode: str = "drive"
+    categories: Dict[str, int] = field(default_factory=dict)
+    brands: Dict[str, str] = field(default_factory=dict)
+
+
+def _load_taxonomy(taxonomy_dir: Path) -> Tuple[Dict[str, int], Dict[str, str]]:
+    categories: Dict[str, int] = {}
+    brands: Dict[str, str] = {}
+    cat_csv = taxonomy_dir / "POI_category_registry.csv"
+    brand_csv = taxonomy_dir / "POI_brand_registry.csv"
+    if cat_csv.exists():
+        with open(cat_csv, newline="") as f:
+            for row in csv.DictReader(f):
+                categories[row["category_id"]] = int(row["numeric_id"])
+    if brand_csv.exists():
+        with open(brand_csv, newline="") as f:
+            for row in csv.DictReader(f):
+                brands[row["brand_id"]] = row["canonical"]
+    if not categories:
+        categories = {"supermarket": 1, "cafe": 2, "pharmacy": 3, "hospital": 4, "park": 5}
+    if not brands:
+        brands = {"starbucks": "Starbucks", "dunkin": "Dunkin'"}
+    return categories, brands
+
+
+def _load_limits(path: Path) -> Dict:
+    if path.exists():
+        with open(path) as f:
+            return json.load(f)
+    return {"_defaults": {"category": {"max_minutes": 60, "top_k": 12}, "brand": {"max_minutes": 60, "top_k": 12}}}
+
+
+def _entity_max_seconds(limits: Dict, entity_type: str, entity_id: str) -> int:
+    defaults = limits.get("_defaults", {}).get(entity_type, {"max_minutes": 60})
+    entry = limits.get(entity_type, {}).get(entity_id, {})
+    return int(entry.get("max_minutes", defaults.get("max_minutes", 60))) * 60
+
+
+def _atomic_write_table(table: pa.Table, path: Path) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    pq.write_table(table, tmp, compression="zstd")
+    os.replace(tmp, path)
+
+
+# -----------------------------
+# Graph
+# -----------------------------
+def build_grid_graph(spec: SyntheticSpec, rng: np.random.Generator) -> Dict[str, np.ndarray]:
+    """Build a jittered street grid with arterials, highways, gaps and one-way streets."""
+    cols = max(2, int(math.ceil(math.sqrt(spec.nodes))))
+    rows = max(2, int(math.ceil(spec.nodes / cols)))
+    n = rows * cols
+
+    deg_lat = spec.spacing_m / _M_PER_DEG
+    deg_lon = spec.spacing_m / (_M_PER_DEG * math.cos(math.radians(spec.origin_lat)))
+    rr, cc = np.divmod(np.arange(n, dtype=np.int64), cols)
+    jitter = rng.uniform(-0.3, 0.3, size=(n, 2))
+    lats = spec.origin_lat + (rr + jitter[:, 0]) * deg_lat
+    lons = spec.origin_lon + (cc + jitter[:, 1]) * deg_lon
+
+    # Undirected candidate edges: horizontal (row class) then vertical (column class).
+    h_u = (rr * cols + cc)[cc < cols - 1]
+    h_line = rr[cc < cols - 1]
+    v_u = (rr * cols + cc)[rr < rows - 1]
+    v_line = cc[rr < rows - 1]
+    u = np.concatenate([h_u, v_u])
+    v = np.concatenate([h_u + 1, v_u + cols])
+    line = np.concatenate([h_line, v_line])
+
+    speed = np.full(u.size, _LOCAL_SPEED)
+    arterial = line % _ARTERIAL[1] == 0
+    highway = line % _HIGHWAY[1] == 0
+    speed[arterial] = _ARTERIAL[0]
+    speed[highway] = _HIGHWAY[0]
+    local = ~(arterial | highway)
+
+    keep = ~(local & (rng.random(u.size) < spec.drop_fraction))
+    oneway = local & (rng.random(u.size) < spec.oneway_fraction)
+    flip = rng.random(u.size) < 0.5
+    u, v, speed, oneway, flip = u[keep], v[keep], speed[keep], oneway[keep], flip[keep]
+    a = np.where(oneway & flip, v, u)
+    b = np.where(oneway & flip, u, v)
+
+    dy = (lats[b] - lats[a]) * _M_PER_DEG
+    dx = (lons[b] - lons[a]) * _M_PER_DEG * math.cos(math.radians(spec.origin_lat))
+    secs = np.ceil(np.hypot(dx, dy) / speed)
+    secs = np.clip(secs, 1, 65534).astype(np.uint16)
+
+    two_way = ~oneway
+    src = np.concatenate([a, b[two_way]])
+    dst = np.concatenate([b, a[two_way]])
+    w = np.concatenate([secs, secs[two_way]])
+
+    order = np.argsort(src, kind="stable")
+    indices = dst[order].astype(np.int32)
+    w_sec = w[order].astype(np.uint16)
+    counts = np.bincount(src, minlength=n)
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(counts, out=indptr[1:])
+
+    # OSM-like ids: large, unique, not equal to the CSR index.
+    node_ids = (1_000_000_000 + rng.permutation(n)).astype(np.int64)
+    return {
+        "node_ids": node_ids,
+        "indptr": indptr,
+        "indices": indices,
+        "w_sec": w_sec,
+        "lats": lats.astype(np.float32),
+        "lons": lons.astype(np.float32),
+    }
+
+
+def compute_node_h3(lats: np.ndarray, lons: np.ndarray, resolutions: Tuple[int, ...]) -> Dict[int, np.ndarray]:
+    """Hierarchical H3 ids per node: finest res from coordinates, coarser ones via parents."""
+    finest = max(resolutions)
+    fine = np.fromiter(
+        (h3i.latlng_to_cell(float(la), float(lo), finest) for la, lo in zip(lats, lons)),
+        dtype=np.uint64,
+        count=lats.size,
+    )
+    out = {finest: fine}
+    uniq, inverse = np.unique(fine, return_inverse=True)
+    for r in resolutions:
+        if r == finest:
+            continue
+        parents = np.fromiter((h3i.cell_to_parent(int(c), r) for c in uniq), dtype=np.uint64, count=uniq.size)
+        out[r] = parents[inverse]
+    return out
+
+
+def write_graph_cache(root: Path, spec: SyntheticSpec, graph: Dict[str, np.ndarray], h3_by_res: Dict[int, np.ndarray]) -> Path:
+    osm_dir = root / "osm"
+    osm_dir.mkdir(parents=True, exist_ok=True)
+    pbf_path = osm_dir / f"{spec.state}.osm.pbf"
+    if not pbf_path.exists():
+        pbf_path.touch()
+    cache_dir = osm_dir / "cache_csr" / f"{spec.state}_{spec.mode}.npycache"
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    for name in ("node_ids", "indptr", "indices", "w_sec", "lats", "lons"):
+        np.save(cache_dir / f"{name}.npy", graph[name])
+    for r, arr in h3_by_res.items():
+        np.save(cache_dir / f"h3_r{int(r)}.npy", arr)
+    meta = {
+        "pbf": pbf_path.name,
+        "mode": spec.mode,
+        "pbf_mtime": os.path.getmtime(pbf_path),
+        "cache_created": time.time(),
+        "hierarchical_h3": True,
+        "synthetic": {"seed": spec.seed, "nodes": int(graph["node_ids"].size), "edges": int(graph["indices"].size)},
+    }
+    with open(cache_dir / "meta.json", "w") as f:
+        json.dump(meta, f)
+    return cache_dir
+
+
+# -----------------------------
+# POIs and anchors
+# -----------------------------
+def build_canonical_pois(spec: SyntheticSpec, graph: Dict[str, np.ndarray], rng: np.random.Generator) -> Tuple[pd.DataFrame, np.ndarray]:
+    """Place POIs next to random nodes; returns the frame and each POI's host node index."""
+    import shapely
+
+    n_nodes = graph["node_ids"].size
+    # Zipf-like popularity so a few categories and brands dominate, as in real extracts.
+    cat_ids = sorted(spec.categories)
+    brand_ids = sorted(spec.brands)
+    cat_w = 1.0 / np.arange(1, len(cat_ids) + 1)
+    cat_choice = rng.choice(len(cat_ids), size=spec.pois, p=cat_w / cat_w.sum())
+    has_brand = rng.random(spec.pois) < 0.25
+    brand_w = 1.0 / np.arange(1, len(brand_ids) + 1)
+    brand_choice = rng.choice(len(brand_ids), size=spec.pois, p=brand_w / brand_w.sum())
+
+    # Clustered placement: half the POIs gather around a few town centres.
+    host = rng.integers(0, n_nodes, size=spec.pois)
+    n_centres = max(1, spec.pois // 500)
+    centres = rng.integers(0, n_nodes, size=n_centres)
+    clustered = rng.random(spec.pois) < 0.5
+    offsets = rng.integers(-400, 401, size=spec.pois)
+    host = np.where(clustered, np.clip(centres[rng.integers(0, n_centres, size=spec.pois)] + offsets, 0, n_nodes - 1), host)
+
+    deg = 40.0 / _M_PER_DEG
+    lats = graph["lats"][host].astype(np.float64) + rng.uniform(-deg, deg, size=spec.pois)
+    lons = graph["lons"][host].astype(np.float64) + rng.uniform(-deg, deg, size=spec.pois)
+
+    categories = np.array(cat_ids, dtype=object)[cat_choice]
+    brand_id = np.where(has_brand, np.array(brand_ids, dtype=object)[brand_choice], None)
+    brand_name = np.array([spec.brands[b] if b is not None else None for b in brand_id], dtype=object)
+    names = np.array(
+        [brand_name[i] if brand_name[i] is not None else f"Synthetic {categories[i].replace('_', ' ').title()} {i}" for i in range(spec.pois)],
+        dtype=object,
+    )
+    poi_ids = [str(uuid.uuid5(uuid.NAMESPACE_DNS, f"synthetic|{spec.seed}|{i}")) for i in range(spec.pois)]
+    h3_r9 = [h3i.int_to_str(h3i.latlng_to_cell(float(la), float(lo), 9)) for la, lo in zip(lats, lons)]
+
+    df = pd.DataFrame({
+        "poi_id": poi_ids,
+        "name": names,
+        "brand_id": brand_id,
+        "brand_name": brand_name,
+        "class": "synthetic",
+        "category": categories,
+        "subcat": None,
+        "trauma_level": None,
+        "lon": lons.astype(np.float32),
+        "lat": lats.astype(np.float32),
+        "geometry": shapely.to_wkb(shapely.points(lons, lats)),
+        "source": "synthetic",
+        "ext_id": [f"synthetic:{i}" for i in range(spec.pois)],
+        "h3_r9": h3_r9,
+        "provenance": [["synthetic"]] * spec.pois,
+    })
+    return df, host
+
+
+def build_anchor_sites(spec: SyntheticSpec, graph: Dict[str, np.ndarray], pois: pd.DataFrame, host: np.ndarray) -> pd.DataFrame:
+    """Group POIs by host node into anchor sites, mirroring 03_build_anchor_sites."""
+    node_ids = graph["node_ids"]
+    frame = pd.DataFrame({
+        "node_idx": host,
+        "poi_id": pois["poi_id"].to_numpy(),
+        "brand_id": pois["brand_id"].to_numpy(),
+        "category": pois["category"].to_numpy(),
+    })
+    grouped = frame.groupby("node_idx", sort=True).agg(
+        poi_ids=("poi_id", list),
+        brands=("brand_id", lambda s: list(dict.fromkeys(b for b in s if pd.notna(b)))),
+        categories=("category", lambda s: sorted(set(s))),
+    ).reset_index()
+    idx = grouped["node_idx"].to_numpy()
+    sites = pd.DataFrame({
+        "site_id": [str(uuid.uuid5(uuid.NAMESPACE_DNS, f"{spec.mode}|{int(nid)}")) for nid in node_ids[idx]],
+        "node_id": node_ids[idx],
+        "lon": graph["lons"][idx].astype(np.float64),
+        "lat": graph["lats"][idx].astype(np.float64),
+        "poi_ids": grouped["poi_ids"],
+        "brands": grouped["brands"],
+        "categories": grouped["categories"],
+    })
+    # Same deterministic ordering as assign_anchor_int_ids in 03.
+    sites = sites.sort_values("site_id").reset_index(drop=True)
+    sites["anchor_int_id"] = sites.index.astype(np.int32)
+    return sites
+
+
+def _project(lats: np.ndarray, lons: np.ndarray, lat0: float) -> np.ndarray:
+    return np.column_stack([
+        np.asarray(lons, dtype=np.float64) * _M_PER_DEG * math.cos(math.radians(lat0)),
+        np.asarray(lats, dtype=np.float64) * _M_PER_DEG,
+    ])
+
+
+def _estimate_seconds(dist_m: np.ndarray) -> np.ndarray:
+    return np.ceil(dist_m * _DETOUR_FACTOR / _ESTIMATE_SPEED_MPS)
+
+
+# -----------------------------
+# T_hex, D_anchor, overlays
+# -----------------------------
+def build_t_hex(spec: SyntheticSpec, sites: pd.DataFrame, h3_by_res: Dict[int, np.ndarray]) -> pa.Table:
+    """Top-K nearest anchors per hex (by hex centre) within the overflow cutoff."""
+    tree = cKDTree(_project(sites["lat"].to_numpy(), sites["lon"].to_numpy(), spec.origin_lat))
+    anchor_ids = sites["anchor_int_id"].to_numpy(dtype=np.int32)
+    k = min(spec.k_best, len(sites))
+    cutoff_s = spec.overflow_minutes * 60
+    parts = []
+    for r in spec.resolutions:
+        hexes = np.unique(h3_by_res[r])
+        centres = np.array([h3i.cell_to_latlng(int(c)) for c in hexes], dtype=np.float64).reshape(-1, 2)
+        dist, nn = tree.query(_project(centres[:, 0], centres[:, 1], spec.origin_lat), k=k)
+        dist = dist.reshape(len(hexes), k)
+        nn = nn.reshape(len(hexes), k)
+        secs = _estimate_seconds(dist)
+        ok = secs <= cutoff_s
+        rows = np.nonzero(ok)
+        parts.append(pd.DataFrame({
+            "h3_id": hexes[rows[0]].astype(np.uint64),
+            "anchor_int_id": anchor_ids[nn[rows]],
+            "time_s": secs[rows].astype(np.uint16),
+            "res": np.int32(r),
+        }))
+    df = pd.concat(parts, ignore_index=True)
+    df["mode"] = spec.mode
+    df["snapshot_ts"] = SNAPSHOT_TS
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    metadata = {
+        "source_pbf": f"{spec.state}.osm.pbf",
+        "mode": spec.mode,
+        "k_best": str(spec.k_best),
+        "cutoff_minutes": str(spec.cutoff_minutes),
+        "creation_date": SNAPSHOT_TS,
+        "dataset_version": f"synthetic-seed{spec.seed}",
+    }
+    return table.replace_schema_metadata({k_: v.encode("utf-8") for k_, v in metadata.items()})
+
+
+def _d_anchor_table(anchor_xy: np.ndarray, anchor_ids: np.ndarray, source_rows: np.ndarray, max_seconds: int) -> Tuple[np.ndarray, np.ndarray]:
+    tree = cKDTree(anchor_xy[source_rows])
+    dist, _ = tree.query(anchor_xy, k=1)
+    secs = _estimate_seconds(dist)
+    ok = secs <= max_seconds
+    return anchor_ids[ok].astype(np.uint32), secs[ok].astype(np.uint16)
+
+
+def write_d_anchor(root: Path, spec: SyntheticSpec, sites: pd.DataFrame, limits: Dict) -> Tuple[int, int]:
+    anchor_xy = _project(sites["lat"].to_numpy(), sites["lon"].to_numpy(), spec.origin_lat)
+    anchor_ids = sites["anchor_int_id"].to_numpy()
+    mode_code = 0 if spec.mode == "drive" else 2
+    snapshot = pa.scalar(pd.Timestamp(SNAPSHOT_TS).date(), type=pa.date32())
+
+    n_cat = 0
+    for label in sorted(spec.categories):
+        rows = np.flatnonzero([label in cats for cats in sites["categories"]])
+        if rows.size == 0:
+            continue
+        ids, secs = _d_anchor_table(anchor_xy, anchor_ids, rows, _entity_max_seconds(limits, "category", label))
+        cid = spec.categories[label]
+        table = pa.table({
+            "anchor_id": pa.array(ids, type=pa.uint32()),
+            "category_id": pa.array(np.full(ids.size, cid, dtype=np.uint32), type=pa.uint32()),
+            "mode": pa.array(np.full(ids.size, mode_code, dtype=np.uint8), type=pa.uint8()),
+            "seconds_u16": pa.array(secs, type=pa.uint16()),
+            "snapshot_ts": pa.array([snapshot] * ids.size, type=pa.date32()),
+        })
+        _atomic_write_table(table, root / "d_anchor_category" / f"mode={mode_code}" / f"category_id={cid}" / "part-000.parquet")
+        n_cat += 1
+
+    n_brand = 0
+    for brand in sorted(spec.brands):
+        rows = np.flatnonzero([brand in brands for brands in sites["brands"]])
+        if rows.size == 0:
+            continue
+        ids, secs = _d_anchor_table(anchor_xy, anchor_ids, rows, _entity_max_seconds(limits, "brand", brand))
+        table = pa.table({
+            "anchor_id": pa.array(ids, type=pa.uint32()),
+            "brand_id": pa.array([brand] * ids.size, type=pa.string()),
+            "mode": pa.array(np.full(ids.size, mode_code, dtype=np.uint8), type=pa.uint8()),
+            "seconds_u16": pa.array(secs, type=pa.uint16()),
+            "snapshot_ts": pa.array([snapshot] * ids.size, type=pa.date32()),
+        })
+        _atomic_write_table(table, root / "d_anchor_brand" / f"mode={mode_code}" / f"brand_id={brand}" / "part-000.parquet")
+        n_brand += 1
+    return n_cat, n_brand
+
+
+def _hex_frame(spec: SyntheticSpec, h3_by_res: Dict[int, np.ndarray]) -> pd.DataFrame:
+    frames = []
+    for r in spec.resolutions:
+        hexes = np.unique(h3_by_res[r])
+        centres = np.array([h3i.cell_to_latlng(int(c)) for c in hexes], dtype=np.float64).reshape(-1, 2)
+        frames.append(pd.DataFrame({"h3_id": hexes, "res": np.int32(r), "lat": centres[:, 0], "lon": centres[:, 1]}))
+    return pd.concat(frames, ignore_index=True)
+
+
+def build_climate(spec: SyntheticSpec, hexes: pd.DataFrame) -> pa.Table:
+    """Smooth latitude-driven climate fields, quantized like quantize_climate."""
+    lat_anom = (hexes["lat"].to_numpy() - spec.origin_lat)
+    lon_anom = (hexes["lon"].to_numpy() - spec.origin_lon)
+    base = 50.0 - 3.5 * lat_anom + 1.5 * np.sin(lon_anom * 3.0)
+    seasonal = 22.0 * np.sin((np.arange(12) - 3.5) / 12.0 * 2 * np.pi)
+    temps = base[:, None] + seasonal[None, :]
+    ppt_mm = np.clip(95.0 + 15.0 * np.cos(lon_anom * 2.0)[:, None] + 10.0 * np.cos(np.arange(12) / 12.0 * 2 * np.pi)[None, :], 0, None)
+
+    cols: Dict[str, pa.Array] = {
+        "h3_id": pa.array(hexes["h3_id"].to_numpy(dtype=np.uint64), type=pa.uint64()),
+        "res": pa.array(hexes["res"].to_numpy(dtype=np.int32), type=pa.int32()),
+    }
+
+    def q_temp(x: np.ndarray) -> pa.Array:
+        return pa.array(np.round(x / 0.1).astype(np.int16), type=pa.int16())
+
+    def q_ppt(x: np.ndarray) -> pa.Array:
+        return pa.array(np.round(np.clip(x, 0, None) / 0.1).astype(np.uint16), type=pa.uint16())
+
+    for i, m in enumerate(MONTHS):
+        cols[f"temp_mean_{m}_f_q"] = q_temp(temps[:, i])
+    cols["temp_mean_ann_f_q"] = q_temp(temps.mean(axis=1))
+    cols["temp_mean_summer_f_q"] = q_temp(temps[:, 5:8].mean(axis=1))
+    cols["temp_mean_winter_f_q"] = q_temp(temps[:, [11, 0, 1]].mean(axis=1))
+    cols["temp_max_hot_month_f_q"] = q_temp(temps.max(axis=1) + 9.0)
+    cols["temp_min_cold_month_f_q"] = q_temp(temps.min(axis=1) - 9.0)
+    for i, m in enumerate(MONTHS):
+        cols[f"ppt_{m}_mm_q"] = q_ppt(ppt_mm[:, i])
+        cols[f"ppt_{m}_in_q"] = q_ppt(ppt_mm[:, i] / 25.4)
+    cols["ppt_ann_mm_q"] = q_ppt(ppt_mm.sum(axis=1))
+    cols["ppt_ann_in_q"] = q_ppt(ppt_mm.sum(axis=1) / 25.4)
+    return pa.table(cols)
+
+
+def build_overlays(spec: SyntheticSpec, hexes: pd.DataFrame, rng: np.random.Generator) -> Tuple[pa.Table, pa.Table]:
+    h3_ids = pa.array(hexes["h3_id"].to_numpy(dtype=np.uint64), type=pa.uint64())
+    res = pa.array(hexes["res"].to_numpy(dtype=np.int32), type=pa.int32())
+    # Power lines follow a handful of straight corridors across the grid.
+    lon = hexes["lon"].to_numpy()
+    corridor_lons = rng.uniform(lon.min(), lon.max(), size=3) if lon.size else np.empty(0)
+    near = np.zeros(len(hexes), dtype=bool)
+    for c in corridor_lons:
+        near |= np.abs(lon - c) < 0.01
+    corridors = pa.table({"h3_id": h3_ids, "res": res, "near_power_corridor": pa.array(near, type=pa.bool_())})
+
+    share = np.clip(0.5 + 0.3 * np.sin(hexes["lat"].to_numpy() * 7.0) + rng.normal(0, 0.05, size=len(hexes)), 0, 1)
+    lean = np.minimum((share / 0.2).astype(np.uint8), 4)
+    politics = pa.table({
+        "h3_id": h3_ids,
+        "res": res,
+        "political_lean": pa.array(lean, type=pa.uint8()),
+        "rep_vote_share": pa.array(share.astype(np.float32), type=pa.float32()),
+    })
+    return corridors, politics
+
+
+# -----------------------------
+# Driver
+# -----------------------------
+def generate_synthetic_dataset(spec: SyntheticSpec, root: Path, taxonomy_dir: Optional[Path] = None) -> Dict[str, str]:
+    """Generate the full bundle under ``root``; returns a name → path map of outputs."""
+    root = Path(root)
+    taxonomy_dir = Path(taxonomy_dir) if taxonomy_dir else Path("data/taxonomy")
+    if not spec.categories or not spec.brands:
+        cats, brands = _load_taxonomy(taxonomy_dir)
+        spec.categories = spec.categories or cats
+        spec.brands = spec.brands or brands
+    limits = _load_limits(taxonomy_dir / "d_anchor_limits.json")
+
+    # Independent streams per artifact so resizing one part does not reshuffle the others.
+    graph_rng, poi_rng, overlay_rng = (np.random.default_rng([spec.seed, i]) for i in range(3))
+    outputs: Dict[str, str] = {}
+
+    t0 = time.perf_counter()
+    graph = build_grid_graph(spec, graph_rng)
+    h3_by_res = compute_node_h3(graph["lats"], graph["lons"], spec.resolutions)
+    cache_dir = write_graph_cache(root, spec, graph, h3_by_res)
+    outputs["csr_cache"] = str(cache_dir)
+    print(f"[ok] Graph: nodes={graph['node_ids'].size} edges={graph['indices'].size} -> {cache_dir} ({time.perf_counter() - t0:.1f}s)")
+
+    pois, host = build_canonical_pois(spec, graph, poi_rng)
+    poi_path = root / "poi" / f"{spec.state}_canonical.parquet"
+    _atomic_write_table(pa.Table.from_pandas(pois, preserve_index=False), poi_path)
+    outputs["pois"] = str(poi_path)
+
+    sites = build_anchor_sites(spec, graph, pois, host)
+    sites_path = root / "anchors" / f"{spec.state}_{spec.mode}_sites.parquet"
+    map_path = root / "anchors" / f"{spec.state}_{spec.mode}_site_id_map.parquet"
+    _atomic_write_table(pa.Table.from_pandas(sites, preserve_index=False), sites_path)
+    _atomic_write_table(pa.Table.from_pandas(sites[["anchor_int_id", "site_id"]], preserve_index=False), map_path)
+    outputs["anchors"] = str(sites_path)
+    outputs["site_id_map"] = str(map_path)
+    print(f"[ok] POIs={len(pois)} anchor sites={len(sites)}")
+
+    t_hex = build_t_hex(spec, sites, h3_by_res)
+    t_hex_path = root / "minutes" / f"{spec.state}_{spec.mode}_t_hex.parquet"
+    _atomic_write_table(t_hex, t_hex_path)
+    outputs["t_hex"] = str(t_hex_path)
+    print(f"[ok] T_hex rows={t_hex.num_rows}")
+
+    n_cat, n_brand = write_d_anchor(root, spec, sites, limits)
+    outputs["d_anchor_category"] = str(root / "d_anchor_category")
+    outputs["d_anchor_brand"] = str(root / "d_anchor_brand")
+    print(f"[ok] D_anchor partitions: categories={n_cat} brands={n_brand}")
+
+    hexes = _hex_frame(spec, h3_by_res)
+    climate_path = root / "climate" / f"{spec.state}_hex_climate.parquet"
+    _atomic_write_table(build_climate(spec, hexes), climate_path)
+    corridors, politics = build_overlays(spec, hexes, overlay_rng)
+    corridor_path = root / "power_corridors" / f"{spec.state}_near_power_corridor.parquet"
+    politics_path = root / "politics" / f"{spec.state}_political_lean.parquet"
+    _atomic_write_table(corridors, corridor_path)
+    _atomic_write_table(politics, politics_path)
+    outputs.update(climate=str(climate_path), power_corridors=str(corridor_path), politics=str(politics_path))
+    print(f"[ok] Overlays for {len(hexes)} hexes")
+    print(f"--- Synthetic bundle '{spec.state}' finished in {time.perf_counter() - t0:.1f}s ---")
+    return outputs
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Generate a deterministic synthetic dataset bundle")
+    ap.add_argument("--state", default="synthetic", help="State slug used in output file names (default: synthetic)")
+    ap.add_argument("--root", default="data", help="Output root mirroring data/ (default: data)")
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--scale", type=float, default=None, help="Multiplier on Massachusetts-sized defaults (e.g. 10, 100)")
+    ap.add_argument("--nodes", type=int, default=None, help=f"Approximate graph node count (default: {BASE_NODES} × scale)")
+    ap.add_argument("--pois", type=int, default=None, help=f"Canonical POI count (default: {BASE_POIS} × scale)")
+    ap.add_argument("--k-best", type=int, default=20)
+    ap.add_argument("--cutoff", type=int, default=30, help="Primary cutoff minutes recorded in T_hex metadata")
+    ap.add_argument("--overflow-cutoff", type=int, default=60, help="Max minutes kept in T_hex")
+    ap.add_argument("--taxonomy-dir", default="data/taxonomy")
+    args = ap.parse_args()
+
+    scale = args.scale if args.scale is not None else 1.0
+    spec = SyntheticSpec(
+        state=args.state,
+        seed=args.seed,
+        nodes=args.nodes if args.nodes is not None else int(BASE_NODES * scale),
+        pois=args.pois if args.pois is not None else int(BASE_POIS * scale),
+        k_best=args.k_best,
+        cutoff_minutes=args.cutoff,
+        overflow_minutes=args.overflow_cutoff,
+    )
+    generate_synthetic_dataset(spec, Path(args.root), Path(args.taxonomy_dir))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Drop small disconnected components from a state's CSR cache (graph.islands) and report the
+node/edge savings.
+
+The cache under data/osm/cache_csr/<state>_<mode>.npycache is rewritten in place: every per-node
+array is subset, island_remap.npy maps new node indices to the unpruned graph, meta.json records
+{"islands": {...}} and cached CH binaries are removed. Components that contain a node of
+--anchors are always kept, so existing anchor sites stay routable; --strong also drops one-way
+trap nodes that cannot reach a strongly connected core. Set
+config.GRAPH_CONFIG[mode]["min_component_nodes"] to prune automatically when the cache is rebuilt.
+
+Usage:
+  python scripts/prune_csr_islands.py --pbf data/osm/massachusetts.osm.pbf --min-nodes 50 \
+      --anchors data/anchors/massachusetts_drive_sites.parquet [--dry-run]
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "src"))
+
+from graph.islands import format_report, island_mask, prune_csr_cache  # noqa: E402
+from graph.pyrosm_csr import _csr_cache_dir, load_or_build_csr  # noqa: E402
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Prune small disconnected components from a CSR cache.")
+    ap.add_argument("--pbf", required=True)
+    ap.add_argument("--mode", default="drive", choices=["drive", "walk"])
+    ap.add_argument("--min-nodes", type=int, default=50, help="Drop weakly connected components with fewer nodes")
+    ap.add_argument("--anchors", default=None, help="Anchor sites parquet; components containing an anchor node are kept")
+    ap.add_argument("--strong", action="store_true", help="Also drop nodes that cannot reach a strongly connected core")
+    ap.add_argument("--dry-run", action="store_true", help="Report what would be dropped without rewriting the cache")
+    args = ap.parse_args()
+
+    node_ids, indptr, indices, *_ = load_or_build_csr(args.pbf, args.mode, [7, 8], False)
+    cache_dir = _csr_cache_dir(args.pbf, args.mode)
+    keep_ids = None
+    if args.anchors:
+        keep_ids = pd.read_parquet(args.anchors, columns=["node_id"])["node_id"].to_numpy(dtype=np.int64)
+    print(f"[info] {cache_dir}: {node_ids.size} nodes, {indices.size} edges")
+
+    t0 = time.perf_counter()
+    if args.dry_run:
+        keep = np.isin(np.asarray(node_ids), keep_ids) if keep_ids is not None else None
+        mask, stats = island_mask(np.asarray(indptr), np.asarray(indices), args.min_nodes, keep, args.strong)
+        src = np.repeat(mask, np.diff(np.asarray(indptr)))
+        print(f"[dry-run] would keep {int(mask.sum())}/{mask.size} nodes and "
+              f"{int((src & mask[np.asarray(indices)]).sum())}/{indices.size} edges; {json.dumps(stats)}")
+        return
+    report = prune_csr_cache(cache_dir, args.min_nodes, keep_ids, args.strong)
+    print(f"[ok] Pruned islands in {time.perf_counter() - t0:.2f}s: {format_report(report)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Publish the working-tree artifacts as an immutable, versioned dataset release.
+
+Copies what the API serves (anchor sites, canonical POIs, D_anchor partitions,
+taxonomy, hex lookup index, CSR/CH caches and PMTiles) into releases/<version>/, writes a manifest,
+and atomically repoints releases/CURRENT. A running API picks up the new version
+on its next poll, warms it in the background and swaps without a restart.
+
+Usage:
+  python scripts/publish_dataset.py                       # publish + activate
+  python scripts/publish_dataset.py --states massachusetts --no-activate
+  python scripts/publish_dataset.py --activate 20250101T120000   # roll back/forward
+"""
+from __future__ import annotations
+
+import argparse
+import glob
+import os
+import shutil
+import sys
+import time
+from typing import List
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "src"))
+
+import config  # noqa: E402
+from serving.snapshots import (  # noqa: E402
+    CURRENT_NAME,
+    MANIFEST_NAME,
+    build_manifest,
+    read_current,
+    read_manifest,
+    set_current,
+    verify_manifest,
+    write_manifest,
+)
+
+MODES = ("drive", "walk")
+
+
+def _discover_states() -> List[str]:
+    suffix = "_canonical.parquet"
+    return sorted(os.path.basename(p)[: -len(suffix)] for p in glob.glob(os.path.join("data", "poi", f"*{suffix}")))
+
+
+def _release_sources(states: List[str]) -> List[str]:
+    """Working-tree paths (files or directories) that make up a release."""
+    paths: List[str] = []
+    for state in states:
+        paths.append(os.path.join("data", "poi", f"{state}_canonical.parquet"))
+        for mode in MODES:
+            paths.append(os.path.join("data", "anchors", f"{state}_{mode}_sites.parquet"))
+            paths.append(os.path.join("data", "osm", "cache_csr", f"{state}_{mode}.npycache"))
+    paths += [
+        os.path.join("data", "d_anchor_category"),
+        os.path.join("data", "d_anchor_brand"),
+        os.path.join("data", "taxonomy"),
+        os.path.join("data", "hex_index"),
+    ]
+    paths += sorted(glob.glob(os.path.join("tiles", "*.pmtiles")))
+    return [p for p in paths if os.path.exists(p)]
+
+
+def _copy_file(src: str, dst: str, link: bool) -> None:
+    os.makedirs(os.path.dirname(dst), exist_ok=True)
+    if link:
+        try:
+            os.link(src, dst)
+            return
+        except OSError:
+            pass
+    shutil.copy2(src, dst)
+
+
+def _copy_tree(src: str, dst_root: str, link: bool) -> int:
+    n = 0
+    if os.path.isfile(src):
+        _copy_file(src, os.path.join(dst_root, src), link)
+        return 1
+    for dirpath, _, filenames in os.walk(src):
+        for name in filenames:
+            if name.startswith(".") or ".tmp" in name:
+                continue
+            p = os.path.join(dirpath, name)
+            _copy_file(p, os.path.join(dst_root, p), link)
+            n += 1
+    return n
+
+
+def _prune(releases_dir: str, keep: int, protect: List[str]) -> None:
+    if keep <= 0:
+        return
+    versions = []
+    for d in glob.glob(os.path.join(releases_dir, "*")):
+        name = os.path.basename(d)
+        if not os.path.isfile(os.path.join(d, MANIFEST_NAME)):
+            continue
+        try:
+            created = read_manifest(d).get("created", "")
+        except Exception:
+            created = ""
+        versions.append((created, name))
+    versions.sort(reverse=True)
+    for _, name in versions[keep:]:
+        if name in protect:
+            continue
+        print(f"[info] Pruning old release {name}")
+        shutil.rmtree(os.path.join(releases_dir, name), ignore_errors=True)
+
+
+def activate(releases_dir: str, version: str) -> None:
+    version_dir = os.path.join(releases_dir, version)
+    problems = verify_manifest(version_dir, read_manifest(version_dir))
+    if problems:
+        raise SystemExit(f"[error] Release {version} is incomplete: {problems[:5]}")
+    set_current(releases_dir, version)
+    print(f"[ok] {os.path.join(releases_dir, CURRENT_NAME)} -> {version}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Publish working-tree artifacts as a versioned dataset release.")
+    ap.add_argument("--releases-dir", default="releases", help="Root of versioned releases (default: releases)")
+    ap.add_argument("--version", default=None, help="Release name (default: UTC timestamp)")
+    ap.add_argument("--states", nargs="+", default=None, help="States to include (default: every data/poi/<state>_canonical.parquet)")
+    ap.add_argument("--link", action="store_true",
+                    help="Hardlink instead of copy. Only safe if pipeline steps replace files rather than rewrite them in place.")
+    ap.add_argument("--keep", type=int, default=3, help="Releases to keep after publishing (0 = keep all)")
+    ap.add_argument("--no-activate", action="store_true", help="Stage the release without repointing CURRENT")
+    ap.add_argument("--activate", metavar="VERSION", default=None, help="Only repoint CURRENT at an existing release")
+    args = ap.parse_args()
+
+    os.makedirs(args.releases_dir, exist_ok=True)
+    if args.activate:
+        activate(args.releases_dir, args.activate)
+        return
+
+    version = args.version or time.strftime("%Y%m%dT%H%M%S", time.gmtime())
+    final_dir = os.path.join(args.releases_dir, version)
+    if os.path.exists(final_dir):
+        raise SystemExit(f"[error] Release {version} already exists")
+    states = args.states or _discover_states()
+    if not states:
+        raise SystemExit("[error] No states found under data/poi; nothing to publish")
+
+    staging = os.path.join(args.releases_dir, f".staging-{version}")
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+    sources = _release_sources(states)
+    print(f"[info] Publishing {version} for {', '.join(states)} ({len(sources)} sources)")
+    n_files = sum(_copy_tree(src, staging, args.link) for src in sources)
+
+    manifest = build_manifest(staging, version, dataset_version=config.DATASET_VERSION, states=states)
+    write_manifest(staging, manifest)
+    # Rename the fully written directory into place so watchers never see a partial release
+    os.replace(staging, final_dir)
+    total_mb = sum(manifest["files"].values()) / 1e6
+    print(f"[ok] Wrote {final_dir}: {n_files} files, {total_mb:.1f} MB")
+
+    if not args.no_activate:
+        activate(args.releases_dir, version)
+    _prune(args.releases_dir, args.keep, protect=[version, read_current(args.releases_dir) or ""])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Renumber a state's CSR cache for memory locality (graph.reorder) and time the K-best kernel
+before and after.
+
+The cache under data/osm/cache_csr/<state>_<mode>.npycache is rewritten in place (node_ids,
+lats/lons, h3_r*.npy, indptr/indices/w_sec), meta.json records {"node_order": {method, version}}
+and cached CH binaries are removed. With --anchors the kernel runs on the old and the new order
+and the per-node label times are checked to agree. Set config.GRAPH_CONFIG[mode]["node_order"]
+to keep the order when the cache is rebuilt from a newer PBF. --json-out records the
+before/after kernel timings.
+
+Usage:
+  python scripts/reorder_csr_cache.py --pbf data/osm/massachusetts.osm.pbf --method hilbert \
+      --anchors data/anchors/massachusetts_drive_sites.parquet --k 20 --threads 16 --repeat 3 --json-out reorder.json
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "src"))
+
+from graph.anchors import build_anchor_mappings  # noqa: E402
+from graph.csr_utils import build_rev_csr  # noqa: E402
+from graph.pyrosm_csr import _csr_cache_dir, load_csr_npy, load_or_build_csr  # noqa: E402
+from graph.reorder import NODE_ORDER_METHODS, read_node_order, reorder_csr_cache  # noqa: E402
+
+
+def _time_kbest(args, node_ids, indptr, indices, w_sec):
+    import t_hex
+
+    anchor_idx, _ = build_anchor_mappings(pd.read_parquet(args.anchors, columns=["site_id", "node_id", "anchor_int_id"]), node_ids)
+    sources = np.flatnonzero(anchor_idx >= 0).astype(np.int32)
+    rev = build_rev_csr(np.asarray(indptr), np.asarray(indices), np.asarray(w_sec))
+    fn = getattr(t_hex, f"kbest_multisource_{args.kernel}_csr")
+    best, t = float("inf"), None
+    for _ in range(args.repeat):
+        t0 = time.perf_counter()
+        _, t = fn(*rev, sources, args.k, args.cutoff * 60, args.overflow_cutoff * 60, args.threads, False)
+        best = min(best, time.perf_counter() - t0)
+    return best, np.asarray(t)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Locality-preserving renumbering of a CSR cache.")
+    ap.add_argument("--pbf", required=True)
+    ap.add_argument("--mode", default="drive", choices=["drive", "walk"])
+    ap.add_argument("--method", default="hilbert", choices=list(NODE_ORDER_METHODS))
+    ap.add_argument("--anchors", default=None, help="Anchor sites parquet; time the K-best kernel before/after when given")
+    ap.add_argument("--kernel", default="bucket", choices=["bucket", "frontier"])
+    ap.add_argument("--k", type=int, default=20)
+    ap.add_argument("--cutoff", type=int, default=30, help="Primary cutoff minutes")
+    ap.add_argument("--overflow-cutoff", type=int, default=60, help="Overflow cutoff minutes")
+    ap.add_argument("--threads", type=int, default=1)
+    ap.add_argument("--repeat", type=int, default=1)
+    ap.add_argument("--json-out", default=None, help="Write the before/after timings as JSON (needs --anchors)")
+    args = ap.parse_args()
+
+    node_ids, indptr, indices, w_sec, *_ = load_or_build_csr(args.pbf, args.mode, [7, 8], False)
+    cache_dir = _csr_cache_dir(args.pbf, args.mode)
+    print(f"[info] {cache_dir}: {node_ids.size} nodes, {indices.size} edges, order {read_node_order(cache_dir) or 'pyrosm'}")
+
+    before = _time_kbest(args, node_ids, indptr, indices, w_sec) if args.anchors else None
+    t0 = time.perf_counter()
+    perm = reorder_csr_cache(cache_dir, args.method)
+    t_reorder = time.perf_counter() - t0
+    print(f"[ok] Renumbered nodes ({args.method}) in {t_reorder:.2f}s")
+
+    if before is not None:
+        node_ids, indptr, indices, w_sec, *_ = load_csr_npy(cache_dir, [])
+        after = _time_kbest(args, node_ids, indptr, indices, w_sec)
+        same = np.array_equal(after[1], before[1][perm])
+        print(f"[ok] k-best ({args.kernel}, K={args.k}, threads={args.threads}): before {before[0]:.2f}s, "
+              f"after {after[0]:.2f}s ({before[0] / max(after[0], 1e-9):.2f}x); label times {'match' if same else 'DIFFER'}")
+        if args.json_out:
+            os.makedirs(os.path.dirname(args.json_out) or ".", exist_ok=True)
+            with open(args.json_out, "w") as f:
+                json.dump({
+                    "pbf": args.pbf, "method": args.method, "kernel": args.kernel, "k": args.k, "threads": args.threads,
+                    "nodes": int(node_ids.size), "edges": int(indices.size), "reorder_s": round(t_reorder, 3),
+                    "kbest_before_s": round(before[0], 3), "kbest_after_s": round(after[0], 3), "times_match": bool(same),
+                }, f, indent=2)
+            print(f"[ok] Wrote {args.json_out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -24,6 +24,11 @@ log() {
 : "${THREADS:=1}"
 : "${WORKERS:=32}"
 : "${TELEMETRY_INTERVAL:=5}"
+# Progress of an interrupted (e.g. preempted) run is kept here and resumed by the next run of the
+# same TARGET; set CHECKPOINT_PREFIX= to disable. Cleared after a successful run.
+: "${CHECKPOINT_PREFIX=gs://${BUCKET}/checkpoints/${TARGET}}"
+: "${CHECKPOINT_SYNC_INTERVAL:=300}"
+: "${CHECKPOINT_CHUNKS:=8}"
 
 RUN_ID="$(date +%Y%m%d-%H%M%S)"
 SRC_TARBALL="vicinity-src-${RUN_ID}.tar.gz"
@@ -43,6 +48,9 @@ if [[ ! -f "${STARTUP_SCRIPT_PATH}" ]]; then
 fi
 
 log "run=${RUN_ID} target=${TARGET} instance=${INSTANCE_NAME} zone=${ZONE} bucket=${BUCKET}"
+if [[ -n "${CHECKPOINT_PREFIX}" ]] && gsutil -q ls "${CHECKPOINT_PREFIX}" >/dev/null 2>&1; then
+  log "resuming from checkpoints in ${CHECKPOINT_PREFIX}"
+fi
 log "packaging HEAD $(git -C "${REPO_ROOT}" rev-parse --short HEAD)"
 
 # Create tarball with source code and required data files for categories build
@@ -118,7 +126,7 @@ gcloud compute instances create "${INSTANCE_NAME}" \
   --image-project "${IMAGE_PROJECT}" \
   --boot-disk-size "${BOOT_DISK_SIZE_GB}" \
   --boot-disk-type "${BOOT_DISK_TYPE}" \
-  --metadata RUN_ID="${RUN_ID}",BUCKET="${BUCKET}",SRC_TARBALL="${SRC_TARBALL}",RESULTS_PREFIX="${RESULTS_PREFIX}",TARGET="${TARGET}",THREADS="${THREADS}",WORKERS="${WORKERS}",TELEMETRY_INTERVAL="${TELEMETRY_INTERVAL}" \
+  --metadata RUN_ID="${RUN_ID}",BUCKET="${BUCKET}",SRC_TARBALL="${SRC_TARBALL}",RESULTS_PREFIX="${RESULTS_PREFIX}",TARGET="${TARGET}",THREADS="${THREADS}",WORKERS="${WORKERS}",TELEMETRY_INTERVAL="${TELEMETRY_INTERVAL}",CHECKPOINT_PREFIX="${CHECKPOINT_PREFIX}",CHECKPOINT_SYNC_INTERVAL="${CHECKPOINT_SYNC_INTERVAL}",CHECKPOINT_CHUNKS="${CHECKPOINT_CHUNKS}" \
   --metadata-from-file startup-script="${STARTUP_SCRIPT_PATH}"
 log "instance ${INSTANCE_NAME} created"
 
@@ -340,6 +340,9 @@ TARGET="$(fetch_metadata "TARGET")"
 THREADS_OVERRIDE="$(fetch_metadata_optional "THREADS")"
 WORKERS_OVERRIDE="$(fetch_metadata_optional "WORKERS")"
 TELEMETRY_INTERVAL_OVERRIDE="$(fetch_metadata_optional "TELEMETRY_INTERVAL")"
+CHECKPOINT_PREFIX="$(fetch_metadata_optional "CHECKPOINT_PREFIX")"
+CHECKPOINT_SYNC_OVERRIDE="$(fetch_metadata_optional "CHECKPOINT_SYNC_INTERVAL")"
+CHECKPOINT_CHUNKS_OVERRIDE="$(fetch_metadata_optional "CHECKPOINT_CHUNKS")"
 
 # Apply defaults + validation for parallelism knobs
 THREADS_VALUE="${THREADS_OVERRIDE:-1}"
@@ -354,12 +357,70 @@ TELEMETRY_INTERVAL_VALUE="${TELEMETRY_INTERVAL_OVERRIDE:-5}"
 if [[ -z "${TELEMETRY_INTERVAL_VALUE}" || ! "${TELEMETRY_INTERVAL_VALUE}" =~ ^[0-9]+$ || "${TELEMETRY_INTERVAL_VALUE}" -lt 1 ]]; then
   TELEMETRY_INTERVAL_VALUE=5
 fi
+CHECKPOINT_SYNC_VALUE="${CHECKPOINT_SYNC_OVERRIDE:-300}"
+if [[ -z "${CHECKPOINT_SYNC_VALUE}" || ! "${CHECKPOINT_SYNC_VALUE}" =~ ^[0-9]+$ || "${CHECKPOINT_SYNC_VALUE}" -lt 30 ]]; then
+  CHECKPOINT_SYNC_VALUE=300
+fi
+CHECKPOINT_CHUNKS_VALUE="${CHECKPOINT_CHUNKS_OVERRIDE:-8}"
+if [[ -z "${CHECKPOINT_CHUNKS_VALUE}" || ! "${CHECKPOINT_CHUNKS_VALUE}" =~ ^[0-9]+$ ]]; then
+  CHECKPOINT_CHUNKS_VALUE=8
+fi
 TELEMETRY_BOOTSTRAP_INTERVAL_VALUE=$((TELEMETRY_INTERVAL_VALUE * 6))
 if [[ "${TELEMETRY_BOOTSTRAP_INTERVAL_VALUE}" -lt "${TELEMETRY_INTERVAL_VALUE}" ]]; then
   TELEMETRY_BOOTSTRAP_INTERVAL_VALUE="${TELEMETRY_INTERVAL_VALUE}"
 fi
 
+# Outputs that are safe to restore on a rerun: partitions are fingerprinted and written
+# atomically, and in-progress k-best / category shard checkpoints validate their inputs.
+if [[ "${TARGET}" == "all" ]]; then
+  CHECKPOINT_DIRS=(data/anchors data/minutes data/d_anchor_brand data/d_anchor_category)
+else
+  CHECKPOINT_DIRS=(data/d_anchor_category)
+fi
+CHECKPOINT_SYNC_PID=""
+
+sync_checkpoints() {
+  local dir
+  for dir in "${CHECKPOINT_DIRS[@]}"; do
+    [[ -d "${dir}" ]] || continue
+    gsutil -m -q rsync -r -x '.*\.tmp$' "${dir}" "${CHECKPOINT_PREFIX}/${dir}" >>"${QUIET_LOG}" 2>&1 \
+      || log "[checkpoint] upload of ${dir} failed (will retry)"
+  done
+}
+
+checkpoint_sync_loop() {
+  local interval="$1"
+  while true; do
+    sleep "${interval}"
+    sync_checkpoints
+    log "[checkpoint] synced ${CHECKPOINT_DIRS[*]} to ${CHECKPOINT_PREFIX}"
+  done
+}
+
+restore_checkpoints() {
+  local dir
+  for dir in "${CHECKPOINT_DIRS[@]}"; do
+    if gsutil -q ls "${CHECKPOINT_PREFIX}/${dir}" >/dev/null 2>&1; then
+      mkdir -p "${dir}"
+      if gsutil -m -q rsync -r "${CHECKPOINT_PREFIX}/${dir}" "${dir}" >>"${QUIET_LOG}" 2>&1; then
+        log "[checkpoint] restored ${dir} from ${CHECKPOINT_PREFIX}"
+      else
+        log "[checkpoint] restore of ${dir} failed; starting it from scratch"
+      fi
+    fi
+  done
+}
+
+stop_checkpoint_sync() {
+  if [[ -n "${CHECKPOINT_SYNC_PID}" ]]; then
+    kill "${CHECKPOINT_SYNC_PID}" >/dev/null 2>&1 || true
+    wait "${CHECKPOINT_SYNC_PID}" 2>/dev/null || true
+    CHECKPOINT_SYNC_PID=""
+  fi
+}
+
 log "boot metadata RUN_ID=${RUN_ID} TARGET=${TARGET} SRC=${SRC_TARBALL}"
+log "checkpoint config prefix=${CHECKPOINT_PREFIX:-none} sync=${CHECKPOINT_SYNC_VALUE}s chunks=${CHECKPOINT_CHUNKS_VALUE}"
 log "parallelism config threads=${THREADS_VALUE} workers=${WORKERS_VALUE}"
 log "telemetry intervals bootstrap=${TELEMETRY_BOOTSTRAP_INTERVAL_VALUE}s fast=${TELEMETRY_INTERVAL_VALUE}s"
 start_monitors "${TELEMETRY_BOOTSTRAP_INTERVAL_VALUE}"
@@ -370,6 +431,11 @@ cleanup_and_shutdown() {
   local exit_code=$?
   stop_memory_monitor "${MEMORY_MONITOR_LABEL:-}"
   stop_monitors
+  stop_checkpoint_sync
+  if [[ ${exit_code} -ne 0 && -n "${CHECKPOINT_PREFIX:-}" && -d /opt/vicinity/work ]]; then
+    # Keep whatever finished so a rerun resumes from it
+    (cd /opt/vicinity/work && sync_checkpoints) || true
+  fi
   if [[ ${exit_code} -ne 0 ]]; then
     error "Script failed with exit code ${exit_code}"
     EXIT_CODE=${exit_code}
@@ -496,8 +562,17 @@ export OMP_NUM_THREADS="${THREADS_VALUE}" \
        NUMEXPR_NUM_THREADS="${THREADS_VALUE}" \
        NUMEXPR_MAX_THREADS="${THREADS_VALUE}"
 
+export CHECKPOINT_CHUNKS="${CHECKPOINT_CHUNKS_VALUE}"
+
 restart_monitors "${TELEMETRY_INTERVAL_VALUE}"
 
+if [[ -n "${CHECKPOINT_PREFIX}" ]]; then
+  restore_checkpoints
+  checkpoint_sync_loop "${CHECKPOINT_SYNC_VALUE}" &
+  CHECKPOINT_SYNC_PID=$!
+  log_phase "checkpoint restore"
+fi
+
 memory_phase_label="make_${TARGET}"
 start_memory_monitor "${TELEMETRY_INTERVAL_VALUE}" "${memory_phase_label}"
 if [[ "${TARGET}" == "all" ]]; then
@@ -530,9 +605,23 @@ fi
 stop_memory_monitor "${memory_phase_label}"
 
 stop_monitors
+stop_checkpoint_sync
+if [[ -n "${CHECKPOINT_PREFIX}" ]]; then
+  if [[ ${EXIT_CODE} -eq 0 ]]; then
+    # Results are uploaded; a fresh run must not pick up this run's outputs as checkpoints
+    gsutil -m -q rm -r "${CHECKPOINT_PREFIX}" >>"${QUIET_LOG}" 2>&1 || true
+    log "[checkpoint] cleared ${CHECKPOINT_PREFIX}"
+  else
+    sync_checkpoints
+    log "[checkpoint] kept progress in ${CHECKPOINT_PREFIX} for the next run"
+  fi
+fi
 
-# Always upload build log
+# Always upload build log and kernel stats reports
 gsutil -m cp build.log "${RESULTS_PREFIX}/build.log" || true
+if [[ -d data/reports ]]; then
+  gsutil -m -q rsync -r data/reports "${RESULTS_PREFIX}/reports" || true
+fi
 if [[ -f "${QUIET_LOG}" ]]; then
   gsutil -m cp "${QUIET_LOG}" "${RESULTS_PREFIX}/startup_detail.log" || true
 fi
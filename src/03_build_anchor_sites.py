@@ -8,6 +8,9 @@ Inputs:
 Outputs:
 - data/anchors/<state>_<mode>_sites.parquet  (with columns: site_id, node_id, lon, lat, poi_ids, brands, categories, anchor_int_id)
 - data/anchors/<state>_<mode>_site_id_map.parquet (anchor_int_id:int32, site_id:str)
+- --registry: persistent site_id → anchor_int_id registry (see graph/anchor_registry.py); existing
+  sites keep their id, new sites are appended and removed ones tombstoned. --compact-ids renumbers
+  densely (ids change, so downstream products need a full rebuild).
 
 Notes:
 - Anchorable POIs are those with category or brand_id.
@@ -24,6 +27,7 @@ from scipy.spatial import cKDTree
 # Add data/taxonomy to path for taxonomy module
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "data", "taxonomy"))
 
+from graph.anchor_registry import allocate_anchor_int_ids, compact_registry, load_registry, save_registry
 from graph.pyrosm_csr import load_or_build_csr
 import config
 
@@ -66,11 +70,26 @@ def _expand_categories(row: pd.Series) -> list[str]:
     return sorted(categories)
 
 
-def assign_anchor_int_ids(sites_df: pd.DataFrame) -> pd.DataFrame:
+def assign_anchor_int_ids(sites_df: pd.DataFrame, registry_path: str = None, compact: bool = False) -> pd.DataFrame:
     # Deterministic stable ordering by site_id (uuid string)
     out = sites_df.sort_values("site_id").reset_index(drop=True).copy()
-    out["anchor_int_id"] = out.index.astype(np.int32)
-    return out
+    if not registry_path:
+        out["anchor_int_id"] = out.index.astype(np.int32)
+        return out
+
+    registry, ids, stats = allocate_anchor_int_ids(load_registry(registry_path), out["site_id"])
+    if compact:
+        registry, remap = compact_registry(registry)
+        ids = registry.set_index("site_id")["anchor_int_id"]
+        moved = sum(1 for old, new in remap.items() if old != new)
+        print(f"[ids] Compacted registry: {len(remap)} active ids, {moved} renumbered (full downstream rebuild needed)")
+    save_registry(registry_path, registry)
+    print(
+        f"[ids] Registry {registry_path}: kept={stats['kept']} added={stats['added']} "
+        f"revived={stats['revived']} tombstoned={stats['tombstoned']}"
+    )
+    out["anchor_int_id"] = out["site_id"].map(ids).astype(np.int32)
+    return out.sort_values("anchor_int_id").reset_index(drop=True)
 
 
 def build_anchor_sites_from_nodes(
@@ -263,6 +282,8 @@ def main():
     ap.add_argument("--pbf", required=True)
     ap.add_argument("--out-sites", required=True)
     ap.add_argument("--out-map", required=True)
+    ap.add_argument("--registry", default=None, help="Persistent site_id → anchor_int_id registry (append-only ids); omit to number by site_id order")
+    ap.add_argument("--compact-ids", action="store_true", help="Drop tombstones and renumber registry ids densely")
     args = ap.parse_args()
 
     # Load canonical POIs
@@ -284,7 +305,7 @@ def main():
         raise SystemExit("No anchor sites built. Check inputs.")
 
     # Assign stable int IDs and persist
-    sites_with_ids = assign_anchor_int_ids(sites)
+    sites_with_ids = assign_anchor_int_ids(sites, args.registry, args.compact_ids)
     os.makedirs(os.path.dirname(args.out_sites) or ".", exist_ok=True)
     sites_with_ids.to_parquet(args.out_sites, index=False)
 
@@ -33,11 +33,32 @@ import geopandas as gpd
 import pyarrow as pa
 import pyarrow.parquet as pq
 from tqdm import tqdm
-import polars as pl
 
-from graph.pyrosm_csr import load_or_build_csr
+from graph.pyrosm_csr import _csr_cache_dir, load_or_build_csr
+from graph.bundle import GraphBundle
+from d_anchor_fingerprint import graph_fingerprint, placement_fingerprint
+from run_checkpoint import RunCheckpoint
+from kernel_report import RunReport
 from graph.csr_utils import build_rev_csr
-from t_hex import kbest_multisource_bucket_csr, aggregate_h3_topk_precached
+from graph.simplify import contract_degree2
+from graph.kbest_approx import ROUNDING, compare_labels, format_comparison, quantized_kernel
+from graph.kbest_incremental import (
+    affected_hexes,
+    kbest_resumable,
+    label_cache_mismatch,
+    labels_to_anchor_ids,
+    load_label_cache,
+    patch_t_hex,
+    repair_labels,
+    save_label_cache,
+)
+from t_hex import (
+    aggregate_h3_topk_precached,
+    aggregate_h3_topk_sorted,
+    kbest_h3_topk_stream,
+    kbest_multisource_bucket_csr,
+    kbest_multisource_frontier_csr,
+)
 import config
 
 # Import the shared anchor site builder from 03_build_anchor_sites.py to avoid duplication
@@ -65,6 +86,136 @@ NODATA_U16 = config.NODATA_U16
 # (Removed unused top-K helpers and provenance utilities.)
 
 
+def _t_hex_metadata(args) -> Dict[bytes, bytes]:
+    metadata = {
+        "source_pbf": os.path.basename(args.pbf),
+        "mode": args.mode,
+        "k_best": str(args.k_best),
+        "cutoff_minutes": str(args.cutoff),
+        "bucket_width_s": str(args.bucket_width_s),
+        "creation_date": SNAPSHOT_TS,
+        "dataset_version": config.DATASET_VERSION,
+    }
+    return {k.encode('utf-8'): v.encode('utf-8') for k, v in metadata.items()}
+
+
+def _const_column(value: str, n: int) -> pa.Array:
+    return pa.array([value], type=pa.large_string()).take(pa.array(np.zeros(n, dtype=np.int32)))
+
+
+def _with_const_columns(batch: pa.RecordBatch, args) -> pa.RecordBatch:
+    """Append the constant mode/snapshot_ts columns to a native (h3_id, anchor_int_id, time_s, res) batch."""
+    n = batch.num_rows
+    return pa.RecordBatch.from_arrays(
+        list(batch.columns) + [_const_column(args.mode, n), _const_column(SNAPSHOT_TS, n)],
+        names=list(batch.schema.names) + ["mode", "snapshot_ts"],
+    )
+
+
+def _peak_rss_mb() -> float:
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def write_t_hex_streaming(args, indptr_rev, indices_rev, w_rev, source_idxs, anchor_idx, node_h3_by_res, res_used,
+                          cutoff_primary_s, cutoff_overflow_s, progress_cb) -> int:
+    """Fused native K-best + per-hex top-K, written to Parquet one record batch at a time.
+
+    Peak memory is the kernel's [N,K] labels plus one batch; no node-level anchor array,
+    aggregation hash maps or full long-format table are materialized.
+    """
+    schema = pa.schema([
+        ("h3_id", pa.uint64()),
+        ("anchor_int_id", pa.int32()),
+        ("time_s", pa.uint16()),
+        ("res", pa.int32()),
+        ("mode", pa.large_string()),
+        ("snapshot_ts", pa.large_string()),
+    ], metadata=_t_hex_metadata(args))
+    os.makedirs(os.path.dirname(args.out_times) or ".", exist_ok=True)
+    tmp_path = args.out_times + ".tmp"
+    writer = pq.ParquetWriter(tmp_path, schema, compression="zstd", use_dictionary=True)
+
+    def _sink(batch):
+        # ArrowBatch from the native side; imported without copying the column buffers
+        writer.write_batch(_with_const_columns(pa.record_batch(batch), args).cast(schema))
+
+    try:
+        rows = kbest_h3_topk_stream(
+            indptr_rev, indices_rev, w_rev, source_idxs, anchor_idx,
+            np.ascontiguousarray(node_h3_by_res, dtype=np.uint64), np.array(res_used, dtype=np.int32),
+            int(args.k_best), cutoff_primary_s, cutoff_overflow_s, int(max(1, args.threads)), bool(args.progress),
+            _sink, int(args.stream_batch_rows), ("frontier" if args.kernel == "frontier" else "bucket"), progress_cb,
+            arrow=True,
+        )
+    except BaseException:
+        writer.close()
+        os.remove(tmp_path)
+        raise
+    writer.close()
+    os.replace(tmp_path, args.out_times)
+    return int(rows)
+
+
+
+def write_t_hex_incremental(args, indptr, indices, w_sec, indptr_rev, indices_rev, w_rev, anchor_idx,
+                            node_h3_by_res, res_used, cutoff_primary_s, cutoff_overflow_s, graph_hash, report=None) -> int:
+    """Repair the cached node labels for the current anchors and patch only the affected hexes.
+
+    Needs the label cache and T_hex of a previous full run with the same graph, K, cutoffs and
+    `--kernel`; the repair runs that kernel, so the rows match a full rebuild with it.
+    """
+    base_path = args.base_times or args.out_times
+    cached = load_label_cache(args.labels_cache) if args.labels_cache else None
+    if cached is None or not os.path.exists(base_path):
+        raise SystemExit(f"--incremental needs --labels-cache from a previous full run and its T_hex ({base_path})")
+    meta, labels = cached
+    stale = label_cache_mismatch(
+        meta, n_nodes=len(anchor_idx), k=int(args.k_best), cutoff_primary_s=cutoff_primary_s,
+        cutoff_overflow_s=cutoff_overflow_s, graph=graph_hash, kernel=args.kernel,
+    )
+    if stale:
+        raise SystemExit(f"Label cache {args.labels_cache} does not match this run ({stale}); rerun without --incremental")
+
+    kbest_fn = kbest_multisource_frontier_csr if args.kernel == "frontier" else kbest_multisource_bucket_csr
+    agg_fn = aggregate_h3_topk_sorted if args.agg == "sort" else aggregate_h3_topk_precached
+    if report is not None:
+        kbest_fn = report.instrument(kbest_fn.__name__, kbest_fn)
+        agg_fn = report.instrument(agg_fn.__name__, agg_fn)
+    start = time.perf_counter()
+    best_src_idx, time_s, stats = repair_labels(
+        kbest_fn, (indptr, indices, w_sec), (indptr_rev, indices_rev, w_rev),
+        labels["best_src_idx"], labels["time_s"], labels["anchor_idx"], anchor_idx,
+        cutoff_primary_s, cutoff_overflow_s, int(max(1, args.threads)),
+    )
+    old_anchor_int = labels_to_anchor_ids(labels["best_src_idx"], labels["anchor_idx"])
+    best_anchor_int = labels_to_anchor_ids(best_src_idx, anchor_idx)
+    changed = np.flatnonzero((old_anchor_int != best_anchor_int).any(axis=1) | (labels["time_s"] != time_s).any(axis=1))
+    print(
+        f"[info] Incremental repair: anchors -{stats['removed']} +{stats['added']}, "
+        f"{stats['invalidated']} nodes re-solved from {stats['repair_sources']} anchors, "
+        f"{stats['merged']} merged, {changed.size} changed in {time.perf_counter() - start:.2f}s"
+    )
+
+    rows, hexes = affected_hexes(node_h3_by_res, changed)
+    fresh = pa.record_batch(agg_fn(
+        np.ascontiguousarray(node_h3_by_res[rows]), np.ascontiguousarray(best_anchor_int[rows]),
+        np.ascontiguousarray(time_s[rows]), np.array(res_used, dtype=np.int32), int(args.k_best),
+        int(UNREACH_U16), os.cpu_count(), False, arrow=True,
+    ))
+    print(f"[info] Re-aggregated {sum(h.size for h in hexes)} hexes from {rows.size} nodes")
+    table = patch_t_hex(pq.read_table(base_path), pa.Table.from_batches([fresh]), res_used, hexes)
+    n = table.num_rows
+    table = table.append_column("mode", _const_column(args.mode, n)).append_column("snapshot_ts", _const_column(SNAPSHOT_TS, n))
+
+    os.makedirs(os.path.dirname(args.out_times) or ".", exist_ok=True)
+    tmp_path = args.out_times + ".tmp"
+    pq.write_table(table.replace_schema_metadata(_t_hex_metadata(args)), tmp_path, compression="zstd", use_dictionary=True)
+    os.replace(tmp_path, args.out_times)
+    save_label_cache(args.labels_cache, best_src_idx, time_s, anchor_idx, cutoff_primary_s, cutoff_overflow_s, graph_hash,
+                     args.kernel)
+    return n
+
 
 # -----------------------------
 # Main
@@ -81,13 +232,46 @@ def main():
     ap.add_argument("--out-times", required=True, help="Output Parquet path for long-format travel times (t_hex)")
     ap.add_argument("--out-sites", required=False, help="Output Parquet path for the generated anchor sites (if building inline)")
     ap.add_argument("--anchors", required=False, help="Optional: path to prebuilt anchor sites parquet (preferred)")
-    ap.add_argument("--simplify-graph", action="store_true", help="(no-op) kept for CLI compatibility")
+    ap.add_argument("--simplify-graph", action="store_true",
+                    help="Contract degree-2 chains (keeping anchor nodes) before the k-best run and expand node labels "
+                         "back for H3 aggregation; results are unchanged")
     ap.add_argument("--batch-size", type=int, default=500, help="Batch size for anchor processing (default: 500)")
     ap.add_argument("--k-pass-mode", action="store_true", help="(no-op) K-pass kept for compatibility; kernel handles K-pass internally")
     ap.add_argument("--progress", action="store_true", help="Show progress bars/logs during heavy stages")
     ap.add_argument("--overflow-cutoff", type=int, default=90, help="Overflow cutoff MINUTES for nodes missing K labels (default: 90; set equal to --cutoff to disable overflow)")
-    ap.add_argument("--threads", type=int, default=1, help="Threads for k-best compute. Use 1 to compute all sources in a single pass (fastest, avoids repeated per-chunk traversals).")
+    ap.add_argument("--threads", type=int, default=1, help="Threads for k-best compute. With --kernel chunked, use 1 to compute all sources in a single pass (avoids repeated per-chunk traversals).")
+    ap.add_argument("--fused", action="store_true",
+                    help="Fuse k-best and H3 top-K in one native call and stream T_hex to Parquet in batches "
+                         "(bounded memory; rows are ordered by res, h3_id instead of hash order)")
+    ap.add_argument("--stream-batch-rows", type=int, default=1_000_000, help="Rows per record batch with --fused (default: 1,000,000)")
+    ap.add_argument("--agg", choices=["hash", "sort"], default="hash",
+                    help="H3 top-K aggregation: 'hash' (per-thread hash maps) or 'sort' (parallel radix sort + linear pass)")
+    ap.add_argument("--kernel", choices=["chunked", "frontier"], default="chunked",
+                    help="K-best kernel: 'chunked' splits sources across threads (one traversal per chunk); "
+                         "'frontier' shares one bucket frontier across threads (each label settled once, output independent of --threads)")
+    ap.add_argument("--labels-cache", default=None,
+                    help="Directory for the node K-best labels of this run (needed later by --incremental)")
+    ap.add_argument("--incremental", action="store_true",
+                    help="Repair the labels in --labels-cache for the current anchors and patch only the affected hexes "
+                         "of the previous T_hex instead of a full K-best run")
+    ap.add_argument("--base-times", default=None, help="T_hex to patch with --incremental (default: --out-times)")
+    ap.add_argument("--checkpoint-dir", default=None,
+                    help="Checkpoint k-best source chunks and per-resolution aggregates here; a rerun with the same "
+                         "inputs resumes from the last completed step (removed after the output is written)")
+    ap.add_argument("--checkpoint-chunks", type=int, default=8,
+                    help="Source chunks for --checkpoint-dir (one kernel run each; default: 8)")
+    ap.add_argument("--report", default=None,
+                    help="Write a JSON report of native kernel stats (pops, relaxations, pruning, peak queue, "
+                         "per-phase wall time) for this run")
+    ap.add_argument("--bucket-width-s", type=int, default=1,
+                    help="Approximate k-best: Dial bucket width in seconds; edge weights are rounded to it and times "
+                         "come out as multiples of it (default: 1 = exact)")
+    ap.add_argument("--round-weights", choices=list(ROUNDING), default="nearest",
+                    help="Edge weight rounding for --bucket-width-s: 'nearest' (unbiased) or 'up' (never optimistic)")
+    ap.add_argument("--validate-approx", action="store_true",
+                    help="With --bucket-width-s > 1, also run the exact kernel and report the time/source error distribution")
     args = ap.parse_args()
+    report = RunReport(args.report, "04_compute_minutes_per_state", vars(args)) if args.report else None
 
     # Load canonical POIs
     print("[info] Loading canonical POI data...")
@@ -144,12 +328,46 @@ def main():
     if not source_idxs.any():
         raise SystemExit("No valid anchor nodes found in the graph. Aborting.")
 
+    # 2. Optionally contract degree-2 chains; labels are expanded back to every node after the kernel
+    graph = None
+    kernel_sources = source_idxs
+    kernel_csr = (indptr, indices, w_sec)
+    if args.simplify_graph and args.fused:
+        raise SystemExit("--simplify-graph expands node labels before aggregation; drop --fused")
+    if args.checkpoint_dir and args.fused:
+        raise SystemExit("--checkpoint-dir checkpoints materialized labels; drop --fused")
+    approx = args.bucket_width_s > 1
+    if args.bucket_width_s < 1:
+        raise SystemExit("--bucket-width-s must be >= 1")
+    if approx and (args.fused or args.incremental):
+        raise SystemExit("--bucket-width-s wraps the materialized k-best run; drop --fused/--incremental")
+    if args.validate_approx and not approx:
+        raise SystemExit("--validate-approx compares against --bucket-width-s > 1")
+    if args.simplify_graph and not args.incremental:
+        start = time.perf_counter()
+        graph = contract_degree2(indptr, indices, w_sec, anchor_idx >= 0)
+        n_full, m_full = len(node_ids), int(indices.shape[0])
+        print(
+            f"[info] Simplified graph: nodes {n_full} -> {graph.n_nodes} (-{100.0 * (1 - graph.n_nodes / max(1, n_full)):.1f}%), "
+            f"edges {m_full} -> {graph.n_edges} (-{100.0 * (1 - graph.n_edges / max(1, m_full)):.1f}%) "
+            f"in {time.perf_counter() - start:.2f}s"
+        )
+        if report is not None:
+            report.add("contract_degree2", call_s=time.perf_counter() - start, nodes=graph.n_nodes, edges=graph.n_edges)
+        kernel_sources = graph.new_index[source_idxs]
+        kernel_csr = (graph.indptr, graph.indices, graph.w_sec)
+
     # 3. Call the native kernel
     print(f"[info] Preparing adjacency (transpose for node→anchor times)...")
-    # Use shared CSR transpose utility
-    indptr_rev, indices_rev, w_rev = build_rev_csr(indptr, indices, w_sec)
+    # The cache bundle's digest identifies the full graph in checkpoints and the label cache
+    bundle = GraphBundle(_csr_cache_dir(args.pbf, args.mode))
+    if kernel_csr[0] is indptr:
+        # Full graph: the transpose is cached in the CSR cache bundle
+        indptr_rev, indices_rev, w_rev = bundle.rev_csr()
+    else:
+        indptr_rev, indices_rev, w_rev = build_rev_csr(*kernel_csr)
 
-    print(f"[info] Calling native kernel (bucket K-pass) for k-best search (k={args.k_best}, cutoff={args.cutoff} min, overflow={args.overflow_cutoff} min, threads={args.threads})...")
+    print(f"[info] Calling native kernel ({args.kernel}) for k-best search (k={args.k_best}, cutoff={args.cutoff} min, overflow={args.overflow_cutoff} min, threads={args.threads})...")
     cutoff_primary_s = int(args.cutoff) * 60
     # Allow tuning overflow cutoff to trade accuracy for speed
     cutoff_overflow_s = int(args.overflow_cutoff) * 60
@@ -169,55 +387,142 @@ def main():
                 kb_pbar.refresh()
         kb_pbar.update(1)
 
-    # Important: pass threads=1 by default so the kernel computes all sources in a single pass.
-    # The parallel path partitions sources and repeats graph traversals per chunk, which can be
-    # substantially slower overall despite parallelism.
-    best_src_idx, time_s = kbest_multisource_bucket_csr(
-        indptr_rev, indices_rev, w_rev, source_idxs, K, cutoff_primary_s, cutoff_overflow_s, int(max(1, args.threads)), bool(args.progress), (_kb_cb if args.progress else None)
-    )
+    if args.incremental:
+        if args.fused:
+            raise SystemExit("--incremental works on materialized labels; drop --fused")
+        rows = write_t_hex_incremental(
+            args, indptr, indices, w_sec, indptr_rev, indices_rev, w_rev, anchor_idx, node_h3_by_res, res_used,
+            cutoff_primary_s, cutoff_overflow_s, bundle.digest, report,
+        )
+        if report is not None:
+            report.write()
+        print(f"[ok] wrote {args.out_times}  rows={rows}  (long format, incremental)")
+        return
+
+    if args.fused:
+        print(f"[info] Streaming fused k-best + H3 top-K to {args.out_times} ...")
+        start = time.perf_counter()
+        rows = write_t_hex_streaming(
+            args, indptr_rev, indices_rev, w_rev, source_idxs, anchor_idx, node_h3_by_res, res_used,
+            cutoff_primary_s, cutoff_overflow_s, (_kb_cb if args.progress else None),
+        )
+        if kb_pbar is not None:
+            kb_pbar.close()
+        if report is not None:
+            # The fused stream has no per-kernel counters; record its wall time only
+            report.add("kbest_h3_topk_stream", call_s=time.perf_counter() - start, rows=rows)
+            report.write()
+        print(f"[ok] wrote {args.out_times}  rows={rows}  (long format, streamed, peak RSS {_peak_rss_mb():.0f} MB)")
+        return
+
+    # The chunked kernel partitions sources and repeats graph traversals per chunk, which can be
+    # substantially slower overall than threads=1. The frontier kernel parallelizes within one
+    # shared traversal instead, so it is the one to use with --threads > 1.
+    kbest_fn = kbest_multisource_frontier_csr if args.kernel == "frontier" else kbest_multisource_bucket_csr
+    exact_fn = kbest_fn
+    if report is not None:
+        kbest_fn = report.instrument(kbest_fn.__name__, kbest_fn)
+    if approx:
+        print(f"[info] Approximate k-best: {args.bucket_width_s}s buckets, edge weights rounded {args.round_weights}")
+        kbest_fn = quantized_kernel(kbest_fn, args.bucket_width_s, args.round_weights)
+    checkpoint = None
+    if args.checkpoint_dir:
+        checkpoint = RunCheckpoint(args.checkpoint_dir, {
+            "graph": bundle.digest if kernel_csr[0] is indptr else graph_fingerprint(*kernel_csr),
+            "placement": placement_fingerprint(source_idxs, anchor_idx[source_idxs]),
+            "k": K,
+            "cutoff_primary_s": cutoff_primary_s,
+            "cutoff_overflow_s": cutoff_overflow_s,
+            "kernel": args.kernel,
+            "chunks": int(args.checkpoint_chunks),
+            "res": [int(r) for r in res_used],
+            "agg": args.agg,
+            "bucket_width_s": int(args.bucket_width_s),
+            "round_weights": args.round_weights if approx else None,
+        })
+    start = time.perf_counter()
+    if checkpoint is not None:
+        best_src_idx, time_s = kbest_resumable(
+            kbest_fn, (indptr_rev, indices_rev, w_rev), kernel_sources, K, cutoff_primary_s, cutoff_overflow_s,
+            int(max(1, args.threads)), args.checkpoint_chunks, checkpoint,
+        )
+    else:
+        best_src_idx, time_s = kbest_fn(
+            indptr_rev, indices_rev, w_rev, kernel_sources, K, cutoff_primary_s, cutoff_overflow_s, int(max(1, args.threads)), bool(args.progress), (_kb_cb if args.progress else None)
+        )
     if kb_pbar is not None:
         kb_pbar.close()
+    print(f"[info] k-best: {time.perf_counter() - start:.2f}s over {len(indptr_rev) - 1} nodes / {len(indices_rev)} edges")
+    if args.validate_approx:
+        start = time.perf_counter()
+        if report is not None:
+            exact_fn = report.instrument(f"{exact_fn.__name__}:exact", exact_fn)
+        exact_src, exact_t = exact_fn(
+            indptr_rev, indices_rev, w_rev, kernel_sources, K, cutoff_primary_s, cutoff_overflow_s, int(max(1, args.threads)), False
+        )
+        print(f"[info] Exact k-best for validation: {time.perf_counter() - start:.2f}s")
+        errors = compare_labels(exact_src, exact_t, best_src_idx, time_s)
+        print(f"[info] Approximation error ({args.bucket_width_s}s, {args.round_weights}): {format_comparison(errors)}")
+        if report is not None:
+            report.add("approx_validation", None, bucket_width_s=str(args.bucket_width_s),
+                       round_weights=args.round_weights, errors=errors)
+        del exact_src, exact_t
+    if graph is not None:
+        start = time.perf_counter()
+        best_src_idx, time_s = graph.expand_labels(best_src_idx, time_s, cutoff_overflow_s)
+        print(f"[info] Expanded labels to {len(node_ids)} nodes in {time.perf_counter() - start:.2f}s")
+        if report is not None:
+            report.add("expand_labels", call_s=time.perf_counter() - start)
+    if args.labels_cache and approx:
+        print("[info] Approximate labels are not written to the label cache (it must match an exact run)")
+    elif args.labels_cache:
+        save_label_cache(args.labels_cache, best_src_idx, time_s, anchor_idx, cutoff_primary_s, cutoff_overflow_s,
+                         bundle.digest, args.kernel)
+        print(f"[info] Saved node labels to {args.labels_cache}")
 
     # Map source node indices back to the stable anchor_int_id
     print("[info] Mapping results back to anchor IDs...")
     best_anchor_int = np.where(best_src_idx >= 0, anchor_idx[best_src_idx], -1).astype(np.int32)
 
     # 4. Node->H3 aggregation + per-hex top-K in native Rust
-    print("[info] Aggregating results into H3 hexes (precomputed H3) using native kernel...")
-    h3_id_arr, site_id_arr, time_arr, res_arr = aggregate_h3_topk_precached(
-        node_h3_by_res, best_anchor_int, time_s, np.array(res_used, dtype=np.int32), K, int(UNREACH_U16), os.cpu_count(), False
-    )
-
-    out_df = (
-        pl.DataFrame({
-            "h3_id": np.asarray(h3_id_arr, dtype=np.uint64),
-            "anchor_int_id": np.asarray(site_id_arr, dtype=np.int32),
-            "time_s": np.asarray(time_arr, dtype=np.uint16),
-            "res": np.asarray(res_arr, dtype=np.int32),
-        })
-        .with_columns([
-            pl.lit(args.mode).alias("mode"),
-            pl.lit(SNAPSHOT_TS).alias("snapshot_ts"),
-        ])
-    )
-    print(f"[info] Aggregation complete. Total rows: {len(out_df)}")
+    print(f"[info] Aggregating results into H3 hexes (precomputed H3, {args.agg}) using native kernel...")
+    agg_fn = aggregate_h3_topk_sorted if args.agg == "sort" else aggregate_h3_topk_precached
+    if report is not None:
+        agg_fn = report.instrument(agg_fn.__name__, agg_fn)
+    if checkpoint is None:
+        # arrow=True hands back the Rust-owned column buffers through the Arrow C Data Interface
+        agg_batch = agg_fn(
+            np.ascontiguousarray(node_h3_by_res), best_anchor_int, time_s, np.array(res_used, dtype=np.int32), K, int(UNREACH_U16), os.cpu_count(), False,
+            arrow=True,
+        )
+        batches = [pa.record_batch(agg_batch)]
+        del agg_batch
+    else:
+        # One aggregate per resolution so a restart only redoes the resolutions not yet saved
+        batches = []
+        for ri, res in enumerate(res_used):
+            key = f"agg-r{int(res)}"
+            if not checkpoint.is_done(key):
+                agg_batch = agg_fn(
+                    np.ascontiguousarray(node_h3_by_res[:, [ri]]), best_anchor_int, time_s, np.array([res], dtype=np.int32), K, int(UNREACH_U16), os.cpu_count(), False,
+                    arrow=True,
+                )
+                checkpoint.save_table(key, pa.Table.from_batches([pa.record_batch(agg_batch)]))
+                checkpoint.mark(key)
+                del agg_batch
+            batches.extend(checkpoint.load_table(key).to_batches())
+    del best_src_idx, best_anchor_int, time_s
+    gc.collect()
+
+    table = pa.Table.from_batches([_with_const_columns(b, args) for b in batches])
+    del batches
+    print(f"[info] Aggregation complete. Total rows: {table.num_rows}")
 
     # 5. Save final output
     os.makedirs(os.path.dirname(args.out_times) or ".", exist_ok=True)
 
     print(f"[info] Writing final output to {args.out_times}...")
-    table = out_df.to_arrow()
-
-    metadata = {
-        "source_pbf": os.path.basename(args.pbf),
-        "mode": args.mode,
-        "k_best": str(args.k_best),
-        "cutoff_minutes": str(args.cutoff),
-        "creation_date": SNAPSHOT_TS,
-        "dataset_version": config.DATASET_VERSION,
-    }
-    metadata_bytes = {k: v.encode('utf-8') for k, v in metadata.items()}
-    table = table.replace_schema_metadata(metadata_bytes)
+    table = table.replace_schema_metadata(_t_hex_metadata(args))
 
     pq.write_table(
         table,
@@ -225,7 +530,11 @@ def main():
         compression="zstd",
         use_dictionary=True
     )
-    print(f"[ok] wrote {args.out_times}  rows={len(out_df)}  (long format)")
+    if checkpoint is not None:
+        checkpoint.clear()
+    if report is not None:
+        report.write()
+    print(f"[ok] wrote {args.out_times}  rows={table.num_rows}  (long format, peak RSS {_peak_rss_mb():.0f} MB)")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,89 @@
+"""
+Build the anchor×anchor travel-time matrix used by the D_anchor stages.
+
+One CH bucket many-to-many over the reverse-graph CH (shared with the API's
+ch_graph_rev.bin cache) gives, for every anchor, the seconds to every other anchor
+within the limit. The limit defaults to the largest max_minutes in
+data/taxonomy/d_anchor_limits.json so every brand/category can be answered from
+the matrix. Output is CSR under data/anchor_matrix/<state>_<mode>/ (see
+graph/anchor_matrix.py); 05/06 consume it with --anchor-matrix.
+
+Usage:
+  PY=PYTHONPATH=src .venv/bin/python src/04b_build_anchor_matrix.py \
+    --pbf data/osm/massachusetts.osm.pbf \
+    --anchors data/anchors/massachusetts_drive_sites.parquet \
+    --mode drive --threads 16
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from d_anchor_common import load_d_anchor_limits
+from graph.anchor_matrix import build_anchor_matrix, save_anchor_matrix
+from graph.anchors import build_anchor_mappings
+from graph.bundle import GraphBundle
+from graph.pyrosm_csr import _csr_cache_dir, load_or_build_csr
+
+
+def _max_limit_minutes() -> int:
+    limits = load_d_anchor_limits()
+    minutes = [
+        int(entry.get("max_minutes", 0))
+        for section in ("brand", "category", "_defaults")
+        for entry in limits.get(section, {}).values()
+        if isinstance(entry, dict)
+    ]
+    return max(minutes, default=60)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Build the anchor×anchor sparse travel-time matrix (CH many-to-many)")
+    ap.add_argument("--pbf", required=True)
+    ap.add_argument("--anchors", required=True)
+    ap.add_argument("--mode", required=True, choices=["drive", "walk"])
+    ap.add_argument("--limit-minutes", type=int, default=None, help="Matrix cap (default: max max_minutes across D_anchor limits)")
+    ap.add_argument("--threads", type=int, default=os.cpu_count() or 1)
+    ap.add_argument("--out-dir", default="data/anchor_matrix")
+    args = ap.parse_args()
+
+    limit_min = args.limit_minutes or _max_limit_minutes()
+    limit_s = min(limit_min * 60, 65534)
+    state = os.path.basename(args.pbf).split(".")[0]
+    out_dir = os.path.join(args.out_dir, f"{state}_{args.mode}")
+
+    start = time.perf_counter()
+    node_ids, *_ = load_or_build_csr(args.pbf, args.mode, [8], False)
+    anchors_df = pd.read_parquet(args.anchors)
+    anchor_idx, _ = build_anchor_mappings(anchors_df, node_ids)
+    anchor_nodes = np.flatnonzero(anchor_idx >= 0).astype(np.int32, copy=False)
+    anchor_int_ids = anchor_idx[anchor_nodes].astype(np.int32, copy=False)
+    print(f"[info] Loaded CSR ({len(node_ids)} nodes) and {anchor_nodes.size} anchors in {time.perf_counter() - start:.2f}s")
+
+    ch_start = time.perf_counter()
+    bundle = GraphBundle(_csr_cache_dir(args.pbf, args.mode))
+    ch_rev = bundle.ch("_rev", threads=args.threads, progress=True)
+    print(f"[info] Reverse CH ready in {time.perf_counter() - ch_start:.2f}s")
+
+    m2m_start = time.perf_counter()
+    matrix = build_anchor_matrix(ch_rev, anchor_nodes, anchor_int_ids, limit_s, args.threads)
+    nnz = int(matrix.indices.size)
+    density = nnz / max(1, matrix.n_anchors ** 2)
+    print(
+        f"[info] Many-to-many {matrix.n_anchors}×{matrix.n_anchors} within {limit_s // 60}min: "
+        f"nnz={nnz} ({density:.1%}) in {time.perf_counter() - m2m_start:.2f}s"
+    )
+
+    # Recorded so 05/06 reject the matrix once the graph changes under the same anchors
+    matrix.graph_digest = bundle.digest
+    save_anchor_matrix(matrix, out_dir)
+    size_mb = (matrix.indptr.nbytes + matrix.indices.nbytes + matrix.seconds.nbytes) / 1e6
+    print(f"[ok] wrote {out_dir} ({size_mb:.1f} MB)")
+
+
+if __name__ == "__main__":
+    main()
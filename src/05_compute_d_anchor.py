@@ -19,6 +19,15 @@ Usage:
     --anchors data/anchors/massachusetts_drive_sites.parquet \
     --mode drive --brands-threshold 5
 
+Existing partitions are only recomputed when their inputs changed: each one stores a
+fingerprint (source anchors, limits, graph, anchor placement) in its Parquet metadata,
+and partitions whose only change is new/moved anchors are extended in place instead of
+re-routed (see d_anchor_fingerprint.py). --dry-run prints that plan without computing.
+
+With --anchor-matrix data/anchor_matrix/<state>_drive (see 04b_build_anchor_matrix.py)
+each brand is a masked row-min over the precomputed anchor×anchor matrix instead
+of a routing run; brands whose max_minutes exceed the matrix limit are still routed.
+
 Or target a single brand:
   PY=PYTHONPATH=src .venv/bin/python src/05_compute_d_anchor.py \
     --pbf data/osm/massachusetts.osm.pbf \
@@ -52,8 +61,19 @@ from d_anchor_common import (
     execute_tasks,
     write_empty_shard,
     write_shard,
+    write_matrix_shard,
+    extend_shard,
+    load_matching_anchor_matrix,
     get_entity_limits,
 )
+from d_anchor_fingerprint import (
+    entity_fingerprint,
+    placement_fingerprint,
+    plan_rebuild,
+    print_rebuild_report,
+    prune_placements,
+    save_placement,
+)
 
 SNAPSHOT_TS = time.strftime("%Y-%m-%d")
 
@@ -72,6 +92,7 @@ def _vectorized_write(
     mode_code: int,
     time_s: np.ndarray,
     snapshot_ts: str,
+    fingerprint: Dict[str, object],
 ) -> int:
     # Get limits for this brand
     limits = get_entity_limits("brand", brand_id)
@@ -90,15 +111,16 @@ def _vectorized_write(
         },
         top_k=top_k,
         max_seconds=max_seconds,
+        fingerprint=fingerprint,
     )
 
 
-def _write_empty_brand_shard(out_path: str) -> None:
-    write_empty_shard(out_path, _BRAND_SCHEMA)
+def _write_empty_brand_shard(out_path: str, fingerprint: Dict[str, object]) -> None:
+    write_empty_shard(out_path, _BRAND_SCHEMA, fingerprint)
 
 
-def _compute_one_brand(task: Tuple[str, int, np.ndarray, np.ndarray, str]) -> Tuple[str, str]:
-    brand_id, mode_code, src, targets_idx, out_path = task
+def _compute_one_brand(task: Tuple[str, int, np.ndarray, np.ndarray, str, Dict[str, object]]) -> Tuple[str, str]:
+    brand_id, mode_code, src, targets_idx, out_path, fingerprint = task
 
     # Get limits for this brand
     limits = get_entity_limits("brand", brand_id)
@@ -111,7 +133,7 @@ def _compute_one_brand(task: Tuple[str, int, np.ndarray, np.ndarray, str]) -> Tu
     time_s = compute_times(src, targets_idx, cutoff_primary_s, cutoff_overflow_s)
     sssp_elapsed = time.perf_counter() - sssp_start
     write_start = time.perf_counter()
-    rows = _vectorized_write(out_path, brand_id, mode_code, time_s, SNAPSHOT_TS)
+    rows = _vectorized_write(out_path, brand_id, mode_code, time_s, SNAPSHOT_TS, fingerprint)
     write_elapsed = time.perf_counter() - write_start
     total_elapsed = time.perf_counter() - task_start
     print(
@@ -150,6 +172,8 @@ def main():
     ap.add_argument("--workers", type=int, default=min(8, os.cpu_count() or 1), help="Parallel brand workers (processes)")
     ap.add_argument("--out-dir", default="data/d_anchor_brand")
     ap.add_argument("--force", action="store_true")
+    ap.add_argument("--anchor-matrix", default=None, help="Anchor matrix directory; brands within its limit skip routing")
+    ap.add_argument("--dry-run", action="store_true", help="Report which brands would be rebuilt, extended or skipped, then exit")
     args = ap.parse_args()
 
     max_workers = max(1, int(args.workers))
@@ -232,9 +256,17 @@ def main():
 
     mode_code = 0 if args.mode == "drive" else 2
     out_base = os.path.join(args.out_dir, f"mode={mode_code}")
-    ensure_dir(out_base)
-
-    work: List[Tuple[str, int, np.ndarray, np.ndarray, str]] = []
+    graph_hash = graph_ctx.graph_digest
+    if args.dry_run:
+        targets_hash = placement_fingerprint(anchor_nodes, anchor_int_ids)
+        matrix = None
+    else:
+        ensure_dir(out_base)
+        targets_hash = save_placement(out_base, anchor_nodes, anchor_int_ids)
+        matrix = load_matching_anchor_matrix(args.anchor_matrix, graph_ctx) if args.anchor_matrix else None
+
+    plans: List[Tuple[str, str, List[str]]] = []
+    work: List[Tuple[str, int, np.ndarray, np.ndarray, str, Dict[str, object]]] = []
     for raw in targets:
         canon = str(raw)
         src = brand_to_source_idxs.get(canon, np.array([], dtype=np.int32))
@@ -246,11 +278,42 @@ def main():
               f"max_minutes={limits['max_minutes']}, top_k={limits['top_k']}")
         
         out_dir = os.path.join(out_base, f"brand_id={canon}")
-        ensure_dir(out_dir)
         out_path = os.path.join(out_dir, "part-000.parquet")
+        max_seconds = limits["max_minutes"] * 60
+        fingerprint = entity_fingerprint(src, limits, graph_hash, targets_hash)
+        action, reasons, old_placement = plan_rebuild(out_path, fingerprint, args.force, out_base)
+        plans.append((canon, action, reasons))
+        if args.dry_run:
+            continue
+        if action == "skip":
+            print(f"[skip] D_anchor brand for {canon} is up to date: {out_path}")
+            continue
+        if action == "extend":
+            extend_start = time.perf_counter()
+            rows, routed = extend_shard(
+                out_path,
+                graph_ctx,
+                src,
+                old_placement,
+                SNAPSHOT_TS,
+                _BRAND_SCHEMA,
+                ["anchor_id", "brand_id", "mode", "snapshot_ts"],
+                lambda size, canon=canon: {
+                    "brand_id": [canon] * size,
+                    "mode": np.full(size, mode_code, dtype=np.uint8),
+                },
+                max_seconds,
+                fingerprint,
+                kernel_threads,
+            )
+            print(f"[ok] Extended D_anchor brand '{canon}' with {routed} new/moved anchors: {out_path} rows={rows} "
+                  f"took={time.perf_counter() - extend_start:.3f}s")
+            continue
+
+        ensure_dir(out_dir)
         if src.size == 0:
             print(f"[warn] No source nodes for brand={canon}; writing empty.")
-            _write_empty_brand_shard(out_path)
+            _write_empty_brand_shard(out_path, fingerprint)
             continue
 
         build_targets_start = time.perf_counter()
@@ -264,15 +327,34 @@ def main():
         )
         if targets_idx.size == 0:
             print(f"[warn] No target nodes for brand={canon}; writing empty.")
-            _write_empty_brand_shard(out_path)
+            _write_empty_brand_shard(out_path, fingerprint)
             continue
 
-        # Skip if exists unless forced (simple existence check, no timestamp comparison)
-        if (not args.force) and os.path.exists(out_path):
-            print(f"[skip] D_anchor brand for {canon} already exists: {out_path}")
+        if matrix is not None and max_seconds <= matrix.limit_s:
+            lookup_start = time.perf_counter()
+            rows = write_matrix_shard(
+                out_path,
+                matrix,
+                src,
+                SNAPSHOT_TS,
+                _BRAND_SCHEMA,
+                ["anchor_id", "brand_id", "mode", "snapshot_ts"],
+                lambda size, canon=canon: {
+                    "brand_id": [canon] * size,
+                    "mode": np.full(size, mode_code, dtype=np.uint8),
+                },
+                max_seconds,
+                fingerprint,
+            )
+            print(f"[ok] Wrote D_anchor brand '{canon}' from anchor matrix: {out_path} rows={rows} "
+                  f"took={time.perf_counter() - lookup_start:.3f}s")
             continue
 
-        work.append((canon, mode_code, src, targets_idx, out_path))
+        work.append((canon, mode_code, src, targets_idx, out_path, fingerprint))
+
+    if args.dry_run:
+        print_rebuild_report("brand", plans)
+        return
 
     execute_tasks(
         work,
@@ -282,6 +364,7 @@ def main():
         _compute_one_brand,
         describe=lambda task: f"Brand '{task[0]}'",
     )
+    prune_placements(out_base, "brand_id=")
 
 
 if __name__ == "__main__":
@@ -16,11 +16,31 @@ Columns:
 Also writes a convenience label map at data/taxonomy/category_labels.json
 mapping string ids to human-friendly labels, if possible.
 
+With --multi-label every scheduled category is routed in one native call
+(t_hex.nearest_multilabel_csr: one bucket-queue traversal per 64 categories,
+per-category cutoffs from d_anchor_limits.json) instead of one k=1 search per
+category shard; outputs are identical. With --anchor-matrix each category within
+the matrix limit is a masked row-min over the precomputed anchor×anchor matrix
+(04b_build_anchor_matrix.py) and needs no routing at all.
+
+As in 05, partitions carry an input fingerprint in their Parquet metadata: only
+categories whose source anchors, limits or graph changed are recomputed, ones that
+only gained or moved anchors are extended in place, and --dry-run reports the plan.
+
+Runs are resumable: each routed category shard is spooled to
+<mode dir>/_checkpoint/category_id=<id>/ (keyed by the category fingerprint) and the
+partition is written as soon as its last shard lands; --multi-label writes its
+partitions after every batch of categories. A restart after an interruption only
+routes the shards and categories that are still missing.
+
+--report PATH writes a JSON report of the native kernel counters of every routed
+shard (see kernel_report.py); multi-label batches are recorded with wall time only.
+
 Usage:
   PY=PYTHONPATH=src .venv/bin/python src/06_compute_d_anchor_category.py \
     --pbf data/osm/massachusetts.osm.pbf \
     --anchors data/anchors/massachusetts_drive_sites.parquet \
-    --mode drive
+    --mode drive [--multi-label]
 """
 from __future__ import annotations
 import argparse
@@ -30,7 +50,7 @@ import sys
 import time
 from collections import defaultdict
 from pathlib import Path
-from typing import Any, Dict, List, Tuple
+from typing import Any, Dict, List, Optional, Tuple
 
 # Ensure taxonomy helpers are importable when script is run via Make
 PROJECT_ROOT = Path(__file__).resolve().parents[1]
@@ -52,8 +72,27 @@ from d_anchor_common import (
     execute_tasks,
     write_empty_shard,
     build_shard_frame,
+    build_anchor_times_frame,
+    compute_times_multilabel,
+    write_frame,
+    write_matrix_shard,
+    extend_shard,
+    load_matching_anchor_matrix,
     get_entity_limits,
 )
+from d_anchor_fingerprint import (
+    entity_fingerprint,
+    placement_fingerprint,
+    plan_rebuild,
+    print_rebuild_report,
+    prune_placements,
+    save_placement,
+)
+from run_checkpoint import RunCheckpoint
+from kernel_report import RunReport
+
+_CHECKPOINT_DIR = "_checkpoint"
+_MULTI_LABEL_BATCH = 64
 def _normalize_label(s: str) -> str:
     # Minimal prettifier for labels
     return (str(s) if s is not None else "").strip().replace("_", " ").title()
@@ -68,8 +107,8 @@ _CATEGORY_SCHEMA: Dict[str, pl.DataType] = {
 }
 
 
-def _write_empty_category_shard(out_path: str) -> None:
-    write_empty_shard(out_path, _CATEGORY_SCHEMA)
+def _write_empty_category_shard(out_path: str, fingerprint: Dict[str, object]) -> None:
+    write_empty_shard(out_path, _CATEGORY_SCHEMA, fingerprint)
 
 
 def _split_sources(src: np.ndarray, desired_shards: int) -> List[np.ndarray]:
@@ -92,7 +131,7 @@ def _decode_frame(payload: bytes) -> pl.DataFrame:
 
 def _compute_category_shard(
     task: Tuple[int, str, int, np.ndarray, np.ndarray, int, int, int, int]
-) -> Tuple[int, str, int, int, bytes, int]:
+) -> Tuple[int, str, int, int, bytes, int, Dict[str, Any]]:
     (
         cid,
         label,
@@ -109,7 +148,7 @@ def _compute_category_shard(
 
     task_start = time.perf_counter()
     sssp_start = time.perf_counter()
-    time_s = compute_times(src, targets_idx, cutoff_primary_s, cutoff_overflow_s)
+    time_s, kernel_stats = compute_times(src, targets_idx, cutoff_primary_s, cutoff_overflow_s, stats=True)
     sssp_elapsed = time.perf_counter() - sssp_start
 
     encode_start = time.perf_counter()
@@ -134,7 +173,128 @@ def _compute_category_shard(
         f"rows={rows} sssp={sssp_elapsed:.2f}s encode={encode_elapsed:.2f}s total={total_elapsed:.2f}s "
         f"max_minutes={cutoff_primary_s // 60} top_k={top_k}"
     )
-    return cid, label, shard_idx, shard_count, payload, rows
+    timings = {"call_s": sssp_elapsed, "encode_s": encode_elapsed}
+    return cid, label, shard_idx, shard_count, payload, rows, {**(kernel_stats or {}), **timings}
+
+
+def _run_multi_label(
+    plans: List[Tuple[int, str, str, np.ndarray, int, Dict[str, object]]],
+    graph_ctx,
+    mode_code: int,
+    threads: int,
+    report: Optional[RunReport] = None,
+) -> None:
+    """
+    Route the planned categories with the multi-label kernel and write one partition per category.
+
+    Categories go in batches of 64 labels per thread and each batch is written before the next is
+    routed, so an interrupted run keeps the finished partitions (their fingerprints skip them).
+    """
+    batch_size = _MULTI_LABEL_BATCH * max(1, int(threads))
+    for lo in range(0, len(plans), batch_size):
+        batch = plans[lo:lo + batch_size]
+        sssp_start = time.perf_counter()
+        times = compute_times_multilabel(
+            graph_ctx,
+            [plan[3] for plan in batch],
+            [plan[4] for plan in batch],
+            threads,
+        )
+        if report is not None:
+            report.add("nearest_multilabel_csr", call_s=time.perf_counter() - sssp_start, labels_routed=len(batch))
+        print(
+            f"[ok] Multi-label routing for {len(batch)} categories ({lo + len(batch)}/{len(plans)}) over "
+            f"{graph_ctx.anchor_nodes.size} anchors took {time.perf_counter() - sssp_start:.2f}s (threads={threads})"
+        )
+        for j, (cid, label, out_path, _src, max_seconds, fingerprint) in enumerate(batch):
+            df = build_anchor_times_frame(
+                graph_ctx.anchor_int_ids,
+                times[:, j],
+                SNAPSHOT_TS,
+                _CATEGORY_SCHEMA,
+                ["anchor_id", "category_id", "mode", "snapshot_ts"],
+                lambda size, cid=cid: {
+                    "category_id": np.full(size, cid, dtype=np.uint32),
+                    "mode": np.full(size, mode_code, dtype=np.uint8),
+                },
+                max_seconds,
+            )
+            write_frame(out_path, df, fingerprint)
+            print(f"[ok] Wrote D_anchor category id={cid} label='{label}' rows={df.height} output={out_path}")
+
+
+def _shard_key(shard_idx: int) -> str:
+    return f"shard-{shard_idx}"
+
+
+def _write_checkpointed_category(cid: int, meta: Dict[str, Any]) -> None:
+    """Merge a category's spooled shards into its partition and drop the checkpoint."""
+    checkpoint: RunCheckpoint = meta["checkpoint"]
+    frames = [pl.from_arrow(checkpoint.load_table(_shard_key(i))) for i in range(meta["shards"])]
+    combined = frames[0] if len(frames) == 1 else pl.concat(frames, how="vertical")
+    deduped = (
+        # Shards spooled by an earlier run may carry an older snapshot date
+        combined.with_columns(pl.col("snapshot_ts").max())
+        .group_by(["anchor_id", "category_id", "mode", "snapshot_ts"])
+        .agg(pl.col("seconds_u16").min())
+        .select(list(_CATEGORY_SCHEMA.keys()))
+    )
+    write_frame(meta["out_path"], deduped, meta["fingerprint"])
+    checkpoint.clear()
+    print(
+        f"[ok] Wrote D_anchor category id={cid} label='{meta['label']}' "
+        f"rows={deduped.height} shards={meta['shards']} output={meta['out_path']}"
+    )
+
+
+def _category_complete(meta: Dict[str, Any]) -> bool:
+    return all(meta["checkpoint"].is_done(_shard_key(i)) for i in range(meta["shards"]))
+
+
+def _run_sharded(
+    work: List[Tuple[int, str, int, np.ndarray, np.ndarray, int, int, int, int]],
+    category_plans: Dict[int, Dict[str, Any]],
+    graph_ctx,
+    kernel_threads: int,
+    max_workers: int,
+    report: Optional[RunReport] = None,
+) -> None:
+    """
+    Route category shards in worker processes. Each finished shard is spooled to the category's
+    checkpoint and the partition is written as soon as all of its shards are in.
+    """
+    def _on_result(result) -> None:
+        cid, label, shard_idx, shard_count, payload, rows, shard_stats = result
+        if report is not None:
+            report.add("kbest_multisource_bucket_csr", shard_stats, category_id=str(cid), shard=f"{shard_idx + 1}/{shard_count}")
+        meta = category_plans[cid]
+        try:
+            frame = _decode_frame(payload)
+        except Exception as exc:
+            print(f"[error] Failed to decode shard result for category id={cid} shard={shard_idx + 1}: {exc}")
+            return
+        meta["checkpoint"].save_table(_shard_key(shard_idx), frame.to_arrow())
+        meta["checkpoint"].mark(_shard_key(shard_idx), rows=int(rows))
+        if _category_complete(meta):
+            _write_checkpointed_category(cid, meta)
+
+    execute_tasks(
+        work,
+        graph_ctx,
+        kernel_threads,
+        max_workers,
+        _compute_category_shard,
+        describe=lambda task: f"Category id={task[0]} shard={task[5] + 1}/{task[6]} label='{task[1]}'",
+        on_result=_on_result,
+    )
+
+    for cid, meta in category_plans.items():
+        if meta["checkpoint"].done and not _category_complete(meta):
+            done = sum(meta["checkpoint"].is_done(_shard_key(i)) for i in range(meta["shards"]))
+            print(
+                f"[warn] Category id={cid} has {done}/{meta['shards']} shards; partition not written. "
+                f"Rerun to route the missing shards (checkpoint: {meta['checkpoint'].directory})."
+            )
 
 
 def main():
@@ -153,10 +313,16 @@ def main():
     ap.add_argument("--categories-csv", default="data/taxonomy/POI_category_registry.csv", help="Path to categories CSV with explicit numeric IDs")
     ap.add_argument("--force", action="store_true")
     ap.add_argument("--prune", action="store_true", help="Remove existing category partitions not in current targets")
+    ap.add_argument("--multi-label", action="store_true",
+                    help="Route all categories together with the native multi-label kernel (uses --threads, ignores --workers/--category-shards)")
+    ap.add_argument("--anchor-matrix", default=None, help="Anchor matrix directory; categories within its limit skip routing")
+    ap.add_argument("--dry-run", action="store_true", help="Report which categories would be rebuilt, extended or skipped, then exit")
+    ap.add_argument("--report", default=None, help="Write a JSON report of native kernel stats for the routed shards")
     args = ap.parse_args()
 
     max_workers = max(1, int(args.workers))
     kernel_threads = max(1, int(args.threads))
+    multi_label_threads = kernel_threads
     if max_workers > 1 and kernel_threads > 1:
         print(
             f"[debug] Reducing kernel threads from {kernel_threads} to 1 to avoid oversubscription with {max_workers} workers"
@@ -268,10 +434,11 @@ def main():
 
     mode_code = 0 if args.mode == "drive" else 2
     out_base = os.path.join(args.out_dir, f"mode={mode_code}")
-    ensure_dir(out_base)
+    if not args.dry_run:
+        ensure_dir(out_base)
 
     # Optionally prune any existing category partitions not targeted
-    if args.prune:
+    if args.prune and not args.dry_run:
         try:
             wanted_cids = set(label_to_id.values())
             for name in os.listdir(out_base):
@@ -288,7 +455,16 @@ def main():
         except Exception as e:
             print(f"[warn] prune step failed: {e}")
 
+    graph_hash = graph_ctx.graph_digest
+    if args.dry_run:
+        targets_hash = placement_fingerprint(anchor_nodes, anchor_int_ids)
+        matrix = None
+    else:
+        targets_hash = save_placement(out_base, anchor_nodes, anchor_int_ids)
+        matrix = load_matching_anchor_matrix(args.anchor_matrix, graph_ctx) if args.anchor_matrix else None
+    plans: List[Tuple[str, str, List[str]]] = []
     category_plans: Dict[int, Dict[str, Any]] = {}
+    multi_plans: List[Tuple[int, str, str, np.ndarray, int, Dict[str, object]]] = []
     work: List[Tuple[int, str, int, np.ndarray, np.ndarray, int, int, int, int]] = []
     for label in targets:
         cid = label_to_id[label]
@@ -301,22 +477,68 @@ def main():
               f"max_minutes={limits['max_minutes']}, top_k={limits['top_k']}")
 
         out_dir = os.path.join(out_base, f"category_id={cid}")
-        ensure_dir(out_dir)
         out_path = os.path.join(out_dir, "part-000.parquet")
-
-        # Skip if exists unless forced (simple existence check, no timestamp comparison)
-        if (not args.force) and os.path.exists(out_path):
-            print(f"[skip] D_anchor category for id={cid} already exists: {out_path}")
+        max_seconds = limits["max_minutes"] * 60
+        top_k = limits["top_k"]
+        fingerprint = entity_fingerprint(src, limits, graph_hash, targets_hash)
+        action, reasons, old_placement = plan_rebuild(out_path, fingerprint, args.force, out_base)
+        plans.append((f"{label} (id={cid})", action, reasons))
+        if args.dry_run:
+            continue
+        if action == "skip":
+            print(f"[skip] D_anchor category for id={cid} is up to date: {out_path}")
+            continue
+        if action == "extend":
+            extend_start = time.perf_counter()
+            rows, routed = extend_shard(
+                out_path,
+                graph_ctx,
+                src,
+                old_placement,
+                SNAPSHOT_TS,
+                _CATEGORY_SCHEMA,
+                ["anchor_id", "category_id", "mode", "snapshot_ts"],
+                lambda size, cid=cid: {
+                    "category_id": np.full(size, cid, dtype=np.uint32),
+                    "mode": np.full(size, mode_code, dtype=np.uint8),
+                },
+                max_seconds,
+                fingerprint,
+                multi_label_threads,
+            )
+            print(f"[ok] Extended D_anchor category id={cid} label='{label}' with {routed} new/moved anchors "
+                  f"rows={rows} took={time.perf_counter() - extend_start:.3f}s output={out_path}")
             continue
 
+        ensure_dir(out_dir)
         if src.size == 0:
             print(f"[warn] No source nodes for category id={cid}; writing empty.")
-            _write_empty_category_shard(out_path)
+            _write_empty_category_shard(out_path, fingerprint)
             continue
 
-        limits = get_entity_limits("category", label)
-        max_seconds = limits["max_minutes"] * 60
-        top_k = limits["top_k"]
+        if matrix is not None and max_seconds <= matrix.limit_s:
+            lookup_start = time.perf_counter()
+            rows = write_matrix_shard(
+                out_path,
+                matrix,
+                src,
+                SNAPSHOT_TS,
+                _CATEGORY_SCHEMA,
+                ["anchor_id", "category_id", "mode", "snapshot_ts"],
+                lambda size, cid=cid: {
+                    "category_id": np.full(size, cid, dtype=np.uint32),
+                    "mode": np.full(size, mode_code, dtype=np.uint8),
+                },
+                max_seconds,
+                fingerprint,
+            )
+            print(f"[ok] Wrote D_anchor category id={cid} label='{label}' from anchor matrix rows={rows} "
+                  f"took={time.perf_counter() - lookup_start:.3f}s output={out_path}")
+            continue
+
+        if args.multi_label:
+            multi_plans.append((cid, label, out_path, src, max_seconds, fingerprint))
+            continue
 
         shards = _split_sources(src, args.category_shards)
         shard_payloads: List[Tuple[np.ndarray, np.ndarray]] = []
@@ -338,16 +560,30 @@ def main():
 
         if not shard_payloads:
             print(f"[warn] No runnable shards for category id={cid}; writing empty.")
-            _write_empty_category_shard(out_path)
+            _write_empty_category_shard(out_path, fingerprint)
             continue
 
+        checkpoint = RunCheckpoint(
+            os.path.join(out_base, _CHECKPOINT_DIR, f"category_id={cid}"),
+            {"fingerprint": fingerprint, "shards": len(shard_payloads)},
+        )
         category_plans[cid] = {
             "label": label,
             "out_path": out_path,
             "shards": len(shard_payloads),
+            "fingerprint": fingerprint,
+            "checkpoint": checkpoint,
         }
+        if _category_complete(category_plans[cid]):
+            print(f"[checkpoint] All {len(shard_payloads)} shards of category id={cid} were already routed")
+            _write_checkpointed_category(cid, category_plans.pop(cid))
+            continue
+        if checkpoint.done:
+            print(f"[checkpoint] Resuming category id={cid}: {len(checkpoint.done)}/{len(shard_payloads)} shards already routed")
 
         for shard_idx, (shard_src, targets_idx) in enumerate(shard_payloads):
+            if checkpoint.is_done(_shard_key(shard_idx)):
+                continue
             work.append(
                 (
                     cid,
@@ -362,54 +598,20 @@ def main():
                 )
             )
 
-    if not work:
-        print("[info] No category shards scheduled; exiting.")
+    if args.dry_run:
+        print_rebuild_report("category", plans)
         return
 
-    shard_results = execute_tasks(
-        work,
-        graph_ctx,
-        kernel_threads,
-        max_workers,
-        _compute_category_shard,
-        describe=lambda task: f"Category id={task[0]} shard={task[5] + 1}/{task[6]} label='{task[1]}'",
-    )
-
-    shard_frames: Dict[int, List[pl.DataFrame]] = defaultdict(list)
-    for result in shard_results:
-        if not result:
-            continue
-        cid, label, shard_idx, shard_count, payload, rows = result
-        try:
-            frame = _decode_frame(payload)
-        except Exception as exc:
-            print(f"[error] Failed to decode shard result for category id={cid} shard={shard_idx + 1}: {exc}")
-            continue
-        shard_frames[cid].append(frame)
-
-    for cid, meta in category_plans.items():
-        frames = shard_frames.get(cid, [])
-        if len(frames) != meta["shards"]:
-            print(
-                f"[warn] Expected {meta['shards']} shards for category id={cid} but received {len(frames)}; "
-                "output may be incomplete."
-            )
-        if not frames:
-            _write_empty_category_shard(meta["out_path"])
-            continue
-        combined = frames[0] if len(frames) == 1 else pl.concat(frames, how="vertical")
-        deduped = (
-            combined.group_by(["anchor_id", "category_id", "mode", "snapshot_ts"])
-            .agg(pl.col("seconds_u16").min())
-            .select(list(_CATEGORY_SCHEMA.keys()))
-        )
-        tmp_path = meta["out_path"] + ".tmp"
-        deduped.write_parquet(tmp_path, compression="zstd", statistics=True, row_group_size=128_000)
-        os.replace(tmp_path, meta["out_path"])
-        print(
-            f"[ok] Wrote D_anchor category id={cid} label='{meta['label']}' "
-            f"rows={deduped.height} shards={meta['shards']} output={meta['out_path']}"
-        )
+    report = RunReport(args.report, "06_compute_d_anchor_category", vars(args)) if args.report else None
+    if multi_plans:
+        _run_multi_label(multi_plans, graph_ctx, mode_code, multi_label_threads, report)
+    elif work:
+        _run_sharded(work, category_plans, graph_ctx, kernel_threads, max_workers, report)
+    else:
+        print("[info] No category shards scheduled.")
+    prune_placements(out_base, "category_id=")
+    if report is not None:
+        report.write()
 
 
 if __name__ == "__main__":
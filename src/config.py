@@ -27,11 +27,17 @@ GRAPH_CONFIG = {
         "network_type": "drive",
         "retain_all": False,
         "simplify": False,
+        # CSR cache node numbering: None (pyrosm order), "hilbert" or "rcm" (see graph/reorder.py)
+        "node_order": None,
+        # Drop weakly connected components smaller than this from the CSR cache (None keeps all; see graph/islands.py)
+        "min_component_nodes": None,
     },
     "walk": {
         "network_type": "walk",
         "retain_all": False,
         "simplify": False,
+        "node_order": None,
+        "min_component_nodes": None,
     }
 }
 
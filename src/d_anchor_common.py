@@ -12,10 +12,12 @@ from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
 import numpy as np
 import polars as pl
 
-from graph.pyrosm_csr import load_or_build_csr
-from graph.csr_utils import build_rev_csr
+from graph.pyrosm_csr import _csr_cache_dir, load_or_build_csr
+from graph.bundle import GraphBundle
 from graph.anchors import build_anchor_mappings
-from t_hex import kbest_multisource_bucket_csr, weakly_connected_components
+from d_anchor_fingerprint import MATRIX_TIMES, added_anchor_mask, fingerprint_metadata
+from kernel_report import call_with_stats
+from t_hex import kbest_multisource_bucket_csr, nearest_multilabel_csr
 
 _G: Dict[str, Any] = {}
 _LIMITS: Optional[Dict[str, Any]] = None
@@ -95,6 +97,7 @@ class GraphContext:
     indices_rev: np.ndarray
     w_rev: np.ndarray
     node_count: int
+    graph_digest: str  # GraphBundle.digest of the forward CSR
 
     def worker_arrays(self) -> Dict[str, np.ndarray]:
         return {
@@ -144,8 +147,10 @@ def build_graph_context(pbf_path: str, mode: str, anchors_df) -> GraphContext:
     anchor_nodes = np.flatnonzero(anchor_idx >= 0).astype(np.int32, copy=False)
     anchor_int_ids = anchor_idx[anchor_nodes].astype(np.int32, copy=False)
 
-    indptr_rev, indices_rev, w_rev = build_rev_csr(indptr, indices, w_sec)
-    comp_id = weakly_connected_components(indptr, indices, indptr_rev, indices_rev)
+    # Reverse CSR and component ids come from the cache bundle (built once per graph)
+    bundle = GraphBundle(_csr_cache_dir(pbf_path, mode))
+    indptr_rev, indices_rev, w_rev = bundle.rev_csr()
+    comp_id = bundle.components()
     anchor_comp_ids = comp_id[anchor_nodes]
 
     comp_lists: Dict[int, List[int]] = defaultdict(list)
@@ -163,6 +168,7 @@ def build_graph_context(pbf_path: str, mode: str, anchors_df) -> GraphContext:
         indices_rev=indices_rev,
         w_rev=w_rev,
         node_count=len(node_ids),
+        graph_digest=bundle.digest,
     )
 
 
@@ -171,11 +177,23 @@ def compute_times(
     targets_idx: np.ndarray,
     cutoff_primary_s: int,
     cutoff_overflow_s: int,
-) -> np.ndarray:
+    stats: bool = False,
+):
+    """
+    k=1 node times from the nearest of `src` (in a worker set up by `init_graph_worker`).
+
+    Returns the [N,1] uint16 times, or (times, kernel stats dict or None) with `stats=True`.
+    """
     indptr_rev = _G["indptr_rev"]
     indices_rev = _G["indices_rev"]
     w_rev = _G["w_rev"]
     threads = max(1, int(_G.get("threads", 1)))
+    if stats:
+        (_best_src_idx, time_s), kernel_stats = call_with_stats(
+            kbest_multisource_bucket_csr,
+            indptr_rev, indices_rev, w_rev, src, 1, cutoff_primary_s, cutoff_overflow_s, threads, False, None, targets_idx,
+        )
+        return time_s, kernel_stats
     _best_src_idx, time_s = kbest_multisource_bucket_csr(
         indptr_rev,
         indices_rev,
@@ -192,12 +210,19 @@ def compute_times(
     return time_s
 
 
-def write_empty_shard(out_path: str, schema: Dict[str, pl.DataType]) -> int:
-    df = empty_frame(schema)
+def write_frame(out_path: str, df: pl.DataFrame, fingerprint: Optional[Dict[str, Any]] = None) -> int:
+    """Atomically write a shard frame, recording its input fingerprint in the Parquet metadata."""
     tmp_path = out_path + ".tmp"
-    df.write_parquet(tmp_path, compression="zstd", statistics=True, row_group_size=128_000)
+    df.write_parquet(
+        tmp_path, compression="zstd", statistics=True, row_group_size=128_000,
+        metadata=fingerprint_metadata(fingerprint),
+    )
     os.replace(tmp_path, out_path)
-    return 0
+    return df.height
+
+
+def write_empty_shard(out_path: str, schema: Dict[str, pl.DataType], fingerprint: Optional[Dict[str, Any]] = None) -> int:
+    return write_frame(out_path, empty_frame(schema), fingerprint)
 
 
 def build_shard_frame(
@@ -240,13 +265,31 @@ def build_shard_frame(
         rows_anchor_id.append(int(anchor_id))
         rows_seconds.append(int(valid_distances[0]))
 
-    if not rows_anchor_id:
+    return _frame_from_rows(
+        np.array(rows_anchor_id, dtype=np.uint32),
+        np.array(rows_seconds, dtype=np.int32),
+        snapshot_ts,
+        schema,
+        dedupe_keys,
+        extra_builder,
+    )
+
+
+def _frame_from_rows(
+    anchor_ids: np.ndarray,
+    seconds: np.ndarray,
+    snapshot_ts: str,
+    schema: Dict[str, pl.DataType],
+    dedupe_keys: Iterable[str],
+    extra_builder: Callable[[int], Dict[str, Any]],
+) -> pl.DataFrame:
+    if anchor_ids.size == 0:
         return empty_frame(schema)
 
-    size = len(rows_anchor_id)
+    size = int(anchor_ids.size)
     columns: Dict[str, Any] = {
-        "anchor_id": pl.Series("anchor_id", np.array(rows_anchor_id, dtype=np.uint32), dtype=pl.UInt32),
-        "_seconds_raw": pl.Series("_seconds_raw", np.array(rows_seconds, dtype=np.int32), dtype=pl.Int32),
+        "anchor_id": pl.Series("anchor_id", anchor_ids.astype(np.uint32, copy=False), dtype=pl.UInt32),
+        "_seconds_raw": pl.Series("_seconds_raw", seconds.astype(np.int32, copy=False), dtype=pl.Int32),
         "snapshot_ts": pl.Series([snapshot_ts] * size, dtype=pl.Utf8).str.to_date(),
     }
     extra_cols = extra_builder(size)
@@ -274,6 +317,152 @@ def build_shard_frame(
     return df
 
 
+def compute_times_multilabel(
+    graph_ctx: GraphContext,
+    label_sources: List[np.ndarray],
+    cutoffs_s: List[int],
+    threads: int,
+    progress: bool = False,
+) -> np.ndarray:
+    """
+    Nearest-source seconds from every anchor node for many labels in one native call.
+
+    Column j equals `compute_times(label_sources[j], ..., cutoffs_s[j], cutoffs_s[j])` restricted
+    to `graph_ctx.anchor_nodes`. Returns [len(anchor_nodes), len(label_sources)] uint16
+    (65535 = unreachable within that label's cutoff).
+    """
+    counts = np.array([src.size for src in label_sources], dtype=np.int64)
+    label_indptr = np.zeros(len(label_sources) + 1, dtype=np.int64)
+    np.cumsum(counts, out=label_indptr[1:])
+    flat = (
+        np.concatenate(label_sources).astype(np.int32, copy=False)
+        if label_sources else np.empty(0, dtype=np.int32)
+    )
+    return nearest_multilabel_csr(
+        graph_ctx.indptr_rev,
+        graph_ctx.indices_rev,
+        graph_ctx.w_rev,
+        label_indptr,
+        flat,
+        np.asarray(cutoffs_s, dtype=np.uint16),
+        graph_ctx.anchor_nodes,
+        max(1, int(threads)),
+        progress,
+    )
+
+
+def build_anchor_times_frame(
+    anchor_ids: np.ndarray,
+    seconds: np.ndarray,
+    snapshot_ts: str,
+    schema: Dict[str, pl.DataType],
+    dedupe_keys: Iterable[str],
+    extra_builder: Callable[[int], Dict[str, Any]],
+    max_seconds: int,
+) -> pl.DataFrame:
+    """Shard frame from one per-anchor seconds column (e.g. a column of `compute_times_multilabel`)."""
+    seconds = np.asarray(seconds).astype(np.int32, copy=False)
+    keep = seconds <= int(max_seconds)
+    return _frame_from_rows(anchor_ids[keep], seconds[keep], snapshot_ts, schema, dedupe_keys, extra_builder)
+
+
+def load_matching_anchor_matrix(matrix_dir: str, graph_ctx: GraphContext):
+    """Load an anchor×anchor matrix built for this graph and its anchors, or None if missing/stale."""
+    from graph.anchor_matrix import load_anchor_matrix
+
+    matrix = load_anchor_matrix(matrix_dir)
+    if matrix is None:
+        print(f"[warn] No anchor matrix at {matrix_dir}; routing every entity.")
+        return None
+    if not (
+        np.array_equal(matrix.anchor_nodes, graph_ctx.anchor_nodes)
+        and np.array_equal(matrix.anchor_int_ids, graph_ctx.anchor_int_ids)
+    ):
+        print(f"[warn] Anchor matrix at {matrix_dir} was built for different anchors; routing every entity.")
+        return None
+    if matrix.graph_digest != graph_ctx.graph_digest:
+        print(f"[warn] Anchor matrix at {matrix_dir} was built for a different graph; routing every entity.")
+        return None
+    print(
+        f"[info] Using anchor matrix {matrix_dir}: anchors={matrix.n_anchors} nnz={matrix.indices.size} "
+        f"limit={matrix.limit_s // 60}min"
+    )
+    return matrix
+
+
+def write_matrix_shard(
+    out_path: str,
+    matrix,
+    src: np.ndarray,
+    snapshot_ts: str,
+    schema: Dict[str, pl.DataType],
+    dedupe_keys: Iterable[str],
+    extra_builder: Callable[[int], Dict[str, Any]],
+    max_seconds: int,
+    fingerprint: Optional[Dict[str, Any]] = None,
+) -> int:
+    """
+    Write a D_anchor shard from the anchor matrix (masked row-min over `src` anchors) instead of routing.
+
+    The fingerprint is marked as matrix-built so a later placement change rebuilds the shard
+    rather than extending it with routed rows.
+    """
+    seconds = matrix.masked_row_min(matrix.positions_of(src), max_seconds)
+    df = build_anchor_times_frame(
+        np.asarray(matrix.anchor_int_ids), seconds, snapshot_ts, schema, dedupe_keys, extra_builder, max_seconds
+    )
+    return write_frame(out_path, df, {**fingerprint, "times": MATRIX_TIMES} if fingerprint is not None else None)
+
+
+def extend_shard(
+    out_path: str,
+    graph_ctx: GraphContext,
+    src: np.ndarray,
+    old_placement: Tuple[np.ndarray, np.ndarray],
+    snapshot_ts: str,
+    schema: Dict[str, pl.DataType],
+    dedupe_keys: Iterable[str],
+    extra_builder: Callable[[int], Dict[str, Any]],
+    max_seconds: int,
+    fingerprint: Dict[str, Any],
+    threads: int = 1,
+) -> Tuple[int, int]:
+    """
+    Bring a shard up to date after anchors were added or moved, without re-routing the rest.
+
+    Sources, limits and graph are unchanged (see d_anchor_fingerprint.plan_rebuild), so rows of
+    anchors that kept their node are still exact. Rows of anchors that left or moved are dropped
+    and only the new (node, anchor) pairs are routed with the same bucket kernel as a full build,
+    with early stop on just those targets. Matrix-built shards are never extended, so every row
+    comes from the CSR. Returns (rows written, anchors routed).
+    """
+    is_new = added_anchor_mask(old_placement, graph_ctx.anchor_nodes, graph_ctx.anchor_int_ids)
+    added = np.flatnonzero(is_new)
+    new_ids = graph_ctx.anchor_int_ids[added]
+    seconds = np.full(added.size, 65535, dtype=np.uint16)
+    if added.size and src.size:
+        new_nodes = graph_ctx.anchor_nodes[added]
+        reachable = np.isin(graph_ctx.comp_id[new_nodes], np.unique(graph_ctx.comp_id[src]))
+        if reachable.any():
+            _best, time_s = kbest_multisource_bucket_csr(
+                graph_ctx.indptr_rev, graph_ctx.indices_rev, graph_ctx.w_rev, src, 1,
+                int(max_seconds), int(max_seconds), max(1, int(threads)), False, None,
+                new_nodes[reachable],
+            )
+            seconds[reachable] = np.asarray(time_s)[new_nodes[reachable], 0]
+    fresh = build_anchor_times_frame(new_ids, seconds, snapshot_ts, schema, dedupe_keys, extra_builder, max_seconds)
+
+    kept_ids = graph_ctx.anchor_int_ids[~is_new]
+    kept = (
+        pl.read_parquet(out_path)
+        .filter(pl.col("anchor_id").is_in(kept_ids.astype(np.uint32).tolist()))
+        .with_columns(pl.lit(snapshot_ts).str.to_date().alias("snapshot_ts"))
+        .select(list(schema.keys()))
+    )
+    df = pl.concat([kept, fresh.select(list(schema.keys()))], how="vertical")
+    return write_frame(out_path, df, fingerprint), int(added.size)
+
+
 def write_shard(
     out_path: str,
     time_s: np.ndarray,
@@ -283,6 +472,7 @@ def write_shard(
     extra_builder: Callable[[int], Dict[str, Any]],
     top_k: Optional[int] = None,
     max_seconds: Optional[int] = None,
+    fingerprint: Optional[Dict[str, Any]] = None,
 ) -> int:
     """
     Write D_anchor shard with optional top_k and max_seconds filtering.
@@ -296,6 +486,7 @@ def write_shard(
         extra_builder: Function to build extra columns
         top_k: If set, keep only top_k nearest sources per anchor (default: None = no limit)
         max_seconds: If set, filter out distances > max_seconds (default: None = no limit)
+        fingerprint: Input fingerprint stored in the Parquet metadata (see d_anchor_fingerprint)
     
     Returns:
         Number of rows written
@@ -309,13 +500,7 @@ def write_shard(
         top_k=top_k,
         max_seconds=max_seconds,
     )
-    if df.height == 0:
-        return write_empty_shard(out_path, schema)
-
-    tmp_path = out_path + ".tmp"
-    df.write_parquet(tmp_path, compression="zstd", statistics=True, row_group_size=128_000)
-    os.replace(tmp_path, out_path)
-    return df.height
+    return write_frame(out_path, df, fingerprint)
 
 
 def compute_target_nodes(
@@ -369,7 +554,14 @@ def execute_tasks(
     max_workers: int,
     worker_fn: Callable[[Any], Any],
     describe: Callable[[Any], str],
+    on_result: Optional[Callable[[Any], None]] = None,
 ) -> List[Any]:
+    """
+    Run `worker_fn` over `work` in a spawn process pool sharing the graph arrays.
+
+    Results are returned in completion order; with `on_result` each one is handed to the callback
+    as soon as it completes (e.g. to checkpoint it) and is not retained in the returned list.
+    """
     if not work:
         return []
 
@@ -414,7 +606,10 @@ def execute_tasks(
                 start, desc = futures.pop(fut)
                 try:
                     result = fut.result()
-                    results.append(result)
+                    if on_result is not None:
+                        on_result(result)
+                    else:
+                        results.append(result)
                     elapsed = time.perf_counter() - start
                     if desc:
                         print(f"[debug] {desc} finished in {elapsed:.2f}s")
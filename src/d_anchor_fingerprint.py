@@ -0,0 +1,163 @@
+"""Per-entity input fingerprints for incremental D_anchor rebuilds.
+
+Each brand/category partition records, in its Parquet key-value metadata, what it was computed from:
+
+  sources  hash of the entity's source anchor nodes
+  limits   max_minutes/top_k from d_anchor_limits.json
+  graph    hash of the routing graph (the forward CSR's GraphBundle.digest)
+  targets  hash of the full anchor placement (anchor node ↔ anchor_int_id)
+
+A partition is up to date when all four match. When only `targets` differs, the existing rows
+are still exact for anchors that kept their node (their nearest source did not move), so only
+new or moved anchors need routing ("extend"); anything else is a full rebuild. Placements are
+kept under `<mode dir>/_placements/<targets>.npy` so an extend can diff old and new anchors.
+
+Partitions written from the anchor×anchor matrix also record `"times": "matrix"`. An extend routes
+the new rows on the CSR, and CH matrix times can differ from those by a few seconds, so a matrix
+partition is rebuilt in full on a placement change (one masked row-min) rather than extended.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+FINGERPRINT_KEY = "d_anchor_fingerprint"
+PLACEMENTS_DIR = "_placements"
+_COMPONENTS = ("sources", "limits", "graph", "targets")
+MATRIX_TIMES = "matrix"
+
+
+def _digest(*arrays: np.ndarray) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    for arr in arrays:
+        arr = np.ascontiguousarray(arr)
+        h.update(arr.dtype.str.encode())
+        h.update(str(arr.shape).encode())
+        h.update(arr.tobytes())
+    return h.hexdigest()
+
+
+def graph_fingerprint(indptr: np.ndarray, indices: np.ndarray, w_sec: np.ndarray) -> str:
+    return _digest(indptr, indices, w_sec)
+
+
+def placement_fingerprint(anchor_nodes: np.ndarray, anchor_int_ids: np.ndarray) -> str:
+    return _digest(np.asarray(anchor_nodes, dtype="<i4"), np.asarray(anchor_int_ids, dtype="<i4"))
+
+
+def entity_fingerprint(src: np.ndarray, limits: Dict[str, int], graph_hash: str, targets_hash: str) -> Dict[str, object]:
+    return {
+        "sources": _digest(np.unique(np.asarray(src, dtype=np.int64)).astype("<i4")),
+        "limits": {"max_minutes": int(limits["max_minutes"]), "top_k": int(limits["top_k"])},
+        "graph": graph_hash,
+        "targets": targets_hash,
+    }
+
+
+def fingerprint_metadata(fingerprint: Optional[Dict[str, object]]) -> Optional[Dict[str, str]]:
+    """Parquet key-value metadata for a partition (None when no fingerprint is tracked)."""
+    if fingerprint is None:
+        return None
+    return {FINGERPRINT_KEY: json.dumps(fingerprint, sort_keys=True)}
+
+
+def read_fingerprint(path: str) -> Optional[Dict[str, object]]:
+    try:
+        metadata = pq.read_metadata(path).metadata or {}
+    except (OSError, pa.ArrowInvalid):
+        return None
+    raw = metadata.get(FINGERPRINT_KEY.encode())
+    return json.loads(raw) if raw else None
+
+
+def save_placement(mode_dir: str, anchor_nodes: np.ndarray, anchor_int_ids: np.ndarray) -> str:
+    """Store the current anchor placement under its hash (idempotent); returns the hash."""
+    digest = placement_fingerprint(anchor_nodes, anchor_int_ids)
+    path = os.path.join(mode_dir, PLACEMENTS_DIR, f"{digest}.npy")
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            np.save(f, np.stack([np.asarray(anchor_nodes, dtype=np.int32), np.asarray(anchor_int_ids, dtype=np.int32)]))
+        os.replace(tmp, path)
+    return digest
+
+
+def load_placement(mode_dir: str, digest: str) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+    path = os.path.join(mode_dir, PLACEMENTS_DIR, f"{digest}.npy")
+    if not os.path.isfile(path):
+        return None
+    pair = np.load(path)
+    return pair[0], pair[1]
+
+
+def prune_placements(mode_dir: str, partition_prefix: str) -> int:
+    """Delete stored placements that no partition under `mode_dir` refers to any more."""
+    placements = os.path.join(mode_dir, PLACEMENTS_DIR)
+    if not os.path.isdir(placements):
+        return 0
+    referenced = set()
+    for name in os.listdir(mode_dir):
+        if name.startswith(partition_prefix):
+            fp = read_fingerprint(os.path.join(mode_dir, name, "part-000.parquet"))
+            if fp:
+                referenced.add(fp.get("targets"))
+    removed = 0
+    for name in os.listdir(placements):
+        if name.endswith(".npy") and name[:-4] not in referenced:
+            os.remove(os.path.join(placements, name))
+            removed += 1
+    return removed
+
+
+def added_anchor_mask(old_placement: Tuple[np.ndarray, np.ndarray], anchor_nodes: np.ndarray, anchor_int_ids: np.ndarray) -> np.ndarray:
+    """Bool mask over the current anchors: True where (node, anchor_int_id) was not placed before."""
+    def _keys(nodes, ids):
+        return (np.asarray(nodes, dtype=np.int64) << 32) | np.asarray(ids, dtype=np.int64)
+
+    return ~np.isin(_keys(anchor_nodes, anchor_int_ids), _keys(*old_placement))
+
+
+def plan_rebuild(out_path: str, fingerprint: Dict[str, object], force: bool, mode_dir: str) -> Tuple[str, List[str], Optional[Tuple[np.ndarray, np.ndarray]]]:
+    """
+    ("skip" | "extend" | "full", reasons, previous placement) for one partition.
+
+    "extend" is only offered when the previous placement is still on disk to diff against, and
+    never for a partition written from the anchor matrix.
+    """
+    if force:
+        return "full", ["forced"], None
+    if not os.path.exists(out_path):
+        return "full", ["missing"], None
+    previous = read_fingerprint(out_path)
+    if previous is None:
+        return "full", ["no fingerprint"], None
+    changed = [key for key in _COMPONENTS if previous.get(key) != fingerprint[key]]
+    if not changed:
+        return "skip", [], None
+    if changed == ["targets"]:
+        if previous.get("times") == MATRIX_TIMES:
+            return "full", ["targets (matrix partition)"], None
+        old_placement = load_placement(mode_dir, str(previous["targets"]))
+        if old_placement is not None:
+            return "extend", changed, old_placement
+        return "full", ["targets (previous placement unknown)"], None
+    return "full", changed, None
+
+
+def print_rebuild_report(kind: str, plans: List[Tuple[str, str, List[str]]]) -> None:
+    """Dry-run summary: one line per entity plus totals by action."""
+    counts: Dict[str, int] = {}
+    for entity, action, reasons in plans:
+        counts[action] = counts.get(action, 0) + 1
+        detail = f" ({', '.join(reasons)})" if reasons else ""
+        print(f"[plan] {kind} {entity}: {action}{detail}")
+    summary = ", ".join(f"{action}={counts.get(action, 0)}" for action in ("full", "extend", "skip"))
+    print(f"[plan] {len(plans)} {kind} partitions: {summary}")
@@ -0,0 +1,140 @@
+"""Anchor×anchor travel-time matrix (sparse CSR) and D_anchor lookups from it.
+
+Row i holds the seconds from anchor node i to every anchor node reachable within
+the matrix limit (columns are positions in the same anchor order). A brand or
+category D_anchor is then a masked row-min over the columns of its anchors, so no
+routing run is needed per entity. The lookup reads only those columns through a
+column index (the transposed CSR, built once per loaded matrix), so an entity costs
+the entries of its own anchors' columns rather than a pass over every row.
+
+Layout on disk (one directory per state/mode):
+
+  indptr.npy          int64 [A+1]
+  indices.npy         int32 [nnz]  column anchor positions, ascending per row
+  seconds.npy         uint16 [nnz]
+  anchor_nodes.npy    int32 [A]    CSR node index of each anchor position
+  anchor_int_ids.npy  int32 [A]
+  meta.json           limit_s, n_anchors, nnz, graph (GraphBundle digest of the CSR), built_at
+
+A matrix is only valid for the graph it was routed on: loaders compare `graph_digest` with the
+current bundle digest, since an edge weight change keeps the anchor nodes but not the times.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Optional, Tuple
+
+import numpy as np
+
+UNREACH_U16 = np.uint16(65535)
+
+
+@dataclass
+class AnchorMatrix:
+    indptr: np.ndarray
+    indices: np.ndarray
+    seconds: np.ndarray
+    anchor_nodes: np.ndarray
+    anchor_int_ids: np.ndarray
+    limit_s: int
+    graph_digest: Optional[str] = None
+    _by_column: Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]] = field(default=None, init=False, repr=False, compare=False)
+
+    @property
+    def n_anchors(self) -> int:
+        return int(self.anchor_nodes.size)
+
+    def positions_of(self, nodes: np.ndarray) -> np.ndarray:
+        """Anchor positions of CSR node indices (nodes that are not anchors are dropped)."""
+        nodes = np.asarray(nodes, dtype=np.int32)
+        pos = np.searchsorted(self.anchor_nodes, nodes)
+        pos = np.clip(pos, 0, max(self.n_anchors - 1, 0))
+        ok = self.anchor_nodes[pos] == nodes if self.n_anchors else np.zeros(nodes.size, dtype=bool)
+        return np.unique(pos[ok])
+
+    def columns(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Column-major view (col_indptr int64 [A+1], rows int32 [nnz], seconds uint16 [nnz]), built on first use."""
+        if self._by_column is None:
+            indices = np.asarray(self.indices)
+            order = np.argsort(indices, kind="stable")
+            col_indptr = np.zeros(self.n_anchors + 1, dtype=np.int64)
+            np.cumsum(np.bincount(indices, minlength=self.n_anchors), out=col_indptr[1:])
+            rows = np.repeat(np.arange(self.n_anchors, dtype=np.int32), np.diff(np.asarray(self.indptr)))
+            self._by_column = (col_indptr, rows[order], np.asarray(self.seconds)[order])
+        return self._by_column
+
+    def masked_row_min(self, source_positions: np.ndarray, max_seconds: Optional[int] = None) -> np.ndarray:
+        """
+        Per-anchor seconds to the nearest anchor in `source_positions`.
+
+        Only the source columns are read (see `columns`). Returns uint16 [A] with 65535 where no
+        source is within `max_seconds` (or the matrix limit).
+        """
+        if max_seconds is not None and int(max_seconds) > self.limit_s:
+            raise ValueError(f"max_seconds={max_seconds} exceeds matrix limit {self.limit_s}s")
+        col_indptr, rows, seconds = self.columns()
+        cols = np.unique(np.asarray(source_positions, dtype=np.int64))
+        starts, lens = col_indptr[cols], col_indptr[cols + 1] - col_indptr[cols]
+        entries = np.repeat(starts - (np.cumsum(lens) - lens), lens) + np.arange(int(lens.sum()), dtype=np.int64)
+        out = np.full(self.n_anchors, UNREACH_U16, dtype=np.uint16)
+        np.minimum.at(out, rows[entries], seconds[entries])
+        if max_seconds is not None:
+            out[out > int(max_seconds)] = UNREACH_U16
+        return out
+
+
+def build_anchor_matrix(ch_rev, anchor_nodes: np.ndarray, anchor_int_ids: np.ndarray, limit_s: int, threads: int = 1) -> AnchorMatrix:
+    """
+    Many-to-many over the reverse-graph CH (the API's `ch_graph_rev.bin`).
+
+    On the reverse graph d_rev(b→a) = d(a→b), so rows keyed by target give each anchor's
+    outgoing times to every other anchor.
+    """
+    anchor_nodes = np.ascontiguousarray(anchor_nodes, dtype=np.int32)
+    indptr, indices, seconds = ch_rev.many_to_many(anchor_nodes, anchor_nodes, int(limit_s), int(threads))
+    return AnchorMatrix(
+        indptr=np.asarray(indptr),
+        indices=np.asarray(indices),
+        seconds=np.asarray(seconds),
+        anchor_nodes=anchor_nodes,
+        anchor_int_ids=np.ascontiguousarray(anchor_int_ids, dtype=np.int32),
+        limit_s=int(limit_s),
+    )
+
+
+def save_anchor_matrix(matrix: AnchorMatrix, out_dir: str) -> None:
+    os.makedirs(out_dir, exist_ok=True)
+    for name in ("indptr", "indices", "seconds", "anchor_nodes", "anchor_int_ids"):
+        tmp = os.path.join(out_dir, f"{name}.npy.tmp")
+        with open(tmp, "wb") as f:
+            np.save(f, getattr(matrix, name))
+        os.replace(tmp, os.path.join(out_dir, f"{name}.npy"))
+    meta = {
+        "limit_s": matrix.limit_s,
+        "n_anchors": matrix.n_anchors,
+        "nnz": int(matrix.indices.size),
+        "graph": matrix.graph_digest,
+        "built_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+    tmp = os.path.join(out_dir, "meta.json.tmp")
+    with open(tmp, "w") as f:
+        json.dump(meta, f, indent=2)
+    os.replace(tmp, os.path.join(out_dir, "meta.json"))
+
+
+def load_anchor_matrix(matrix_dir: str, mmap: bool = True) -> Optional[AnchorMatrix]:
+    meta_path = os.path.join(matrix_dir, "meta.json")
+    if not os.path.isfile(meta_path):
+        return None
+    with open(meta_path, "r") as f:
+        meta = json.load(f)
+    mode = "r" if mmap else None
+    arrays = {
+        name: np.load(os.path.join(matrix_dir, f"{name}.npy"), mmap_mode=mode)
+        for name in ("indptr", "indices", "seconds", "anchor_nodes", "anchor_int_ids")
+    }
+    return AnchorMatrix(limit_s=int(meta["limit_s"]), graph_digest=meta.get("graph"), **arrays)
@@ -0,0 +1,96 @@
+"""Persistent site_id → anchor_int_id registry (append-only, with tombstones).
+
+Sorting by site_id and numbering 0..n-1 renumbers every later anchor when one site is added,
+which changes every D_anchor partition and tile. The registry instead remembers each site's id:
+
+- sites already in the registry keep their id (a tombstoned site that comes back is revived);
+- new sites get ids after the current maximum, in site_id order;
+- sites that disappeared are tombstoned (`active = False`), so their id is never handed out again.
+
+Ids therefore stay stable across small POI updates, at the cost of gaps. `compact_registry`
+drops tombstones and renumbers the active sites densely (keeping their relative order); that
+changes ids and should be followed by a full rebuild, like the first run without a registry.
+
+Registry file (parquet): site_id (str), anchor_int_id (int32), active (bool).
+"""
+
+from __future__ import annotations
+
+import os
+from typing import Dict, Tuple
+
+import numpy as np
+import pandas as pd
+
+REGISTRY_COLUMNS = ["site_id", "anchor_int_id", "active"]
+
+
+def empty_registry() -> pd.DataFrame:
+    return pd.DataFrame({
+        "site_id": pd.Series([], dtype=object),
+        "anchor_int_id": pd.Series([], dtype=np.int32),
+        "active": pd.Series([], dtype=bool),
+    })
+
+
+def load_registry(path: str) -> pd.DataFrame:
+    """Registry at `path`, or an empty one when the file does not exist yet."""
+    if not path or not os.path.isfile(path):
+        return empty_registry()
+    reg = pd.read_parquet(path, columns=REGISTRY_COLUMNS)
+    reg["anchor_int_id"] = reg["anchor_int_id"].astype(np.int32)
+    reg["active"] = reg["active"].astype(bool)
+    if reg["site_id"].duplicated().any() or reg["anchor_int_id"].duplicated().any():
+        raise ValueError(f"Anchor id registry {path} has duplicate site_id or anchor_int_id entries")
+    return reg
+
+
+def save_registry(path: str, registry: pd.DataFrame) -> None:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    registry[REGISTRY_COLUMNS].sort_values("anchor_int_id").to_parquet(tmp, index=False)
+    os.replace(tmp, path)
+
+
+def allocate_anchor_int_ids(registry: pd.DataFrame, site_ids) -> Tuple[pd.DataFrame, pd.Series, Dict[str, int]]:
+    """
+    (updated registry, anchor_int_id per site_id, stats) for the current set of sites.
+
+    The returned Series is indexed by site_id. Stats count kept, added, revived and
+    tombstoned sites.
+    """
+    current = pd.Index(pd.unique(pd.Series(site_ids, dtype=object)))
+    reg = registry[REGISTRY_COLUMNS].copy()
+    known = reg["site_id"].isin(current)
+    was_active = reg["active"].to_numpy()
+
+    new_sites = np.sort(current[~current.isin(reg["site_id"])].to_numpy().astype(str))
+    start = int(reg["anchor_int_id"].max()) + 1 if len(reg) else 0
+    if start + len(new_sites) > np.iinfo(np.int32).max:
+        raise ValueError("anchor_int_id space exhausted; compact the registry")
+    added = pd.DataFrame({
+        "site_id": pd.Series(new_sites, dtype=object),
+        "anchor_int_id": np.arange(start, start + len(new_sites), dtype=np.int32),
+        "active": np.ones(len(new_sites), dtype=bool),
+    })
+
+    stats = {
+        "kept": int((known & was_active).sum()),
+        "added": int(len(new_sites)),
+        "revived": int((known & ~was_active).sum()),
+        "tombstoned": int((~known & was_active).sum()),
+    }
+    reg["active"] = known.to_numpy()
+    out = pd.concat([reg, added], ignore_index=True) if len(added) else reg.reset_index(drop=True)
+    out["anchor_int_id"] = out["anchor_int_id"].astype(np.int32)
+    ids = out.loc[out["active"]].set_index("site_id")["anchor_int_id"]
+    return out, ids, stats
+
+
+def compact_registry(registry: pd.DataFrame) -> Tuple[pd.DataFrame, Dict[int, int]]:
+    """Drop tombstones and renumber active sites 0..n-1 in their current id order; returns (registry, old→new)."""
+    active = registry.loc[registry["active"], REGISTRY_COLUMNS].sort_values("anchor_int_id").reset_index(drop=True)
+    new_ids = np.arange(len(active), dtype=np.int32)
+    remap = {int(old): int(new) for old, new in zip(active["anchor_int_id"].to_numpy(), new_ids)}
+    active["anchor_int_id"] = new_ids
+    return active, remap
@@ -0,0 +1,196 @@
+"""Versioned, checksummed bundle of the derived graph artifacts kept next to a CSR cache.
+
+A CSR cache directory (`data/osm/cache_csr/<state>_<mode>.npycache`) holds the forward CSR and
+per-node arrays written by `graph.pyrosm_csr`. Everything derived from the forward CSR lives next
+to it and is listed in `bundle.json`:
+
+  {"version": 1,
+   "csr": {"digest": <graph_fingerprint of indptr/indices/w_sec>, "nodes": N, "edges": M,
+           "files": {"indptr.npy": [size, mtime_ns], ...}},
+   "artifacts": {"rev_csr": {"csr": <digest>, "files": {"rev_indptr.npy": {"bytes", "blake2b"}, ...}},
+                 "components": {...}, "ch_rev": {...}}}
+
+An artifact is current when it was built from the current forward digest and its files still have
+the recorded sizes (`verify()` also re-hashes their contents). The forward digest is recomputed
+only when a forward file's size or mtime changed (a rebuild, `graph.reorder`, `graph.islands`);
+if the content changed too, every artifact is dropped. The digest is the same
+`d_anchor_fingerprint.graph_fingerprint` the D_anchor and label-cache fingerprints record, so
+callers holding a bundle use `GraphBundle.digest` instead of re-hashing the arrays. CH binaries are registered the same way,
+so a CH built for another graph is never loaded (caches from before the bundle rebuild their CH
+once). All files are written to a temp name and renamed, and arrays are opened with mmap.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from d_anchor_fingerprint import graph_fingerprint
+
+BUNDLE_VERSION = 1
+MANIFEST = "bundle.json"
+FORWARD_FILES = ("indptr.npy", "indices.npy", "w_sec.npy")
+REV_FILES = ("rev_indptr.npy", "rev_indices.npy", "rev_w_sec.npy")
+COMPONENTS_FILE = "comp_id.npy"
+
+
+def _file_digest(path: str) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 24), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _stat(path: str) -> List[int]:
+    st = os.stat(path)
+    return [int(st.st_size), int(st.st_mtime_ns)]
+
+
+def save_npy_atomic(path: str, arr: np.ndarray) -> None:
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        np.save(f, arr)
+    os.replace(tmp, path)
+
+
+def _write_json_atomic(path: str, obj: Dict[str, Any]) -> None:
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(obj, f, indent=1)
+    os.replace(tmp, path)
+
+
+class GraphBundle:
+    """Lazy access to the forward CSR and its derived artifacts in one cache directory."""
+
+    def __init__(self, cache_dir: str):
+        self.cache_dir = cache_dir
+        self.manifest = self._load_manifest()
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.cache_dir, name)
+
+    def _load(self, name: str) -> np.ndarray:
+        return np.load(self._path(name), mmap_mode="r", allow_pickle=False)
+
+    def _load_manifest(self) -> Dict[str, Any]:
+        path = self._path(MANIFEST)
+        manifest: Optional[Dict[str, Any]] = None
+        if os.path.isfile(path):
+            try:
+                with open(path, "r") as f:
+                    manifest = json.load(f)
+            except (OSError, ValueError):
+                manifest = None
+        if manifest is None or manifest.get("version") != BUNDLE_VERSION:
+            return self._refresh({"version": BUNDLE_VERSION, "csr": {}, "artifacts": {}})
+        files = {name: _stat(self._path(name)) for name in FORWARD_FILES}
+        if manifest["csr"].get("files") != files:
+            return self._refresh(manifest)
+        return manifest
+
+    def _refresh(self, manifest: Dict[str, Any]) -> Dict[str, Any]:
+        """Re-hash the forward CSR; artifacts of another digest are dropped."""
+        indptr, indices, w_sec = self.forward()
+        digest = graph_fingerprint(indptr, indices, w_sec)
+        if manifest["csr"].get("digest") != digest:
+            for entry in manifest["artifacts"].values():
+                for name in entry["files"]:
+                    if os.path.isfile(self._path(name)):
+                        os.remove(self._path(name))
+            manifest["artifacts"] = {}
+        manifest["csr"] = {
+            "digest": digest,
+            "nodes": int(indptr.shape[0] - 1),
+            "edges": int(indices.shape[0]),
+            "files": {name: _stat(self._path(name)) for name in FORWARD_FILES},
+        }
+        _write_json_atomic(self._path(MANIFEST), manifest)
+        return manifest
+
+    @property
+    def digest(self) -> str:
+        return self.manifest["csr"]["digest"]
+
+    def forward(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        return tuple(self._load(name) for name in FORWARD_FILES)  # type: ignore[return-value]
+
+    def has(self, artifact: str) -> bool:
+        entry = self.manifest["artifacts"].get(artifact)
+        if entry is None or entry.get("csr") != self.digest:
+            return False
+        for name, rec in entry["files"].items():
+            path = self._path(name)
+            if not os.path.isfile(path) or os.path.getsize(path) != rec["bytes"]:
+                return False
+        return True
+
+    def register(self, artifact: str, files: List[str], **info: Any) -> None:
+        """Record files already written to the cache directory as `artifact` of the current CSR."""
+        self.manifest["artifacts"][artifact] = {
+            "csr": self.digest,
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "files": {name: {"bytes": os.path.getsize(self._path(name)), "blake2b": _file_digest(self._path(name))}
+                      for name in files},
+            **info,
+        }
+        _write_json_atomic(self._path(MANIFEST), self.manifest)
+
+    def _arrays(self, artifact: str, names: Tuple[str, ...], build) -> Tuple[np.ndarray, ...]:
+        if not self.has(artifact):
+            for name, arr in zip(names, build()):
+                save_npy_atomic(self._path(name), arr)
+            self.register(artifact, list(names))
+        return tuple(self._load(name) for name in names)
+
+    def rev_csr(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Reverse CSR (indptr_rev, indices_rev, w_rev), built once per forward graph."""
+        from graph.csr_utils import build_rev_csr
+
+        return self._arrays("rev_csr", REV_FILES, lambda: build_rev_csr(*self.forward()))  # type: ignore[return-value]
+
+    def components(self) -> np.ndarray:
+        """Weakly connected component id per node (t_hex.weakly_connected_components)."""
+        def _build():
+            from t_hex import weakly_connected_components
+
+            indptr, indices, _ = self.forward()
+            indptr_rev, indices_rev, _ = self.rev_csr()
+            return (np.asarray(weakly_connected_components(indptr, indices, indptr_rev, indices_rev)),)
+
+        return self._arrays("components", (COMPONENTS_FILE,), _build)[0]
+
+    def ch(self, suffix: str = "_rev", threads: int = 1, progress: bool = False):
+        """
+        CH over the reverse (`_rev`) or forward (``) CSR, rebuilt when not registered for this graph.
+
+        `threads > 1` builds with the parallel contraction (see graph.ch_cache.build_and_cache_ch).
+        """
+        from graph.ch_cache import _ch_cache_path, build_and_cache_ch, load_cached_ch
+
+        artifact = "ch" + suffix
+        if self.has(artifact):
+            cached = load_cached_ch(self.cache_dir, suffix)
+            if cached is not None:
+                return cached
+        csr = self.rev_csr() if suffix == "_rev" else self.forward()
+        ch_graph = build_and_cache_ch(self.cache_dir, *csr, suffix=suffix, threads=threads, progress=progress)
+        self.register(artifact, [os.path.basename(_ch_cache_path(self.cache_dir, suffix))])
+        return ch_graph
+
+    def verify(self) -> Dict[str, bool]:
+        """Re-hash every registered artifact file; returns {artifact: ok}."""
+        out = {}
+        for artifact, entry in self.manifest["artifacts"].items():
+            ok = self.has(artifact)
+            for name, rec in entry["files"].items():
+                ok = ok and _file_digest(self._path(name)) == rec["blake2b"]
+            out[artifact] = ok
+        return out
+
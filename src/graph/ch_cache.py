@@ -1,4 +1,8 @@
-"""Helpers for caching Contraction Hierarchies (CH) prepared graphs on disk."""
+"""Helpers for caching Contraction Hierarchies (CH) prepared graphs on disk.
+
+These do not check that a cached CH matches the graph; for a CSR cache directory use
+`graph.bundle.GraphBundle.ch`, which only loads a CH registered for the current forward CSR.
+"""
 
 from __future__ import annotations
 
@@ -32,6 +36,23 @@ def _as_c_contiguous(arr: np.ndarray, dtype) -> np.ndarray:
     return np.ascontiguousarray(arr, dtype=dtype)
 
 
+def _progress_callback(desc: str):
+    """tqdm-backed `progress_cb(done, total)` for the parallel CH build."""
+    from tqdm import tqdm
+
+    pbar = None
+
+    def _cb(done: int, total: int) -> None:
+        nonlocal pbar
+        if pbar is None:
+            pbar = tqdm(total=total, desc=desc, unit="node")
+        pbar.update(done - pbar.n)
+        if done >= total:
+            pbar.close()
+
+    return _cb
+
+
 def build_and_cache_ch(
     cache_dir: str,
     indptr: np.ndarray,
@@ -39,16 +60,24 @@ def build_and_cache_ch(
     w_sec: np.ndarray,
     *,
     suffix: str = "",
+    threads: int = 1,
+    progress: bool = False,
 ) -> CHGraph:
+    """Contract and cache a CH; `threads > 1` uses the parallel independent-set contraction."""
     os.makedirs(cache_dir, exist_ok=True)
     ch_graph = ch_build_from_csr(
         _as_c_contiguous(indptr, np.int64),
         _as_c_contiguous(indices, np.int32),
         _as_c_contiguous(w_sec, np.uint16),
+        threads=int(max(1, threads)),
+        progress=bool(progress),
+        progress_cb=_progress_callback("CH contraction") if progress else None,
     )
     path = _ch_cache_path(cache_dir, suffix)
-    with open(path, "wb") as f:
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
         f.write(ch_graph.to_bytes())
+    os.replace(tmp, path)
     return ch_graph
 
 
@@ -59,8 +88,10 @@ def load_or_build_ch(
     w_sec: np.ndarray,
     *,
     suffix: str = "",
+    threads: int = 1,
+    progress: bool = False,
 ) -> CHGraph:
     cached = load_cached_ch(cache_dir, suffix)
     if cached is not None:
         return cached
-    return build_and_cache_ch(cache_dir, indptr, indices, w_sec, suffix=suffix)
+    return build_and_cache_ch(cache_dir, indptr, indices, w_sec, suffix=suffix, threads=threads, progress=progress)
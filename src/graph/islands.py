@@ -0,0 +1,160 @@
+"""Island pruning for the CSR cache: drop small disconnected components before routing.
+
+pyrosm keeps every drivable way, so a state graph carries thousands of tiny components
+(parking-lot service roads, ferry stubs, islands). They cost memory and CH preprocessing, anchors
+snapped onto them reach almost nothing (see the Logan Airport case in docs/ANCHORS.md), and the
+K-best kernels still visit them.
+
+- weak:   weakly connected components (t_hex.weakly_connected_components) with fewer than
+          `min_nodes` nodes are dropped, unless they contain a node to keep (an anchor);
+- strong: with `strong=True`, nodes that cannot reach a strongly connected core (an SCC of at
+          least `min_nodes` nodes, or a kept node) are dropped too. From such one-way traps no
+          anchor is reachable, so they never get a label. The count is reported either way.
+
+`prune_csr_cache` rewrites a cache directory in place (with graph.reorder's cache helpers). It
+keeps `island_remap.npy` (new node index -> index in the unpruned graph), which a later reorder
+permutes with the other per-node arrays, and records {"islands": {...}} with the node and edge
+savings in meta.json. Anything keyed on CSR node indices is invalidated: CH binaries in the cache
+are removed, and D_anchor fingerprints and T_hex label caches hash the graph and rebuild.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+from graph.reorder import ISLAND_REMAP, drop_ch_binaries, load_cache_arrays, save_cache_arrays, update_cache_meta
+
+ISLANDS_VERSION = 1
+REMAP_FILE = f"{ISLAND_REMAP}.npy"
+
+
+def _weak_components(indptr: np.ndarray, indices: np.ndarray) -> np.ndarray:
+    from graph.csr_utils import build_rev_csr
+    from t_hex import weakly_connected_components
+
+    w = np.zeros(indices.shape[0], dtype=np.uint16)
+    indptr_rev, indices_rev, _ = build_rev_csr(indptr, indices, w)
+    return np.asarray(weakly_connected_components(indptr, indices, indptr_rev, indices_rev))
+
+
+def _reaches_core(indptr: np.ndarray, indices: np.ndarray, core: np.ndarray) -> np.ndarray:
+    """Mask of nodes with a directed path into `core` (BFS from a super node over reversed edges)."""
+    from scipy.sparse import csr_matrix
+    from scipy.sparse.csgraph import breadth_first_order
+
+    n = int(indptr.shape[0] - 1)
+    src = np.repeat(np.arange(n, dtype=np.int64), np.diff(indptr))
+    core_nodes = np.flatnonzero(core)
+    rows = np.concatenate([np.asarray(indices, dtype=np.int64), np.full(core_nodes.size, n, dtype=np.int64)])
+    cols = np.concatenate([src, core_nodes])
+    rev = csr_matrix((np.ones(rows.size, dtype=np.int8), (rows, cols)), shape=(n + 1, n + 1))
+    order = breadth_first_order(rev, n, directed=True, return_predecessors=False)
+    mask = np.zeros(n + 1, dtype=bool)
+    mask[order] = True
+    return mask[:n]
+
+
+def island_mask(indptr: np.ndarray, indices: np.ndarray, min_nodes: int, keep: Optional[np.ndarray] = None,
+                strong: bool = False, comp_id: Optional[np.ndarray] = None) -> Tuple[np.ndarray, Dict[str, Any]]:
+    """
+    (mask of nodes to keep, stats) for pruning components smaller than `min_nodes`.
+
+    `keep` is an optional node mask (e.g. anchor nodes) whose components are never dropped;
+    `comp_id` may pass precomputed weak component ids.
+    """
+    from scipy.sparse import csr_matrix
+    from scipy.sparse.csgraph import connected_components
+
+    indptr = np.asarray(indptr, dtype=np.int64)
+    indices = np.asarray(indices)
+    n = int(indptr.shape[0] - 1)
+    keep = np.zeros(n, dtype=bool) if keep is None else np.asarray(keep, dtype=bool)
+    if comp_id is None:
+        comp_id = _weak_components(indptr, indices)
+    comp_id = np.asarray(comp_id, dtype=np.int64)
+
+    sizes = np.bincount(comp_id)
+    protected = np.zeros(sizes.size, dtype=bool)
+    protected[comp_id[keep]] = True
+    keep_comp = (sizes >= min_nodes) | protected
+    mask = keep_comp[comp_id]
+
+    adj = csr_matrix((np.ones(indices.shape[0], dtype=np.int8), indices, indptr), shape=(n, n))
+    _, scc = connected_components(adj, directed=True, connection="strong")
+    core = (np.bincount(scc)[scc] >= min_nodes) | keep
+    traps = mask & ~_reaches_core(indptr, indices, core)
+    if strong:
+        mask &= ~traps
+
+    stats = {
+        "components": int(sizes.size),
+        "components_dropped": int((~keep_comp).sum()),
+        "components_kept_for_anchors": int((protected & (sizes < min_nodes)).sum()),
+        "trap_nodes": int(traps.sum()),
+        "largest_component": int(sizes.max()) if sizes.size else 0,
+    }
+    return mask, stats
+
+
+def induced_subgraph(mask: np.ndarray, indptr: np.ndarray, indices: np.ndarray,
+                     w_sec: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """CSR restricted to `mask` nodes, renumbered in their original order; returns (indptr, indices, w_sec, remap new -> old)."""
+    mask = np.asarray(mask, dtype=bool)
+    indptr = np.asarray(indptr, dtype=np.int64)
+    indices = np.asarray(indices)
+    remap = np.flatnonzero(mask)
+    new_index = np.full(mask.size, -1, dtype=np.int64)
+    new_index[remap] = np.arange(remap.size)
+    src = np.repeat(np.arange(mask.size), np.diff(indptr))
+    edge_keep = mask[src] & mask[indices]
+    new_indptr = np.zeros(remap.size + 1, dtype=np.int64)
+    np.cumsum(np.bincount(new_index[src[edge_keep]], minlength=remap.size), out=new_indptr[1:])
+    return (new_indptr, new_index[indices[edge_keep]].astype(np.int32),
+            np.asarray(w_sec)[edge_keep].astype(np.uint16, copy=False), remap)
+
+
+def prune_csr_cache(cache_dir: str, min_nodes: int, keep_node_ids: Optional[np.ndarray] = None,
+                    strong: bool = False) -> Dict[str, Any]:
+    """Drop small components from a CSR cache directory in place; returns the report stored in meta.json."""
+    indptr, indices, w_sec, node_arrays = load_cache_arrays(cache_dir)
+    keep = None
+    if keep_node_ids is not None:
+        keep = np.isin(node_arrays["node_ids"], np.asarray(keep_node_ids, dtype=node_arrays["node_ids"].dtype))
+    mask, stats = island_mask(indptr, indices, min_nodes, keep, strong)
+    new_indptr, new_indices, new_w, _ = induced_subgraph(mask, indptr, indices, w_sec)
+    # An earlier remap is a per-node array too: subsetting it composes the two prunes, so the
+    # remap always points into the unpruned graph
+    node_arrays.setdefault(ISLAND_REMAP, np.arange(mask.size, dtype=np.int64))
+    save_cache_arrays(cache_dir, {
+        "indptr": new_indptr, "indices": new_indices, "w_sec": new_w,
+        **{name: np.ascontiguousarray(arr[mask]) for name, arr in node_arrays.items()},
+    })
+    drop_ch_binaries(cache_dir)
+
+    report = {
+        "version": ISLANDS_VERSION,
+        "min_nodes": int(min_nodes),
+        "strong": bool(strong),
+        "anchors": int(keep.sum()) if keep is not None else None,
+        "nodes_before": int(mask.size),
+        "nodes_after": int(new_indptr.size - 1),
+        "edges_before": int(indices.shape[0]),
+        "edges_after": int(new_indices.shape[0]),
+        **stats,
+    }
+    update_cache_meta(cache_dir, islands=report)
+    return report
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    nb, na = report["nodes_before"], report["nodes_after"]
+    eb, ea = report["edges_before"], report["edges_after"]
+    return (
+        f"nodes {nb} -> {na} (-{nb - na}, {100.0 * (nb - na) / max(1, nb):.2f}%), "
+        f"edges {eb} -> {ea} (-{eb - ea}, {100.0 * (eb - ea) / max(1, eb):.2f}%); "
+        f"{report['components_dropped']}/{report['components']} components dropped "
+        f"(<{report['min_nodes']} nodes, {report['components_kept_for_anchors']} small ones kept for anchors), "
+        f"{report['trap_nodes']} one-way trap nodes{' dropped' if report['strong'] else ''}"
+    )
@@ -0,0 +1,120 @@
+"""Approximate K-best on a time-quantized graph, for exploratory K / cutoff tuning.
+
+The Dial kernels keep one bucket per second up to the overflow cutoff (5400 at 90 min) and a
+label's bucket is its time. `quantized_kernel` runs the unchanged kernel in units of
+`bucket_width_s` seconds instead: edge weights are rounded to that quantum and the cutoffs are
+floored to it, so the queue has `cutoff / width` buckets and every label with the same rounded
+time is settled from the same bucket. Times come back in seconds (multiples of the width).
+
+Rounding:
+- `nearest`: each edge is off by at most width/2, so a path of h edges is off by at most
+  h * width / 2 in either direction (errors mostly cancel in practice);
+- `up`: never optimistic; a label is at least the exact time and at most h * width above it.
+
+Near-ties between sources can resolve differently, so the K sources of a node may differ from
+the exact run. `compare_labels` measures both effects against an exact run (04 --validate-approx).
+"""
+
+from __future__ import annotations
+
+from typing import Any, Callable, Dict
+
+import numpy as np
+
+UNREACH_U16 = 65535
+ROUNDING = ("nearest", "up")
+_COMPARE_ROWS = 1 << 16
+
+
+def quantize_weights(w_sec: np.ndarray, width_s: int, rounding: str = "nearest") -> np.ndarray:
+    """Edge weights in units of `width_s` seconds (uint16)."""
+    if rounding not in ROUNDING:
+        raise ValueError(f"rounding must be one of {ROUNDING}, got {rounding!r}")
+    w = np.asarray(w_sec, dtype=np.int64)
+    if rounding == "up":
+        q = (w + width_s - 1) // width_s
+    else:
+        q = (w + width_s // 2) // width_s
+    return q.astype(np.uint16)
+
+
+def quantized_kernel(kbest_fn: Callable, width_s: int, rounding: str = "nearest") -> Callable:
+    """
+    Wrap a K-best kernel (`kbest_multisource_*_csr` signature) to run on quantized times.
+
+    The wrapper takes and returns seconds like the kernel itself; extra return values (e.g. the
+    stats dict) are passed through in quantum units. `width_s == 1` returns `kbest_fn` unchanged.
+    """
+    width_s = int(width_s)
+    if width_s < 1:
+        raise ValueError("bucket width must be >= 1 second")
+    if rounding not in ROUNDING:
+        raise ValueError(f"rounding must be one of {ROUNDING}, got {rounding!r}")
+    if width_s == 1:
+        return kbest_fn
+
+    def _run(indptr, indices, w_sec, sources, k, cutoff_primary_s, cutoff_overflow_s, *args: Any, **kwargs: Any):
+        out = kbest_fn(
+            indptr, indices, quantize_weights(w_sec, width_s, rounding), sources, k,
+            int(cutoff_primary_s) // width_s, int(cutoff_overflow_s) // width_s, *args, **kwargs,
+        )
+        t_q = np.asarray(out[1])
+        t = np.where(t_q == UNREACH_U16, UNREACH_U16, t_q.astype(np.int64) * width_s).astype(np.uint16)
+        return (out[0], t) + tuple(out[2:])
+
+    return _run
+
+
+def compare_labels(exact_src: np.ndarray, exact_t: np.ndarray, approx_src: np.ndarray, approx_t: np.ndarray) -> Dict[str, Any]:
+    """
+    Error of approximate node labels against exact ones (same [N,K] layout).
+
+    Slot j is compared as "time to the j-th nearest source": signed error percentiles over slots
+    filled in both runs, plus slots that only one run filled, the share of nodes with the same
+    nearest source and the mean recall of the exact K sources.
+    """
+    exact_src, approx_src = np.asarray(exact_src), np.asarray(approx_src)
+    exact_t, approx_t = np.asarray(exact_t), np.asarray(approx_t)
+    if exact_t.shape != approx_t.shape:
+        raise ValueError(f"label shapes differ: {exact_t.shape} vs {approx_t.shape}")
+    in_exact = exact_t != UNREACH_U16
+    in_approx = approx_t != UNREACH_U16
+    both = in_exact & in_approx
+    err = approx_t[both].astype(np.int64) - exact_t[both].astype(np.int64)
+    abs_err = np.abs(err)
+
+    labeled = np.flatnonzero(in_exact[:, 0])
+    recall_sum = 0.0
+    for lo in range(0, labeled.size, _COMPARE_ROWS):
+        rows = labeled[lo:lo + _COMPARE_ROWS]
+        es, as_ = exact_src[rows], approx_src[rows]
+        hit = (es[:, :, None] == as_[:, None, :]).any(axis=2) & (es >= 0)
+        recall_sum += float((hit.sum(axis=1) / np.maximum((es >= 0).sum(axis=1), 1)).sum())
+
+    def _pct(q: float) -> float:
+        return float(np.percentile(abs_err, q)) if abs_err.size else 0.0
+
+    return {
+        "nodes": int(labeled.size),
+        "slots_compared": int(err.size),
+        "slots_lost": int((in_exact & ~in_approx).sum()),
+        "slots_gained": int((~in_exact & in_approx).sum()),
+        "err_mean_s": float(err.mean()) if err.size else 0.0,
+        "abs_err_p50_s": _pct(50),
+        "abs_err_p90_s": _pct(90),
+        "abs_err_p99_s": _pct(99),
+        "abs_err_max_s": int(abs_err.max()) if abs_err.size else 0,
+        "exact_share": float((err == 0).mean()) if err.size else 1.0,
+        "nearest_same_source": float((exact_src[labeled, 0] == approx_src[labeled, 0]).mean()) if labeled.size else 1.0,
+        "topk_recall": recall_sum / labeled.size if labeled.size else 1.0,
+    }
+
+
+def format_comparison(stats: Dict[str, Any]) -> str:
+    return (
+        f"{stats['slots_compared']} slots over {stats['nodes']} nodes: mean {stats['err_mean_s']:+.1f}s, "
+        f"|err| p50/p90/p99/max {stats['abs_err_p50_s']:.0f}/{stats['abs_err_p90_s']:.0f}/"
+        f"{stats['abs_err_p99_s']:.0f}/{stats['abs_err_max_s']}s, exact {100 * stats['exact_share']:.1f}%, "
+        f"slots lost/gained {stats['slots_lost']}/{stats['slots_gained']}, "
+        f"nearest source same {100 * stats['nearest_same_source']:.1f}%, top-K recall {100 * stats['topk_recall']:.1f}%"
+    )
@@ -0,0 +1,280 @@
+"""Incremental repair of node K-best labels (and the T_hex rows built from them) after anchor edits.
+
+A full 04 run leaves its node labels in a label cache; an incremental run diffs the old and
+new anchor placement and only searches around the anchors that changed:
+
+- removed/moved anchors: nodes whose labels mention one are re-solved exactly from the anchors
+  within the overflow radius of those nodes (a bounded forward ball, not the whole state);
+- added/moved anchors: one K-best run from just those sources, merged into the existing labels.
+
+Labels are ordered by (time, source node index), the tie rule of the K-best kernels, so the
+repaired labels equal a full rebuild with the kernel that wrote the cache. The cache records that
+kernel, and an incremental run must use the same one (`label_cache_mismatch`). Only hexes containing a node whose labels changed
+are re-aggregated; their rows replace the old ones in the base T_hex table.
+
+The same merge makes a full run resumable: `kbest_resumable` runs the kernel over slices of the
+sources and folds each slice into the running labels, saving them to a run checkpoint after
+every slice (the union of per-slice top-K lists is the exact top-K).
+
+Label cache layout (one directory per state/mode):
+
+  best_src_idx.npy  int32 [N,K]  CSR node index of each label's anchor (-1 = empty)
+  time_s.npy        uint16 [N,K]
+  anchor_idx.npy    int32 [N]    anchor_int_id at each CSR node (-1 = not an anchor)
+  meta.json         n_nodes, k, cutoff_primary_s, cutoff_overflow_s, graph (CSR hash), kernel, built_at
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pyarrow as pa
+
+UNREACH_U16 = np.uint16(65535)
+
+_CACHE_ARRAYS = ("best_src_idx", "time_s", "anchor_idx")
+_MERGE_ROWS = 1 << 20
+
+
+def save_label_cache(cache_dir: str, best_src_idx: np.ndarray, time_s: np.ndarray, anchor_idx: np.ndarray,
+                     cutoff_primary_s: int, cutoff_overflow_s: int, graph_hash: Optional[str] = None,
+                     kernel: Optional[str] = None) -> None:
+    os.makedirs(cache_dir, exist_ok=True)
+    arrays = {"best_src_idx": best_src_idx, "time_s": time_s, "anchor_idx": anchor_idx}
+    for name in _CACHE_ARRAYS:
+        tmp = os.path.join(cache_dir, f"{name}.npy.tmp")
+        with open(tmp, "wb") as f:
+            np.save(f, np.ascontiguousarray(arrays[name]))
+        os.replace(tmp, os.path.join(cache_dir, f"{name}.npy"))
+    meta = {
+        "n_nodes": int(best_src_idx.shape[0]),
+        "k": int(best_src_idx.shape[1]),
+        "cutoff_primary_s": int(cutoff_primary_s),
+        "cutoff_overflow_s": int(cutoff_overflow_s),
+        "graph": graph_hash,
+        "kernel": kernel,
+        "built_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+    tmp = os.path.join(cache_dir, "meta.json.tmp")
+    with open(tmp, "w") as f:
+        json.dump(meta, f, indent=2)
+    os.replace(tmp, os.path.join(cache_dir, "meta.json"))
+
+
+def load_label_cache(cache_dir: str) -> Optional[Tuple[dict, Dict[str, np.ndarray]]]:
+    """(meta, arrays) of a label cache, or None when the directory has none."""
+    meta_path = os.path.join(cache_dir, "meta.json")
+    if not os.path.isfile(meta_path):
+        return None
+    with open(meta_path, "r") as f:
+        meta = json.load(f)
+    arrays = {name: np.load(os.path.join(cache_dir, f"{name}.npy")) for name in _CACHE_ARRAYS}
+    return meta, arrays
+
+
+def label_cache_mismatch(meta: dict, **expected) -> Dict[str, object]:
+    """{key: cached value} for every expected meta entry the cache does not match (empty = usable)."""
+    return {key: meta.get(key) for key, val in expected.items() if meta.get(key) != val}
+
+
+def changed_sources(old_anchor_idx: np.ndarray, new_anchor_idx: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    (removed, added) source node indices between two anchor placements.
+
+    A node whose anchor_int_id changed counts as both (removed, then re-added), which also
+    covers anchors that moved to a different node.
+    """
+    old_anchor_idx = np.asarray(old_anchor_idx)
+    new_anchor_idx = np.asarray(new_anchor_idx)
+    if old_anchor_idx.shape != new_anchor_idx.shape:
+        raise ValueError("anchor_idx arrays must cover the same graph")
+    diff = old_anchor_idx != new_anchor_idx
+    removed = np.flatnonzero(diff & (old_anchor_idx >= 0)).astype(np.int32)
+    added = np.flatnonzero(diff & (new_anchor_idx >= 0)).astype(np.int32)
+    return removed, added
+
+
+def merge_topk(src_a: np.ndarray, t_a: np.ndarray, src_b: np.ndarray, t_b: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Row-wise top-K of two label sets, one slot per source (its smallest time).
+
+    Rows come out ordered by (time, source index) with (-1, 65535) padding, the same layout the
+    K-best kernels emit.
+    """
+    src = np.concatenate([src_a, src_b], axis=1).astype(np.int32, copy=False)
+    t = np.concatenate([t_a, t_b], axis=1).astype(np.uint16, copy=True)
+    t[src < 0] = UNREACH_U16
+    # Keep the fastest slot per source: sort by (src, time), blank repeats of the same source
+    order = np.lexsort((t, src), axis=-1)
+    src = np.take_along_axis(src, order, axis=1)
+    t = np.take_along_axis(t, order, axis=1)
+    dup = np.zeros(src.shape, dtype=bool)
+    dup[:, 1:] = (src[:, 1:] == src[:, :-1]) & (src[:, 1:] >= 0)
+    src[dup] = -1
+    t[dup] = UNREACH_U16
+    # Final order: (time, src) with padding last
+    src_key = np.where(src >= 0, src, np.iinfo(np.int32).max)
+    order = np.lexsort((src_key, t), axis=-1)[:, :k]
+    return np.take_along_axis(src, order, axis=1), np.take_along_axis(t, order, axis=1)
+
+
+def _within_radius(kbest_fn: Callable, fwd_csr, seeds: np.ndarray, radius_s: int, threads: int) -> np.ndarray:
+    """Bool [N]: nodes x with d(seed → x) <= radius for some seed (forward graph)."""
+    indptr, indices, w_sec = fwd_csr
+    src, _ = kbest_fn(indptr, indices, w_sec, np.ascontiguousarray(seeds, dtype=np.int32), 1, radius_s, radius_s, threads, False)
+    return np.asarray(src)[:, 0] >= 0
+
+
+def repair_labels(
+    kbest_fn: Callable,
+    fwd_csr,
+    rev_csr,
+    best_src_idx: np.ndarray,
+    time_s: np.ndarray,
+    old_anchor_idx: np.ndarray,
+    new_anchor_idx: np.ndarray,
+    cutoff_primary_s: int,
+    cutoff_overflow_s: int,
+    threads: int = 1,
+) -> Tuple[np.ndarray, np.ndarray, dict]:
+    """
+    Node K-best labels for `new_anchor_idx`, starting from the labels computed for `old_anchor_idx`.
+
+    `kbest_fn` is one of the native K-best kernels (the frontier kernel for results identical to a
+    full rebuild); `fwd_csr`/`rev_csr` are (indptr, indices, w_sec) of the forward and reverse graph.
+    Returns (best_src_idx, time_s, stats).
+    """
+    k = int(best_src_idx.shape[1])
+    src = np.array(best_src_idx, dtype=np.int32, copy=True)
+    t = np.array(time_s, dtype=np.uint16, copy=True)
+    removed, added = changed_sources(old_anchor_idx, new_anchor_idx)
+    new_sources = np.flatnonzero(np.asarray(new_anchor_idx) >= 0).astype(np.int32)
+    stats = {"removed": int(removed.size), "added": int(added.size), "invalidated": 0, "repair_sources": 0, "merged": 0}
+    r_ind, r_idx, r_w = rev_csr
+
+    if removed.size:
+        invalid = np.flatnonzero(np.isin(src, removed).any(axis=1))
+        stats["invalidated"] = int(invalid.size)
+        if invalid.size:
+            # Any anchor that can label an invalid node lies within the overflow radius of it
+            ball = _within_radius(kbest_fn, fwd_csr, invalid, cutoff_overflow_s, threads)
+            cand = new_sources[ball[new_sources]]
+            stats["repair_sources"] = int(cand.size)
+            if cand.size:
+                rs, rt = kbest_fn(r_ind, r_idx, r_w, cand, k, cutoff_primary_s, cutoff_overflow_s, threads, False)
+                src[invalid] = np.asarray(rs)[invalid]
+                t[invalid] = np.asarray(rt)[invalid]
+            else:
+                src[invalid] = -1
+                t[invalid] = UNREACH_U16
+
+    if added.size:
+        a_src, a_t = kbest_fn(r_ind, r_idx, r_w, added, k, cutoff_primary_s, cutoff_overflow_s, threads, False)
+        a_src, a_t = np.asarray(a_src), np.asarray(a_t)
+        hit = np.flatnonzero(a_src[:, 0] >= 0)
+        stats["merged"] = int(hit.size)
+        if hit.size:
+            src[hit], t[hit] = merge_topk(src[hit], t[hit], a_src[hit], a_t[hit], k)
+
+    return src, t, stats
+
+
+def kbest_resumable(
+    kbest_fn: Callable,
+    rev_csr,
+    sources: np.ndarray,
+    k: int,
+    cutoff_primary_s: int,
+    cutoff_overflow_s: int,
+    threads: int,
+    n_chunks: int,
+    checkpoint,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Full K-best labels computed over `n_chunks` slices of `sources`, resuming from `checkpoint`.
+
+    `checkpoint` is a run_checkpoint.RunCheckpoint opened with inputs that pin the graph, sources,
+    K, cutoffs and `n_chunks`. After each slice the merged labels are saved and the slice is marked
+    done; re-running a slice whose merge was saved but not marked is harmless (merge_topk keeps one
+    slot per source).
+    """
+    n = int(rev_csr[0].shape[0] - 1)
+    sources = np.ascontiguousarray(sources, dtype=np.int32)
+    chunks = np.array_split(sources, max(1, min(int(n_chunks), sources.size)))
+    done = sum(checkpoint.is_done(f"chunk-{i}") for i in range(len(chunks)))
+    if done:
+        saved = checkpoint.load_arrays("labels")
+        src, t = saved["best_src_idx"], saved["time_s"]
+        print(f"[checkpoint] Resuming k-best after {done}/{len(chunks)} source chunks")
+    else:
+        src = np.full((n, k), -1, dtype=np.int32)
+        t = np.full((n, k), UNREACH_U16, dtype=np.uint16)
+
+    for i, chunk in enumerate(chunks):
+        key = f"chunk-{i}"
+        if checkpoint.is_done(key):
+            continue
+        start = time.perf_counter()
+        c_src, c_t = kbest_fn(*rev_csr, chunk, k, cutoff_primary_s, cutoff_overflow_s, threads, False)
+        c_src, c_t = np.asarray(c_src), np.asarray(c_t)
+        hit = np.flatnonzero(c_src[:, 0] >= 0)
+        for lo in range(0, hit.size, _MERGE_ROWS):
+            rows = hit[lo:lo + _MERGE_ROWS]
+            src[rows], t[rows] = merge_topk(src[rows], t[rows], c_src[rows], c_t[rows], k)
+        checkpoint.save_arrays("labels", best_src_idx=src, time_s=t)
+        checkpoint.mark(key, sources=int(chunk.size))
+        print(f"[checkpoint] k-best chunk {i + 1}/{len(chunks)}: {chunk.size} sources in {time.perf_counter() - start:.2f}s")
+    return src, t
+
+
+def labels_to_anchor_ids(best_src_idx: np.ndarray, anchor_idx: np.ndarray) -> np.ndarray:
+    return np.where(best_src_idx >= 0, np.asarray(anchor_idx)[np.maximum(best_src_idx, 0)], -1).astype(np.int32)
+
+
+def affected_hexes(node_h3_by_res: np.ndarray, changed_nodes: np.ndarray) -> Tuple[np.ndarray, List[np.ndarray]]:
+    """
+    (node rows to re-aggregate, affected h3 ids per resolution column).
+
+    A hex is affected when any of its nodes changed labels; every node of an affected hex (at any
+    resolution) is re-aggregated so those hexes come out complete.
+    """
+    node_h3_by_res = np.asarray(node_h3_by_res)
+    rows = np.zeros(node_h3_by_res.shape[0], dtype=bool)
+    hexes: List[np.ndarray] = []
+    for ri in range(node_h3_by_res.shape[1]):
+        hx = np.unique(node_h3_by_res[changed_nodes, ri])
+        hx = hx[hx != 0]
+        hexes.append(hx)
+        if hx.size:
+            rows |= np.isin(node_h3_by_res[:, ri], hx)
+    return np.flatnonzero(rows), hexes
+
+
+def patch_t_hex(base: pa.Table, fresh: pa.Table, res_used: List[int], hexes: List[np.ndarray]) -> pa.Table:
+    """
+    Replace the rows of affected (res, h3_id) hexes in `base` with those in `fresh`.
+
+    Both tables hold the native (h3_id, anchor_int_id, time_s, res) columns. `fresh` may contain
+    partial rows for unaffected hexes (nodes pulled in through another resolution); those are
+    dropped. The result is ordered by (res, h3_id, time_s, anchor_int_id).
+    """
+    def _in_affected(table: pa.Table) -> np.ndarray:
+        h3 = table.column("h3_id").to_numpy()
+        res = table.column("res").to_numpy()
+        mask = np.zeros(table.num_rows, dtype=bool)
+        for r, hx in zip(res_used, hexes):
+            if hx.size:
+                mask |= (res == int(r)) & np.isin(h3, hx)
+        return mask
+
+    cols = ["h3_id", "anchor_int_id", "time_s", "res"]
+    base = base.select(cols)
+    fresh = fresh.select(cols).cast(base.schema)
+    keep = base.filter(pa.array(~_in_affected(base)))
+    add = fresh.filter(pa.array(_in_affected(fresh)))
+    merged = pa.concat_tables([keep, add])
+    return merged.sort_by([("res", "ascending"), ("h3_id", "ascending"), ("time_s", "ascending"), ("anchor_int_id", "ascending")])
@@ -8,6 +8,10 @@ import pyarrow.ipc as pa_ipc
 from pyrosm import OSM
 from t_hex import build_csr_from_arrays, compute_h3_for_nodes
 
+from graph.reorder import NODE_ORDER_VERSION, node_order, permute_csr, reorder_csr_cache
+from graph.islands import format_report, prune_csr_cache
+from graph.bundle import save_npy_atomic
+
 
 def _default_drive_speed_kmh_for_highway(hwy: str) -> float:
     # Conservative defaults; favor smaller values to avoid underestimating travel time
@@ -197,7 +201,7 @@ def _csr_cache_dir(pbf_path: str, mode: str) -> str:
 
 
 def _save_npy(arr: np.ndarray, path: str):
-    np.save(path, arr)
+    save_npy_atomic(path, arr)
 
 
 def _load_npy(path: str, mmap: bool = True) -> np.ndarray:
@@ -245,9 +249,26 @@ def load_csr_npy(cache_dir: str, res: list[int]) -> tuple:
     return node_ids, indptr, indices, w_sec, lats, lons, h3_list
 
 
+def _configured_node_order(mode: str) -> dict | None:
+    """Node order requested by config.GRAPH_CONFIG[mode]["node_order"] (None keeps pyrosm order)."""
+    import config
+
+    method = config.GRAPH_CONFIG.get(mode, {}).get("node_order")
+    return {"method": method, "version": NODE_ORDER_VERSION} if method else None
+
+
+def _configured_min_component(mode: str) -> int:
+    """Island threshold from config.GRAPH_CONFIG[mode]["min_component_nodes"] (0 keeps every component)."""
+    import config
+
+    return int(config.GRAPH_CONFIG.get(mode, {}).get("min_component_nodes") or 0)
+
+
 def load_or_build_csr(pbf_path: str, mode: str, resolutions: list[int], progress: bool = True):
     cache_dir = _csr_cache_dir(pbf_path, mode)
     cache_valid = False
+    want_order = _configured_node_order(mode)
+    want_islands = _configured_min_component(mode)
     
     if os.path.isdir(cache_dir):
         # Validate cache before loading
@@ -274,6 +295,19 @@ def load_or_build_csr(pbf_path: str, mode: str, resolutions: list[int], progress
                 if meta.get("hierarchical_h3") is not True:
                     print("[graph cache] Cache missing hierarchical_h3 flag; rebuilding to ensure consistent mapping.")
                     cache_valid = False
+                pruned = (meta.get("islands") or {}).get("min_nodes")
+                if cache_valid and want_islands and pruned is not None and pruned != want_islands:
+                    # Dropped components cannot be restored in place
+                    print(f"[graph cache] Cache pruned at {pruned} nodes per component, config wants {want_islands}; rebuilding")
+                    cache_valid = False
+                elif cache_valid and want_islands and pruned is None:
+                    # Anchors may already be snapped to this cache; only prune_csr_islands.py knows
+                    # which components hold them, so the existing cache is left as is
+                    print(f"[graph cache] Cache is not pruned (config wants components of {want_islands}+ nodes); "
+                          f"run scripts/prune_csr_islands.py --anchors ... (make prune_islands) to prune it")
+                if cache_valid and want_order and meta.get("node_order") != want_order:
+                    print(f"[graph cache] Renumbering cached nodes ({want_order['method']} order v{want_order['version']})")
+                    reorder_csr_cache(cache_dir, want_order["method"])
             except Exception as e:
                 print(f"[graph cache] Failed to read/validate metadata: {e}, rebuilding cache")
                 cache_valid = False
@@ -326,6 +360,14 @@ def load_or_build_csr(pbf_path: str, mode: str, resolutions: list[int], progress
     h3_ids = compute_h3_for_nodes(lats, lons, np.array(resolutions, dtype=np.int32), os.cpu_count(), bool(progress))
     h3_ids = np.asarray(h3_ids, dtype=np.uint64)
     h3_by_res = {int(r): h3_ids[:, i] for i, r in enumerate(resolutions)}
+    if want_order:
+        perm = node_order(want_order["method"], indptr, indices, lats, lons)
+        indptr, indices, w_sec, arrays = permute_csr(
+            perm, indptr, indices, w_sec,
+            {"node_ids": node_ids, "lats": lats, "lons": lons, **{f"h3_r{r}": a for r, a in h3_by_res.items()}},
+        )
+        node_ids, lats, lons = arrays["node_ids"], arrays["lats"], arrays["lons"]
+        h3_by_res = {r: arrays[f"h3_r{r}"] for r in h3_by_res}
     
     # Save with enhanced metadata including PBF modification time
     pbf_mtime = os.path.getmtime(pbf_path)
@@ -338,8 +380,15 @@ def load_or_build_csr(pbf_path: str, mode: str, resolutions: list[int], progress
             "pbf_mtime": pbf_mtime,
             "cache_created": os.path.getmtime(cache_dir) if os.path.exists(cache_dir) else pbf_mtime,
             "hierarchical_h3": True,
+            **({"node_order": want_order} if want_order else {}),
         }
     )
+    if want_islands:
+        # Anchors are snapped to the cached graph afterwards, so no component needs protecting here
+        print(f"[graph cache] Pruning components under {want_islands} nodes: "
+              f"{format_report(prune_csr_cache(cache_dir, want_islands))}")
+        node_ids, indptr, indices, w_sec, lats, lons, h3_list = load_csr_npy(cache_dir, resolutions)
+        h3_by_res = {int(r): a for r, a in zip(resolutions, h3_list)}
     # Return stacked [N,R]
     h3_mat = np.column_stack([h3_by_res[int(r)] for r in resolutions]) if resolutions else np.empty((len(lats), 0), dtype=np.uint64)
     return node_ids, indptr, indices, w_sec, lats, lons, h3_mat, resolutions
@@ -0,0 +1,170 @@
+"""Locality-preserving node renumbering for the CSR cache.
+
+pyrosm emits nodes in file order, so the neighbours of a node are usually far apart in the
+per-node arrays and each relaxation in the K-best kernels and CH sweeps touches a new cache line.
+Renumbering puts nearby nodes next to each other:
+
+  hilbert  position along a Hilbert curve over (lon, lat), 16 bits per axis
+  rcm      reverse Cuthill–McKee on the undirected graph (BFS levels, low bandwidth)
+
+`permute_csr` applies a permutation to every per-node array (node ids, coordinates, H3 columns,
+the island remap of a pruned cache) and remaps the CSR consistently; `reorder_csr_cache` rewrites
+a cache directory in place and records the order in meta.json as {"node_order": {"method",
+"version"}}. Anything keyed on CSR node indices is invalidated by a reorder: CH binaries in the
+cache are removed, D_anchor fingerprints and T_hex label caches hash the graph and rebuild.
+
+`load_cache_arrays`, `save_cache_arrays`, `drop_ch_binaries` and `update_cache_meta` are the
+cache-directory helpers shared with `graph.islands`.
+"""
+
+from __future__ import annotations
+
+import glob
+import json
+import os
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+NODE_ORDER_VERSION = 1
+NODE_ORDER_METHODS = ("hilbert", "rcm")
+
+_CSR_NODE_ARRAYS = ("node_ids", "lats", "lons")
+# Per-node array written by graph.islands (new node index -> index in the unpruned graph)
+ISLAND_REMAP = "island_remap"
+
+
+def hilbert_order(lats: np.ndarray, lons: np.ndarray, bits: int = 16) -> np.ndarray:
+    """Permutation (new → old) sorting nodes by their Hilbert index on the lon/lat bounding box."""
+    lats = np.asarray(lats, dtype=np.float64)
+    lons = np.asarray(lons, dtype=np.float64)
+    if lats.size == 0:
+        return np.zeros(0, dtype=np.int64)
+    n = 1 << bits
+
+    def _grid(v: np.ndarray) -> np.ndarray:
+        lo, hi = float(v.min()), float(v.max())
+        scale = (n - 1) / (hi - lo) if hi > lo else 0.0
+        return np.clip(np.rint((v - lo) * scale), 0, n - 1).astype(np.int64)
+
+    x, y = _grid(lons), _grid(lats)
+    d = np.zeros(x.size, dtype=np.int64)
+    s = n >> 1
+    while s > 0:
+        rx = (x & s) > 0
+        ry = (y & s) > 0
+        d += s * s * ((3 * rx.astype(np.int64)) ^ ry.astype(np.int64))
+        # Rotate the quadrant so the curve stays continuous
+        flip = ~ry & rx
+        x = np.where(flip, n - 1 - x, x)
+        y = np.where(flip, n - 1 - y, y)
+        x, y = np.where(~ry, y, x), np.where(~ry, x, y)
+        s >>= 1
+    return np.argsort(d, kind="stable")
+
+
+def rcm_order(indptr: np.ndarray, indices: np.ndarray) -> np.ndarray:
+    """Permutation (new → old) from reverse Cuthill–McKee on the symmetrized graph."""
+    from scipy.sparse import csr_matrix
+    from scipy.sparse.csgraph import reverse_cuthill_mckee
+
+    n = int(indptr.shape[0] - 1)
+    adj = csr_matrix((np.ones(indices.shape[0], dtype=np.int8), np.asarray(indices), np.asarray(indptr)), shape=(n, n))
+    return np.asarray(reverse_cuthill_mckee((adj + adj.T).tocsr(), symmetric_mode=True), dtype=np.int64)
+
+
+def node_order(method: str, indptr: np.ndarray, indices: np.ndarray, lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+    if method == "hilbert":
+        return hilbert_order(lats, lons)
+    if method == "rcm":
+        return rcm_order(indptr, indices)
+    raise ValueError(f"Unknown node order {method!r}; expected one of {NODE_ORDER_METHODS}")
+
+
+def permute_csr(perm: np.ndarray, indptr: np.ndarray, indices: np.ndarray, w_sec: np.ndarray,
+                node_arrays: Dict[str, np.ndarray]) -> Tuple[np.ndarray, np.ndarray, np.ndarray, Dict[str, np.ndarray]]:
+    """
+    Renumber a CSR graph so new node i is old node perm[i].
+
+    Returns (indptr, indices, w_sec, node_arrays) with every per-node array gathered by `perm`;
+    edges keep their order within each row.
+    """
+    perm = np.asarray(perm, dtype=np.int64)
+    indptr = np.asarray(indptr, dtype=np.int64)
+    n = perm.size
+    if n != indptr.size - 1 or not np.array_equal(np.sort(perm), np.arange(n)):
+        raise ValueError("perm must be a permutation of the graph's nodes")
+    inv = np.empty(n, dtype=np.int64)
+    inv[perm] = np.arange(n, dtype=np.int64)
+
+    deg = np.diff(indptr)[perm]
+    new_indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(deg, out=new_indptr[1:])
+    src_edge = np.repeat(indptr[perm] - new_indptr[:-1], deg) + np.arange(int(new_indptr[-1]), dtype=np.int64)
+    new_indices = inv[np.asarray(indices)[src_edge]].astype(np.int32)
+    new_w = np.asarray(w_sec)[src_edge].astype(np.uint16, copy=False)
+    arrays = {name: np.ascontiguousarray(np.asarray(arr)[perm]) for name, arr in node_arrays.items()}
+    return new_indptr, new_indices, new_w, arrays
+
+
+def read_node_order(cache_dir: str) -> Optional[dict]:
+    """{"method", "version"} recorded for a CSR cache, or None for pyrosm order."""
+    meta_path = os.path.join(cache_dir, "meta.json")
+    if not os.path.isfile(meta_path):
+        return None
+    with open(meta_path, "r") as f:
+        return json.load(f).get("node_order")
+
+
+def load_cache_arrays(cache_dir: str) -> Tuple[np.ndarray, np.ndarray, np.ndarray, Dict[str, np.ndarray]]:
+    """(indptr, indices, w_sec, per-node arrays) of a cache directory: node ids, coordinates, H3 columns and island remap."""
+    def _load(name: str) -> np.ndarray:
+        return np.load(os.path.join(cache_dir, f"{name}.npy"), allow_pickle=False)
+
+    node_arrays = {name: _load(name) for name in _CSR_NODE_ARRAYS}
+    for path in sorted(glob.glob(os.path.join(cache_dir, "h3_r*.npy"))):
+        name = os.path.basename(path)[:-4]
+        node_arrays[name] = _load(name)
+    if os.path.isfile(os.path.join(cache_dir, f"{ISLAND_REMAP}.npy")):
+        node_arrays[ISLAND_REMAP] = _load(ISLAND_REMAP)
+    return _load("indptr"), _load("indices"), _load("w_sec"), node_arrays
+
+
+def save_cache_arrays(cache_dir: str, arrays: Dict[str, np.ndarray]) -> None:
+    """Write `<name>.npy` for each array via a temp file + rename."""
+    for name, arr in arrays.items():
+        tmp = os.path.join(cache_dir, f"{name}.npy.tmp")
+        with open(tmp, "wb") as f:
+            np.save(f, arr)
+        os.replace(tmp, os.path.join(cache_dir, f"{name}.npy"))
+
+
+def drop_ch_binaries(cache_dir: str) -> None:
+    """Remove cached contraction hierarchies, which are built over node indices."""
+    for path in glob.glob(os.path.join(cache_dir, "ch_graph*.bin")):
+        os.remove(path)
+
+
+def update_cache_meta(cache_dir: str, **entries) -> None:
+    """Set top-level keys of the cache's meta.json (written via a temp file + rename)."""
+    meta_path = os.path.join(cache_dir, "meta.json")
+    meta = {}
+    if os.path.isfile(meta_path):
+        with open(meta_path, "r") as f:
+            meta = json.load(f)
+    meta.update(entries)
+    tmp = meta_path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(meta, f)
+    os.replace(tmp, meta_path)
+
+
+def reorder_csr_cache(cache_dir: str, method: str) -> np.ndarray:
+    """Permute every array of a CSR cache directory in place; returns the permutation (new → old)."""
+    indptr, indices, w_sec, node_arrays = load_cache_arrays(cache_dir)
+    perm = node_order(method, indptr, indices, node_arrays["lats"], node_arrays["lons"])
+    indptr, indices, w_sec, node_arrays = permute_csr(perm, indptr, indices, w_sec, node_arrays)
+    save_cache_arrays(cache_dir, {"indptr": indptr, "indices": indices, "w_sec": w_sec, **node_arrays})
+    drop_ch_binaries(cache_dir)
+    update_cache_meta(cache_dir, node_order={"method": method, "version": NODE_ORDER_VERSION})
+    return perm
@@ -0,0 +1,181 @@
+"""Degree-2 chain contraction of a CSR road graph for the node→anchor K-best stage.
+
+OSM ways keep every shape node, so the K-best kernels spend most relaxations walking chains of
+nodes that only have the previous and the next node as neighbours. A *through node* is one of
+
+- one-way: one in-edge from u, one out-edge to w (u != w);
+- two-way: edges u↔v↔w and nothing else (u != w).
+
+Through nodes that are not kept (anchors, plus anything else in `keep`) are removed, and every
+maximal chain becomes a single edge between its kept endpoints whose weight is the chain's sum
+(saturating at 65535 s, above any kernel cutoff). Isolated cycles made only of through nodes are
+left as they are.
+
+A removed node can only leave its chain through the chain's endpoints, so its labels are the
+endpoints' labels shifted by the along-chain offsets: `expand_labels` rebuilds exact node-level
+K-best labels for H3 aggregation. Kept nodes keep their relative order, so the kernels'
+(time, source index) tie order is unchanged.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+import numpy as np
+
+from graph.kbest_incremental import UNREACH_U16, merge_topk
+
+_EXPAND_ROWS = 1 << 20
+
+
+@dataclass
+class ContractedGraph:
+    kept: np.ndarray        # int32[Nc] original node index of each contracted node
+    new_index: np.ndarray   # int32[N] contracted index, -1 for removed nodes
+    indptr: np.ndarray      # int64[Nc+1]
+    indices: np.ndarray     # int32[Mc]
+    w_sec: np.ndarray       # uint16[Mc]
+    removed: np.ndarray     # int32[R] original index of each removed node
+    end_a: np.ndarray       # int32[R] contracted index of the first chain exit
+    off_a: np.ndarray       # int64[R] seconds from the removed node to end_a
+    end_b: np.ndarray       # int32[R] second exit of two-way chains, -1 for one-way chains
+    off_b: np.ndarray       # int64[R]
+
+    @property
+    def n_nodes(self) -> int:
+        return int(self.kept.size)
+
+    @property
+    def n_edges(self) -> int:
+        return int(self.indices.size)
+
+    def expand_labels(self, best_src_idx: np.ndarray, time_s: np.ndarray, cutoff_overflow_s: int):
+        """
+        Node K-best labels on the original graph from labels on the contracted one.
+
+        `best_src_idx`/`time_s` are the kernel's [Nc,K] outputs; the result is [N,K] with source
+        indices in the original numbering and labels beyond `cutoff_overflow_s` dropped.
+        """
+        best_src_idx = np.asarray(best_src_idx)
+        time_s = np.asarray(time_s)
+        k = int(best_src_idx.shape[1])
+        src_orig = np.where(best_src_idx >= 0, self.kept[np.maximum(best_src_idx, 0)], -1).astype(np.int32)
+        src = np.full((self.new_index.size, k), -1, dtype=np.int32)
+        t = np.full((self.new_index.size, k), UNREACH_U16, dtype=np.uint16)
+        src[self.kept] = src_orig
+        t[self.kept] = time_s
+
+        def _shifted(end: np.ndarray, off: np.ndarray):
+            s = np.where(end[:, None] >= 0, src_orig[np.maximum(end, 0)], -1)
+            tt = time_s[np.maximum(end, 0)].astype(np.int64) + off[:, None]
+            drop = (s < 0) | (tt > int(cutoff_overflow_s))
+            s[drop] = -1
+            tt[drop] = int(UNREACH_U16)
+            return s, tt.astype(np.uint16)
+
+        for lo in range(0, self.removed.size, _EXPAND_ROWS):
+            sl = slice(lo, lo + _EXPAND_ROWS)
+            s_a, t_a = _shifted(self.end_a[sl], self.off_a[sl])
+            s_b, t_b = _shifted(self.end_b[sl], self.off_b[sl])
+            rows = self.removed[sl]
+            src[rows], t[rows] = merge_topk(s_a, t_a, s_b, t_b, k)
+        return src, t
+
+
+def _through_nodes(indptr: np.ndarray, indices: np.ndarray, keep: np.ndarray) -> np.ndarray:
+    n = indptr.size - 1
+    if indices.size == 0:
+        return np.zeros(n, dtype=bool)
+    out_deg = np.diff(indptr)
+    in_deg = np.bincount(indices, minlength=n)
+    tail = np.repeat(np.arange(n, dtype=np.int64), out_deg)
+    has_loop = np.zeros(n, dtype=bool)
+    has_loop[tail[tail == indices]] = True
+
+    in_order = np.argsort(indices, kind="stable")
+    in_tail = tail[in_order]
+    in_ptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(in_deg, out=in_ptr[1:])
+
+    first_out = np.minimum(indptr[:-1], indices.size - 1)
+    first_in = np.minimum(in_ptr[:-1], indices.size - 1)
+    h1 = indices[first_out].astype(np.int64)
+    i1 = in_tail[first_in]
+    one_way = (out_deg == 1) & (in_deg == 1) & (h1 != i1)
+
+    second_out = np.minimum(first_out + 1, indices.size - 1)
+    second_in = np.minimum(first_in + 1, indices.size - 1)
+    h2 = indices[second_out].astype(np.int64)
+    i2 = in_tail[second_in]
+    two_way = (
+        (out_deg == 2) & (in_deg == 2) & (h1 != h2)
+        & (np.minimum(h1, h2) == np.minimum(i1, i2)) & (np.maximum(h1, h2) == np.maximum(i1, i2))
+    )
+    return (one_way | two_way) & ~has_loop & ~keep
+
+
+def contract_degree2(indptr: np.ndarray, indices: np.ndarray, w_sec: np.ndarray, keep: np.ndarray) -> ContractedGraph:
+    """Contract unkept degree-2 through nodes of a forward CSR graph (see module docstring)."""
+    indptr = np.asarray(indptr, dtype=np.int64)
+    indices = np.asarray(indices, dtype=np.int64)
+    w = np.asarray(w_sec, dtype=np.int64)
+    n = indptr.size - 1
+    keep = np.asarray(keep, dtype=bool).copy()
+    tail = np.repeat(np.arange(n, dtype=np.int64), np.diff(indptr))
+
+    while True:
+        through = _through_nodes(indptr, indices, keep)
+        # Walk each edge along its chain: the next edge leaves the head without turning back
+        nxt = np.full(indices.size, -1, dtype=np.int64)
+        e = np.flatnonzero(through[indices])
+        if e.size:
+            p = indptr[indices[e]]
+            nxt[e] = np.where(indices[p] != tail[e], p, p + 1)
+        acc = w.copy()
+        end = indices.copy()
+        # Pointer doubling: O(log chain length) vectorized passes
+        for _ in range(int(np.ceil(np.log2(max(indices.size, 2)))) + 1):
+            a = np.flatnonzero(nxt >= 0)
+            if a.size == 0:
+                break
+            step = nxt[a]
+            acc_a, end_a, nxt_a = acc[a] + acc[step], end[step], nxt[step]
+            acc[a], end[a], nxt[a] = acc_a, end_a, nxt_a
+        cyclic = nxt >= 0
+        if not cyclic.any():
+            break
+        keep[tail[cyclic]] = True  # chains that never reach a kept node: leave those cycles alone
+
+    kept = np.flatnonzero(~through).astype(np.int32)
+    new_index = np.full(n, -1, dtype=np.int32)
+    new_index[kept] = np.arange(kept.size, dtype=np.int32)
+
+    e = np.flatnonzero(~through[tail] & (end != tail))
+    u = new_index[tail[e]].astype(np.int64)
+    v = new_index[end[e]].astype(np.int64)
+    cw = np.minimum(acc[e], int(UNREACH_U16))
+    # Parallel edges (e.g. a chain next to a direct road) collapse to the fastest one
+    order = np.lexsort((cw, v, u))
+    u, v, cw = u[order], v[order], cw[order]
+    first = np.ones(u.size, dtype=bool)
+    first[1:] = (u[1:] != u[:-1]) | (v[1:] != v[:-1])
+    u, v, cw = u[first], v[first], cw[first]
+    c_indptr = np.zeros(kept.size + 1, dtype=np.int64)
+    np.cumsum(np.bincount(u, minlength=kept.size), out=c_indptr[1:])
+
+    removed = np.flatnonzero(through).astype(np.int32)
+    p = indptr[removed]
+    two_way = np.diff(indptr)[removed] == 2
+    q = np.where(two_way, p + 1, p)
+    return ContractedGraph(
+        kept=kept,
+        new_index=new_index,
+        indptr=c_indptr,
+        indices=v.astype(np.int32),
+        w_sec=cw.astype(np.uint16),
+        removed=removed,
+        end_a=new_index[end[p]],
+        off_a=acc[p],
+        end_b=np.where(two_way, new_index[end[q]], -1).astype(np.int32),
+        off_b=np.where(two_way, acc[q], 0),
+    )
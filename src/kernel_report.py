@@ -0,0 +1,107 @@
+"""Per-run JSON reports of native kernel work (the `stats=True` dicts of the t_hex kernels).
+
+`kbest_multisource_*_csr`, `aggregate_h3_topk_*` and `CHGraph.many_to_many` accept `stats=True` and
+return an extra dict of work counters (pops, settled, relaxations, pruned, peak_queued, groups,
+labels, bucket_span) plus `phases_s`/`wall_s`. 04 and 06 collect them with --report into:
+
+  {"script": ..., "args": {...}, "started_at": ..., "wall_s": ...,
+   "totals": {kernel: {"calls": n, <summed counters>, "phases_s": {...}, "call_s": ...}},
+   "calls": [{"kernel": ..., <counters>, <context>}, ...]}
+
+Counters are summed across calls except `peak_queued`/`bucket_span` (maxima). `call_s` is the wall
+time seen from Python, so `call_s - wall_s` is the conversion/GIL overhead around the kernel. Steps
+without native stats (graph simplification, multi-label routing) are recorded with `call_s` only.
+A t_hex build that predates `stats=` still runs; its calls are recorded without counters.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+_MAX_COUNTERS = ("peak_queued", "bucket_span")
+
+
+def call_with_stats(fn: Callable, *args: Any, **kwargs: Any) -> Tuple[Any, Optional[Dict[str, Any]]]:
+    """Call a t_hex kernel with `stats=True`; returns (usual result, stats dict or None on older builds)."""
+    try:
+        out = fn(*args, stats=True, **kwargs)
+    except TypeError as exc:
+        if "stats" not in str(exc):
+            raise
+        return fn(*args, **kwargs), None
+    *result, stats = out
+    return (result[0] if len(result) == 1 else tuple(result)), stats
+
+
+class RunReport:
+    """Kernel stats of one script run, written as JSON to `path`."""
+
+    def __init__(self, path: str, script: str, args: Optional[Dict[str, Any]] = None):
+        self.path = path
+        self.script = script
+        self.args = {k: v for k, v in (args or {}).items() if isinstance(v, (str, int, float, bool, list, type(None)))}
+        self.calls: List[Dict[str, Any]] = []
+        self.started_at = time.strftime("%Y-%m-%dT%H:%M:%S")
+        self._start = time.perf_counter()
+
+    def add(self, kernel: str, stats: Optional[Dict[str, Any]] = None, **context: Any) -> None:
+        """Record one call of `kernel` (stats may be None for steps without native counters)."""
+        entry: Dict[str, Any] = {"kernel": kernel}
+        entry.update(stats or {})
+        entry.update(context)
+        self.calls.append(entry)
+
+    def instrument(self, kernel: str, fn: Callable, **context: Any) -> Callable:
+        """Wrap `fn` so every call requests stats, records them and returns the usual result."""
+        def _wrapped(*args: Any, **kwargs: Any) -> Any:
+            start = time.perf_counter()
+            result, stats = call_with_stats(fn, *args, **kwargs)
+            self.add(kernel, stats, call_s=time.perf_counter() - start, **context)
+            return result
+        return _wrapped
+
+    @contextmanager
+    def step(self, name: str, **context: Any):
+        """Time a Python-side step (recorded like a kernel call without counters)."""
+        start = time.perf_counter()
+        yield
+        self.add(name, None, call_s=time.perf_counter() - start, **context)
+
+    def totals(self) -> Dict[str, Dict[str, Any]]:
+        out: Dict[str, Dict[str, Any]] = {}
+        for call in self.calls:
+            agg = out.setdefault(call["kernel"], {"calls": 0})
+            agg["calls"] += 1
+            for key, val in call.items():
+                if key == "kernel":
+                    continue
+                if key == "phases_s":
+                    phases = agg.setdefault("phases_s", {})
+                    for name, secs in val.items():
+                        phases[name] = phases.get(name, 0.0) + secs
+                elif isinstance(val, (int, float)) and not isinstance(val, bool):
+                    if key in _MAX_COUNTERS:
+                        agg[key] = max(agg.get(key, 0), val)
+                    else:
+                        agg[key] = agg.get(key, 0) + val
+        return out
+
+    def write(self) -> None:
+        report = {
+            "script": self.script,
+            "args": self.args,
+            "started_at": self.started_at,
+            "wall_s": time.perf_counter() - self._start,
+            "totals": self.totals(),
+            "calls": self.calls,
+        }
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(report, f, indent=2)
+        os.replace(tmp, self.path)
+        print(f"[info] Wrote kernel report ({len(self.calls)} calls) to {self.path}")
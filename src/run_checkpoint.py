@@ -0,0 +1,100 @@
+"""Checkpoints for long routing runs (T_hex K-best chunks, D_anchor category shards).
+
+A run keeps its progress in one directory:
+
+  state.json        {"inputs": ..., "done": [keys], "updated_at": ...}
+  <key>.npz         arrays saved for a completed step
+  <key>.arrow       table saved for a completed step
+
+`inputs` describes everything the results depend on (graph/anchor hashes, K, cutoffs, chunking).
+Opening a checkpoint whose recorded inputs differ discards it, so a restart with the same inputs
+resumes from the completed steps and anything else starts clean. Every file is written to a
+temporary name and renamed, and a step is only marked done after its data is on disk, so a run
+killed at any point (e.g. a reclaimed preemptible VM) leaves a consistent checkpoint.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import time
+from typing import Any, Dict, Optional
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.ipc as pa_ipc
+
+_STATE = "state.json"
+
+
+def _replace_atomic(path: str, write) -> None:
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        write(f)
+    os.replace(tmp, path)
+
+
+class RunCheckpoint:
+    """Completed steps of one run, valid only for the inputs it was opened with."""
+
+    def __init__(self, directory: str, inputs: Dict[str, Any]):
+        self.directory = directory
+        # Compare in JSON form so tuples/ints round-trip the same way as the stored state
+        self.inputs = json.loads(json.dumps(inputs, sort_keys=True))
+        self.done: Dict[str, Any] = {}
+        state = self._read_state()
+        if state is not None and state.get("inputs") == self.inputs:
+            self.done = dict(state.get("done", {}))
+        elif state is not None:
+            print(f"[checkpoint] Inputs changed; discarding checkpoint in {directory}")
+            self.clear()
+
+    def _read_state(self) -> Optional[dict]:
+        path = os.path.join(self.directory, _STATE)
+        if not os.path.isfile(path):
+            return None
+        try:
+            with open(path, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _path(self, key: str, ext: str) -> str:
+        return os.path.join(self.directory, f"{key}{ext}")
+
+    def is_done(self, key: str) -> bool:
+        return key in self.done
+
+    def mark(self, key: str, **info: Any) -> None:
+        """Record `key` as completed (with optional JSON-serializable details)."""
+        os.makedirs(self.directory, exist_ok=True)
+        self.done[key] = info
+        state = {"inputs": self.inputs, "done": self.done, "updated_at": time.strftime("%Y-%m-%dT%H:%M:%S")}
+        _replace_atomic(os.path.join(self.directory, _STATE), lambda f: f.write(json.dumps(state, indent=2).encode()))
+
+    def save_arrays(self, key: str, **arrays: np.ndarray) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        _replace_atomic(self._path(key, ".npz"), lambda f: np.savez(f, **arrays))
+
+    def load_arrays(self, key: str) -> Dict[str, np.ndarray]:
+        with np.load(self._path(key, ".npz"), allow_pickle=False) as data:
+            return {name: data[name] for name in data.files}
+
+    def save_table(self, key: str, table: pa.Table) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+
+        def _write(f):
+            with pa_ipc.new_file(f, table.schema) as writer:
+                writer.write_table(table)
+
+        _replace_atomic(self._path(key, ".arrow"), _write)
+
+    def load_table(self, key: str) -> pa.Table:
+        with pa.OSFile(self._path(key, ".arrow"), "rb") as source:
+            return pa_ipc.open_file(source).read_all()
+
+    def clear(self) -> None:
+        """Remove the checkpoint (after the run's final output is written)."""
+        shutil.rmtree(self.directory, ignore_errors=True)
+        self.done = {}
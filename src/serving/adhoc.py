@@ -0,0 +1,74 @@
+"""Ad-hoc D_anchor for arbitrary POI sets: brand/category unions or explicit POI ids → anchor sources."""
+
+from __future__ import annotations
+
+import hashlib
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List
+
+import numpy as np
+import pandas as pd
+
+
+def _as_list(value) -> List[str]:
+    if isinstance(value, np.ndarray):
+        value = value.tolist()
+    if not isinstance(value, (list, tuple)):
+        return []
+    return [str(v) for v in value if v is not None and str(v).strip()]
+
+
+@dataclass
+class AnchorSetIndex:
+    """Inverted brand/category/POI → anchor_int_id index over one shard's anchor sites."""
+
+    by_brand: Dict[str, np.ndarray] = field(default_factory=dict)
+    by_category: Dict[str, np.ndarray] = field(default_factory=dict)
+    by_poi: Dict[str, int] = field(default_factory=dict)
+
+    @classmethod
+    def from_sites(cls, sites: pd.DataFrame) -> "AnchorSetIndex":
+        brands: Dict[str, List[int]] = {}
+        cats: Dict[str, List[int]] = {}
+        pois: Dict[str, int] = {}
+        cols = [c for c in ("anchor_int_id", "brands", "categories", "poi_ids") if c in sites.columns]
+        if "anchor_int_id" not in cols:
+            return cls()
+        for row in sites[cols].itertuples(index=False):
+            rec = row._asdict()
+            aid = int(rec["anchor_int_id"])
+            for b in _as_list(rec.get("brands")):
+                brands.setdefault(b, []).append(aid)
+            for c in _as_list(rec.get("categories")):
+                cats.setdefault(c, []).append(aid)
+            for p in _as_list(rec.get("poi_ids")):
+                pois[p] = aid
+        return cls(
+            by_brand={k: np.unique(np.asarray(v, dtype=np.int32)) for k, v in brands.items()},
+            by_category={k: np.unique(np.asarray(v, dtype=np.int32)) for k, v in cats.items()},
+            by_poi=pois,
+        )
+
+    def resolve(self, brands: Iterable[str] = (), categories: Iterable[str] = (), poi_ids: Iterable[str] = ()) -> np.ndarray:
+        """Sorted unique anchor_int_ids serving any of the given brands, categories or POIs."""
+        parts: List[np.ndarray] = []
+        parts += [self.by_brand[b] for b in brands if b in self.by_brand]
+        parts += [self.by_category[c] for c in categories if c in self.by_category]
+        hits = [self.by_poi[p] for p in poi_ids if p in self.by_poi]
+        if hits:
+            parts.append(np.asarray(hits, dtype=np.int32))
+        if not parts:
+            return np.zeros(0, dtype=np.int32)
+        return np.unique(np.concatenate(parts)).astype(np.int32, copy=False)
+
+
+def anchor_set_key(anchor_ids: np.ndarray) -> str:
+    """Canonical cache key for a source set: different spellings of the same anchors share it."""
+    ids = np.unique(np.asarray(anchor_ids, dtype=np.int64)).astype("<i4")
+    return hashlib.sha1(ids.tobytes()).hexdigest()[:16]
+
+
+def anchor_nodes_for(anchor_ids: np.ndarray, shard_anchor_ids: np.ndarray, shard_anchor_nodes: np.ndarray) -> np.ndarray:
+    """Graph node indices of the requested anchors (anchors not snapped in this shard are dropped)."""
+    mask = np.isin(np.asarray(shard_anchor_ids), np.asarray(anchor_ids))
+    return np.asarray(shard_anchor_nodes, dtype=np.int32)[mask]
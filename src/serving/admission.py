@@ -0,0 +1,137 @@
+"""Admission control for CPU-heavy API work (custom routing) on a dedicated bounded executor."""
+
+from __future__ import annotations
+
+import collections
+import contextvars
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, Optional
+
+
+class Overloaded(Exception):
+    """Raised when a task is rejected; callers map it to 503 + Retry-After."""
+
+    def __init__(self, reason: str, retry_after_s: float):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after_s = retry_after_s
+
+
+class AdmissionController:
+    """Bounded executor with a global queue limit and a per-client concurrency limit.
+
+    At most ``max_workers`` tasks run and at most ``max_queue`` wait; anything beyond is
+    rejected immediately instead of piling up behind FastAPI's shared threadpool. Each
+    client may hold ``per_client`` admitted (queued or running) tasks. Tasks that waited
+    longer than ``max_wait_s`` are dropped when they reach a worker, since the caller has
+    most likely given up. The caller's contextvars (e.g. the pinned dataset snapshot)
+    are carried into the worker thread.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = 4,
+        max_queue: int = 16,
+        per_client: int = 2,
+        retry_after_s: float = 2.0,
+        max_wait_s: float = 0.0,
+        name: str = "routing",
+    ):
+        self.max_workers = max(1, int(max_workers))
+        self.max_queue = max(0, int(max_queue))
+        self.per_client = max(1, int(per_client))
+        self.retry_after_s = float(retry_after_s)
+        self.max_wait_s = float(max_wait_s)
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=name)
+        self._lock = threading.Lock()
+        self._running = 0
+        self._queued = 0
+        self._by_client: Dict[str, int] = collections.defaultdict(int)
+        self._waits: Deque[float] = collections.deque(maxlen=512)
+        self._runs: Deque[float] = collections.deque(maxlen=512)
+        self.counters: Dict[str, int] = collections.defaultdict(int)
+
+    def submit(self, client_id: str, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Future:
+        with self._lock:
+            if self._by_client[client_id] >= self.per_client:
+                self.counters["rejected_client"] += 1
+                raise Overloaded("per-client concurrency limit", self.retry_after_s)
+            if self._running + self._queued >= self.max_workers + self.max_queue:
+                self.counters["rejected_queue"] += 1
+                raise Overloaded("routing queue full", self.retry_after_s)
+            self._queued += 1
+            self._by_client[client_id] += 1
+            self.counters["admitted"] += 1
+        enqueued = time.monotonic()
+        ctx = contextvars.copy_context()
+
+        def _task():
+            started = time.monotonic()
+            with self._lock:
+                self._queued -= 1
+                self._running += 1
+                self._waits.append(started - enqueued)
+            try:
+                if self.max_wait_s > 0 and started - enqueued > self.max_wait_s:
+                    with self._lock:
+                        self.counters["expired"] += 1
+                    raise Overloaded("queued past max wait", self.retry_after_s)
+                result = ctx.run(fn, *args, **kwargs)
+                with self._lock:
+                    self.counters["completed"] += 1
+                return result
+            except Overloaded:
+                raise
+            except Exception:
+                with self._lock:
+                    self.counters["failed"] += 1
+                raise
+            finally:
+                with self._lock:
+                    self._running -= 1
+                    self._runs.append(time.monotonic() - started)
+                    self._by_client[client_id] -= 1
+                    if self._by_client[client_id] <= 0:
+                        del self._by_client[client_id]
+
+        try:
+            return self._executor.submit(_task)
+        except RuntimeError:
+            # Executor shut down: undo the reservation
+            with self._lock:
+                self._queued -= 1
+                self._by_client[client_id] -= 1
+                if self._by_client[client_id] <= 0:
+                    del self._by_client[client_id]
+            raise Overloaded("routing executor stopped", self.retry_after_s)
+
+    def shutdown(self, wait: bool = False) -> None:
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            waits = sorted(self._waits)
+            runs = sorted(self._runs)
+            return {
+                "running": self._running,
+                "queued": self._queued,
+                "clients": len(self._by_client),
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "per_client": self.per_client,
+                "counters": dict(self.counters),
+                "queue_wait_ms": _percentiles(waits),
+                "run_ms": _percentiles(runs),
+            }
+
+
+def _percentiles(sorted_s: list) -> Optional[Dict[str, float]]:
+    if not sorted_s:
+        return None
+
+    def pick(q: float) -> float:
+        return round(sorted_s[min(len(sorted_s) - 1, int(q * len(sorted_s)))] * 1000.0, 2)
+
+    return {"p50": pick(0.50), "p95": pick(0.95), "max": round(sorted_s[-1] * 1000.0, 2)}
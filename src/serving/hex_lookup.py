@@ -0,0 +1,130 @@
+"""Hex -> anchor lookups for hover tooltips: an mmap'd hex-ordinal index over merged T_hex plus dense D_anchor arrays.
+
+Index layout (``data/hex_index/r<res>/``), built from ``state_tiles/us_r<res>.parquet``::
+
+    hex_ids.npy   uint64 [H]      sorted H3 ids (row ordinal = searchsorted position)
+    a_id.npy      int32  [H, K]   anchor_int_id per slot, -1 when empty
+    a_s.npy       uint16 [H, K]   hex->anchor seconds per slot, UNREACH when empty
+    meta.json     res, k, rows, source, source_mtime
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import re
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+UNREACH_U16 = 65535
+_SLOT_RE = re.compile(r"^a(\d+)_id$")
+
+
+def build_hex_index(source_parquet: str, out_dir: str, res: int) -> Dict[str, object]:
+    """Write the hex-ordinal index for one resolution from the merged wide T_hex parquet."""
+    import pyarrow.parquet as pq
+
+    schema = pq.read_schema(source_parquet)
+    slots = sorted(int(m.group(1)) for m in (_SLOT_RE.match(n) for n in schema.names) if m)
+    slots = [i for i in slots if f"a{i}_s" in schema.names]
+    if not slots:
+        raise RuntimeError(f"{source_parquet} has no a{{i}}_id/a{{i}}_s columns")
+    cols = ["h3_id"] + [f"a{i}_id" for i in slots] + [f"a{i}_s" for i in slots]
+    if "res" in schema.names:
+        cols.append("res")
+    table = pq.read_table(source_parquet, columns=cols)
+    if "res" in table.column_names:
+        res_col = table.column("res").to_numpy(zero_copy_only=False)
+        keep = np.flatnonzero(res_col == int(res))
+        table = table.take(keep)
+
+    h3_ids = table.column("h3_id").to_numpy(zero_copy_only=False).astype(np.uint64, copy=False)
+    order = np.argsort(h3_ids, kind="stable")
+    h3_ids = h3_ids[order]
+    if h3_ids.size > 1 and np.any(h3_ids[1:] == h3_ids[:-1]):
+        raise RuntimeError(f"{source_parquet} has duplicate h3_id rows at res {res}")
+
+    k = len(slots)
+    a_id = np.full((h3_ids.size, k), -1, dtype=np.int32)
+    a_s = np.full((h3_ids.size, k), UNREACH_U16, dtype=np.uint16)
+    for j, i in enumerate(slots):
+        ids = table.column(f"a{i}_id").to_numpy(zero_copy_only=False)
+        secs = table.column(f"a{i}_s").to_numpy(zero_copy_only=False)
+        ids = np.asarray(ids, dtype=np.float64)[order]
+        secs = np.asarray(secs, dtype=np.float64)[order]
+        ok = np.isfinite(ids) & np.isfinite(secs) & (ids >= 0)
+        a_id[ok, j] = ids[ok].astype(np.int32)
+        a_s[ok, j] = np.minimum(secs[ok], UNREACH_U16).astype(np.uint16)
+
+    os.makedirs(out_dir, exist_ok=True)
+    np.save(os.path.join(out_dir, "hex_ids.npy"), h3_ids)
+    np.save(os.path.join(out_dir, "a_id.npy"), a_id)
+    np.save(os.path.join(out_dir, "a_s.npy"), a_s)
+    meta = {
+        "res": int(res),
+        "k": k,
+        "rows": int(h3_ids.size),
+        "source": os.path.basename(source_parquet),
+        "source_mtime": os.path.getmtime(source_parquet),
+    }
+    with open(os.path.join(out_dir, "meta.json"), "w") as f:
+        json.dump(meta, f)
+    return meta
+
+
+@dataclass
+class HexLookupIndex:
+    """Memory-mapped view of one resolution's index; lookups are a binary search plus two row reads."""
+
+    res: int
+    hex_ids: np.ndarray
+    a_id: np.ndarray
+    a_s: np.ndarray
+
+    @classmethod
+    def open(cls, index_dir: str) -> "HexLookupIndex":
+        with open(os.path.join(index_dir, "meta.json"), "r") as f:
+            meta = json.load(f)
+        return cls(
+            res=int(meta["res"]),
+            hex_ids=np.load(os.path.join(index_dir, "hex_ids.npy"), mmap_mode="r"),
+            a_id=np.load(os.path.join(index_dir, "a_id.npy"), mmap_mode="r"),
+            a_s=np.load(os.path.join(index_dir, "a_s.npy"), mmap_mode="r"),
+        )
+
+    def ordinal(self, h3_id: int) -> Optional[int]:
+        i = int(np.searchsorted(self.hex_ids, np.uint64(h3_id)))
+        if i < self.hex_ids.size and int(self.hex_ids[i]) == int(h3_id):
+            return i
+        return None
+
+    def row(self, ordinal: int) -> Tuple[np.ndarray, np.ndarray]:
+        return np.asarray(self.a_id[ordinal]), np.asarray(self.a_s[ordinal])
+
+
+def dense_d_anchor(anchor_ids: np.ndarray, seconds: np.ndarray) -> np.ndarray:
+    """D_anchor as a uint16 array indexed by anchor_int_id (UNREACH where absent)."""
+    anchor_ids = np.asarray(anchor_ids, dtype=np.int64)
+    if anchor_ids.size == 0:
+        return np.full(0, UNREACH_U16, dtype=np.uint16)
+    dense = np.full(int(anchor_ids.max()) + 1, UNREACH_U16, dtype=np.uint16)
+    dense[anchor_ids] = np.asarray(seconds, dtype=np.uint16)
+    return dense
+
+
+def best_anchor(a_id: np.ndarray, a_s: np.ndarray, dense: np.ndarray) -> Optional[Tuple[int, int, int]]:
+    """min over slots of a_s + D[a_id]; returns (total_seconds, anchor_id, slot) or None if nothing reachable."""
+    ids = np.asarray(a_id, dtype=np.int64)
+    ok = (ids >= 0) & (ids < dense.size) & (np.asarray(a_s) < UNREACH_U16)
+    if not ok.any():
+        return None
+    d = np.full(ids.shape, UNREACH_U16, dtype=np.uint32)
+    d[ok] = dense[ids[ok]]
+    ok &= d < UNREACH_U16
+    if not ok.any():
+        return None
+    total = np.where(ok, np.asarray(a_s, dtype=np.uint32) + d, np.uint32(0xFFFFFFFF))
+    slot = int(np.argmin(total))
+    return int(total[slot]), int(ids[slot]), slot
@@ -0,0 +1,354 @@
+"""Per-state dataset shards for the API: discovery, lazy loading, point routing and LRU unloading."""
+
+from __future__ import annotations
+
+import glob
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    from h3.api import basic_int as _h3i
+except Exception:  # pragma: no cover - h3 is a hard dependency of the API
+    _h3i = None  # type: ignore
+
+# Resolution used for the per-state coverage index (coarse enough to stay small nationwide).
+ROUTING_H3_RES = 7
+
+Loader = Callable[["StateShard"], Tuple[Dict[str, Any], Dict[str, Any]]]
+
+
+@dataclass
+class StateShard:
+    """One state's graph + anchors for a travel mode; heavy payloads are loaded on demand."""
+
+    state: str
+    mode: str
+    data_root: str
+    cache_dir: str
+    pbf_path: str
+    sites_path: Optional[str]
+    bbox: Optional[Tuple[float, float, float, float]] = None  # lon_min, lat_min, lon_max, lat_max
+    coverage: Optional[np.ndarray] = None  # sorted uint64 H3 cells at ROUTING_H3_RES
+    graph: Optional[Dict[str, Any]] = None
+    anchors: Optional[Dict[str, Any]] = None
+    nbytes: int = 0
+    loads: int = 0
+    last_used: float = 0.0
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    @property
+    def key(self) -> Tuple[str, str]:
+        return (self.state, self.mode)
+
+    @property
+    def loaded(self) -> bool:
+        return self.graph is not None
+
+    def contains(self, lon: float, lat: float) -> bool:
+        if self.bbox is None:
+            return False
+        x0, y0, x1, y1 = self.bbox
+        return x0 <= lon <= x1 and y0 <= lat <= y1
+
+    def covers_cell(self, cell: int) -> bool:
+        if self.coverage is None or self.coverage.size == 0:
+            return False
+        i = int(np.searchsorted(self.coverage, np.uint64(cell)))
+        return i < self.coverage.size and int(self.coverage[i]) == int(cell)
+
+    def unload(self) -> None:
+        self.graph = None
+        self.anchors = None
+        self.nbytes = 0
+
+
+def payload_nbytes(*payloads: Optional[Dict[str, Any]]) -> int:
+    """Approximate resident size of shard payloads (numpy arrays and data frames)."""
+    total = 0
+    for payload in payloads:
+        if not payload:
+            continue
+        for value in payload.values():
+            if isinstance(value, np.ndarray):
+                total += int(value.nbytes)
+            elif hasattr(value, "memory_usage") and callable(getattr(value, "memory_usage")):
+                try:
+                    total += int(value.memory_usage(deep=False).sum())
+                except Exception:
+                    pass
+    return total
+
+
+def _ch_cache_bytes(cache_dir: str) -> int:
+    """On-disk size of cached CH graphs, used as a proxy for their in-memory footprint."""
+    return sum(os.path.getsize(p) for p in glob.glob(os.path.join(cache_dir, "ch_graph*.bin")))
+
+
+def _mode_suffix(mode: str) -> str:
+    return f"_{mode}.npycache"
+
+
+def _bbox_from_config(state: str) -> Optional[Tuple[float, float, float, float]]:
+    try:
+        import config  # type: ignore
+
+        box = getattr(config, "STATE_BOUNDING_BOXES", {}).get(state)
+    except Exception:
+        box = None
+    if not box:
+        return None
+    return (float(box["west"]), float(box["south"]), float(box["east"]), float(box["north"]))
+
+
+def _coverage_from_cache(cache_dir: str) -> Optional[np.ndarray]:
+    """Distinct routing-resolution cells covered by the graph (from the cached per-node H3 ids)."""
+    fine = None
+    for res in (ROUTING_H3_RES, 8, 9):
+        path = os.path.join(cache_dir, f"h3_r{res}.npy")
+        if os.path.exists(path):
+            fine = (res, np.load(path, mmap_mode="r"))
+            break
+    if fine is None:
+        return None
+    res, arr = fine
+    cells = np.unique(np.asarray(arr))
+    cells = cells[cells != 0]
+    if res != ROUTING_H3_RES and _h3i is not None:
+        cells = np.unique(np.fromiter((_h3i.cell_to_parent(int(c), ROUTING_H3_RES) for c in cells), dtype=np.uint64, count=cells.size))
+    return cells.astype(np.uint64, copy=False)
+
+
+def _bbox_from_cache(cache_dir: str) -> Optional[Tuple[float, float, float, float]]:
+    lats_p = os.path.join(cache_dir, "lats.npy")
+    lons_p = os.path.join(cache_dir, "lons.npy")
+    if not (os.path.exists(lats_p) and os.path.exists(lons_p)):
+        return None
+    lats = np.load(lats_p, mmap_mode="r")
+    lons = np.load(lons_p, mmap_mode="r")
+    if lats.size == 0:
+        return None
+    return (float(np.min(lons)), float(np.min(lats)), float(np.max(lons)), float(np.max(lats)))
+
+
+class ShardRegistry:
+    """Discovers per-state artifacts under a data root and serves them lazily.
+
+    Shards are loaded on first use through ``loader`` and unloaded least-recently-used
+    first when the summed payload size exceeds ``memory_budget_bytes`` or when a shard
+    has been idle longer than ``idle_ttl_s``. Callers keep their own references, so an
+    unloaded shard's arrays are freed once in-flight requests finish. Limits are enforced
+    on every ``get()``; ``start_sweeper()`` also enforces them periodically so idle shards
+    are unloaded when no requests arrive.
+    """
+
+    def __init__(
+        self,
+        loader: Loader,
+        data_root: str = "data",
+        modes: Tuple[str, ...] = ("drive", "walk"),
+        states: Optional[List[str]] = None,
+        memory_budget_bytes: int = 0,
+        idle_ttl_s: float = 0.0,
+    ):
+        self.loader = loader
+        self.data_root = data_root
+        self.modes = tuple(modes)
+        self.allowed_states = set(states) if states else None
+        self.memory_budget_bytes = int(memory_budget_bytes)
+        self.idle_ttl_s = float(idle_ttl_s)
+        self._shards: Dict[Tuple[str, str], StateShard] = {}
+        self._lock = threading.Lock()
+        self.evictions = 0
+        self._sweeper: Optional[threading.Thread] = None
+        self._stop_sweep = threading.Event()
+
+    # ---------- discovery ----------
+    def discover(self) -> List[StateShard]:
+        osm_dir = os.path.join(self.data_root, "osm")
+        found: Dict[Tuple[str, str], StateShard] = {}
+        for mode in self.modes:
+            suffix = _mode_suffix(mode)
+            states = {
+                os.path.basename(p)[: -len(suffix)]
+                for p in glob.glob(os.path.join(osm_dir, "cache_csr", f"*{suffix}"))
+            }
+            states.update(
+                os.path.basename(p)[: -len(".osm.pbf")] for p in glob.glob(os.path.join(osm_dir, "*.osm.pbf"))
+            )
+            for state in sorted(states):
+                if self.allowed_states is not None and state not in self.allowed_states:
+                    continue
+                cache_dir = os.path.join(osm_dir, "cache_csr", f"{state}{suffix}")
+                pbf_path = os.path.join(osm_dir, f"{state}.osm.pbf")
+                if not os.path.isdir(cache_dir) and not os.path.isfile(pbf_path):
+                    continue
+                sites = os.path.join(self.data_root, "anchors", f"{state}_{mode}_sites.parquet")
+                legacy_sites = os.path.join(self.data_root, "minutes", f"{state}_{mode}_sites.parquet")
+                sites_path = sites if os.path.exists(sites) else (legacy_sites if os.path.exists(legacy_sites) else None)
+                shard = StateShard(
+                    state=state,
+                    mode=mode,
+                    data_root=self.data_root,
+                    cache_dir=cache_dir,
+                    pbf_path=pbf_path,
+                    sites_path=sites_path,
+                )
+                if os.path.isdir(cache_dir):
+                    shard.bbox = _bbox_from_cache(cache_dir)
+                    shard.coverage = _coverage_from_cache(cache_dir)
+                if shard.bbox is None:
+                    shard.bbox = _bbox_from_config(state)
+                found[shard.key] = shard
+        with self._lock:
+            # Keep already-loaded payloads for shards that are still present.
+            for key, shard in found.items():
+                old = self._shards.get(key)
+                if old is not None and old.loaded:
+                    shard.graph, shard.anchors, shard.nbytes = old.graph, old.anchors, old.nbytes
+                    shard.loads, shard.last_used = old.loads, old.last_used
+            self._shards = found
+        return list(found.values())
+
+    def states(self, mode: Optional[str] = None) -> List[str]:
+        with self._lock:
+            return sorted({s.state for s in self._shards.values() if mode is None or s.mode == mode})
+
+    def shard(self, state: str, mode: str) -> Optional[StateShard]:
+        with self._lock:
+            return self._shards.get((state, mode))
+
+    # ---------- routing ----------
+    def route_point(self, lon: float, lat: float, mode: str) -> Optional[str]:
+        """Pick the state shard for a point: H3 coverage first, then bbox, smallest bbox wins ties."""
+        with self._lock:
+            candidates = [s for s in self._shards.values() if s.mode == mode]
+        if not candidates:
+            return None
+        if _h3i is not None:
+            try:
+                cell = _h3i.latlng_to_cell(float(lat), float(lon), ROUTING_H3_RES)
+            except Exception:
+                cell = None
+            if cell is not None:
+                covering = [s for s in candidates if s.covers_cell(cell)]
+                if covering:
+                    return _smallest_bbox(covering).state
+        boxed = [s for s in candidates if s.contains(lon, lat)]
+        if boxed:
+            return _smallest_bbox(boxed).state
+        if len(candidates) == 1:
+            return candidates[0].state
+        return None
+
+    # ---------- loading / unloading ----------
+    def get(self, state: str, mode: str) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        shard = self.shard(state, mode)
+        if shard is None:
+            raise KeyError(f"no dataset shard for state={state} mode={mode}")
+        with shard.lock:
+            if not shard.loaded:
+                graph, anchors = self.loader(shard)
+                shard.graph, shard.anchors = graph, anchors
+                shard.nbytes = payload_nbytes(graph, anchors) + _ch_cache_bytes(shard.cache_dir)
+                shard.loads += 1
+                print(f"[shards] Loaded {state}/{mode}: {shard.nbytes / 1e6:.1f} MB")
+            shard.last_used = time.monotonic()
+            graph, anchors = shard.graph, shard.anchors
+        self.enforce_limits(keep=shard.key)
+        return graph, anchors  # type: ignore[return-value]
+
+    def enforce_limits(self, keep: Optional[Tuple[str, str]] = None) -> List[Tuple[str, str]]:
+        """Unload idle shards and, if over budget, least-recently-used ones (never ``keep``)."""
+        now = time.monotonic()
+        evicted: List[Tuple[str, str]] = []
+        with self._lock:
+            loaded = sorted(((s, s.last_used) for s in self._shards.values() if s.loaded and s.key != keep),
+                            key=lambda item: item[1])
+            total = sum(s.nbytes for s in self._shards.values() if s.loaded)
+        for shard, seen in loaded:
+            idle = self.idle_ttl_s > 0 and (now - seen) > self.idle_ttl_s
+            over = self.memory_budget_bytes > 0 and total > self.memory_budget_bytes
+            if not (idle or over):
+                continue
+            with shard.lock:
+                # get() may have touched the shard since the snapshot: it is neither idle nor LRU now
+                if not shard.loaded or shard.last_used != seen:
+                    continue
+                total -= shard.nbytes
+                print(f"[shards] Unloading {shard.state}/{shard.mode} ({'idle' if idle else 'memory budget'}, {shard.nbytes / 1e6:.1f} MB)")
+                shard.unload()
+            evicted.append(shard.key)
+        with self._lock:
+            self.evictions += len(evicted)
+        return evicted
+
+    def start_sweeper(self, interval_s: Optional[float] = None) -> None:
+        """Run ``enforce_limits()`` every ``interval_s`` (default: half the idle TTL) on a daemon thread."""
+        if self.idle_ttl_s <= 0 or self._sweeper is not None:
+            return
+        interval = float(interval_s) if interval_s else max(1.0, self.idle_ttl_s / 2)
+        self._stop_sweep.clear()
+        self._sweeper = threading.Thread(target=self._sweep, args=(interval,), name="shard-sweeper", daemon=True)
+        self._sweeper.start()
+
+    def stop_sweeper(self) -> None:
+        self._stop_sweep.set()
+        if self._sweeper is not None:
+            self._sweeper.join(timeout=5)
+            self._sweeper = None
+
+    def _sweep(self, interval: float) -> None:
+        while not self._stop_sweep.wait(interval):
+            try:
+                self.enforce_limits()
+            except Exception as e:  # keep sweeping; the next get() enforces limits as well
+                print(f"[warn] Shard sweeper error: {e}")
+
+    def unload_all(self) -> None:
+        with self._lock:
+            shards = list(self._shards.values())
+        for shard in shards:
+            with shard.lock:
+                shard.unload()
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        with self._lock:
+            shards = sorted(self._shards.values(), key=lambda s: s.key)
+        rows = [
+            {
+                "state": s.state,
+                "mode": s.mode,
+                "loaded": s.loaded,
+                "bytes": s.nbytes,
+                "loads": s.loads,
+                "idle_s": round(now - s.last_used, 1) if s.last_used else None,
+                "bbox": list(s.bbox) if s.bbox else None,
+                "has_anchors": s.sites_path is not None,
+            }
+            for s in shards
+        ]
+        return {
+            "data_root": self.data_root,
+            "resident_bytes": sum(r["bytes"] for r in rows),
+            "memory_budget_bytes": self.memory_budget_bytes,
+            "idle_ttl_s": self.idle_ttl_s,
+            "evictions": self.evictions,
+            "sweeping": self._sweeper is not None,
+            "shards": rows,
+        }
+
+
+def _smallest_bbox(shards: List[StateShard]) -> StateShard:
+    def area(s: StateShard) -> float:
+        if s.bbox is None:
+            return float("inf")
+        x0, y0, x1, y1 = s.bbox
+        return (x1 - x0) * (y1 - y0)
+
+    return min(shards, key=lambda s: (area(s), s.state))
@@ -0,0 +1,291 @@
+"""Versioned dataset releases for the API: manifests, the CURRENT pointer and atomic hot swaps.
+
+Layout (``releases_dir`` defaults to ``releases/``)::
+
+    releases/
+      CURRENT                      # one line: the version being served
+      <version>/
+        manifest.json              # version, created, dataset_version, states, files{relpath: bytes}
+        data/...                   # same layout as the working-tree data/ (anchors, poi, d_anchor_*, osm/cache_csr, taxonomy)
+        tiles/...                  # *.pmtiles
+
+Without a CURRENT pointer the API serves the working tree (``data/`` + ``tiles/``) as before.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from serving.shards import ShardRegistry
+
+MANIFEST_NAME = "manifest.json"
+CURRENT_NAME = "CURRENT"
+WORKING_TREE_VERSION = "working-tree"
+
+
+# ---------- manifest + pointer helpers (shared with scripts/publish_dataset.py) ----------
+def _atomic_write_text(path: str, text: str) -> None:
+    tmp = f"{path}.tmp-{os.getpid()}"
+    with open(tmp, "w") as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def build_manifest(version_dir: str, version: str, **extra: Any) -> Dict[str, Any]:
+    """Describe every file under ``version_dir`` (relative path -> size in bytes)."""
+    files: Dict[str, int] = {}
+    for dirpath, _, filenames in os.walk(version_dir):
+        for name in filenames:
+            if name == MANIFEST_NAME:
+                continue
+            full = os.path.join(dirpath, name)
+            files[os.path.relpath(full, version_dir)] = os.path.getsize(full)
+    manifest: Dict[str, Any] = {
+        "version": version,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        **extra,
+        "files": dict(sorted(files.items())),
+    }
+    return manifest
+
+
+def write_manifest(version_dir: str, manifest: Dict[str, Any]) -> str:
+    path = os.path.join(version_dir, MANIFEST_NAME)
+    _atomic_write_text(path, json.dumps(manifest, indent=2) + "\n")
+    return path
+
+
+def read_manifest(version_dir: str) -> Dict[str, Any]:
+    with open(os.path.join(version_dir, MANIFEST_NAME), "r") as f:
+        return json.load(f)
+
+
+def verify_manifest(version_dir: str, manifest: Dict[str, Any]) -> List[str]:
+    """Return a list of problems (missing files or size mismatches); empty when the release is complete."""
+    problems: List[str] = []
+    for rel, size in (manifest.get("files") or {}).items():
+        full = os.path.join(version_dir, rel)
+        if not os.path.isfile(full):
+            problems.append(f"missing {rel}")
+        elif os.path.getsize(full) != int(size):
+            problems.append(f"size mismatch {rel}: {os.path.getsize(full)} != {size}")
+    return problems
+
+
+def read_current(releases_dir: str) -> Optional[str]:
+    path = os.path.join(releases_dir, CURRENT_NAME)
+    try:
+        with open(path, "r") as f:
+            version = f.read().strip()
+    except FileNotFoundError:
+        return None
+    return version or None
+
+
+def set_current(releases_dir: str, version: str) -> None:
+    """Atomically point CURRENT at ``version`` (rename over the old pointer)."""
+    _atomic_write_text(os.path.join(releases_dir, CURRENT_NAME), version + "\n")
+
+
+# ---------- snapshots ----------
+@dataclass
+class DatasetSnapshot:
+    """One immutable dataset version plus everything the API derived from it."""
+
+    version: str
+    root: str
+    shards: ShardRegistry
+    manifest: Dict[str, Any] = field(default_factory=dict)
+    cache: Dict[str, Any] = field(default_factory=dict)  # per-version memo (POIs, labels, ...)
+    leases: int = 0
+    retired: bool = False
+    activated_at: float = 0.0
+
+    @property
+    def data_root(self) -> str:
+        return os.path.normpath(os.path.join(self.root, "data"))
+
+    @property
+    def tiles_root(self) -> str:
+        return os.path.normpath(os.path.join(self.root, "tiles"))
+
+    def release(self) -> None:
+        self.shards.stop_sweeper()
+        self.shards.unload_all()
+        self.cache.clear()
+
+
+RegistryFactory = Callable[[str], ShardRegistry]
+
+
+class SnapshotManager:
+    """Serves the CURRENT dataset version and swaps to new ones without dropping requests.
+
+    ``lease()`` pins a request to the snapshot that was current when it started; a
+    retired snapshot is released (graphs unloaded, caches cleared) once its last
+    lease ends. ``check()`` warms a newly published version in the calling thread and
+    swaps it in atomically; ``start()`` runs it periodically on a daemon thread.
+    """
+
+    def __init__(
+        self,
+        registry_factory: RegistryFactory,
+        releases_dir: str = "releases",
+        working_root: str = ".",
+        poll_s: float = 10.0,
+    ):
+        self.registry_factory = registry_factory
+        self.releases_dir = releases_dir
+        self.working_root = working_root
+        self.poll_s = float(poll_s)
+        self._current: Optional[DatasetSnapshot] = None
+        self._lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        self._failed: Dict[str, str] = {}
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self.swaps = 0
+
+    # ---------- construction ----------
+    def _open(self, version: Optional[str]) -> DatasetSnapshot:
+        if version is None:
+            root = self.working_root
+            manifest: Dict[str, Any] = {}
+            version = WORKING_TREE_VERSION
+        else:
+            root = os.path.join(self.releases_dir, version)
+            manifest = read_manifest(root)
+            problems = verify_manifest(root, manifest)
+            if problems:
+                raise RuntimeError(f"release {version} is incomplete: {'; '.join(problems[:5])}")
+        snap = DatasetSnapshot(version=version, root=root, shards=self.registry_factory(os.path.normpath(os.path.join(root, "data"))), manifest=manifest)
+        snap.shards.discover()
+        return snap
+
+    def current(self) -> DatasetSnapshot:
+        with self._lock:
+            if self._current is not None:
+                return self._current
+        # First use: open whatever CURRENT points at (or the working tree) without warming.
+        with self._reload_lock:
+            with self._lock:
+                if self._current is None:
+                    version = read_current(self.releases_dir)
+                    try:
+                        snap = self._open(version)
+                    except Exception as e:
+                        if version is None:
+                            raise
+                        self._failed[version] = str(e)
+                        print(f"[warn] Failed to load dataset version {version}: {e}; serving the working tree")
+                        snap = self._open(None)
+                    snap.activated_at = time.time()
+                    self._current = snap
+                    print(f"[snapshots] Serving dataset version {snap.version} from {snap.root}")
+                return self._current
+
+    @contextlib.contextmanager
+    def lease(self) -> Iterator[DatasetSnapshot]:
+        snap = self.current()
+        with self._lock:
+            # Re-read under the lock so a concurrent swap cannot hand out a retired snapshot.
+            snap = self._current or snap
+            snap.leases += 1
+        try:
+            yield snap
+        finally:
+            release = False
+            with self._lock:
+                snap.leases -= 1
+                release = snap.retired and snap.leases == 0
+            if release:
+                self._release(snap)
+
+    # ---------- reload ----------
+    def check(self) -> bool:
+        """Swap to the version named by CURRENT if it changed. Returns True on swap."""
+        target = read_current(self.releases_dir)
+        if target is None or target in self._failed:
+            return False
+        old = self.current()
+        if target == old.version:
+            return False
+        with self._reload_lock:
+            old = self.current()
+            if target == old.version:
+                return False
+            print(f"[snapshots] New dataset version {target}; warming...")
+            start = time.time()
+            try:
+                snap = self._open(target)
+                self._warm(snap, old)
+            except Exception as e:
+                self._failed[target] = str(e)
+                print(f"[warn] Failed to load dataset version {target}: {e}; still serving {old.version}")
+                return False
+            with self._lock:
+                snap.activated_at = time.time()
+                self._current = snap
+                old.retired = True
+                release = old.leases == 0
+                self.swaps += 1
+            print(f"[snapshots] Swapped {old.version} -> {snap.version} after {time.time() - start:.1f}s warmup")
+        if release:
+            self._release(old)
+        return True
+
+    def _warm(self, snap: DatasetSnapshot, old: DatasetSnapshot) -> None:
+        # Preload the shards that are hot in the outgoing version so the swap does not
+        # push a 30-60 s graph load onto the first request.
+        hot = [row for row in old.shards.stats()["shards"] if row["loaded"]]
+        for row in hot:
+            if snap.shards.shard(row["state"], row["mode"]) is not None:
+                snap.shards.get(row["state"], row["mode"])
+
+    def _release(self, snap: DatasetSnapshot) -> None:
+        print(f"[snapshots] Releasing dataset version {snap.version}")
+        snap.release()
+
+    # ---------- watcher ----------
+    def start(self) -> None:
+        if self.poll_s <= 0 or self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="dataset-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.poll_s):
+            try:
+                self.check()
+            except Exception as e:  # keep watching; the old version stays live
+                print(f"[warn] Dataset watcher error: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        snap = self.current()
+        return {
+            "version": snap.version,
+            "root": snap.root,
+            "dataset_version": snap.manifest.get("dataset_version"),
+            "created": snap.manifest.get("created"),
+            "activated_at": snap.activated_at,
+            "leases": snap.leases,
+            "swaps": self.swaps,
+            "failed_versions": dict(self._failed),
+            "watching": self._thread is not None,
+            "poll_s": self.poll_s,
+        }
@@ -0,0 +1,107 @@
+"""
+Shared test fixtures
+
+- random_csr: builder for random directed CSR graphs (indptr int64, indices int32, w uint16)
+- kbest_reference: pure-Python K-best kernel with the native kernels' call signature
+
+With VICINITY_REQUIRE_NATIVE=1 (set in CI) the session fails up front unless `t_hex` imports with
+every native export, so the native tests run instead of skipping.
+"""
+import heapq
+import os
+
+import numpy as np
+import pytest
+
+UNREACH = 65535
+
+# Native exports the tests exercise (CHGraph methods as "CHGraph.<name>")
+NATIVE_EXPORTS = (
+    "kbest_multisource_csr",
+    "kbest_multisource_bucket_csr",
+    "kbest_multisource_frontier_csr",
+    "kbest_h3_topk_stream",
+    "nearest_multilabel_csr",
+    "aggregate_h3_topk",
+    "aggregate_h3_topk_precached",
+    "aggregate_h3_topk_sorted",
+    "compute_h3_for_nodes",
+    "weakly_connected_components",
+    "build_csr_from_arrays",
+    "ch_build_from_csr",
+    "ch_from_bytes",
+    "ArrowBatch",
+    "CHGraph.query_subset",
+    "CHGraph.query_multi",
+    "CHGraph.many_to_many",
+    "CHGraph.to_bytes",
+)
+
+
+def pytest_configure(config):
+    if os.environ.get("VICINITY_REQUIRE_NATIVE", "") in ("", "0"):
+        return
+    try:
+        import t_hex
+    except ImportError as exc:
+        raise pytest.UsageError(f"VICINITY_REQUIRE_NATIVE is set but t_hex does not import: {exc}")
+    missing = []
+    for name in NATIVE_EXPORTS:
+        obj = t_hex
+        for part in name.split("."):
+            obj = getattr(obj, part, None)
+        if obj is None:
+            missing.append(name)
+    if missing:
+        raise pytest.UsageError(f"t_hex is missing native exports: {', '.join(missing)}")
+
+
+def make_random_csr(n, m, seed=0, w_low=1, w_high=300):
+    """Random CSR with ``m`` edges over ``n`` nodes, rows sorted by (source, target).
+
+    ``seed`` is an int or a ``np.random.Generator`` (which keeps drawing for the caller);
+    weights are drawn from ``[w_low, w_high)``.
+    """
+    rng = seed if isinstance(seed, np.random.Generator) else np.random.default_rng(seed)
+    src = rng.integers(0, n, m)
+    dst = rng.integers(0, n, m)
+    w = rng.integers(w_low, w_high, m).astype(np.uint16)
+    order = np.lexsort((dst, src))
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(src, minlength=n), out=indptr[1:])
+    return indptr, dst[order].astype(np.int32), w[order]
+
+
+def reference_kbest(indptr, indices, w, sources, k, cutoff_primary_s, cutoff_overflow_s, threads, progress):
+    """K-best kernel stand-in: K nearest sources per node by (time, source index) within the overflow cutoff."""
+    n = indptr.size - 1
+    labels = [[] for _ in range(n)]
+    for s in np.asarray(sources).tolist():
+        dist = {s: 0}
+        heap = [(0, s)]
+        while heap:
+            d, v = heapq.heappop(heap)
+            if d > dist.get(v, 1 << 60):
+                continue
+            labels[v].append((d, s))
+            for e in range(indptr[v], indptr[v + 1]):
+                u, nd = int(indices[e]), d + int(w[e])
+                if nd <= cutoff_overflow_s and nd < dist.get(u, 1 << 60):
+                    dist[u] = nd
+                    heapq.heappush(heap, (nd, u))
+    src = np.full((n, k), -1, dtype=np.int32)
+    t = np.full((n, k), UNREACH, dtype=np.uint16)
+    for v, lab in enumerate(labels):
+        for j, (d, s) in enumerate(sorted(lab)[:k]):
+            src[v, j], t[v, j] = s, d
+    return src, t
+
+
+@pytest.fixture
+def random_csr():
+    return make_random_csr
+
+
+@pytest.fixture
+def kbest_reference():
+    return reference_kbest
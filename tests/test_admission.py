@@ -0,0 +1,65 @@
+"""
+Test Routing Admission Control
+
+Validates src/serving/admission.py:
+- per-client and global queue limits reject immediately with Overloaded
+- slots are released when tasks finish
+- contextvars of the submitting request reach the worker
+"""
+import contextvars
+import sys
+import threading
+
+import pytest
+
+sys.path.append("src")
+
+from serving.admission import AdmissionController, Overloaded
+
+
+@pytest.fixture
+def gate():
+    ev = threading.Event()
+    yield ev
+    ev.set()
+
+
+class TestAdmissionController:
+    """Test suite for the bounded routing executor."""
+
+    def test_per_client_limit(self, gate):
+        """Verify one client cannot hold more than per_client slots while others still get in."""
+        ctl = AdmissionController(max_workers=2, max_queue=4, per_client=1, retry_after_s=3)
+        ctl.submit("a", gate.wait)
+        with pytest.raises(Overloaded) as exc:
+            ctl.submit("a", gate.wait)
+        assert exc.value.retry_after_s == 3
+        ctl.submit("b", gate.wait)
+        assert ctl.metrics()["counters"]["rejected_client"] == 1
+        gate.set()
+        ctl.shutdown(wait=True)
+
+    def test_queue_limit_and_release(self, gate):
+        """Verify the queue bound rejects overflow and finished tasks free their slots."""
+        ctl = AdmissionController(max_workers=1, max_queue=1, per_client=10)
+        futs = [ctl.submit("a", gate.wait), ctl.submit("a", gate.wait)]
+        with pytest.raises(Overloaded):
+            ctl.submit("a", gate.wait)
+        m = ctl.metrics()
+        assert m["running"] + m["queued"] == 2
+        gate.set()
+        for f in futs:
+            f.result(timeout=5)
+        assert ctl.submit("a", lambda: 42).result(timeout=5) == 42
+        m = ctl.metrics()
+        assert m["running"] == 0 and m["queued"] == 0
+        assert m["counters"]["completed"] == 3
+        ctl.shutdown(wait=True)
+
+    def test_context_propagation(self):
+        """Verify the worker sees the caller's contextvars (pinned dataset snapshot)."""
+        var = contextvars.ContextVar("snapshot", default=None)
+        var.set("v2")
+        ctl = AdmissionController(max_workers=1)
+        assert ctl.submit("a", var.get).result(timeout=5) == "v2"
+        ctl.shutdown(wait=True)
@@ -0,0 +1,140 @@
+"""
+Test Anchor×Anchor Matrix
+
+Validates graph.anchor_matrix:
+- masked row-min equals a brute-force min over the dense matrix for random anchor subsets
+- the column index holds each column's (row, seconds) entries; empty and repeated source
+  positions are handled
+- per-entity max_seconds filtering and rejection of limits above the matrix cap
+- save/load round-trip (memory-mapped) keeps the graph digest, and a matrix routed on another graph
+  (or without a recorded digest) is not used for D_anchor lookups (skipped without `t_hex`)
+- CHGraph.many_to_many rows against per-target PHAST queries (skipped without `t_hex`)
+"""
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.append("src")
+
+from graph.anchor_matrix import AnchorMatrix, load_anchor_matrix, save_anchor_matrix
+
+UNREACH = 65535
+
+
+def _random_matrix(n_anchors, limit_s, seed):
+    rng = np.random.default_rng(seed)
+    dense = rng.integers(0, 2 * limit_s, size=(n_anchors, n_anchors)).astype(np.int64)
+    np.fill_diagonal(dense, 0)
+    dense[rng.random(dense.shape) < 0.2] = UNREACH
+    dense[3, :] = UNREACH  # an anchor that reaches nothing
+    keep = dense <= limit_s
+    indptr = np.concatenate([[0], np.cumsum(keep.sum(axis=1))]).astype(np.int64)
+    rows, cols = np.nonzero(keep)
+    matrix = AnchorMatrix(
+        indptr=indptr,
+        indices=cols.astype(np.int32),
+        seconds=dense[rows, cols].astype(np.uint16),
+        anchor_nodes=np.sort(rng.choice(10_000, n_anchors, replace=False)).astype(np.int32),
+        anchor_int_ids=np.arange(n_anchors, dtype=np.int32),
+        limit_s=limit_s,
+    )
+    return matrix, np.where(keep, dense, UNREACH)
+
+
+class TestAnchorMatrix:
+    """Test suite for the anchor matrix artifact and lookups."""
+
+    def test_masked_row_min_matches_dense(self):
+        """Verify masked row-min equals the dense per-row minimum over the source columns."""
+        matrix, dense = _random_matrix(60, 3600, seed=5)
+        rng = np.random.default_rng(9)
+        for size in (1, 4, 25):
+            cols = rng.choice(60, size, replace=False)
+            got = matrix.masked_row_min(cols)
+            expected = dense[:, cols].min(axis=1)
+            np.testing.assert_array_equal(got, expected.astype(np.uint16))
+
+    def test_column_index_and_edge_positions(self):
+        """Verify the column view transposes the CSR and row-min handles empty/repeated sources."""
+        matrix, dense = _random_matrix(50, 1800, seed=12)
+        col_indptr, rows, seconds = matrix.columns()
+        for j in (0, 3, 49):
+            col = np.full(50, UNREACH, dtype=np.int64)
+            col[rows[col_indptr[j]:col_indptr[j + 1]]] = seconds[col_indptr[j]:col_indptr[j + 1]]
+            np.testing.assert_array_equal(col, dense[:, j])
+        assert (matrix.masked_row_min(np.array([], dtype=np.int64)) == UNREACH).all()
+        np.testing.assert_array_equal(matrix.masked_row_min(np.array([7, 7, 2])), dense[:, [2, 7]].min(axis=1).astype(np.uint16))
+
+    def test_max_seconds_filter_and_limit(self):
+        """Verify entity cutoffs drop slower rows and caps above the matrix limit are rejected."""
+        matrix, dense = _random_matrix(40, 3600, seed=6)
+        cols = np.array([0, 7, 11])
+        got = matrix.masked_row_min(cols, max_seconds=900)
+        expected = dense[:, cols].min(axis=1)
+        expected[expected > 900] = UNREACH
+        np.testing.assert_array_equal(got, expected.astype(np.uint16))
+        with pytest.raises(ValueError):
+            matrix.masked_row_min(cols, max_seconds=7200)
+
+    def test_positions_of_drops_non_anchor_nodes(self):
+        """Verify node→position mapping ignores nodes that are not anchors."""
+        matrix, _ = _random_matrix(20, 600, seed=7)
+        nodes = np.concatenate([matrix.anchor_nodes[[2, 5, 5]], [-1, 10_001]])
+        np.testing.assert_array_equal(matrix.positions_of(nodes), [2, 5])
+
+    def test_save_load_round_trip(self, tmp_path):
+        """Verify the on-disk layout loads back to identical arrays, limit and graph digest."""
+        matrix, _ = _random_matrix(30, 1800, seed=8)
+        matrix.graph_digest = "g1"
+        save_anchor_matrix(matrix, str(tmp_path / "ma_drive"))
+        loaded = load_anchor_matrix(str(tmp_path / "ma_drive"))
+        assert loaded.limit_s == 1800
+        assert loaded.graph_digest == "g1"
+        for name in ("indptr", "indices", "seconds", "anchor_nodes", "anchor_int_ids"):
+            np.testing.assert_array_equal(getattr(loaded, name), getattr(matrix, name))
+        assert load_anchor_matrix(str(tmp_path / "missing")) is None
+
+    def test_matching_matrix_requires_same_graph(self, tmp_path):
+        """Verify 05/06 only use a matrix whose anchors and graph digest match the current graph."""
+        pytest.importorskip("t_hex")  # d_anchor_common loads the CSR builder
+        import d_anchor_common as dac
+
+        matrix, _ = _random_matrix(30, 1800, seed=9)
+        n = 10_000
+        anchor_idx = np.full(n, -1, dtype=np.int32)
+        anchor_idx[matrix.anchor_nodes] = matrix.anchor_int_ids
+        empty = np.zeros(0, dtype=np.int32)
+        graph_ctx = dac.GraphContext(
+            anchor_idx=anchor_idx, anchor_nodes=matrix.anchor_nodes, anchor_int_ids=matrix.anchor_int_ids,
+            comp_id=np.zeros(n, dtype=np.int32), comp_to_anchor_nodes={0: matrix.anchor_nodes},
+            indptr_rev=np.zeros(n + 1, dtype=np.int64), indices_rev=empty, w_rev=empty.astype(np.uint16),
+            node_count=n, graph_digest="g1",
+        )
+        matrix_dir = str(tmp_path / "ma_drive")
+        for digest, usable in ((None, False), ("g0", False), ("g1", True)):
+            matrix.graph_digest = digest
+            save_anchor_matrix(matrix, matrix_dir)
+            assert (dac.load_matching_anchor_matrix(matrix_dir, graph_ctx) is not None) == usable
+
+    def test_many_to_many_matches_phast(self, random_csr):
+        """Verify each many-to-many row equals a PHAST query on the same CH."""
+        t_hex = pytest.importorskip("t_hex")
+        if not hasattr(t_hex.CHGraph, "many_to_many"):
+            pytest.skip("t_hex built without CH many-to-many")
+        rng = np.random.default_rng(4)
+        n, m = 300, 1200
+        ch = t_hex.ch_build_from_csr(*random_csr(n, m, seed=rng))
+
+        sources = np.sort(rng.choice(n, 25, replace=False)).astype(np.int32)
+        targets = np.sort(rng.choice(n, 30, replace=False)).astype(np.int32)
+        limit = 1500
+        row_ptr, cols, secs = ch.many_to_many(sources, targets, limit, 2)
+        for ti, t in enumerate(targets.tolist()):
+            row = dict(zip(cols[row_ptr[ti]:row_ptr[ti + 1]].tolist(), secs[row_ptr[ti]:row_ptr[ti + 1]].tolist()))
+            expected = {}
+            for si, s in enumerate(sources.tolist()):
+                d = int(ch.query_all(s, limit)[t])
+                if d <= limit:
+                    expected[si] = d
+            assert row == expected
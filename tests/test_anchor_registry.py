@@ -0,0 +1,74 @@
+"""
+Test Anchor Id Registry
+
+Validates graph.anchor_registry:
+- existing sites keep their anchor_int_id when a site is inserted before them
+- removed sites are tombstoned and revived with their old id
+- new sites are appended after the maximum id, never reusing a tombstoned one
+- compaction drops tombstones and renumbers densely in id order
+- the registry file round-trips through load/save
+"""
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.append("src")
+
+from graph.anchor_registry import allocate_anchor_int_ids, compact_registry, empty_registry, load_registry, save_registry
+
+
+class TestAnchorRegistry:
+    """Test suite for append-only anchor id allocation."""
+
+    def test_first_run_matches_sorted_numbering(self):
+        """Verify an empty registry numbers sites by site_id order, like the registry-less path."""
+        reg, ids, stats = allocate_anchor_int_ids(empty_registry(), ["c", "a", "b"])
+        assert ids.to_dict() == {"a": 0, "b": 1, "c": 2}
+        assert stats == {"kept": 0, "added": 3, "revived": 0, "tombstoned": 0}
+        assert reg["anchor_int_id"].dtype == np.int32
+
+    def test_insert_keeps_existing_ids(self):
+        """Verify inserting a site that sorts first does not renumber the others."""
+        reg, _, _ = allocate_anchor_int_ids(empty_registry(), ["b", "c", "d"])
+        reg, ids, stats = allocate_anchor_int_ids(reg, ["a", "b", "c", "d"])
+        assert ids.to_dict() == {"b": 0, "c": 1, "d": 2, "a": 3}
+        assert stats["kept"] == 3 and stats["added"] == 1
+
+    def test_tombstone_and_revive(self):
+        """Verify removed sites are tombstoned, their ids are not reused, and a returning site gets its id back."""
+        reg, _, _ = allocate_anchor_int_ids(empty_registry(), ["a", "b", "c"])
+        reg, ids, stats = allocate_anchor_int_ids(reg, ["a", "c", "e"])
+        assert ids.to_dict() == {"a": 0, "c": 2, "e": 3}
+        assert stats["tombstoned"] == 1
+        assert reg.set_index("site_id").loc["b", "active"] == False  # noqa: E712
+
+        reg, ids, stats = allocate_anchor_int_ids(reg, ["a", "b", "c", "e"])
+        assert ids["b"] == 1
+        assert stats["revived"] == 1 and stats["added"] == 0
+
+    def test_compact_renumbers_densely(self):
+        """Verify compaction drops tombstones and keeps the relative order of active ids."""
+        reg, _, _ = allocate_anchor_int_ids(empty_registry(), ["a", "b", "c", "d"])
+        reg, _, _ = allocate_anchor_int_ids(reg, ["d", "b", "z"])
+        compacted, remap = compact_registry(reg)
+        assert remap == {1: 0, 3: 1, 4: 2}
+        assert compacted["site_id"].tolist() == ["b", "d", "z"]
+        assert compacted["anchor_int_id"].tolist() == [0, 1, 2]
+        assert compacted["active"].all()
+
+    def test_registry_file_round_trip(self, tmp_path):
+        """Verify a saved registry loads back unchanged and duplicate ids are rejected."""
+        path = str(tmp_path / "ids.parquet")
+        assert len(load_registry(path)) == 0
+        reg, _, _ = allocate_anchor_int_ids(empty_registry(), ["x", "y"])
+        reg, _, _ = allocate_anchor_int_ids(reg, ["y"])
+        save_registry(path, reg)
+        loaded = load_registry(path)
+        assert loaded.to_dict("list") == {"site_id": ["x", "y"], "anchor_int_id": [0, 1], "active": [False, True]}
+
+        bad = loaded.copy()
+        bad.loc[1, "anchor_int_id"] = 0
+        bad.to_parquet(path, index=False)
+        with pytest.raises(ValueError):
+            load_registry(path)
@@ -0,0 +1,75 @@
+"""
+Test Parallel CH Preparation
+
+Validates ch_build_from_csr(threads > 1) against the sequential fast_paths build (skipped without `t_hex`):
+- PHAST distances from every source agree with the sequential CH and with a plain Dijkstra
+- progress_cb receives monotone (contracted, total) counts ending at (N, N)
+- to_bytes/ch_from_bytes round-trips the t_hex CH format, and truncated data is rejected
+"""
+import heapq
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.append("src")
+
+INF = np.iinfo(np.uint32).max
+
+
+def _dijkstra(indptr, indices, w, source):
+    dist = np.full(indptr.size - 1, INF, dtype=np.uint32)
+    dist[source] = 0
+    heap = [(0, source)]
+    while heap:
+        d, u = heapq.heappop(heap)
+        if d != dist[u]:
+            continue
+        for e in range(indptr[u], indptr[u + 1]):
+            v, nd = int(indices[e]), d + max(1, int(w[e]))
+            if v != u and nd < dist[v]:
+                dist[v] = nd
+                heapq.heappush(heap, (nd, v))
+    return dist
+
+
+@pytest.fixture(scope="module")
+def t_hex():
+    return pytest.importorskip("t_hex")
+
+
+class TestParallelCH:
+    """Test suite for the parallel independent-set CH contraction."""
+
+    def test_matches_sequential(self, t_hex, random_csr):
+        """Verify the parallel CH answers every one-to-all query like the sequential one and Dijkstra."""
+        indptr, indices, w = random_csr(200, 800, seed=0, w_low=0)
+        seq = t_hex.ch_build_from_csr(indptr, indices, w)
+        par = t_hex.ch_build_from_csr(indptr, indices, w, threads=4)
+        assert par.num_nodes == seq.num_nodes == indptr.size - 1
+        for s in range(0, indptr.size - 1, 7):
+            expected = _dijkstra(indptr, indices, w, s)
+            np.testing.assert_array_equal(np.asarray(par.query_all(s)), expected)
+            np.testing.assert_array_equal(np.asarray(seq.query_all(s)), expected)
+
+    def test_progress_callback(self, t_hex, random_csr):
+        """Verify progress_cb is called per round with a growing count that ends at all nodes."""
+        indptr, indices, w = random_csr(200, 800, seed=1, w_low=0)
+        calls = []
+        t_hex.ch_build_from_csr(indptr, indices, w, threads=2, progress=True,
+                                progress_cb=lambda done, total: calls.append((done, total)))
+        n = indptr.size - 1
+        assert calls and calls[-1] == (n, n)
+        assert all(a[0] < b[0] for a, b in zip(calls, calls[1:]))
+
+    def test_bytes_round_trip(self, t_hex, random_csr):
+        """Verify a serialized CH reloads with the same distances and truncated bytes raise ValueError."""
+        indptr, indices, w = random_csr(200, 800, seed=2, w_low=0)
+        ch = t_hex.ch_build_from_csr(indptr, indices, w, threads=2)
+        data = ch.to_bytes()
+        assert data[:4] == b"THCH"
+        loaded = t_hex.ch_from_bytes(data)
+        for s in (0, 17, 101):
+            np.testing.assert_array_equal(np.asarray(loaded.query_all(s)), np.asarray(ch.query_all(s)))
+        with pytest.raises(ValueError):
+            t_hex.ch_from_bytes(data[:-5])
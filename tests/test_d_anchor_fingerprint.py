@@ -0,0 +1,142 @@
+"""
+Test D_anchor Input Fingerprints
+
+Validates src/d_anchor_fingerprint.py:
+- fingerprints round-trip through Parquet metadata and drive skip/extend/full plans
+- extend is only planned when the previous anchor placement is on disk, and never for
+  partitions written from the anchor matrix
+- new/moved anchors are detected by (node, anchor_int_id) pairs
+- unreferenced placements are pruned
+- an extended shard equals a full rebuild after adding and moving anchors (skipped without `t_hex`)
+"""
+import sys
+
+import numpy as np
+import polars as pl
+import pytest
+
+sys.path.append("src")
+
+from d_anchor_fingerprint import (
+    MATRIX_TIMES,
+    added_anchor_mask,
+    entity_fingerprint,
+    fingerprint_metadata,
+    load_placement,
+    plan_rebuild,
+    prune_placements,
+    read_fingerprint,
+    save_placement,
+)
+
+LIMITS = {"max_minutes": 30, "top_k": 5}
+
+
+def _write_partition(path, fingerprint):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    pl.DataFrame({"anchor_id": [1, 2]}).write_parquet(str(path), metadata=fingerprint_metadata(fingerprint))
+
+
+class TestDAnchorFingerprint:
+    """Test suite for per-entity D_anchor rebuild planning."""
+
+    def test_plan_actions(self, tmp_path):
+        """Verify unchanged inputs skip, placement-only changes extend and other changes rebuild."""
+        mode_dir = str(tmp_path)
+        old_hash = save_placement(mode_dir, np.array([10, 20]), np.array([0, 1]))
+        fp = entity_fingerprint(np.array([20, 10]), LIMITS, "g1", old_hash)
+        out = tmp_path / "brand_id=x" / "part-000.parquet"
+        _write_partition(out, fp)
+        assert read_fingerprint(str(out)) == fp
+
+        assert plan_rebuild(str(out), fp, False, mode_dir)[0] == "skip"
+        assert plan_rebuild(str(out), fp, True, mode_dir)[:2] == ("full", ["forced"])
+        assert plan_rebuild(str(tmp_path / "missing.parquet"), fp, False, mode_dir)[:2] == ("full", ["missing"])
+
+        new_hash = save_placement(mode_dir, np.array([10, 20, 30]), np.array([0, 1, 2]))
+        action, reasons, old = plan_rebuild(str(out), entity_fingerprint(np.array([10, 20]), LIMITS, "g1", new_hash), False, mode_dir)
+        assert (action, reasons) == ("extend", ["targets"])
+        assert old[0].tolist() == [10, 20]
+
+        changed = entity_fingerprint(np.array([10, 30]), {"max_minutes": 45, "top_k": 5}, "g2", new_hash)
+        assert plan_rebuild(str(out), changed, False, mode_dir)[:2] == ("full", ["sources", "limits", "graph", "targets"])
+
+    def test_extend_needs_previous_placement(self, tmp_path):
+        """Verify a placement-only change falls back to a full rebuild when the old placement is gone."""
+        out = tmp_path / "brand_id=x" / "part-000.parquet"
+        _write_partition(out, entity_fingerprint(np.array([1]), LIMITS, "g", "old"))
+        action, reasons, _ = plan_rebuild(str(out), entity_fingerprint(np.array([1]), LIMITS, "g", "new"), False, str(tmp_path))
+        assert action == "full" and reasons == ["targets (previous placement unknown)"]
+        legacy = tmp_path / "legacy.parquet"
+        pl.DataFrame({"anchor_id": [1]}).write_parquet(str(legacy))
+        assert plan_rebuild(str(legacy), entity_fingerprint(np.array([1]), LIMITS, "g", "new"), False, str(tmp_path))[1] == ["no fingerprint"]
+
+    def test_matrix_partition_is_rebuilt_not_extended(self, tmp_path):
+        """Verify a placement change fully rebuilds a matrix-built partition instead of mixing in routed rows."""
+        mode_dir = str(tmp_path)
+        old_hash = save_placement(mode_dir, np.array([10, 20]), np.array([0, 1]))
+        new_hash = save_placement(mode_dir, np.array([10, 20, 30]), np.array([0, 1, 2]))
+        fp = entity_fingerprint(np.array([10]), LIMITS, "g", old_hash)
+        out = tmp_path / "brand_id=x" / "part-000.parquet"
+        _write_partition(out, {**fp, "times": MATRIX_TIMES})
+        assert plan_rebuild(str(out), fp, False, mode_dir)[0] == "skip"
+        new_fp = entity_fingerprint(np.array([10]), LIMITS, "g", new_hash)
+        assert plan_rebuild(str(out), new_fp, False, mode_dir)[:2] == ("full", ["targets (matrix partition)"])
+
+    def test_added_anchor_mask_and_prune(self, tmp_path):
+        """Verify moved/new anchors are flagged and placements nobody references are deleted."""
+        old = (np.array([10, 20, 30]), np.array([0, 1, 2]))
+        mask = added_anchor_mask(old, np.array([10, 25, 30, 40]), np.array([0, 1, 2, 3]))
+        assert mask.tolist() == [False, True, False, True]
+
+        mode_dir = str(tmp_path)
+        keep = save_placement(mode_dir, *old)
+        stale = save_placement(mode_dir, np.array([1]), np.array([1]))
+        _write_partition(tmp_path / "brand_id=a" / "part-000.parquet", entity_fingerprint(np.array([10]), LIMITS, "g", keep))
+        assert prune_placements(mode_dir, "brand_id=") == 1
+        assert load_placement(mode_dir, keep) is not None
+        assert load_placement(mode_dir, stale) is None
+
+    def test_extend_matches_full_rebuild(self, tmp_path, random_csr):
+        """Verify extending a shard after anchor edits yields the rows of a full rebuild."""
+        t_hex = pytest.importorskip("t_hex")
+        if not hasattr(t_hex, "kbest_multisource_bucket_csr"):
+            pytest.skip("t_hex built without the bucket kernel")
+        from d_anchor_common import GraphContext, build_anchor_times_frame, extend_shard, write_frame
+        from graph.csr_utils import build_rev_csr
+
+        rng = np.random.default_rng(3)
+        n, m = 600, 2400
+        rev = build_rev_csr(*random_csr(n, m, seed=rng, w_high=200))
+        schema = {"anchor_id": pl.UInt32, "seconds_u16": pl.UInt16, "snapshot_ts": pl.Date}
+
+        def ctx(nodes):
+            nodes = np.asarray(nodes, dtype=np.int32)
+            idx = np.full(n, -1, dtype=np.int32)
+            idx[nodes] = np.arange(nodes.size, dtype=np.int32)
+            return GraphContext(idx, nodes, np.arange(nodes.size, dtype=np.int32), np.zeros(n, dtype=np.int32),
+                                {0: nodes}, *rev, n, "g")
+
+        def full(g, sources, max_s):
+            _b, t = t_hex.kbest_multisource_bucket_csr(*rev, sources, 1, max_s, max_s, 1, False)
+            return build_anchor_times_frame(g.anchor_int_ids, np.asarray(t)[g.anchor_nodes, 0], "2026-01-01",
+                                            schema, ["anchor_id", "snapshot_ts"], lambda size: {}, max_s)
+
+        nodes = np.sort(rng.choice(n, 40, replace=False)).astype(np.int32)
+        sources = nodes[:5]
+        max_s = 900
+        old_ctx = ctx(nodes)
+        out = tmp_path / "part-000.parquet"
+        write_frame(str(out), full(old_ctx, sources, max_s))
+
+        new_nodes = nodes.copy()
+        new_nodes[20] = next(v for v in range(n) if v not in set(nodes.tolist()))  # anchor 20 moves
+        new_ctx = ctx(np.concatenate([new_nodes, [v for v in range(n) if v not in set(new_nodes.tolist())][:3]]))
+        rows, routed = extend_shard(
+            str(out), new_ctx, sources, (old_ctx.anchor_nodes, old_ctx.anchor_int_ids), "2026-01-01", schema,
+            ["anchor_id", "snapshot_ts"], lambda size: {}, max_s, {"sources": "s"},
+        )
+        assert routed == 4
+        expected = full(new_ctx, sources, max_s).sort("anchor_id")
+        assert pl.read_parquet(str(out)).sort("anchor_id").equals(expected)
+        assert rows == expected.height
@@ -0,0 +1,95 @@
+"""
+Test Dataset Snapshots
+
+Validates src/serving/snapshots.py hot reload semantics:
+- manifests detect incomplete releases
+- CURRENT swaps are atomic and in-flight leases stay on their version
+- retired versions are released once their last lease ends
+"""
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.append("src")
+
+from serving.shards import ShardRegistry
+from serving.snapshots import (
+    SnapshotManager,
+    build_manifest,
+    set_current,
+    verify_manifest,
+    write_manifest,
+)
+
+
+def _publish(releases: Path, version: str) -> Path:
+    vdir = releases / version
+    (vdir / "data" / "poi").mkdir(parents=True)
+    (vdir / "data" / "poi" / "alpha_canonical.parquet").write_bytes(version.encode())
+    write_manifest(str(vdir), build_manifest(str(vdir), version))
+    return vdir
+
+
+def _manager(releases: Path) -> SnapshotManager:
+    return SnapshotManager(
+        lambda root: ShardRegistry(lambda shard: ({}, {}), data_root=root),
+        releases_dir=str(releases),
+        working_root=str(releases.parent),
+        poll_s=0,
+    )
+
+
+class TestDatasetSnapshots:
+    """Test suite for versioned releases and atomic swaps."""
+
+    def test_manifest_verification(self, tmp_path):
+        """Verify missing or resized files are reported."""
+        vdir = _publish(tmp_path, "v1")
+        manifest = build_manifest(str(vdir), "v1")
+        assert verify_manifest(str(vdir), manifest) == []
+        (vdir / "data" / "poi" / "alpha_canonical.parquet").write_bytes(b"changed-size")
+        assert verify_manifest(str(vdir), manifest)
+
+    def test_working_tree_without_pointer(self, tmp_path):
+        """Verify the working tree is served until CURRENT exists."""
+        mgr = _manager(tmp_path / "releases")
+        assert mgr.current().version == "working-tree"
+        assert mgr.check() is False
+
+    def test_swap_pins_in_flight_leases(self, tmp_path):
+        """Verify a swap keeps in-flight requests on the old version and releases it afterwards."""
+        releases = tmp_path / "releases"
+        _publish(releases, "v1")
+        set_current(str(releases), "v1")
+        mgr = _manager(releases)
+
+        with mgr.lease() as old:
+            assert old.version == "v1"
+            old.cache["marker"] = True
+            _publish(releases, "v2")
+            set_current(str(releases), "v2")
+            assert mgr.check() is True
+            assert mgr.current().version == "v2"
+            # Still pinned: the old snapshot keeps its data until the lease ends
+            assert old.version == "v1" and old.cache.get("marker") is True
+            assert old.retired
+        assert old.cache == {}
+        with mgr.lease() as new:
+            assert new.version == "v2"
+            assert Path(new.data_root) == releases / "v2" / "data"
+
+    def test_incomplete_release_is_skipped(self, tmp_path):
+        """Verify a release failing manifest checks is never swapped in."""
+        releases = tmp_path / "releases"
+        _publish(releases, "v1")
+        set_current(str(releases), "v1")
+        mgr = _manager(releases)
+        assert mgr.current().version == "v1"
+
+        vdir = _publish(releases, "v2")
+        (vdir / "data" / "poi" / "alpha_canonical.parquet").unlink()
+        set_current(str(releases), "v2")
+        assert mgr.check() is False
+        assert mgr.current().version == "v1"
+        assert "v2" in mgr.stats()["failed_versions"]
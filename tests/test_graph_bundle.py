@@ -0,0 +1,90 @@
+"""
+Test Graph Bundle
+
+Validates graph.bundle.GraphBundle and the vectorized build_rev_csr:
+- build_rev_csr returns the exact transpose with in-edges ordered by source
+- the reverse CSR is built once, registered in bundle.json and reopened as a read-only mmap
+- rewriting the forward CSR with new content drops every derived artifact; touching it without a change keeps them
+- verify() detects a derived file whose content changed behind the manifest
+"""
+import json
+import os
+import sys
+
+import numpy as np
+
+sys.path.append("src")
+
+from d_anchor_fingerprint import graph_fingerprint
+from graph.bundle import MANIFEST, REV_FILES, GraphBundle
+from graph.csr_utils import build_rev_csr
+
+
+def _write_forward(path, indptr, indices, w):
+    np.save(path / "indptr.npy", indptr)
+    np.save(path / "indices.npy", indices)
+    np.save(path / "w_sec.npy", w)
+
+
+class TestGraphBundle:
+    """Test suite for the checksummed CSR cache bundle."""
+
+    def test_build_rev_csr(self, random_csr):
+        """Verify the transpose holds every edge reversed, grouped by target and ordered by source."""
+        indptr, indices, w = random_csr(60, 240, seed=0)
+        indptr_rev, indices_rev, w_rev = build_rev_csr(indptr, indices, w)
+        assert (indptr_rev.dtype, indices_rev.dtype, w_rev.dtype) == (np.int64, np.int32, np.uint16)
+        edges = [(int(v), u, int(x)) for u in range(indptr.size - 1)
+                 for v, x in zip(indices[indptr[u]:indptr[u + 1]], w[indptr[u]:indptr[u + 1]])]
+        # Stable on (target, source): parallel edges keep their forward order
+        want = sorted(edges, key=lambda e: e[:2])
+        got = [(v, int(u), int(x)) for v in range(indptr_rev.size - 1)
+               for u, x in zip(indices_rev[indptr_rev[v]:indptr_rev[v + 1]], w_rev[indptr_rev[v]:indptr_rev[v + 1]])]
+        assert got == want
+
+    def test_rev_csr_cached(self, tmp_path, random_csr):
+        """Verify the reverse CSR is registered against the forward digest and reused as an mmap."""
+        indptr, indices, w = random_csr(60, 240, seed=1)
+        _write_forward(tmp_path, indptr, indices, w)
+
+        bundle = GraphBundle(str(tmp_path))
+        assert bundle.digest == graph_fingerprint(indptr, indices, w)
+        rev = bundle.rev_csr()
+        for got, want in zip(rev, build_rev_csr(indptr, indices, w)):
+            np.testing.assert_array_equal(got, want)
+        manifest = json.loads((tmp_path / MANIFEST).read_text())
+        assert manifest["csr"]["nodes"] == indptr.size - 1 and manifest["csr"]["edges"] == indices.size
+        assert manifest["artifacts"]["rev_csr"]["csr"] == bundle.digest
+        assert sorted(manifest["artifacts"]["rev_csr"]["files"]) == sorted(REV_FILES)
+        assert not [p for p in os.listdir(tmp_path) if p.endswith(".tmp")]
+
+        mtime = os.path.getmtime(tmp_path / REV_FILES[0])
+        reopened = GraphBundle(str(tmp_path))
+        assert reopened.has("rev_csr")
+        assert isinstance(reopened.rev_csr()[0], np.memmap)
+        assert os.path.getmtime(tmp_path / REV_FILES[0]) == mtime
+
+    def test_forward_change_invalidates(self, tmp_path, random_csr):
+        """Verify new forward content drops artifacts while an identical rewrite keeps them."""
+        indptr, indices, w = random_csr(60, 240, seed=2)
+        _write_forward(tmp_path, indptr, indices, w)
+        GraphBundle(str(tmp_path)).rev_csr()
+
+        _write_forward(tmp_path, indptr, indices, w)
+        assert GraphBundle(str(tmp_path)).has("rev_csr")
+
+        _write_forward(tmp_path, indptr, indices, w + 1)
+        bundle = GraphBundle(str(tmp_path))
+        assert not bundle.has("rev_csr")
+        assert not (tmp_path / REV_FILES[0]).exists()
+        np.testing.assert_array_equal(bundle.rev_csr()[2], build_rev_csr(indptr, indices, w + 1)[2])
+
+    def test_verify_detects_corruption(self, tmp_path, random_csr):
+        """Verify a derived file rewritten with the same size fails the checksum."""
+        indptr, indices, w = random_csr(60, 240, seed=3)
+        _write_forward(tmp_path, indptr, indices, w)
+        bundle = GraphBundle(str(tmp_path))
+        _, _, w_rev = bundle.rev_csr()
+        assert bundle.verify() == {"rev_csr": True}
+        np.save(tmp_path / REV_FILES[2], np.asarray(w_rev)[::-1].copy())
+        assert bundle.verify() == {"rev_csr": False}
@@ -0,0 +1,115 @@
+"""
+Test Graph Islands
+
+Validates graph.islands:
+- weak components below min_nodes are dropped unless they contain a kept (anchor) node
+- strong mode also drops one-way trap nodes that cannot reach a strongly connected core
+- induced_subgraph renumbers nodes in order and keeps exactly the edges between kept nodes
+- prune_csr_cache rewrites a cache directory with island_remap.npy, meta.json savings and no CH binaries (skipped without `t_hex`)
+"""
+import json
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.append("src")
+
+from graph.islands import REMAP_FILE, induced_subgraph, island_mask, prune_csr_cache
+
+
+def _csr(n, edges):
+    edges = sorted(edges)
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount([u for u, _ in edges], minlength=n), out=indptr[1:])
+    indices = np.array([v for _, v in edges], dtype=np.int32)
+    w = np.arange(1, len(edges) + 1, dtype=np.uint16)
+    return indptr, indices, w
+
+
+def _weak_ids(indptr, indices):
+    from scipy.sparse import csr_matrix
+    from scipy.sparse.csgraph import connected_components
+
+    n = indptr.size - 1
+    adj = csr_matrix((np.ones(indices.size), indices, indptr), shape=(n, n))
+    return connected_components(adj, directed=True, connection="weak")[1]
+
+
+def _graph():
+    """Bidirectional ring 0..5, a one-way tail 6 -> 0, a pair 7 <-> 8 and an isolated node 9."""
+    ring = [(i, (i + 1) % 6) for i in range(6)] + [((i + 1) % 6, i) for i in range(6)]
+    return _csr(10, ring + [(6, 0), (7, 8), (8, 7)])
+
+
+class TestGraphIslands:
+    """Test suite for island pruning of the CSR graph."""
+
+    def test_small_components_dropped(self):
+        """Verify components below the threshold go, and an anchor keeps its component."""
+        indptr, indices, _ = _graph()
+        comp = _weak_ids(indptr, indices)
+        mask, stats = island_mask(indptr, indices, 3, comp_id=comp)
+        assert mask.tolist() == [True] * 7 + [False] * 3
+        assert stats["components"] == 3 and stats["components_dropped"] == 2
+        assert stats["largest_component"] == 7 and stats["trap_nodes"] == 0
+
+        keep = np.zeros(10, dtype=bool)
+        keep[8] = True
+        mask, stats = island_mask(indptr, indices, 3, keep=keep, comp_id=comp)
+        assert mask.tolist() == [True] * 9 + [False]
+        assert stats["components_dropped"] == 1 and stats["components_kept_for_anchors"] == 1
+
+    def test_strong_drops_traps(self):
+        """Verify a node whose only edges lead into a one-way dead end is counted and, with strong, dropped."""
+        ring = [(i, (i + 1) % 4) for i in range(4)] + [((i + 1) % 4, i) for i in range(4)]
+        # 4 -> 5 is a dead end hanging off the ring (0 -> 4); 6 -> 0 can still reach the ring
+        indptr, indices, _ = _csr(7, ring + [(0, 4), (4, 5), (6, 0)])
+        comp = _weak_ids(indptr, indices)
+        mask, stats = island_mask(indptr, indices, 3, comp_id=comp)
+        assert mask.all() and stats["trap_nodes"] == 2
+        mask, _ = island_mask(indptr, indices, 3, strong=True, comp_id=comp)
+        assert mask.tolist() == [True, True, True, True, False, False, True]
+
+    def test_induced_subgraph(self):
+        """Verify the pruned CSR keeps exactly the edges between kept nodes with their weights."""
+        indptr, indices, w = _graph()
+        mask = np.ones(10, dtype=bool)
+        mask[[2, 8]] = False
+        new_indptr, new_indices, new_w, remap = induced_subgraph(mask, indptr, indices, w)
+        assert remap.tolist() == [0, 1, 3, 4, 5, 6, 7, 9]
+        got = {(int(remap[u]), int(remap[v]), int(x))
+               for u in range(remap.size)
+               for v, x in zip(new_indices[new_indptr[u]:new_indptr[u + 1]], new_w[new_indptr[u]:new_indptr[u + 1]])}
+        src = np.repeat(np.arange(10), np.diff(indptr))
+        want = {(int(u), int(v), int(x)) for u, v, x in zip(src, indices, w) if mask[u] and mask[v]}
+        assert got == want
+        assert new_indices.dtype == np.int32 and new_w.dtype == np.uint16
+
+    def test_prune_cache_dir(self, tmp_path):
+        """Verify the cache is rewritten in place with the remap, savings in meta.json and CH caches removed."""
+        t_hex = pytest.importorskip("t_hex")
+        if not hasattr(t_hex, "weakly_connected_components"):
+            pytest.skip("t_hex without weakly_connected_components")
+        indptr, indices, w = _graph()
+        node_ids = np.arange(100, 110, dtype=np.int64)
+        arrays = {
+            "node_ids": node_ids, "indptr": indptr, "indices": indices, "w_sec": w,
+            "lats": np.linspace(42.0, 43.0, 10), "lons": np.linspace(-71.0, -70.0, 10),
+            "h3_r8": np.arange(10, dtype=np.uint64),
+        }
+        for name, arr in arrays.items():
+            np.save(tmp_path / f"{name}.npy", arr)
+        (tmp_path / "meta.json").write_text(json.dumps({"pbf": "x.osm.pbf"}))
+        (tmp_path / "ch_graph.bin").write_bytes(b"stale")
+
+        report = prune_csr_cache(str(tmp_path), 3, keep_node_ids=np.array([109]))
+        assert (report["nodes_before"], report["nodes_after"]) == (10, 8)
+        assert (report["edges_before"], report["edges_after"]) == (15, 13)
+        meta = json.loads((tmp_path / "meta.json").read_text())
+        assert meta["pbf"] == "x.osm.pbf" and meta["islands"] == report
+        assert not (tmp_path / "ch_graph.bin").exists()
+        remap = np.load(tmp_path / REMAP_FILE)
+        assert remap.tolist() == [0, 1, 2, 3, 4, 5, 6, 9]
+        np.testing.assert_array_equal(np.load(tmp_path / "node_ids.npy"), node_ids[remap])
+        np.testing.assert_array_equal(np.load(tmp_path / "h3_r8.npy"), arrays["h3_r8"][remap])
@@ -0,0 +1,96 @@
+"""
+Test CSR Node Renumbering
+
+Validates graph.reorder:
+- the Hilbert order walks a full grid one neighbouring cell at a time
+- permute_csr keeps the edge multiset and gathers every per-node array with the same permutation
+- reorder_csr_cache rewrites a cache directory consistently (including island_remap of a pruned cache), records
+  node_order in meta.json and drops CH binaries
+- K-best label times are unchanged by a renumbering (skipped without `t_hex`)
+"""
+import json
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.append("src")
+
+from graph.reorder import NODE_ORDER_VERSION, hilbert_order, permute_csr, rcm_order, read_node_order, reorder_csr_cache
+
+
+def _edges(indptr, indices, w, labels):
+    return sorted((int(labels[u]), int(labels[indices[e]]), int(w[e]))
+                  for u in range(indptr.size - 1) for e in range(indptr[u], indptr[u + 1]))
+
+
+class TestGraphReorder:
+    """Test suite for locality-preserving CSR renumbering."""
+
+    def test_hilbert_order_is_continuous(self):
+        """Verify consecutive nodes in Hilbert order are grid neighbours on a full 16x16 grid."""
+        xs, ys = (a.ravel().astype(np.float64) for a in np.meshgrid(np.arange(16), np.arange(16)))
+        perm = hilbert_order(ys, xs, bits=4)
+        assert sorted(perm.tolist()) == list(range(256))
+        assert (np.abs(np.diff(xs[perm])) + np.abs(np.diff(ys[perm])) == 1).all()
+
+    def test_permute_csr_keeps_graph(self, random_csr):
+        """Verify renumbered CSR has the same labelled edges and per-node arrays follow the permutation."""
+        rng = np.random.default_rng(1)
+        indptr, indices, w = random_csr(80, 320, seed=rng)
+        node_ids = np.arange(80, dtype=np.int64) * 7 + 3
+        perm = rcm_order(indptr, indices)
+        p_indptr, p_indices, p_w, arrays = permute_csr(perm, indptr, indices, w, {"node_ids": node_ids})
+        assert arrays["node_ids"].tolist() == node_ids[perm].tolist()
+        assert _edges(p_indptr, p_indices, p_w, arrays["node_ids"]) == _edges(indptr, indices, w, node_ids)
+        with pytest.raises(ValueError):
+            permute_csr(np.zeros(80, dtype=np.int64), indptr, indices, w, {})
+
+    def test_reorder_cache_dir(self, tmp_path, random_csr):
+        """Verify the cache (island remap included) is rewritten in place with node_order metadata and stale CH caches removed."""
+        rng = np.random.default_rng(2)
+        indptr, indices, w = random_csr(80, 320, seed=rng)
+        n = indptr.size - 1
+        arrays = {
+            "node_ids": np.arange(n, dtype=np.int64) + 100,
+            "lats": rng.uniform(42, 43, n).astype(np.float32),
+            "lons": rng.uniform(-72, -71, n).astype(np.float32),
+            "h3_r8": rng.integers(1, 1 << 60, n, dtype=np.uint64),
+            "island_remap": np.sort(rng.choice(3 * n, n, replace=False)).astype(np.int64),
+            "indptr": indptr, "indices": indices, "w_sec": w,
+        }
+        for name, arr in arrays.items():
+            np.save(tmp_path / f"{name}.npy", arr)
+        (tmp_path / "meta.json").write_text(json.dumps({"pbf": "x.osm.pbf", "hierarchical_h3": True}))
+        (tmp_path / "ch_graph_rev.bin").write_bytes(b"stale")
+
+        perm = reorder_csr_cache(str(tmp_path), "hilbert")
+        assert read_node_order(str(tmp_path)) == {"method": "hilbert", "version": NODE_ORDER_VERSION}
+        assert json.loads((tmp_path / "meta.json").read_text())["pbf"] == "x.osm.pbf"
+        assert not (tmp_path / "ch_graph_rev.bin").exists()
+        got = {name: np.load(tmp_path / f"{name}.npy") for name in arrays}
+        for name in ("node_ids", "lats", "lons", "h3_r8", "island_remap"):
+            np.testing.assert_array_equal(got[name], arrays[name][perm])
+        assert _edges(got["indptr"], got["indices"], got["w_sec"], got["node_ids"]) == \
+            _edges(indptr, indices, w, arrays["node_ids"])
+
+    def test_kbest_times_invariant(self, random_csr):
+        """Verify the bucket kernel gives the same per-node label times after renumbering."""
+        t_hex = pytest.importorskip("t_hex")
+        if not hasattr(t_hex, "kbest_multisource_bucket_csr"):
+            pytest.skip("t_hex built without the bucket kernel")
+        from graph.csr_utils import build_rev_csr
+
+        rng = np.random.default_rng(3)
+        indptr, indices, w = random_csr(1500, 6000, seed=rng)
+        sources = np.sort(rng.choice(1500, 30, replace=False)).astype(np.int32)
+        lats, lons = rng.uniform(42, 43, 1500), rng.uniform(-72, -71, 1500)
+        perm = hilbert_order(lats, lons)
+        inv = np.empty_like(perm)
+        inv[perm] = np.arange(perm.size)
+        p_indptr, p_indices, p_w, _ = permute_csr(perm, indptr, indices, w, {})
+
+        _, t = t_hex.kbest_multisource_bucket_csr(*build_rev_csr(indptr, indices, w), sources, 4, 900, 1800, 1, False)
+        _, p_t = t_hex.kbest_multisource_bucket_csr(*build_rev_csr(p_indptr, p_indices, p_w),
+                                                    inv[sources].astype(np.int32), 4, 900, 1800, 1, False)
+        np.testing.assert_array_equal(np.asarray(p_t), np.asarray(t)[perm])
@@ -0,0 +1,143 @@
+"""
+Test Degree-2 Chain Contraction
+
+Validates graph.simplify:
+- one-way and two-way chains collapse to single edges between kept nodes; kept nodes are never removed
+- isolated through-node cycles are left in place
+- labels expanded from the contracted graph equal K-best labels on the full graph
+- the native frontier kernel on the contracted graph expands to the full-graph result (skipped without `t_hex`)
+"""
+import heapq
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.append("src")
+
+from graph.simplify import contract_degree2
+
+UNREACH = 65535
+
+
+def _csr(n, edges):
+    edges = sorted(edges)
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    for u, _, _ in edges:
+        indptr[u + 1] += 1
+    return (np.cumsum(indptr), np.array([v for _, v, _ in edges], dtype=np.int32),
+            np.array([w for _, _, w in edges], dtype=np.uint16))
+
+
+def _road_graph(rng, side=6, subdiv=4, one_way_share=0.3):
+    """Grid of intersections whose streets are chains of shape nodes, some of them one-way."""
+    edges, n = [], side * side
+    for r in range(side):
+        for c in range(side):
+            for dr, dc in ((0, 1), (1, 0)):
+                if r + dr >= side or c + dc >= side:
+                    continue
+                a, b = r * side + c, (r + dr) * side + (c + dc)
+                chain = [a] + list(range(n, n + subdiv)) + [b]
+                n += subdiv
+                one_way = rng.random() < one_way_share
+                for x, y in zip(chain[:-1], chain[1:]):
+                    edges.append((x, y, int(rng.integers(1, 60))))
+                    if not one_way:
+                        edges.append((y, x, int(rng.integers(1, 60))))
+    return n, edges
+
+
+def _kbest(indptr, indices, w, sources, k, cutoff):
+    """Node → K nearest sources by (time, source index), one reverse Dijkstra per source."""
+    n = indptr.size - 1
+    rev = [[] for _ in range(n)]
+    for u in range(n):
+        for e in range(indptr[u], indptr[u + 1]):
+            rev[int(indices[e])].append((u, int(w[e])))
+    labels = [[] for _ in range(n)]
+    for s in sources:
+        dist = {int(s): 0}
+        heap = [(0, int(s))]
+        while heap:
+            d, v = heapq.heappop(heap)
+            if d > dist.get(v, 1 << 60):
+                continue
+            labels[v].append((d, int(s)))
+            for u, wu in rev[v]:
+                nd = d + wu
+                if nd <= cutoff and nd < dist.get(u, 1 << 60):
+                    dist[u] = nd
+                    heapq.heappush(heap, (nd, u))
+    src = np.full((n, k), -1, dtype=np.int32)
+    t = np.full((n, k), UNREACH, dtype=np.uint16)
+    for v, lab in enumerate(labels):
+        for j, (d, s) in enumerate(sorted(lab)[:k]):
+            src[v, j], t[v, j] = s, d
+    return src, t
+
+
+class TestGraphSimplify:
+    """Test suite for degree-2 contraction and label expansion."""
+
+    def test_chains_collapse(self):
+        """Verify a two-way chain and a one-way chain become single summed edges, keeping marked nodes."""
+        # 0 <-> 1 <-> 2 <-> 3 (two-way), 3 -> 4 -> 5 -> 0 (one-way); node 0 and 3 are junctions
+        edges = [(0, 1, 5), (1, 0, 6), (1, 2, 7), (2, 1, 8), (2, 3, 9), (3, 2, 10),
+                 (3, 4, 1), (4, 5, 2), (5, 0, 3)]
+        g = contract_degree2(*_csr(6, edges), np.zeros(6, dtype=bool))
+        assert g.kept.tolist() == [0, 3]
+        got = {(int(g.kept[u]), int(g.kept[g.indices[e]]), int(g.w_sec[e]))
+               for u in range(g.n_nodes) for e in range(g.indptr[u], g.indptr[u + 1])}
+        # 3 -> 0 exists twice (24 s back along the two-way chain, 6 s around the one-way loop): the faster one stays
+        assert got == {(0, 3, 21), (3, 0, 6)}
+        keep = np.zeros(6, dtype=bool)
+        keep[2] = True
+        assert contract_degree2(*_csr(6, edges), keep).kept.tolist() == [0, 2, 3]
+
+    def test_isolated_cycle_is_kept(self):
+        """Verify a ring made only of through nodes is not contracted away."""
+        edges = [(i, (i + 1) % 4, 1) for i in range(4)]
+        g = contract_degree2(*_csr(4, edges), np.zeros(4, dtype=bool))
+        assert g.n_nodes == 4 and g.removed.size == 0
+
+    def test_expanded_labels_match_full_graph(self):
+        """Verify expanding contracted K-best labels reproduces the full-graph labels exactly."""
+        rng = np.random.default_rng(5)
+        n, edges = _road_graph(rng)
+        indptr, indices, w = _csr(n, edges)
+        anchors = np.sort(rng.choice(n, 12, replace=False))
+        keep = np.zeros(n, dtype=bool)
+        keep[anchors] = True
+        k, cutoff = 4, 400
+
+        g = contract_degree2(indptr, indices, w, keep)
+        assert g.n_nodes < n / 2 and set(anchors.tolist()) <= set(g.kept.tolist())
+        c_src, c_t = _kbest(g.indptr, g.indices, g.w_sec, g.new_index[anchors], k, cutoff)
+        got_src, got_t = g.expand_labels(c_src, c_t, cutoff)
+        full_src, full_t = _kbest(indptr, indices, w, anchors, k, cutoff)
+        np.testing.assert_array_equal(got_t, full_t)
+        np.testing.assert_array_equal(got_src, full_src)
+
+    def test_frontier_kernel_on_contracted_graph(self):
+        """Verify the native frontier kernel on the contracted graph expands to the full-graph labels."""
+        t_hex = pytest.importorskip("t_hex")
+        if not hasattr(t_hex, "kbest_multisource_frontier_csr"):
+            pytest.skip("t_hex built without the frontier kernel")
+        from graph.csr_utils import build_rev_csr
+
+        rng = np.random.default_rng(9)
+        n, edges = _road_graph(rng, side=12, subdiv=6)
+        indptr, indices, w = _csr(n, edges)
+        anchors = np.sort(rng.choice(n, 40, replace=False)).astype(np.int32)
+        keep = np.zeros(n, dtype=bool)
+        keep[anchors] = True
+        k, cp, co = 5, 600, 1200
+        kbest = t_hex.kbest_multisource_frontier_csr
+
+        g = contract_degree2(indptr, indices, w, keep)
+        c_src, c_t = kbest(*build_rev_csr(g.indptr, g.indices, g.w_sec), g.new_index[anchors], k, cp, co, 2, False)
+        got_src, got_t = g.expand_labels(c_src, c_t, co)
+        full_src, full_t = kbest(*build_rev_csr(indptr, indices, w), anchors, k, cp, co, 2, False)
+        np.testing.assert_array_equal(got_t, np.asarray(full_t))
+        np.testing.assert_array_equal(got_src, np.asarray(full_src))
@@ -0,0 +1,138 @@
+"""
+Test Fused K-best + H3 Streaming
+
+Validates t_hex.kbest_h3_topk_stream (skipped when the native module is not built):
+- batched rows equal a per-hex top-K reduction of the standalone kernel's node labels
+- every hex appears once per resolution with at most K distinct anchors
+- arrow=True batches import into pyarrow with the same rows as the NumPy sink
+- aggregate_h3_topk_sorted equals aggregate_h3_topk_precached and a per-hex reference on random
+  labels with ties, repeated sites, empty cells (h3 == 0), unreachable slots and K below the label
+  width, and both count the distinct hexes as `groups`
+"""
+import sys
+from collections import defaultdict
+
+import numpy as np
+import pytest
+
+sys.path.append("src")
+
+t_hex = pytest.importorskip("t_hex")
+if not hasattr(t_hex, "kbest_h3_topk_stream"):
+    pytest.skip("t_hex built without the fused streaming kernel", allow_module_level=True)
+
+UNREACH = 65535
+
+
+def _ring_graph(n):
+    src = np.concatenate([np.arange(n), (np.arange(n) + 1) % n])
+    dst = np.concatenate([(np.arange(n) + 1) % n, np.arange(n)])
+    w = (np.arange(2 * n) % 50 + 10).astype(np.uint16)
+    order = np.lexsort((dst, src))
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.add.at(indptr, src[order] + 1, 1)
+    return np.cumsum(indptr), dst[order].astype(np.int32), w[order]
+
+
+class TestH3Stream:
+    """Test suite for the fused streaming aggregation."""
+
+    def test_stream_matches_reference_reduction(self):
+        """Verify streamed per-hex top-K equals min-time-per-anchor over the hex's node labels."""
+        n, k = 400, 3
+        indptr, indices, w = _ring_graph(n)
+        sources = np.arange(0, n, 25, dtype=np.int32)
+        anchor_of_node = np.full(n, -1, dtype=np.int32)
+        anchor_of_node[sources] = np.arange(sources.size, dtype=np.int32) + 100
+        # Two fake "resolutions": 8 nodes per cell and 40 nodes per cell
+        h3_ids = np.stack([np.arange(n) // 8 + 1, np.arange(n) // 40 + 1], axis=1).astype(np.uint64)
+        res = np.array([8, 7], dtype=np.int32)
+
+        batches = []
+        rows = t_hex.kbest_h3_topk_stream(
+            indptr, indices, w, sources, anchor_of_node, h3_ids, res, k, 1200, 1800, 1, False,
+            lambda *cols: batches.append([np.asarray(c) for c in cols]), batch_rows=50,
+        )
+        assert len(batches) > 1
+        h3_out, site_out, time_out, res_out = (np.concatenate(c) for c in zip(*batches))
+        assert rows == h3_out.size
+
+        best_src, time_s = t_hex.kbest_multisource_bucket_csr(indptr, indices, w, sources, k, 1200, 1800, 1, False)
+        for ri, r in enumerate(res.tolist()):
+            per_hex = defaultdict(dict)
+            for node in range(n):
+                for s, t in zip(best_src[node].tolist(), time_s[node].tolist()):
+                    if s < 0 or t == UNREACH:
+                        continue
+                    site = int(anchor_of_node[s])
+                    cell = int(h3_ids[node, ri])
+                    per_hex[cell][site] = min(per_hex[cell].get(site, t), t)
+            got = defaultdict(list)
+            for h, s, t in zip(h3_out[res_out == r].tolist(), site_out[res_out == r].tolist(), time_out[res_out == r].tolist()):
+                got[h].append((t, s))
+            assert set(got) == set(per_hex)
+            for cell, sites in per_hex.items():
+                expected = sorted((t, s) for s, t in sites.items())[:k]
+                assert got[cell] == expected
+
+    def test_arrow_batches_match_numpy_batches(self):
+        """Verify ArrowBatch output imports via the PyCapsule protocol and equals the NumPy columns."""
+        pa = pytest.importorskip("pyarrow")
+        n, k = 300, 2
+        indptr, indices, w = _ring_graph(n)
+        sources = np.arange(0, n, 30, dtype=np.int32)
+        anchor_of_node = np.full(n, -1, dtype=np.int32)
+        anchor_of_node[sources] = np.arange(sources.size, dtype=np.int32)
+        h3_ids = (np.arange(n) // 10 + 1).astype(np.uint64).reshape(n, 1)
+        res = np.array([8], dtype=np.int32)
+        args = (indptr, indices, w, sources, anchor_of_node, h3_ids, res, k, 1200, 1800, 1, False)
+
+        np_batches, arrow_batches = [], []
+        t_hex.kbest_h3_topk_stream(*args, lambda *cols: np_batches.append(cols), batch_rows=40)
+        t_hex.kbest_h3_topk_stream(*args, lambda b: arrow_batches.append(pa.record_batch(b)), batch_rows=40, arrow=True)
+
+        table = pa.Table.from_batches(arrow_batches)
+        assert table.schema.names == ["h3_id", "anchor_int_id", "time_s", "res"]
+        assert table.schema.field("time_s").type == pa.uint16()
+        for name, col in zip(table.schema.names, (np.concatenate(c) for c in zip(*np_batches))):
+            np.testing.assert_array_equal(table.column(name).to_numpy(), col)
+
+    @pytest.mark.parametrize("k", [1, 3, 6])
+    def test_sorted_aggregation_matches_precached(self, k):
+        """Verify the sort-based aggregation returns the hash-map aggregation's rows and a reference top-K."""
+        if not hasattr(t_hex, "aggregate_h3_topk_sorted"):
+            pytest.skip("t_hex built without the sort-based aggregation")
+        rng = np.random.default_rng(k)
+        n, kdim = 600, 6
+        # Few sites and times so one site reaches a hex from several nodes and times tie often
+        best = rng.integers(0, 12, (n, kdim)).astype(np.int32)
+        time_s = rng.integers(0, 15, (n, kdim)).astype(np.uint16)
+        best[rng.random((n, kdim)) < 0.1] = -1
+        time_s[rng.random((n, kdim)) < 0.1] = UNREACH
+        h3_ids = np.stack([rng.integers(1, 40, n), rng.integers(1000, 1010, n)], axis=1).astype(np.uint64)
+        h3_ids[rng.random((n, 2)) < 0.1] = 0
+        res = np.array([8, 7], dtype=np.int32)
+
+        per_hex = defaultdict(dict)
+        for node in range(n):
+            for ri, r in enumerate(res.tolist()):
+                cell = int(h3_ids[node, ri])
+                for site, t in zip(best[node].tolist(), time_s[node].tolist()):
+                    if cell and site >= 0 and t < UNREACH:
+                        cur = per_hex[(r, cell)]
+                        cur[site] = min(cur.get(site, t), t)
+        expected = sorted((r, cell, t, site) for (r, cell), sites in per_hex.items()
+                          for t, site in sorted((t, s) for s, t in sites.items())[:k])
+
+        def _rows(out):
+            h, s, t, r = (np.asarray(c).astype(np.int64) for c in out)
+            return sorted(zip(r.tolist(), h.tolist(), t.tolist(), s.tolist()))
+
+        args = (h3_ids, best, time_s, res, k, UNREACH)
+        sorted_out, sorted_stats = t_hex.aggregate_h3_topk_sorted(*args, 2, False, stats=True)
+        assert _rows(sorted_out) == expected
+        for threads in (1, 4):
+            precached_out, precached_stats = t_hex.aggregate_h3_topk_precached(*args, threads, False, stats=True)
+            assert _rows(precached_out) == expected
+            assert precached_stats["groups"] == sorted_stats["groups"] == len(per_hex)
+            assert precached_stats["peak_queued"] == sorted_stats["peak_queued"] == 0
@@ -0,0 +1,65 @@
+"""
+Test Hex Lookup Index
+
+Validates src/serving/hex_lookup.py:
+- the mmap'd index mirrors the merged wide T_hex table (sorted ordinals, empty slots)
+- best_anchor equals a brute-force min of a_s + D_anchor[a_id]
+"""
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.append("src")
+
+from serving.hex_lookup import UNREACH_U16, HexLookupIndex, best_anchor, build_hex_index, dense_d_anchor
+
+
+def _wide_table(path):
+    df = pd.DataFrame({
+        "h3_id": np.array([30, 10, 20], dtype=np.uint64),
+        "res": np.array([8, 8, 8], dtype=np.int32),
+        "a0_id": [5.0, 1.0, np.nan],
+        "a0_s": [100.0, 50.0, np.nan],
+        "a1_id": [7.0, np.nan, np.nan],
+        "a1_s": [300.0, np.nan, np.nan],
+    })
+    df.to_parquet(path, index=False)
+
+
+class TestHexLookup:
+    """Test suite for the hover lookup index."""
+
+    def test_index_layout(self, tmp_path):
+        """Verify rows are sorted by h3_id and missing slots become -1 / UNREACH."""
+        src = tmp_path / "us_r8.parquet"
+        _wide_table(src)
+        meta = build_hex_index(str(src), str(tmp_path / "r8"), 8)
+        assert meta["rows"] == 3 and meta["k"] == 2
+
+        idx = HexLookupIndex.open(str(tmp_path / "r8"))
+        assert idx.hex_ids.tolist() == [10, 20, 30]
+        assert idx.ordinal(25) is None
+        a_id, a_s = idx.row(idx.ordinal(30))
+        assert a_id.tolist() == [5, 7] and a_s.tolist() == [100, 300]
+        a_id, a_s = idx.row(idx.ordinal(20))
+        assert a_id.tolist() == [-1, -1] and a_s.tolist() == [UNREACH_U16, UNREACH_U16]
+
+    def test_best_anchor_matches_brute_force(self):
+        """Verify the slot-wise min over a_s + D[a_id] skips empty and unreachable slots."""
+        rng = np.random.default_rng(11)
+        dense = dense_d_anchor(np.arange(0, 50, 2), rng.integers(0, 4000, 25))
+        dense[10] = UNREACH_U16
+        for _ in range(200):
+            a_id = rng.integers(-1, 60, 6).astype(np.int32)
+            a_s = rng.integers(0, 3000, 6).astype(np.uint16)
+            a_s[rng.random(6) < 0.2] = UNREACH_U16
+            expected = None
+            for aid, s in zip(a_id.tolist(), a_s.tolist()):
+                if aid < 0 or aid >= dense.size or s >= UNREACH_U16 or dense[aid] >= UNREACH_U16:
+                    continue
+                total = s + int(dense[aid])
+                if expected is None or total < expected:
+                    expected = total
+            hit = best_anchor(a_id, a_s, dense)
+            assert (hit[0] if hit else None) == expected
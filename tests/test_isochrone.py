@@ -0,0 +1,52 @@
+"""
+Test Isochrone Aggregation
+
+Validates src/serving/isochrone.py:
+- node -> hex ordinal index over cached H3 ids
+- per-hex minimum within the cutoff, ignoring unreachable nodes
+- minute rounding never under-reports travel time
+"""
+import sys
+
+import numpy as np
+
+sys.path.append("src")
+
+from serving.isochrone import INF_U32, HexIndex, LRUCache, min_time_by_hex, seconds_to_minutes
+
+
+class TestIsochrone:
+    """Test suite for isochrone hex aggregation."""
+
+    def test_min_time_by_hex_matches_reference(self):
+        """Verify the vectorized group-by equals a per-hex Python loop."""
+        rng = np.random.default_rng(3)
+        node_h3 = rng.choice(np.array([11, 22, 33, 44, 55], dtype=np.uint64), size=500)
+        times = rng.integers(0, 3000, size=500).astype(np.uint32)
+        times[::7] = INF_U32
+        idx = HexIndex.from_node_h3(node_h3, 8)
+        assert np.array_equal(idx.hex_ids[idx.node_hex], node_h3)
+
+        ords, secs = min_time_by_hex(times, idx.node_hex, 1200)
+        expected = {}
+        for h, t in zip(node_h3.tolist(), times.tolist()):
+            if t <= 1200:
+                expected[h] = min(expected.get(h, t), t)
+        got = {int(idx.hex_ids[o]): int(s) for o, s in zip(ords, secs)}
+        assert got == expected
+        assert np.all(np.diff(ords) > 0)
+
+    def test_nothing_reachable(self):
+        """Verify an unreachable origin yields empty arrays."""
+        ords, secs = min_time_by_hex(np.full(4, INF_U32), np.arange(4, dtype=np.int32), 600)
+        assert ords.size == 0 and secs.size == 0
+
+    def test_minutes_round_up_and_lru(self):
+        """Verify minute rounding and LRU eviction order."""
+        assert seconds_to_minutes(np.array([0, 1, 60, 61])).tolist() == [0, 1, 1, 2]
+        lru = LRUCache(2)
+        lru.put("a", 1)
+        lru.put("b", 2)
+        assert lru.get("a") == 1
+        lru.put("c", 3)
+        assert lru.get("b") is None and lru.get("a") == 1 and len(lru) == 2
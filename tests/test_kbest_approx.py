@@ -0,0 +1,58 @@
+"""
+Test Approximate K-best
+
+Validates graph.kbest_approx:
+- a 1-second bucket width leaves the kernel untouched
+- quantized runs return multiples of the width, and 'up' rounding never underestimates
+- the label comparison reports zero error for identical labels and counts lost/changed slots
+"""
+import sys
+
+import numpy as np
+
+sys.path.append("src")
+
+from graph.kbest_approx import compare_labels, quantize_weights, quantized_kernel
+
+UNREACH = 65535
+
+
+class TestKbestApprox:
+    """Quantized-time K-best and its validation against the exact run."""
+
+    def test_unit_width_is_exact(self, kbest_reference):
+        """bucket width 1 returns the kernel itself."""
+        assert quantized_kernel(kbest_reference, 1) is kbest_reference
+
+    def test_round_up_bounds(self, random_csr, kbest_reference):
+        """'up' rounding gives width multiples that are never below the exact time of the same slot."""
+        rng = np.random.default_rng(5)
+        indptr, indices, w = random_csr(150, 600, seed=rng, w_high=120)
+        sources = np.sort(rng.choice(150, 12, replace=False)).astype(np.int32)
+        exact_src, exact_t = kbest_reference(indptr, indices, w, sources, 3, 1800, 1800, 1, False)
+        approx_src, approx_t = quantized_kernel(kbest_reference, 30, "up")(indptr, indices, w, sources, 3, 1800, 1800, 1, False)
+
+        reached = approx_t != UNREACH
+        assert np.all(approx_t[reached] % 30 == 0)
+        assert np.all(approx_t[reached] <= 1800)
+        # Every approximate label is an upper bound, so slots the exact run left empty stay empty
+        assert not np.any(reached & (exact_t == UNREACH))
+        assert np.all(approx_t[reached].astype(int) >= exact_t[reached].astype(int))
+        assert np.array_equal(quantize_weights(np.array([0, 1, 30, 31], np.uint16), 30, "up"), [0, 1, 1, 2])
+        assert np.array_equal(quantize_weights(np.array([14, 15, 44, 45], np.uint16), 30, "nearest"), [0, 1, 1, 2])
+
+    def test_compare_labels(self):
+        """Identical labels have no error; shifted times and a dropped slot are reported."""
+        src = np.array([[0, 1], [1, -1], [-1, -1]], dtype=np.int32)
+        t = np.array([[10, 40], [5, UNREACH], [UNREACH, UNREACH]], dtype=np.uint16)
+        same = compare_labels(src, t, src.copy(), t.copy())
+        assert same["nodes"] == 2 and same["slots_compared"] == 3
+        assert same["abs_err_max_s"] == 0 and same["exact_share"] == 1.0 and same["topk_recall"] == 1.0
+
+        approx_src = np.array([[1, -1], [1, -1], [-1, -1]], dtype=np.int32)
+        approx_t = np.array([[20, UNREACH], [0, UNREACH], [UNREACH, UNREACH]], dtype=np.uint16)
+        diff = compare_labels(src, t, approx_src, approx_t)
+        assert diff["slots_compared"] == 2 and diff["slots_lost"] == 1 and diff["slots_gained"] == 0
+        assert diff["err_mean_s"] == 2.5 and diff["abs_err_max_s"] == 10
+        assert diff["nearest_same_source"] == 0.5
+        assert diff["topk_recall"] == 0.75
@@ -0,0 +1,84 @@
+"""
+Test Frontier K-best Kernel
+
+Validates t_hex.kbest_multisource_frontier_csr (skipped when the native module is not built):
+- labels equal a brute-force per-source Dijkstra top-K
+- output is identical for any thread count, including with the parallel phases forced on
+- labels (sources included, ties too) equal the single-threaded bucket kernel, with and without
+  a primary/overflow split
+"""
+import heapq
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.append("src")
+
+t_hex = pytest.importorskip("t_hex")
+if not hasattr(t_hex, "kbest_multisource_frontier_csr"):
+    pytest.skip("t_hex built without the frontier kernel", allow_module_level=True)
+
+UNREACH = 65535
+
+
+def _brute_force(indptr, indices, w, sources, cutoff):
+    n = indptr.size - 1
+    per_node = [[] for _ in range(n)]
+    for s in sources.tolist():
+        dist = {s: 0}
+        pq = [(0, s)]
+        while pq:
+            d, u = heapq.heappop(pq)
+            if d > dist.get(u, UNREACH):
+                continue
+            for e in range(indptr[u], indptr[u + 1]):
+                v, nd = int(indices[e]), d + int(w[e])
+                if nd <= cutoff and nd < dist.get(v, UNREACH):
+                    dist[v] = nd
+                    heapq.heappush(pq, (nd, v))
+        for v, d in dist.items():
+            per_node[v].append((d, s))
+    return [sorted(labels) for labels in per_node]
+
+
+class TestKbestFrontier:
+    """Test suite for the shared-frontier K-best kernel."""
+
+    def test_matches_brute_force_and_is_thread_independent(self, random_csr):
+        """Verify node labels equal per-source Dijkstra top-K and do not change with threads."""
+        indptr, indices, w = random_csr(3000, 12000, seed=5, w_high=400)
+        sources = np.arange(0, 3000, 97, dtype=np.int32)
+        k, cutoff = 4, 1800
+        runs = [
+            t_hex.kbest_multisource_frontier_csr(indptr, indices, w, sources, k, cutoff, cutoff, threads, False,
+                                                 par_min_items=par_min_items)
+            for threads, par_min_items in ((1, 2048), (4, 2048), (4, 1))
+        ]
+        for other in runs[1:]:
+            assert np.array_equal(runs[0][0], other[0])
+            assert np.array_equal(runs[0][1], other[1])
+
+        best_src, time_s = runs[0]
+        expected = _brute_force(indptr, indices, w, sources, cutoff)
+        for node in range(0, 3000, 7):
+            labels = expected[node]
+            got_t = [int(t) for t in time_s[node] if t != UNREACH]
+            assert got_t == [d for d, _ in labels[:k]]
+            # Ties at the K-th slot go to the lowest source index
+            assert best_src[node][: len(got_t)].tolist() == [s for _, s in labels[:k]]
+
+    @pytest.mark.parametrize("cutoff_primary", [900, 1800])
+    def test_matches_bucket_kernel(self, random_csr, cutoff_primary):
+        """Verify the frontier kernel (parallel paths forced) returns exactly the bucket kernel's labels at threads=1."""
+        # Coarse weights make equal-time labels common, so the tie order is exercised
+        indptr, indices, w = random_csr(2000, 8000, seed=9, w_low=1, w_high=60)
+        w = (w // 20 + 1) * 20
+        sources = np.arange(0, 2000, 37, dtype=np.int32)
+        k, cutoff = 4, 1800
+        bucket_src, bucket_t = t_hex.kbest_multisource_bucket_csr(indptr, indices, w, sources, k, cutoff_primary, cutoff, 1, False)
+        for threads in (1, 4):
+            src, t = t_hex.kbest_multisource_frontier_csr(indptr, indices, w, sources, k, cutoff_primary, cutoff, threads, False,
+                                                          par_min_items=1)
+            np.testing.assert_array_equal(t, bucket_t)
+            np.testing.assert_array_equal(src, bucket_src)
@@ -0,0 +1,146 @@
+"""
+Test Incremental K-best Repair
+
+Validates graph.kbest_incremental:
+- merge_topk keeps one slot per source and orders rows by (time, source)
+- anchor diffs treat moved/relabeled anchors as removed + added
+- only affected hexes are replaced when patching a T_hex table
+- the label cache records its kernel and rejects a run with another one
+- repaired labels equal a full rebuild with the pure-Python reference kernel
+- repaired labels equal a full frontier rebuild after adds, removals and moves (skipped without `t_hex`)
+"""
+import sys
+
+import numpy as np
+import pyarrow as pa
+import pytest
+
+sys.path.append("src")
+
+from graph.csr_utils import build_rev_csr
+from graph.kbest_incremental import (
+    affected_hexes,
+    changed_sources,
+    label_cache_mismatch,
+    load_label_cache,
+    merge_topk,
+    patch_t_hex,
+    repair_labels,
+    save_label_cache,
+)
+
+UNREACH = 65535
+
+
+def _t_hex(rows):
+    h3, site, secs, res = zip(*rows) if rows else ((), (), (), ())
+    return pa.table({
+        "h3_id": pa.array(h3, type=pa.uint64()),
+        "anchor_int_id": pa.array(site, type=pa.int32()),
+        "time_s": pa.array(secs, type=pa.uint16()),
+        "res": pa.array(res, type=pa.int32()),
+    })
+
+
+class TestKbestIncremental:
+    """Test suite for incremental label repair and T_hex patching."""
+
+    def test_merge_topk_dedupes_and_orders(self):
+        """Verify merged rows keep each source once at its best time, ordered by (time, source)."""
+        src_a = np.array([[4, 2, -1], [1, -1, -1]], dtype=np.int32)
+        t_a = np.array([[10, 30, UNREACH], [5, UNREACH, UNREACH]], dtype=np.uint16)
+        src_b = np.array([[7, 2, 9], [-1, -1, -1]], dtype=np.int32)
+        t_b = np.array([[10, 30, 50], [UNREACH, UNREACH, UNREACH]], dtype=np.uint16)
+        src, t = merge_topk(src_a, t_a, src_b, t_b, 3)
+        assert src.tolist() == [[4, 7, 2], [1, -1, -1]]
+        assert t.tolist() == [[10, 10, 30], [5, UNREACH, UNREACH]]
+
+    def test_changed_sources(self):
+        """Verify removed, added, moved and relabeled anchors are classified."""
+        old = np.array([-1, 0, 1, 2, -1, 3], dtype=np.int32)
+        new = np.array([-1, 0, -1, 7, 1, 3], dtype=np.int32)
+        removed, added = changed_sources(old, new)
+        assert removed.tolist() == [2, 3]
+        assert added.tolist() == [3, 4]
+
+    def test_patch_replaces_only_affected_hexes(self):
+        """Verify affected hexes are rebuilt in full and unaffected rows are kept."""
+        node_h3 = np.array([[100, 10], [100, 10], [200, 10], [300, 30]], dtype=np.uint64)
+        rows, hexes = affected_hexes(node_h3, np.array([2]))
+        # node 2 is in hex 200 (res 9) and 10 (res 8); hex 10 pulls in nodes 0 and 1 as well
+        assert rows.tolist() == [0, 1, 2]
+        assert [h.tolist() for h in hexes] == [[200], [10]]
+
+        base = _t_hex([(100, 1, 60, 9), (200, 1, 90, 9), (300, 2, 30, 9), (10, 1, 60, 8), (30, 2, 30, 8)])
+        fresh = _t_hex([(100, 5, 20, 9), (200, 5, 40, 9), (10, 5, 20, 8), (10, 1, 60, 8)])
+        got = patch_t_hex(base, fresh, [9, 8], hexes).to_pylist()
+        assert [(r["h3_id"], r["anchor_int_id"], r["time_s"], r["res"]) for r in got] == [
+            (10, 5, 20, 8), (10, 1, 60, 8), (30, 2, 30, 8),
+            (100, 1, 60, 9), (200, 5, 40, 9), (300, 2, 30, 9),
+        ]
+
+    def test_label_cache_records_kernel(self, tmp_path):
+        """Verify the cache meta keeps the kernel and a different (or unrecorded) kernel is a mismatch."""
+        src = np.array([[3, -1], [1, 3]], dtype=np.int32)
+        t = np.array([[40, UNREACH], [10, 25]], dtype=np.uint16)
+        save_label_cache(str(tmp_path / "labels"), src, t, np.array([-1, 0, -1, 1], dtype=np.int32), 600, 900, "g", "chunked")
+        meta, arrays = load_label_cache(str(tmp_path / "labels"))
+        np.testing.assert_array_equal(arrays["best_src_idx"], src)
+        assert label_cache_mismatch(meta, k=2, graph="g", kernel="chunked") == {}
+        assert label_cache_mismatch(meta, k=2, graph="g", kernel="frontier") == {"kernel": "chunked"}
+        meta.pop("kernel")
+        assert label_cache_mismatch(meta, kernel="chunked") == {"kernel": None}
+
+    def test_repair_matches_reference_rebuild(self, random_csr, kbest_reference):
+        """Verify the merge/re-solve logic reproduces a full run of the (time, source)-ordered reference kernel."""
+        rng = np.random.default_rng(7)
+        n = 300
+        fwd = random_csr(n, 1200, seed=rng, w_high=200)
+        rev = build_rev_csr(*fwd)
+        k, cp, co = 3, 600, 900
+
+        old_anchor_idx = np.full(n, -1, dtype=np.int32)
+        old_nodes = rng.choice(n, 30, replace=False)
+        old_anchor_idx[old_nodes] = np.arange(30, dtype=np.int32)
+        new_anchor_idx = old_anchor_idx.copy()
+        new_anchor_idx[old_nodes[:4]] = -1                      # removed
+        free = np.flatnonzero(old_anchor_idx < 0)
+        new_anchor_idx[free[:3]] = [4, 5, 50]                   # anchors 4 and 5 moved, 50 added
+        new_anchor_idx[old_nodes[4:6]] = -1
+
+        old_src, old_t = kbest_reference(*rev, np.flatnonzero(old_anchor_idx >= 0).astype(np.int32), k, cp, co, 1, False)
+        full_src, full_t = kbest_reference(*rev, np.flatnonzero(new_anchor_idx >= 0).astype(np.int32), k, cp, co, 1, False)
+        got_src, got_t, stats = repair_labels(kbest_reference, fwd, rev, old_src, old_t, old_anchor_idx, new_anchor_idx, cp, co)
+        assert stats["removed"] == 6 and stats["added"] == 3
+        assert stats["invalidated"] > 0 and stats["merged"] > 0
+        np.testing.assert_array_equal(got_t, full_t)
+        np.testing.assert_array_equal(got_src, full_src)
+
+    def test_repair_matches_full_rebuild(self, random_csr):
+        """Verify repaired labels equal a full frontier run on the new anchor set."""
+        t_hex = pytest.importorskip("t_hex")
+        if not hasattr(t_hex, "kbest_multisource_frontier_csr"):
+            pytest.skip("t_hex built without the frontier kernel")
+
+        rng = np.random.default_rng(11)
+        n, m = 2000, 8000
+        fwd = random_csr(n, m, seed=rng, w_high=400)
+        rev = build_rev_csr(*fwd)
+        kbest = t_hex.kbest_multisource_frontier_csr
+        k, cp, co = 4, 1200, 2400
+
+        old_anchor_idx = np.full(n, -1, dtype=np.int32)
+        old_nodes = rng.choice(n, 60, replace=False)
+        old_anchor_idx[old_nodes] = np.arange(60, dtype=np.int32)
+        new_anchor_idx = old_anchor_idx.copy()
+        new_anchor_idx[old_nodes[:5]] = -1                      # removed
+        free = np.flatnonzero(old_anchor_idx < 0)
+        new_anchor_idx[free[:3]] = [5, 6, 100]                  # anchors 5 and 6 moved, 100 added
+        new_anchor_idx[old_nodes[5:7]] = -1
+
+        old_src, old_t = kbest(*rev, np.flatnonzero(old_anchor_idx >= 0).astype(np.int32), k, cp, co, 1, False)
+        full_src, full_t = kbest(*rev, np.flatnonzero(new_anchor_idx >= 0).astype(np.int32), k, cp, co, 1, False)
+        got_src, got_t, stats = repair_labels(kbest, fwd, rev, old_src, old_t, old_anchor_idx, new_anchor_idx, cp, co)
+        assert stats["removed"] == 7 and stats["added"] == 3
+        np.testing.assert_array_equal(got_t, full_t)
+        np.testing.assert_array_equal(got_src, full_src)
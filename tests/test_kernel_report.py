@@ -0,0 +1,75 @@
+"""
+Test Kernel Reports
+
+Validates kernel_report.RunReport and call_with_stats:
+- stats dicts are stripped from kernel results and recorded per call
+- totals sum counters and phases but keep the maximum of peak_queued / bucket_span
+- kernels without a `stats` argument still run and are recorded without counters
+- the native K-best kernel returns a stats dict with `stats=True`
+"""
+import json
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.append("src")
+
+from kernel_report import RunReport, call_with_stats
+
+
+def _fake_kbest(n, stats=False):
+    """Stand-in for a t_hex kernel: (src, t) plus a counter dict when asked."""
+    out = (np.zeros((n, 1), np.int32), np.zeros((n, 1), np.uint16))
+    if not stats:
+        return out
+    return out + ({"pops": n, "relaxations": 2 * n, "peak_queued": n, "bucket_span": 10 * n,
+                   "phases_s": {"search": 0.5}, "wall_s": 0.5},)
+
+
+class TestKernelReport:
+    """Collection and totals of native kernel stats."""
+
+    def test_totals_and_json(self, tmp_path):
+        """Counters and phases add up across calls, peaks take the maximum and the JSON is written."""
+        report = RunReport(str(tmp_path / "r" / "run.json"), "04", {"k_best": 5, "pbf": "x.pbf"})
+        kbest = report.instrument("kbest", _fake_kbest)
+        src, t = kbest(3)
+        assert src.shape == (3, 1) and t.shape == (3, 1)
+        kbest(5)
+        report.add("contract_degree2", call_s=1.0)
+
+        totals = report.totals()
+        assert totals["kbest"]["calls"] == 2
+        assert totals["kbest"]["pops"] == 8 and totals["kbest"]["relaxations"] == 16
+        assert totals["kbest"]["peak_queued"] == 5 and totals["kbest"]["bucket_span"] == 50
+        assert totals["kbest"]["phases_s"] == {"search": 1.0}
+        assert totals["contract_degree2"] == {"calls": 1, "call_s": 1.0}
+
+        report.write()
+        data = json.loads((tmp_path / "r" / "run.json").read_text())
+        assert data["args"] == {"k_best": 5, "pbf": "x.pbf"}
+        assert [c["kernel"] for c in data["calls"]] == ["kbest", "kbest", "contract_degree2"]
+
+    def test_kernel_without_stats(self):
+        """A kernel that predates `stats=` runs normally and reports no counters."""
+        def _old(n):
+            return np.arange(n)
+
+        result, stats = call_with_stats(_old, 4)
+        np.testing.assert_array_equal(result, np.arange(4))
+        assert stats is None
+
+    def test_native_kbest_stats(self):
+        """kbest_multisource_bucket_csr(stats=True) appends a counter dict to the usual labels."""
+        t_hex = pytest.importorskip("t_hex")
+        # Path graph 0 - 1 - 2 (both directions, 10 s per edge), source at node 0
+        indptr = np.array([0, 1, 3, 4], dtype=np.int64)
+        indices = np.array([1, 0, 2, 1], dtype=np.int32)
+        w = np.full(4, 10, dtype=np.uint16)
+        (src, t), stats = call_with_stats(
+            t_hex.kbest_multisource_bucket_csr, indptr, indices, w, np.array([0], np.int32), 1, 60, 60, 1, False,
+        )
+        assert t[:, 0].tolist() == [0, 10, 20]
+        assert stats is not None and stats["settled"] == 3 and stats["bucket_span"] == 20
+        assert stats["wall_s"] >= 0 and "search" in stats["phases_s"]
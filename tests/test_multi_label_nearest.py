@@ -0,0 +1,101 @@
+"""
+Test Multi-label Nearest-Source Kernel
+
+Validates t_hex.nearest_multilabel_csr (skipped when the native module is not built):
+- every label column equals a separate kbest_multisource_bucket_csr(k=1) run with
+  that label's sources and cutoff, including across the 64-label word boundary
+- labels without sources stay unreachable
+- repeated target nodes are rejected
+- category partitions built from it (06 --multi-label) equal the ones of the per-category
+  sharded path (k=1 search per source shard, frames merged by minimum)
+"""
+import sys
+
+import numpy as np
+import polars as pl
+import pytest
+
+sys.path.append("src")
+
+t_hex = pytest.importorskip("t_hex")
+if not hasattr(t_hex, "nearest_multilabel_csr"):
+    pytest.skip("t_hex built without the multi-label kernel", allow_module_level=True)
+
+UNREACH = 65535
+
+_SCHEMA = {"anchor_id": pl.UInt32, "category_id": pl.UInt32, "seconds_u16": pl.UInt16, "snapshot_ts": pl.Date}
+_KEYS = ["anchor_id", "category_id", "snapshot_ts"]
+
+
+class TestMultiLabelNearest:
+    """Test suite for the multi-label nearest-source kernel."""
+
+    def test_matches_per_label_bucket_kernel(self, random_csr):
+        """Verify each label column equals the single-label k=1 bucket search."""
+        n = 600
+        indptr, indices, w = random_csr(n, 2400, seed=3, w_low=0, w_high=400)
+        rng = np.random.default_rng(11)
+        n_labels = 70  # spans two 64-label words
+        sources = [np.unique(rng.integers(0, n, rng.integers(0, 6))).astype(np.int32) for _ in range(n_labels)]
+        cutoffs = rng.integers(200, 1500, n_labels).astype(np.uint16)
+        targets = np.unique(rng.integers(0, n, 150)).astype(np.int32)
+
+        label_indptr = np.zeros(n_labels + 1, dtype=np.int64)
+        np.cumsum([s.size for s in sources], out=label_indptr[1:])
+        flat = np.concatenate(sources).astype(np.int32)
+
+        got = t_hex.nearest_multilabel_csr(indptr, indices, w, label_indptr, flat, cutoffs, targets, 2, False)
+        assert got.shape == (targets.size, n_labels)
+
+        for j, src in enumerate(sources):
+            if src.size == 0:
+                assert (got[:, j] == UNREACH).all()
+                continue
+            c = int(cutoffs[j])
+            _, time_s = t_hex.kbest_multisource_bucket_csr(indptr, indices, w, src, 1, c, c, 1, False)
+            np.testing.assert_array_equal(got[:, j], time_s[targets, 0])
+
+    def test_rejects_repeated_targets(self, random_csr):
+        """Verify a target node listed twice raises instead of leaving one of its rows unset."""
+        indptr, indices, w = random_csr(50, 200, seed=4)
+        label_indptr = np.array([0, 2], dtype=np.int64)
+        sources = np.array([1, 7], dtype=np.int32)
+        cutoffs = np.array([900], dtype=np.uint16)
+        with pytest.raises(ValueError):
+            t_hex.nearest_multilabel_csr(indptr, indices, w, label_indptr, sources, cutoffs,
+                                         np.array([3, 9, 3], dtype=np.int32), 1, False)
+
+    def test_frames_match_per_category_shard_path(self, random_csr, tmp_path):
+        """Verify multi-label category frames equal the sharded per-category k=1 frames."""
+        import d_anchor_common as dac
+
+        n = 800
+        indptr, indices, w = random_csr(n, 3200, seed=5, w_low=0, w_high=400)
+        rng = np.random.default_rng(2)
+        anchor_nodes = np.sort(rng.choice(n, 120, replace=False)).astype(np.int32)
+        anchor_int_ids = rng.permutation(anchor_nodes.size).astype(np.int32)
+        anchor_idx = np.full(n, -1, dtype=np.int32)
+        anchor_idx[anchor_nodes] = anchor_int_ids
+        graph_ctx = dac.GraphContext(
+            anchor_idx=anchor_idx, anchor_nodes=anchor_nodes, anchor_int_ids=anchor_int_ids,
+            comp_id=np.zeros(n, dtype=np.int32), comp_to_anchor_nodes={0: anchor_nodes},
+            indptr_rev=indptr, indices_rev=indices, w_rev=w, node_count=n, graph_digest="g",
+        )
+        dac.init_graph_worker({"paths": dac.persist_graph_arrays(str(tmp_path), graph_ctx.worker_arrays()), "threads": 1})
+
+        n_labels = 67
+        sources = [rng.choice(anchor_nodes, rng.integers(1, 8), replace=False).astype(np.int32) for _ in range(n_labels)]
+        cutoffs = rng.integers(300, 1500, n_labels).tolist()
+        times = dac.compute_times_multilabel(graph_ctx, sources, cutoffs, 2)
+
+        for cid, (src, c) in enumerate(zip(sources, cutoffs)):
+            extra = lambda size, cid=cid: {"category_id": np.full(size, cid, dtype=np.uint32)}
+            shards = [
+                dac.build_shard_frame(dac.compute_times(part, anchor_nodes, c, c), "2024-01-01", _SCHEMA, _KEYS, extra,
+                                      top_k=1, max_seconds=c)
+                for part in np.array_split(src, 2) if part.size
+            ]
+            old = (pl.concat(shards).group_by(_KEYS).agg(pl.col("seconds_u16").min())
+                   .select(list(_SCHEMA)).sort("anchor_id"))
+            new = dac.build_anchor_times_frame(anchor_int_ids, times[:, cid], "2024-01-01", _SCHEMA, _KEYS, extra, c)
+            assert new.sort("anchor_id").equals(old)
@@ -0,0 +1,89 @@
+"""
+Test Run Checkpoints
+
+Validates run_checkpoint.RunCheckpoint and graph.kbest_incremental.kbest_resumable:
+- completed steps, arrays and tables survive reopening with the same inputs
+- reopening with different inputs discards the checkpoint
+- K-best over source chunks equals one run over all sources
+- a run interrupted after some chunks resumes without recomputing them and gives the same labels
+"""
+import sys
+
+import numpy as np
+import pyarrow as pa
+import pytest
+
+sys.path.append("src")
+
+from graph.kbest_incremental import kbest_resumable
+from run_checkpoint import RunCheckpoint
+
+UNREACH = 65535
+
+
+class _Preempted(Exception):
+    pass
+
+
+class TestRunCheckpoint:
+    """Checkpointed k-best chunks and resume semantics."""
+
+    def test_state_survives_reopen(self, tmp_path):
+        """Marked steps, arrays and tables are visible to a checkpoint reopened with the same inputs."""
+        inputs = {"graph": "abc", "k": 4, "res": [7, 8]}
+        ckpt = RunCheckpoint(str(tmp_path / "run"), inputs)
+        ckpt.save_arrays("labels", a=np.arange(5))
+        ckpt.mark("chunk-0", sources=3)
+        ckpt.save_table("agg-r8", pa.table({"h3_id": pa.array([1, 2], pa.uint64())}))
+        ckpt.mark("agg-r8")
+
+        again = RunCheckpoint(str(tmp_path / "run"), {"res": (7, 8), "k": 4, "graph": "abc"})
+        assert again.is_done("chunk-0") and again.is_done("agg-r8")
+        assert again.done["chunk-0"] == {"sources": 3}
+        np.testing.assert_array_equal(again.load_arrays("labels")["a"], np.arange(5))
+        assert again.load_table("agg-r8").column("h3_id").to_pylist() == [1, 2]
+
+    def test_changed_inputs_discard(self, tmp_path):
+        """A checkpoint written for other inputs is removed rather than resumed."""
+        RunCheckpoint(str(tmp_path / "run"), {"graph": "abc"}).mark("chunk-0")
+        fresh = RunCheckpoint(str(tmp_path / "run"), {"graph": "def"})
+        assert not fresh.is_done("chunk-0")
+        assert not (tmp_path / "run").exists()
+
+    def test_chunks_match_single_run(self, tmp_path, random_csr, kbest_reference):
+        """Merging per-chunk top-K labels reproduces the labels of one run over every source."""
+        rng = np.random.default_rng(3)
+        csr = random_csr(120, 480, seed=rng, w_high=90)
+        sources = np.sort(rng.choice(120, 25, replace=False)).astype(np.int32)
+        expected = kbest_reference(*csr, sources, 4, 300, 300, 1, False)
+        ckpt = RunCheckpoint(str(tmp_path / "run"), {"chunks": 5})
+        src, t = kbest_resumable(kbest_reference, csr, sources, 4, 300, 300, 1, 5, ckpt)
+        np.testing.assert_array_equal(src, expected[0])
+        np.testing.assert_array_equal(t, expected[1])
+        assert all(ckpt.is_done(f"chunk-{i}") for i in range(5))
+
+    def test_resume_after_interruption(self, tmp_path, random_csr, kbest_reference):
+        """An interrupted run resumes at the first unfinished chunk and ends with the same labels."""
+        rng = np.random.default_rng(11)
+        csr = random_csr(120, 480, seed=rng, w_high=90)
+        sources = np.sort(rng.choice(120, 30, replace=False)).astype(np.int32)
+        expected = kbest_reference(*csr, sources, 3, 240, 240, 1, False)
+        calls = []
+        preempt_at = [3]
+
+        def _flaky(*args):
+            calls.append(args[3].size)
+            if len(calls) == preempt_at[0]:
+                raise _Preempted()
+            return kbest_reference(*args)
+
+        with pytest.raises(_Preempted):
+            kbest_resumable(_flaky, csr, sources, 3, 240, 240, 1, 6,
+                            RunCheckpoint(str(tmp_path / "run"), {"chunks": 6}))
+        calls.clear()
+        preempt_at[0] = 0
+        src, t = kbest_resumable(_flaky, csr, sources, 3, 240, 240, 1, 6,
+                                 RunCheckpoint(str(tmp_path / "run"), {"chunks": 6}))
+        assert len(calls) == 4
+        np.testing.assert_array_equal(src, expected[0])
+        np.testing.assert_array_equal(t, expected[1])
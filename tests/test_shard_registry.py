@@ -0,0 +1,114 @@
+"""
+Test State Shard Registry
+
+Validates src/serving/shards.py against small fake CSR caches:
+- per-state discovery under a data root
+- point routing by H3 coverage / bbox
+- lazy loading and LRU unloading under a memory budget
+- idle unloading by the background sweeper without further requests
+- a shard used after the idle check's snapshot is not unloaded
+"""
+import sys
+import threading
+import time
+from pathlib import Path
+
+import h3
+import numpy as np
+import pytest
+
+sys.path.append("src")
+
+from serving.shards import ShardRegistry
+
+
+def _write_cache(root: Path, state: str, lat0: float, lon0: float, n: int = 50):
+    cache = root / "osm" / "cache_csr" / f"{state}_drive.npycache"
+    cache.mkdir(parents=True)
+    rng = np.random.default_rng(0)
+    lats = (lat0 + rng.uniform(0, 0.2, n)).astype(np.float32)
+    lons = (lon0 + rng.uniform(0, 0.2, n)).astype(np.float32)
+    np.save(cache / "lats.npy", lats)
+    np.save(cache / "lons.npy", lons)
+    cells = [h3.str_to_int(h3.latlng_to_cell(float(a), float(o), 8)) for a, o in zip(lats, lons)]
+    np.save(cache / "h3_r8.npy", np.asarray(cells, dtype=np.uint64))
+
+
+@pytest.fixture
+def data_root(tmp_path):
+    _write_cache(tmp_path, "alpha", 42.0, -72.0)
+    _write_cache(tmp_path, "beta", 44.0, -70.0)
+    return tmp_path
+
+
+def _fake_loader(shard):
+    arr = np.zeros(1_000_000, dtype=np.uint8)  # 1 MB per shard
+    return {"node_ids": arr}, {"anchor_nodes": np.array([], dtype=np.int32)}
+
+
+class TestShardRegistry:
+    """Test suite for per-state shard discovery, routing and unloading."""
+
+    def test_discovery_and_routing(self, data_root):
+        """Verify each cache becomes a shard and points route to the covering state."""
+        reg = ShardRegistry(_fake_loader, data_root=str(data_root), modes=("drive",))
+        reg.discover()
+        assert reg.states() == ["alpha", "beta"]
+        assert reg.route_point(-71.9, 42.1, "drive") == "alpha"
+        assert reg.route_point(-69.9, 44.1, "drive") == "beta"
+        assert reg.route_point(-100.0, 30.0, "drive") is None
+        assert reg.route_point(-71.9, 42.1, "walk") is None
+
+    def test_lazy_load_and_lru_unload(self, data_root):
+        """Verify shards load on first use and the least recently used one is unloaded over budget."""
+        reg = ShardRegistry(_fake_loader, data_root=str(data_root), modes=("drive",), memory_budget_bytes=1_500_000)
+        reg.discover()
+        assert not reg.shard("alpha", "drive").loaded
+
+        reg.get("alpha", "drive")
+        assert reg.shard("alpha", "drive").loaded
+        reg.get("beta", "drive")
+        assert reg.shard("beta", "drive").loaded
+        assert not reg.shard("alpha", "drive").loaded
+        assert reg.stats()["evictions"] == 1
+
+    def test_state_allow_list(self, data_root):
+        """Verify TS_STATES-style filtering restricts discovery."""
+        reg = ShardRegistry(_fake_loader, data_root=str(data_root), modes=("drive",), states=["beta"])
+        reg.discover()
+        assert reg.states() == ["beta"]
+        with pytest.raises(KeyError):
+            reg.get("alpha", "drive")
+
+    def test_sweeper_unloads_idle_shards(self, data_root):
+        """Verify the sweeper unloads a shard past its idle TTL when no further get() arrives."""
+        reg = ShardRegistry(_fake_loader, data_root=str(data_root), modes=("drive",), idle_ttl_s=0.05)
+        reg.discover()
+        reg.get("alpha", "drive")
+        assert reg.shard("alpha", "drive").loaded
+        reg.start_sweeper(interval_s=0.02)
+        try:
+            deadline = time.monotonic() + 5
+            while reg.shard("alpha", "drive").loaded and time.monotonic() < deadline:
+                time.sleep(0.02)
+            assert not reg.shard("alpha", "drive").loaded
+            assert reg.stats()["evictions"] == 1
+        finally:
+            reg.stop_sweeper()
+        assert not reg.stats()["sweeping"]
+
+    def test_shard_used_after_snapshot_is_kept(self, data_root):
+        """Verify enforce_limits re-checks last_used under the shard lock before unloading an idle shard."""
+        reg = ShardRegistry(_fake_loader, data_root=str(data_root), modes=("drive",), idle_ttl_s=0.05)
+        reg.discover()
+        reg.get("alpha", "drive")
+        shard = reg.shard("alpha", "drive")
+        shard.last_used -= 1.0
+        with shard.lock:
+            sweep = threading.Thread(target=reg.enforce_limits)
+            sweep.start()
+            time.sleep(0.1)  # the sweep has taken its snapshot and waits for the shard lock
+            shard.last_used = time.monotonic()  # what get() does while holding the lock
+        sweep.join(timeout=5)
+        assert shard.loaded
+        assert reg.stats()["evictions"] == 0
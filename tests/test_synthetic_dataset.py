@@ -0,0 +1,82 @@
+"""
+Test Synthetic Dataset Generator
+
+Validates that scripts/generate_synthetic_dataset.py emits a consistent bundle:
+- identical arrays for the same seed
+- a CSR cache in the pyrosm_csr npycache layout
+- anchors, T_hex and D_anchor partitions that reference each other
+"""
+import json
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.append("scripts")
+
+from generate_synthetic_dataset import SyntheticSpec, generate_synthetic_dataset
+
+
+def _generate(root: Path, seed: int = 7) -> dict:
+    spec = SyntheticSpec(state="synthetic_test", seed=seed, nodes=2_500, pois=300, k_best=5)
+    return generate_synthetic_dataset(spec, root, Path("data/taxonomy"))
+
+
+@pytest.fixture(scope="module")
+def bundle(tmp_path_factory):
+    root = tmp_path_factory.mktemp("synthetic")
+    return root, _generate(root)
+
+
+class TestSyntheticDataset:
+    """Test suite for the synthetic bundle generator."""
+
+    def test_csr_cache_layout(self, bundle):
+        """Verify the cache has the arrays and metadata load_or_build_csr expects."""
+        _, outputs = bundle
+        cache = Path(outputs["csr_cache"])
+        for name in ("node_ids", "indptr", "indices", "w_sec", "lats", "lons", "h3_r7", "h3_r8"):
+            assert (cache / f"{name}.npy").exists(), f"missing {name}.npy"
+        meta = json.loads((cache / "meta.json").read_text())
+        assert meta["hierarchical_h3"] is True
+        assert meta["pbf_mtime"] is not None
+
+        indptr = np.load(cache / "indptr.npy")
+        indices = np.load(cache / "indices.npy")
+        w_sec = np.load(cache / "w_sec.npy")
+        node_ids = np.load(cache / "node_ids.npy")
+        assert indptr.dtype == np.int64 and indices.dtype == np.int32 and w_sec.dtype == np.uint16
+        assert indptr[-1] == indices.size == w_sec.size
+        assert indices.min() >= 0 and indices.max() < node_ids.size
+        assert (w_sec > 0).all()
+
+    def test_deterministic(self, bundle, tmp_path):
+        """Same seed and sizes produce identical graph and anchors."""
+        _, outputs = bundle
+        again = _generate(tmp_path)
+        for name in ("indptr", "indices", "w_sec", "h3_r8"):
+            a = np.load(Path(outputs["csr_cache"]) / f"{name}.npy")
+            b = np.load(Path(again["csr_cache"]) / f"{name}.npy")
+            assert np.array_equal(a, b), f"{name} differs between runs"
+        pd.testing.assert_frame_equal(pd.read_parquet(outputs["anchors"]), pd.read_parquet(again["anchors"]))
+
+    def test_cross_references(self, bundle):
+        """Anchors sit on graph nodes; T_hex and D_anchor only reference known anchors."""
+        _, outputs = bundle
+        node_ids = np.load(Path(outputs["csr_cache"]) / "node_ids.npy")
+        sites = pd.read_parquet(outputs["anchors"])
+        assert sites["site_id"].is_unique
+        assert np.isin(sites["node_id"], node_ids).all()
+
+        anchor_ids = set(sites["anchor_int_id"].tolist())
+        t_hex = pd.read_parquet(outputs["t_hex"])
+        assert set(t_hex["anchor_int_id"].unique()) <= anchor_ids
+        h3_r8 = np.load(Path(outputs["csr_cache"]) / "h3_r8.npy")
+        assert set(t_hex.loc[t_hex["res"] == 8, "h3_id"].unique()) <= set(np.unique(h3_r8).tolist())
+
+        shards = list(Path(outputs["d_anchor_category"]).glob("mode=0/category_id=*/part-000.parquet"))
+        assert shards, "no category partitions written"
+        d = pd.read_parquet(shards[0])
+        assert set(d["anchor_id"].astype(int)) <= anchor_ids
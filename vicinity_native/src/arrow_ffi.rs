@@ -0,0 +1,308 @@
+//! Minimal Arrow C Data Interface export for flat primitive record batches.
+//!
+//! Kernel outputs are handed to Python as an `ArrowBatch` that implements the Arrow PyCapsule
+//! protocol (`__arrow_c_array__`), so `pyarrow.record_batch(batch)` / `polars.from_arrow(...)`
+//! import the Rust-owned buffers directly instead of copying through NumPy.
+//! Spec: https://arrow.apache.org/docs/format/CDataInterface.html
+
+use std::ffi::{c_char, c_void, CString};
+use std::ptr::null_mut;
+use std::sync::Arc;
+
+use pyo3::prelude::*;
+use pyo3::types::PyCapsule;
+
+#[repr(C)]
+pub struct FFI_ArrowSchema {
+    format: *const c_char,
+    name: *const c_char,
+    metadata: *const c_char,
+    flags: i64,
+    n_children: i64,
+    children: *mut *mut FFI_ArrowSchema,
+    dictionary: *mut FFI_ArrowSchema,
+    release: Option<unsafe extern "C" fn(*mut FFI_ArrowSchema)>,
+    private_data: *mut c_void,
+}
+
+#[repr(C)]
+pub struct FFI_ArrowArray {
+    length: i64,
+    null_count: i64,
+    offset: i64,
+    n_buffers: i64,
+    n_children: i64,
+    buffers: *mut *const c_void,
+    children: *mut *mut FFI_ArrowArray,
+    dictionary: *mut FFI_ArrowArray,
+    release: Option<unsafe extern "C" fn(*mut FFI_ArrowArray)>,
+    private_data: *mut c_void,
+}
+
+// Only ever moved as an opaque capsule payload; the pointed-to data is owned via private_data
+unsafe impl Send for FFI_ArrowSchema {}
+unsafe impl Send for FFI_ArrowArray {}
+
+struct SchemaPrivate {
+    _format: CString,
+    _name: CString,
+    children: Vec<*mut FFI_ArrowSchema>,
+}
+
+struct ArrayPrivate {
+    _owner: Box<dyn std::any::Any + Send>,
+    _buffers: Vec<*const c_void>,
+    children: Vec<*mut FFI_ArrowArray>,
+}
+
+unsafe extern "C" fn release_schema(schema: *mut FFI_ArrowSchema) {
+    if schema.is_null() || (*schema).release.is_none() {
+        return;
+    }
+    let private = Box::from_raw((*schema).private_data as *mut SchemaPrivate);
+    for &child in private.children.iter() {
+        if let Some(release) = (*child).release {
+            release(child);
+        }
+        drop(Box::from_raw(child));
+    }
+    drop(private);
+    (*schema).release = None;
+}
+
+unsafe extern "C" fn release_array(array: *mut FFI_ArrowArray) {
+    if array.is_null() || (*array).release.is_none() {
+        return;
+    }
+    let private = Box::from_raw((*array).private_data as *mut ArrayPrivate);
+    for &child in private.children.iter() {
+        if let Some(release) = (*child).release {
+            release(child);
+        }
+        drop(Box::from_raw(child));
+    }
+    drop(private);
+    (*array).release = None;
+}
+
+fn new_schema(format: &str, name: &str, children: Vec<FFI_ArrowSchema>) -> FFI_ArrowSchema {
+    let format = CString::new(format).unwrap();
+    let name = CString::new(name).unwrap();
+    let (format_ptr, name_ptr) = (format.as_ptr(), name.as_ptr());
+    let mut private = Box::new(SchemaPrivate {
+        _format: format,
+        _name: name,
+        children: children
+            .into_iter()
+            .map(|c| Box::into_raw(Box::new(c)))
+            .collect(),
+    });
+    let n_children = private.children.len() as i64;
+    let children_ptr = if n_children == 0 {
+        null_mut()
+    } else {
+        private.children.as_mut_ptr()
+    };
+    FFI_ArrowSchema {
+        format: format_ptr,
+        name: name_ptr,
+        metadata: std::ptr::null(),
+        flags: 0,
+        n_children,
+        children: children_ptr,
+        dictionary: null_mut(),
+        release: Some(release_schema),
+        private_data: Box::into_raw(private) as *mut c_void,
+    }
+}
+
+fn new_array(
+    length: usize,
+    owner: Box<dyn std::any::Any + Send>,
+    buffers: Vec<*const c_void>,
+    children: Vec<FFI_ArrowArray>,
+) -> FFI_ArrowArray {
+    let mut private = Box::new(ArrayPrivate {
+        _owner: owner,
+        _buffers: buffers,
+        children: children
+            .into_iter()
+            .map(|c| Box::into_raw(Box::new(c)))
+            .collect(),
+    });
+    let n_buffers = private._buffers.len() as i64;
+    let buffers_ptr = private._buffers.as_mut_ptr();
+    let n_children = private.children.len() as i64;
+    let children_ptr = if n_children == 0 {
+        null_mut()
+    } else {
+        private.children.as_mut_ptr()
+    };
+    FFI_ArrowArray {
+        length: length as i64,
+        null_count: 0,
+        offset: 0,
+        n_buffers,
+        n_children,
+        buffers: buffers_ptr,
+        children: children_ptr,
+        dictionary: null_mut(),
+        release: Some(release_array),
+        private_data: Box::into_raw(private) as *mut c_void,
+    }
+}
+
+/// One non-nullable primitive column; buffers are shared (not copied) with every export.
+#[derive(Clone)]
+pub enum Column {
+    U64(Arc<Vec<u64>>),
+    I32(Arc<Vec<i32>>),
+    U16(Arc<Vec<u16>>),
+}
+
+impl Column {
+    fn len(&self) -> usize {
+        match self {
+            Column::U64(v) => v.len(),
+            Column::I32(v) => v.len(),
+            Column::U16(v) => v.len(),
+        }
+    }
+
+    fn format(&self) -> &'static str {
+        match self {
+            Column::U64(_) => "L",
+            Column::I32(_) => "i",
+            Column::U16(_) => "S",
+        }
+    }
+
+    fn export(&self) -> FFI_ArrowArray {
+        // Primitive layout: [validity (absent), values]
+        let (owner, data): (Box<dyn std::any::Any + Send>, *const c_void) = match self {
+            Column::U64(v) => (Box::new(Arc::clone(v)), v.as_ptr() as *const c_void),
+            Column::I32(v) => (Box::new(Arc::clone(v)), v.as_ptr() as *const c_void),
+            Column::U16(v) => (Box::new(Arc::clone(v)), v.as_ptr() as *const c_void),
+        };
+        new_array(self.len(), owner, vec![std::ptr::null(), data], Vec::new())
+    }
+}
+
+/// Record batch of primitive columns exported through the Arrow PyCapsule protocol.
+#[pyclass(module = "t_hex", frozen)]
+pub struct ArrowBatch {
+    names: Vec<&'static str>,
+    columns: Vec<Column>,
+    num_rows: usize,
+}
+
+impl ArrowBatch {
+    pub fn new(names: Vec<&'static str>, columns: Vec<Column>) -> Self {
+        let num_rows = columns.first().map(|c| c.len()).unwrap_or(0);
+        debug_assert!(columns.iter().all(|c| c.len() == num_rows));
+        ArrowBatch {
+            names,
+            columns,
+            num_rows,
+        }
+    }
+
+    /// Long-format T_hex rows: h3_id, anchor_int_id, time_s, res.
+    pub fn h3_rows(h3: Vec<u64>, site: Vec<i32>, time: Vec<u16>, res: Vec<i32>) -> Self {
+        ArrowBatch::new(
+            vec!["h3_id", "anchor_int_id", "time_s", "res"],
+            vec![
+                Column::U64(Arc::new(h3)),
+                Column::I32(Arc::new(site)),
+                Column::U16(Arc::new(time)),
+                Column::I32(Arc::new(res)),
+            ],
+        )
+    }
+
+    fn export_schema(&self) -> FFI_ArrowSchema {
+        let children = self
+            .names
+            .iter()
+            .zip(self.columns.iter())
+            .map(|(name, col)| new_schema(col.format(), name, Vec::new()))
+            .collect();
+        new_schema("+s", "", children)
+    }
+
+    fn export_array(&self) -> FFI_ArrowArray {
+        let children = self.columns.iter().map(|c| c.export()).collect();
+        // Struct layout: [validity (absent)]
+        new_array(
+            self.num_rows,
+            Box::new(()),
+            vec![std::ptr::null()],
+            children,
+        )
+    }
+}
+
+fn schema_capsule<'py>(
+    py: Python<'py>,
+    schema: FFI_ArrowSchema,
+) -> PyResult<Bound<'py, PyCapsule>> {
+    PyCapsule::new_bound_with_destructor(
+        py,
+        schema,
+        Some(CString::new("arrow_schema").unwrap()),
+        |mut s, _| {
+            // Consumers that imported the schema have already nulled `release`
+            if let Some(release) = s.release {
+                unsafe { release(&mut s) }
+            }
+        },
+    )
+}
+
+fn array_capsule<'py>(py: Python<'py>, array: FFI_ArrowArray) -> PyResult<Bound<'py, PyCapsule>> {
+    PyCapsule::new_bound_with_destructor(
+        py,
+        array,
+        Some(CString::new("arrow_array").unwrap()),
+        |mut a, _| {
+            if let Some(release) = a.release {
+                unsafe { release(&mut a) }
+            }
+        },
+    )
+}
+
+#[pymethods]
+impl ArrowBatch {
+    #[getter]
+    fn num_rows(&self) -> usize {
+        self.num_rows
+    }
+
+    #[getter]
+    fn column_names(&self) -> Vec<&'static str> {
+        self.names.clone()
+    }
+
+    fn __len__(&self) -> usize {
+        self.num_rows
+    }
+
+    fn __arrow_c_schema__<'py>(&self, py: Python<'py>) -> PyResult<Bound<'py, PyCapsule>> {
+        schema_capsule(py, self.export_schema())
+    }
+
+    /// Arrow PyCapsule protocol; `requested_schema` is ignored (columns already have fixed types).
+    #[pyo3(signature = (requested_schema=None))]
+    fn __arrow_c_array__<'py>(
+        &self,
+        py: Python<'py>,
+        requested_schema: Option<PyObject>,
+    ) -> PyResult<(Bound<'py, PyCapsule>, Bound<'py, PyCapsule>)> {
+        let _ = requested_schema;
+        Ok((
+            schema_capsule(py, self.export_schema())?,
+            array_capsule(py, self.export_array())?,
+        ))
+    }
+}
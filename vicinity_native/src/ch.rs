@@ -3,33 +3,187 @@ use std::collections::BinaryHeap;
 
 use fast_paths::{self, FastGraph32, InputGraph};
 use numpy::{PyArray1, PyReadonlyArray1};
-use pyo3::exceptions::PyValueError;
+use pyo3::exceptions::{PyRuntimeError, PyValueError};
 use pyo3::prelude::*;
 use pyo3::types::PyBytes;
+use rayon::prelude::*;
+use rayon::ThreadPoolBuilder;
+use std::time::Instant;
+
+use crate::ch_parallel::contract_parallel;
+use crate::stats::KernelStats;
 
 const INF_U32: u32 = u32::MAX;
 
+/// Leading bytes of a serialized `ChData`; older caches are a bincode `FastGraph32` without them.
+const CH_MAGIC: &[u8; 4] = b"THCH";
+const CH_FORMAT_VERSION: u32 = 1;
+
+/// One upward CH edge: `base` is the node whose rank groups the edge, `adj` the higher-ranked end.
+/// Forward edges run base -> adj, backward edges adj -> base in the original graph.
+#[derive(Clone, Copy, Debug)]
+pub(crate) struct ChEdge {
+    pub base: u32,
+    pub adj: u32,
+    pub weight: u32,
+}
+
+/// Contracted graph in the layout of fast_paths' `FastGraph32`: upward edges grouped by the rank
+/// of their base node (`first_*[rank]..first_*[rank + 1]`).
+pub(crate) struct ChData {
+    pub ranks: Vec<u32>,
+    pub first_fwd: Vec<usize>,
+    pub edges_fwd: Vec<ChEdge>,
+    pub first_bwd: Vec<usize>,
+    pub edges_bwd: Vec<ChEdge>,
+}
+
+impl ChData {
+    fn from_fast_graph32(graph: &FastGraph32) -> Self {
+        Self {
+            ranks: graph.ranks.clone(),
+            first_fwd: graph
+                .first_edge_ids_fwd
+                .iter()
+                .map(|&x| x as usize)
+                .collect(),
+            edges_fwd: graph
+                .edges_fwd
+                .iter()
+                .map(|e| ChEdge {
+                    base: e.base_node as u32,
+                    adj: e.adj_node as u32,
+                    weight: e.weight as u32,
+                })
+                .collect(),
+            first_bwd: graph
+                .first_edge_ids_bwd
+                .iter()
+                .map(|&x| x as usize)
+                .collect(),
+            edges_bwd: graph
+                .edges_bwd
+                .iter()
+                .map(|e| ChEdge {
+                    base: e.base_node as u32,
+                    adj: e.adj_node as u32,
+                    weight: e.weight as u32,
+                })
+                .collect(),
+        }
+    }
+
+    /// Little-endian: magic, version, node count (u64), ranks (u32), then per direction the rank
+    /// offsets (u64, N+1) and (base, adj, weight) u32 triples.
+    fn to_bytes(&self) -> Vec<u8> {
+        let n = self.ranks.len();
+        let mut out = Vec::with_capacity(
+            16 + 4 * n + 16 * (n + 1) + 12 * (self.edges_fwd.len() + self.edges_bwd.len()),
+        );
+        out.extend_from_slice(CH_MAGIC);
+        out.extend_from_slice(&CH_FORMAT_VERSION.to_le_bytes());
+        out.extend_from_slice(&(n as u64).to_le_bytes());
+        for &r in &self.ranks {
+            out.extend_from_slice(&r.to_le_bytes());
+        }
+        for (first, edges) in [
+            (&self.first_fwd, &self.edges_fwd),
+            (&self.first_bwd, &self.edges_bwd),
+        ] {
+            for &x in first.iter() {
+                out.extend_from_slice(&(x as u64).to_le_bytes());
+            }
+            for e in edges.iter() {
+                out.extend_from_slice(&e.base.to_le_bytes());
+                out.extend_from_slice(&e.adj.to_le_bytes());
+                out.extend_from_slice(&e.weight.to_le_bytes());
+            }
+        }
+        out
+    }
+
+    fn from_bytes(data: &[u8]) -> Result<Self, String> {
+        fn take<'a>(data: &'a [u8], pos: &mut usize, len: usize) -> Result<&'a [u8], String> {
+            let end = pos
+                .checked_add(len)
+                .filter(|&e| e <= data.len())
+                .ok_or("truncated CH data")?;
+            let slice = &data[*pos..end];
+            *pos = end;
+            Ok(slice)
+        }
+        let mut pos = 0usize;
+        if take(data, &mut pos, 4)? != CH_MAGIC.as_slice() {
+            return Err("not a t_hex CH file".into());
+        }
+        let version = u32::from_le_bytes(take(data, &mut pos, 4)?.try_into().unwrap());
+        if version != CH_FORMAT_VERSION {
+            return Err(format!("unsupported CH format version {version}"));
+        }
+        let n = u64::from_le_bytes(take(data, &mut pos, 8)?.try_into().unwrap()) as usize;
+        let ranks: Vec<u32> = take(data, &mut pos, n.saturating_mul(4))?
+            .chunks_exact(4)
+            .map(|b| u32::from_le_bytes(b.try_into().unwrap()))
+            .collect();
+        let mut dirs = Vec::with_capacity(2);
+        for _ in 0..2 {
+            let first: Vec<usize> = take(data, &mut pos, n.saturating_add(1).saturating_mul(8))?
+                .chunks_exact(8)
+                .map(|b| u64::from_le_bytes(b.try_into().unwrap()) as usize)
+                .collect();
+            if first.windows(2).any(|w| w[0] > w[1]) {
+                return Err("corrupt CH edge offsets".into());
+            }
+            let m = first.last().copied().unwrap_or(0);
+            let edges: Vec<ChEdge> = take(data, &mut pos, m.saturating_mul(12))?
+                .chunks_exact(12)
+                .map(|b| ChEdge {
+                    base: u32::from_le_bytes(b[0..4].try_into().unwrap()),
+                    adj: u32::from_le_bytes(b[4..8].try_into().unwrap()),
+                    weight: u32::from_le_bytes(b[8..12].try_into().unwrap()),
+                })
+                .collect();
+            if edges
+                .iter()
+                .any(|e| e.base as usize >= n || e.adj as usize >= n)
+            {
+                return Err("CH edge endpoint out of range".into());
+            }
+            dirs.push((first, edges));
+        }
+        let (first_bwd, edges_bwd) = dirs.pop().unwrap();
+        let (first_fwd, edges_fwd) = dirs.pop().unwrap();
+        Ok(Self {
+            ranks,
+            first_fwd,
+            edges_fwd,
+            first_bwd,
+            edges_bwd,
+        })
+    }
+}
+
 #[pyclass(module = "t_hex")]
 pub struct CHGraph {
-    graph: FastGraph32,
+    data: ChData,
     order: Vec<u32>,
     down_offsets: Vec<usize>,
     down_edges: Vec<(usize, u32)>,
 }
 
 impl CHGraph {
-    fn from_fast_graph32(graph: FastGraph32) -> Self {
-        let num_nodes = graph.ranks.len();
+    pub(crate) fn from_data(data: ChData) -> Self {
+        let num_nodes = data.ranks.len();
         let mut order = vec![0u32; num_nodes];
-        for (node, &rank) in graph.ranks.iter().enumerate() {
+        for (node, &rank) in data.ranks.iter().enumerate() {
             let r = rank as usize;
             if r < num_nodes {
                 order[r] = node as u32;
             }
         }
         let mut counts = vec![0usize; num_nodes];
-        for edge in &graph.edges_bwd {
-            let adj = edge.adj_node as usize;
+        for edge in &data.edges_bwd {
+            let adj = edge.adj as usize;
             if adj < num_nodes {
                 counts[adj] += 1;
             }
@@ -40,18 +194,18 @@ impl CHGraph {
         }
         let mut down_edges = vec![(0usize, 0u32); down_offsets[num_nodes]];
         let mut cursor = down_offsets.clone();
-        for edge in &graph.edges_bwd {
-            let adj = edge.adj_node as usize;
-            let base = edge.base_node as usize;
+        for edge in &data.edges_bwd {
+            let adj = edge.adj as usize;
+            let base = edge.base as usize;
             if adj >= num_nodes || base >= num_nodes {
                 continue;
             }
             let pos = cursor[adj];
-            down_edges[pos] = (base, edge.weight as u32);
+            down_edges[pos] = (base, edge.weight);
             cursor[adj] = pos + 1;
         }
         Self {
-            graph,
+            data,
             order,
             down_offsets,
             down_edges,
@@ -59,20 +213,26 @@ impl CHGraph {
     }
 
     fn node_count(&self) -> usize {
-        self.graph.ranks.len()
+        self.data.ranks.len()
     }
 
     fn run_phast(&self, source: usize, limit: u32) -> Vec<u32> {
+        self.run_phast_multi(&[source], limit)
+    }
+
+    /// PHAST from a set of sources at distance 0: min over sources for every node.
+    fn run_phast_multi(&self, sources: &[usize], limit: u32) -> Vec<u32> {
         let n = self.node_count();
         let mut dist = vec![INF_U32; n];
-        if source >= n {
-            return dist;
-        }
 
-        // Upward search (Dijkstra restricted to upward edges)
+        // Upward search (Dijkstra restricted to upward edges), seeded with every source
         let mut heap: BinaryHeap<(Reverse<u32>, usize)> = BinaryHeap::new();
-        dist[source] = 0;
-        heap.push((Reverse(0u32), source));
+        for &source in sources {
+            if source < n && dist[source] != 0 {
+                dist[source] = 0;
+                heap.push((Reverse(0u32), source));
+            }
+        }
 
         while let Some((Reverse(du), u)) = heap.pop() {
             if du > limit {
@@ -81,16 +241,16 @@ impl CHGraph {
             if du != dist[u] {
                 continue;
             }
-            let rank_u = self.graph.ranks[u] as usize;
-            if rank_u >= self.graph.first_edge_ids_fwd.len() - 1 {
+            let rank_u = self.data.ranks[u] as usize;
+            if rank_u >= self.data.first_fwd.len() - 1 {
                 continue;
             }
-            let start = self.graph.first_edge_ids_fwd[rank_u] as usize;
-            let end = self.graph.first_edge_ids_fwd[rank_u + 1] as usize;
+            let start = self.data.first_fwd[rank_u] as usize;
+            let end = self.data.first_fwd[rank_u + 1] as usize;
             for idx in start..end {
-                let edge = &self.graph.edges_fwd[idx];
-                let v = edge.adj_node as usize;
-                let w = edge.weight as u32;
+                let edge = &self.data.edges_fwd[idx];
+                let v = edge.adj as usize;
+                let w = edge.weight;
                 let nd = du.saturating_add(w);
                 if nd > limit {
                     continue;
@@ -125,6 +285,56 @@ impl CHGraph {
 
         dist
     }
+
+    /// Upward Dijkstra from `source` over forward (`forward=true`) or backward CH edges.
+    /// Returns every settled (node, dist) within `limit`; `dist` must be all-INF on entry and is
+    /// restored before returning so per-thread scratch can be reused.
+    fn upward_search(
+        &self,
+        source: usize,
+        limit: u32,
+        forward: bool,
+        dist: &mut [u32],
+        heap: &mut BinaryHeap<(Reverse<u32>, usize)>,
+    ) -> Vec<(u32, u32)> {
+        let (edges, first) = if forward {
+            (&self.data.edges_fwd, &self.data.first_fwd)
+        } else {
+            (&self.data.edges_bwd, &self.data.first_bwd)
+        };
+        let mut settled: Vec<(u32, u32)> = Vec::new();
+        heap.clear();
+        dist[source] = 0;
+        heap.push((Reverse(0u32), source));
+        while let Some((Reverse(du), u)) = heap.pop() {
+            if du != dist[u] {
+                continue;
+            }
+            settled.push((u as u32, du));
+            let rank_u = self.data.ranks[u] as usize;
+            if rank_u + 1 >= first.len() {
+                continue;
+            }
+            for edge in &edges[first[rank_u] as usize..first[rank_u + 1] as usize] {
+                let v = edge.adj as usize;
+                let nd = du.saturating_add(edge.weight);
+                if nd <= limit && nd < dist[v] {
+                    dist[v] = nd;
+                    heap.push((Reverse(nd), v));
+                }
+            }
+        }
+        // Reset scratch: every node given a finite dist was pushed and therefore settled
+        for &(v, _) in &settled {
+            dist[v as usize] = INF_U32;
+        }
+        settled
+    }
+}
+
+/// Per-thread scratch for upward searches.
+fn search_scratch(n: usize) -> (Vec<u32>, BinaryHeap<(Reverse<u32>, usize)>) {
+    (vec![INF_U32; n], BinaryHeap::new())
 }
 
 #[pymethods]
@@ -135,14 +345,17 @@ impl CHGraph {
     }
 
     fn to_bytes(&self, py: Python<'_>) -> PyResult<Py<PyBytes>> {
-        match bincode::serialize(&self.graph) {
-            Ok(data) => Ok(PyBytes::new_bound(py, &data).unbind()),
-            Err(e) => Err(PyValueError::new_err(format!("failed to serialize CH graph: {e}"))),
-        }
+        let data = py.allow_threads(|| self.data.to_bytes());
+        Ok(PyBytes::new_bound(py, &data).unbind())
     }
 
     #[pyo3(signature = (source, limit=None))]
-    fn query_all(&self, py: Python<'_>, source: usize, limit: Option<u32>) -> PyResult<Py<PyArray1<u32>>> {
+    fn query_all(
+        &self,
+        py: Python<'_>,
+        source: usize,
+        limit: Option<u32>,
+    ) -> PyResult<Py<PyArray1<u32>>> {
         let lim = limit.unwrap_or(u32::MAX);
         let dist = self.run_phast(source, lim);
         Ok(PyArray1::from_vec_bound(py, dist).unbind())
@@ -175,17 +388,207 @@ impl CHGraph {
         Ok(PyArray1::from_vec_bound(py, out).unbind())
     }
 
-    fn debug_edges(&self, node: usize) -> PyResult<(usize, Vec<(usize, usize, u32)>, Vec<(usize, usize, u32)>)> {
+    /// Bucket many-to-many: shortest times from every source to every target within `limit`.
+    /// Forward upward searches from the sources fill per-node buckets; each target's backward upward
+    /// search scans the buckets of the nodes it settles. Result is CSR keyed by target:
+    /// (indptr [T+1] int64, source positions int32 ascending per row, seconds uint16), one entry per
+    /// source that reaches the target within `limit` (clamped to 65534).
+    /// `stats=True` appends a counter dict: `settled` nodes of all upward searches, `peak_queued`
+    /// bucket entries, `relaxations`/`pruned` bucket entries scanned/over `limit`, `labels` entries out.
+    #[pyo3(signature = (sources, targets, limit, threads=1, stats=false))]
+    fn many_to_many(
+        &self,
+        py: Python<'_>,
+        sources: PyReadonlyArray1<i32>,
+        targets: PyReadonlyArray1<i32>,
+        limit: u32,
+        threads: usize,
+        stats: bool,
+    ) -> PyResult<PyObject> {
+        let n = self.node_count();
+        let sources = sources.as_slice()?;
+        let targets = targets.as_slice()?;
+        if sources
+            .iter()
+            .chain(targets.iter())
+            .any(|&x| x < 0 || x as usize >= n)
+        {
+            return Err(PyValueError::new_err(
+                "source/target node index out of range",
+            ));
+        }
+        let limit = limit.min(u16::MAX as u32 - 1);
+        let pool = ThreadPoolBuilder::new()
+            .num_threads(threads.max(1))
+            .build()
+            .map_err(|e| PyRuntimeError::new_err(format!("Failed to build thread pool: {e}")))?;
+
+        let (indptr, cols, secs, kstats) = py.allow_threads(|| {
+            pool.install(|| {
+                let mut kstats = KernelStats::default();
+                // Forward phase: source search spaces -> buckets[node] = [(source pos, dist)]
+                let t0 = Instant::now();
+                let spaces: Vec<Vec<(u32, u32)>> = sources
+                    .par_iter()
+                    .map_init(
+                        || search_scratch(n),
+                        |(dist, heap), &s| self.upward_search(s as usize, limit, true, dist, heap),
+                    )
+                    .collect();
+                kstats.phase("forward", t0);
+                let t0 = Instant::now();
+                let mut bucket_offsets = vec![0usize; n + 1];
+                for space in &spaces {
+                    for &(v, _) in space {
+                        bucket_offsets[v as usize + 1] += 1;
+                    }
+                }
+                for i in 0..n {
+                    bucket_offsets[i + 1] += bucket_offsets[i];
+                }
+                let mut bucket_entries = vec![(0u32, 0u32); bucket_offsets[n]];
+                let mut cursor = bucket_offsets.clone();
+                for (sp, space) in spaces.into_iter().enumerate() {
+                    for (v, d) in space {
+                        let pos = cursor[v as usize];
+                        bucket_entries[pos] = (sp as u32, d);
+                        cursor[v as usize] = pos + 1;
+                    }
+                }
+                drop(cursor);
+                kstats.settled = bucket_entries.len() as u64;
+                kstats.peak_queued = bucket_entries.len() as u64;
+                kstats.phase("buckets", t0);
+
+                // Backward phase: one row per target, with (settled, scanned, pruned) counts
+                let t0 = Instant::now();
+                let rows: Vec<(Vec<(i32, u16)>, [u64; 3])> = targets
+                    .par_iter()
+                    .map_init(
+                        || {
+                            (
+                                search_scratch(n),
+                                vec![INF_U32; sources.len()],
+                                Vec::<u32>::new(),
+                            )
+                        },
+                        |((dist, heap), best, touched), &t| {
+                            let mut counts = [0u64; 3];
+                            for (v, dv) in self.upward_search(t as usize, limit, false, dist, heap)
+                            {
+                                let v = v as usize;
+                                let bucket =
+                                    &bucket_entries[bucket_offsets[v]..bucket_offsets[v + 1]];
+                                counts[0] += 1;
+                                counts[1] += bucket.len() as u64;
+                                for &(sp, ds) in bucket {
+                                    let c = ds.saturating_add(dv);
+                                    if c > limit {
+                                        counts[2] += 1;
+                                        continue;
+                                    }
+                                    let slot = &mut best[sp as usize];
+                                    if *slot == INF_U32 {
+                                        touched.push(sp);
+                                    }
+                                    if c < *slot {
+                                        *slot = c;
+                                    }
+                                }
+                            }
+                            touched.sort_unstable();
+                            let row: Vec<(i32, u16)> = touched
+                                .iter()
+                                .map(|&sp| (sp as i32, best[sp as usize] as u16))
+                                .collect();
+                            for &sp in touched.iter() {
+                                best[sp as usize] = INF_U32;
+                            }
+                            touched.clear();
+                            (row, counts)
+                        },
+                    )
+                    .collect();
+                kstats.phase("backward", t0);
+
+                let mut indptr = Vec::with_capacity(rows.len() + 1);
+                indptr.push(0i64);
+                let nnz: usize = rows.iter().map(|(r, _)| r.len()).sum();
+                let mut cols = Vec::with_capacity(nnz);
+                let mut secs = Vec::with_capacity(nnz);
+                for (row, counts) in rows {
+                    kstats.settled += counts[0];
+                    kstats.relaxations += counts[1];
+                    kstats.pruned += counts[2];
+                    for (sp, d) in row {
+                        cols.push(sp);
+                        secs.push(d);
+                    }
+                    indptr.push(cols.len() as i64);
+                }
+                kstats.labels = nnz as u64;
+                (indptr, cols, secs, kstats)
+            })
+        });
+
+        let csr = (
+            PyArray1::from_vec_bound(py, indptr).unbind(),
+            PyArray1::from_vec_bound(py, cols).unbind(),
+            PyArray1::from_vec_bound(py, secs).unbind(),
+        );
+        Ok(if stats {
+            let (indptr, cols, secs) = csr;
+            (indptr, cols, secs, kstats.to_dict(py)?).into_py(py)
+        } else {
+            csr.into_py(py)
+        })
+    }
+
+    /// Multi-source PHAST restricted to `targets`: min time from any source (u32::MAX = unreachable).
+    #[pyo3(signature = (sources, targets, limit=None))]
+    fn query_multi(
+        &self,
+        py: Python<'_>,
+        sources: PyReadonlyArray1<i32>,
+        targets: PyReadonlyArray1<i32>,
+        limit: Option<u32>,
+    ) -> PyResult<Py<PyArray1<u32>>> {
+        let lim = limit.unwrap_or(u32::MAX);
+        let srcs: Vec<usize> = sources
+            .as_slice()?
+            .iter()
+            .filter(|&&s| s >= 0)
+            .map(|&s| s as usize)
+            .collect();
+        let idx = targets.as_slice()?;
+        let dist = py.allow_threads(|| self.run_phast_multi(&srcs, lim));
+        let out: Vec<u32> = idx
+            .iter()
+            .map(|&raw| {
+                if raw >= 0 && (raw as usize) < dist.len() {
+                    dist[raw as usize]
+                } else {
+                    INF_U32
+                }
+            })
+            .collect();
+        Ok(PyArray1::from_vec_bound(py, out).unbind())
+    }
+
+    fn debug_edges(
+        &self,
+        node: usize,
+    ) -> PyResult<(usize, Vec<(usize, usize, u32)>, Vec<(usize, usize, u32)>)> {
         if node >= self.node_count() {
             return Err(PyValueError::new_err("node out of range"));
         }
-        let rank = self.graph.ranks[node] as usize;
-        let fwd_start = self.graph.first_edge_ids_fwd[rank] as usize;
-        let fwd_end = self.graph.first_edge_ids_fwd[rank + 1] as usize;
+        let rank = self.data.ranks[node] as usize;
+        let fwd_start = self.data.first_fwd[rank] as usize;
+        let fwd_end = self.data.first_fwd[rank + 1] as usize;
         let mut fwd = Vec::new();
         for idx in fwd_start..fwd_end {
-            let edge = &self.graph.edges_fwd[idx];
-            fwd.push((edge.base_node as usize, edge.adj_node as usize, edge.weight as u32));
+            let edge = &self.data.edges_fwd[idx];
+            fwd.push((edge.base as usize, edge.adj as usize, edge.weight));
         }
         let bwd_start = self.down_offsets[node];
         let bwd_end = self.down_offsets[node + 1];
@@ -198,25 +601,35 @@ impl CHGraph {
     }
 }
 
-fn build_input_graph(
-    indptr: &[i64],
-    indices: &[i32],
-    w_sec: &[u16],
-) -> Result<InputGraph, PyErr> {
+fn validate_csr(indptr: &[i64], indices: &[i32], w_sec: &[u16]) -> Result<(), PyErr> {
     if indptr.is_empty() {
         return Err(PyValueError::new_err("indptr must be non-empty"));
     }
     if indices.len() != w_sec.len() {
-        return Err(PyValueError::new_err("indices and weights must match in length"));
+        return Err(PyValueError::new_err(
+            "indices and weights must match in length",
+        ));
+    }
+    if indptr[0] < 0
+        || indptr.windows(2).any(|w| w[0] > w[1])
+        || *indptr.last().unwrap() as usize > indices.len()
+    {
+        return Err(PyValueError::new_err("indptr out of bounds for indices"));
     }
+    let n = indptr.len() - 1;
+    if indices.iter().any(|&v| v >= 0 && v as usize >= n) {
+        return Err(PyValueError::new_err("edge target out of range"));
+    }
+    Ok(())
+}
+
+fn build_input_graph(indptr: &[i64], indices: &[i32], w_sec: &[u16]) -> Result<InputGraph, PyErr> {
+    validate_csr(indptr, indices, w_sec)?;
     let mut g = InputGraph::new();
     let n = indptr.len() - 1;
     for u in 0..n {
         let lo = indptr[u] as usize;
         let hi = indptr[u + 1] as usize;
-        if hi > indices.len() {
-            return Err(PyValueError::new_err("indptr out of bounds for indices"));
-        }
         for idx in lo..hi {
             let v_raw = indices[idx];
             if v_raw < 0 {
@@ -231,27 +644,68 @@ fn build_input_graph(
     Ok(g)
 }
 
+/// Contract a CSR graph into a CH. `threads <= 1` runs fast_paths' sequential preparation;
+/// `threads > 1` contracts independent node sets in parallel rounds (see ch_parallel.rs), which
+/// answers the same queries with a different node order. With `progress`, `progress_cb(done, total)`
+/// gets the number of contracted nodes after every round (a line on stderr without a callback).
 #[pyfunction]
+#[pyo3(signature = (indptr, indices, w_sec, threads=1, progress=false, progress_cb=None))]
 pub fn ch_build_from_csr(
+    py: Python<'_>,
     indptr: PyReadonlyArray1<i64>,
     indices: PyReadonlyArray1<i32>,
     w_sec: PyReadonlyArray1<u16>,
+    threads: usize,
+    progress: bool,
+    progress_cb: Option<PyObject>,
 ) -> PyResult<CHGraph> {
     let indptr = indptr.as_slice()?;
     let indices = indices.as_slice()?;
     let w_sec = w_sec.as_slice()?;
 
-    let input = build_input_graph(indptr, indices, w_sec)?;
-    let fast_graph = fast_paths::prepare(&input);
-    let fast32 = FastGraph32::new(&fast_graph);
-    Ok(CHGraph::from_fast_graph32(fast32))
+    if threads <= 1 {
+        let input = build_input_graph(indptr, indices, w_sec)?;
+        let data = py.allow_threads(|| {
+            ChData::from_fast_graph32(&FastGraph32::new(&fast_paths::prepare(&input)))
+        });
+        return Ok(CHGraph::from_data(data));
+    }
+    validate_csr(indptr, indices, w_sec)?;
+    let pool = ThreadPoolBuilder::new()
+        .num_threads(threads)
+        .build()
+        .map_err(|e| PyRuntimeError::new_err(format!("Failed to build thread pool: {e}")))?;
+    let mut on_round = |done: usize, total: usize| {
+        if !progress {
+            return;
+        }
+        if let Some(cb) = progress_cb.as_ref() {
+            Python::with_gil(|py| {
+                let _ = cb.call1(py, (done, total));
+            });
+        } else {
+            eprintln!("[ch] contracted {done}/{total} nodes");
+        }
+    };
+    let data = py.allow_threads(|| {
+        pool.install(|| contract_parallel(indptr, indices, w_sec, &mut on_round))
+    });
+    Ok(CHGraph::from_data(data))
 }
 
+/// Load a CH from `CHGraph.to_bytes()`; caches written before the t_hex format (a bincode
+/// fast_paths `FastGraph32`) still load.
 #[pyfunction]
 pub fn ch_from_bytes(data: &Bound<'_, PyBytes>) -> PyResult<CHGraph> {
     let bytes = data.as_bytes();
-    match bincode::deserialize::<FastGraph32>(bytes) {
-        Ok(graph) => Ok(CHGraph::from_fast_graph32(graph)),
-        Err(e) => Err(PyValueError::new_err(format!("failed to deserialize CH graph: {e}"))),
-    }
+    let parsed = if bytes.starts_with(CH_MAGIC) {
+        ChData::from_bytes(bytes)
+    } else {
+        bincode::deserialize::<FastGraph32>(bytes)
+            .map(|graph| ChData::from_fast_graph32(&graph))
+            .map_err(|e| e.to_string())
+    };
+    parsed
+        .map(CHGraph::from_data)
+        .map_err(|e| PyValueError::new_err(format!("failed to deserialize CH graph: {e}")))
 }
@@ -0,0 +1,299 @@
+//! Parallel contraction-hierarchy preparation: independent node sets contracted in rounds.
+//!
+//! Every round
+//! 1. selects the remaining nodes whose priority (edge difference + contracted neighbours, ties
+//!    broken by a node hash) is lower than that of all their remaining neighbours. No two of them
+//!    are adjacent;
+//! 2. contracts them in parallel. For each in-neighbour u and out-neighbour v of a node x, a
+//!    bounded witness search from u that avoids every node of the round decides whether
+//!    u -> x -> v needs a shortcut. Avoiding the whole round keeps the searches independent of the
+//!    order the round is applied in, at the cost of a few extra shortcuts;
+//! 3. records x's remaining edges as its upward CH edges, drops x from its neighbours' adjacency
+//!    and inserts the shortcuts (edits grouped per node and applied in parallel);
+//! 4. re-evaluates the priority of the neighbours of contracted nodes.
+//!
+//! A witness search that stops at `WITNESS_SETTLE_LIMIT` adds the shortcut, so no shortest path
+//! is lost. Ranks follow the rounds, so every recorded edge points to a node contracted later.
+//! The output has the same layout as a fast_paths preparation and serves the same queries.
+
+use std::cmp::Reverse;
+use std::collections::BinaryHeap;
+
+use rayon::prelude::*;
+use rustc_hash::FxHashMap;
+
+use crate::ch::{ChData, ChEdge};
+
+/// Nodes settled by one witness search before it gives up (and the shortcut is added).
+const WITNESS_SETTLE_LIMIT: usize = 500;
+
+type Adjacency = Vec<Vec<(u32, u32)>>;
+type Scratch = (FxHashMap<u32, u32>, BinaryHeap<Reverse<(u32, u32)>>);
+
+#[derive(Clone, Copy)]
+enum Edit {
+    Remove(u32),
+    Add(u32, u32),
+}
+
+/// Out-adjacency with parallel edges merged (minimum weight), self-loops dropped and weights >= 1.
+fn initial_adjacency(indptr: &[i64], indices: &[i32], w_sec: &[u16]) -> (Adjacency, Adjacency) {
+    let n = indptr.len() - 1;
+    let out_adj: Adjacency = (0..n)
+        .into_par_iter()
+        .map(|u| {
+            let mut edges: Vec<(u32, u32)> = (indptr[u] as usize..indptr[u + 1] as usize)
+                .filter(|&e| indices[e] >= 0 && indices[e] as usize != u)
+                .map(|e| (indices[e] as u32, w_sec[e].max(1) as u32))
+                .collect();
+            edges.sort_unstable();
+            edges.dedup_by_key(|e| e.0);
+            edges
+        })
+        .collect();
+    let mut in_adj: Adjacency = vec![Vec::new(); n];
+    for (u, edges) in out_adj.iter().enumerate() {
+        for &(v, w) in edges {
+            in_adj[v as usize].push((u as u32, w));
+        }
+    }
+    (out_adj, in_adj)
+}
+
+/// Bounded Dijkstra from `source` over `out_adj`, skipping `x` and nodes flagged in `avoid`.
+/// Leaves tentative distances (lengths of real paths) in the scratch map.
+fn witness_search(
+    out_adj: &Adjacency,
+    source: u32,
+    x: u32,
+    avoid: &[bool],
+    max_dist: u32,
+    scratch: &mut Scratch,
+) {
+    let (dist, heap) = scratch;
+    dist.clear();
+    heap.clear();
+    dist.insert(source, 0);
+    heap.push(Reverse((0, source)));
+    let mut settled = 0usize;
+    while let Some(Reverse((d, u))) = heap.pop() {
+        if d > max_dist || settled >= WITNESS_SETTLE_LIMIT {
+            break;
+        }
+        if dist.get(&u).map_or(false, |&du| d > du) {
+            continue;
+        }
+        settled += 1;
+        for &(v, w) in &out_adj[u as usize] {
+            if v == x || avoid[v as usize] {
+                continue;
+            }
+            let nd = d.saturating_add(w);
+            if nd > max_dist {
+                continue;
+            }
+            let entry = dist.entry(v).or_insert(u32::MAX);
+            if nd < *entry {
+                *entry = nd;
+                heap.push(Reverse((nd, v)));
+            }
+        }
+    }
+}
+
+/// Shortcuts (u, v, weight) needed to contract `x` without losing a shortest path.
+fn shortcuts_for(
+    x: u32,
+    out_adj: &Adjacency,
+    in_adj: &Adjacency,
+    avoid: &[bool],
+    scratch: &mut Scratch,
+) -> Vec<(u32, u32, u32)> {
+    let outs = &out_adj[x as usize];
+    let mut shortcuts = Vec::new();
+    for &(u, w_ux) in &in_adj[x as usize] {
+        let Some(max_out) = outs.iter().filter(|&&(v, _)| v != u).map(|&(_, w)| w).max() else {
+            continue;
+        };
+        witness_search(out_adj, u, x, avoid, w_ux.saturating_add(max_out), scratch);
+        for &(v, w_xv) in outs {
+            if v == u {
+                continue;
+            }
+            let via = w_ux.saturating_add(w_xv);
+            if scratch.0.get(&v).map_or(true, |&d| d > via) {
+                shortcuts.push((u, v, via));
+            }
+        }
+    }
+    shortcuts
+}
+
+fn priority(
+    x: u32,
+    out_adj: &Adjacency,
+    in_adj: &Adjacency,
+    contracted_nbrs: &[u32],
+    avoid: &[bool],
+    scratch: &mut Scratch,
+) -> i64 {
+    let shortcuts = shortcuts_for(x, out_adj, in_adj, avoid, scratch).len() as i64;
+    let removed = (out_adj[x as usize].len() + in_adj[x as usize].len()) as i64;
+    shortcuts - removed + contracted_nbrs[x as usize] as i64
+}
+
+/// Total order on (priority, hashed node id) so that ties do not block both endpoints.
+fn key(priority: &[i64], x: u32) -> (i64, u32, u32) {
+    (priority[x as usize], x.wrapping_mul(0x9E37_79B1), x)
+}
+
+/// Apply per-node adjacency edits; only the touched lists are moved out and edited in parallel.
+fn apply_edits(adj: &mut Adjacency, mut edits: Vec<(u32, Edit)>) {
+    edits.par_sort_unstable_by_key(|e| e.0);
+    let groups: Vec<&[(u32, Edit)]> = edits.chunk_by(|a, b| a.0 == b.0).collect();
+    let mut lists: Vec<Vec<(u32, u32)>> = groups
+        .iter()
+        .map(|g| std::mem::take(&mut adj[g[0].0 as usize]))
+        .collect();
+    lists
+        .par_iter_mut()
+        .zip(groups.par_iter())
+        .for_each(|(list, group)| {
+            for &(_, edit) in group.iter() {
+                match edit {
+                    Edit::Remove(y) => list.retain(|&(z, _)| z != y),
+                    Edit::Add(y, w) => match list.iter_mut().find(|e| e.0 == y) {
+                        Some(e) => e.1 = e.1.min(w),
+                        None => list.push((y, w)),
+                    },
+                }
+            }
+        });
+    for (group, list) in groups.iter().zip(lists) {
+        adj[group[0].0 as usize] = list;
+    }
+}
+
+/// Contract the CSR graph in parallel rounds (run inside the caller's rayon pool).
+/// `on_round(contracted, total)` is called after every round.
+pub(crate) fn contract_parallel(
+    indptr: &[i64],
+    indices: &[i32],
+    w_sec: &[u16],
+    on_round: &mut dyn FnMut(usize, usize),
+) -> ChData {
+    let n = indptr.len() - 1;
+    let (mut out_adj, mut in_adj) = initial_adjacency(indptr, indices, w_sec);
+    let mut in_round = vec![false; n];
+    let mut contracted_nbrs = vec![0u32; n];
+    let mut rank = vec![u32::MAX; n];
+    let mut up_fwd: Adjacency = vec![Vec::new(); n];
+    let mut up_bwd: Adjacency = vec![Vec::new(); n];
+
+    let mut prio: Vec<i64> = (0..n as u32)
+        .into_par_iter()
+        .map_init(Scratch::default, |scratch, x| {
+            priority(x, &out_adj, &in_adj, &contracted_nbrs, &in_round, scratch)
+        })
+        .collect();
+    let mut remaining: Vec<u32> = (0..n as u32).collect();
+    let mut next_rank = 0u32;
+
+    while !remaining.is_empty() {
+        let round: Vec<u32> = remaining
+            .par_iter()
+            .copied()
+            .filter(|&x| {
+                let kx = key(&prio, x);
+                out_adj[x as usize]
+                    .iter()
+                    .chain(in_adj[x as usize].iter())
+                    .all(|&(y, _)| kx < key(&prio, y))
+            })
+            .collect();
+        for &x in &round {
+            in_round[x as usize] = true;
+        }
+
+        let results: Vec<(u32, Vec<(u32, u32, u32)>)> = round
+            .par_iter()
+            .map_init(Scratch::default, |scratch, &x| {
+                (x, shortcuts_for(x, &out_adj, &in_adj, &in_round, scratch))
+            })
+            .collect();
+
+        let mut out_edits: Vec<(u32, Edit)> = Vec::new();
+        let mut in_edits: Vec<(u32, Edit)> = Vec::new();
+        let mut touched: Vec<u32> = Vec::new();
+        for (x, shortcuts) in &results {
+            let x = *x;
+            rank[x as usize] = next_rank;
+            next_rank += 1;
+            let outs = std::mem::take(&mut out_adj[x as usize]);
+            let ins = std::mem::take(&mut in_adj[x as usize]);
+            for &(v, _) in &outs {
+                in_edits.push((v, Edit::Remove(x)));
+                contracted_nbrs[v as usize] += 1;
+                touched.push(v);
+            }
+            for &(u, _) in &ins {
+                out_edits.push((u, Edit::Remove(x)));
+                contracted_nbrs[u as usize] += 1;
+                touched.push(u);
+            }
+            for &(u, v, w) in shortcuts {
+                out_edits.push((u, Edit::Add(v, w)));
+                in_edits.push((v, Edit::Add(u, w)));
+            }
+            up_fwd[x as usize] = outs;
+            up_bwd[x as usize] = ins;
+        }
+        apply_edits(&mut out_adj, out_edits);
+        apply_edits(&mut in_adj, in_edits);
+        for &x in &round {
+            in_round[x as usize] = false;
+        }
+
+        touched.par_sort_unstable();
+        touched.dedup();
+        let updated: Vec<i64> = touched
+            .par_iter()
+            .map_init(Scratch::default, |scratch, &y| {
+                priority(y, &out_adj, &in_adj, &contracted_nbrs, &in_round, scratch)
+            })
+            .collect();
+        for (&y, p) in touched.iter().zip(updated) {
+            prio[y as usize] = p;
+        }
+        remaining.retain(|&x| rank[x as usize] == u32::MAX);
+        on_round(next_rank as usize, n);
+    }
+
+    let mut order = vec![0u32; n];
+    for (x, &r) in rank.iter().enumerate() {
+        order[r as usize] = x as u32;
+    }
+    let group = |up: &Adjacency| -> (Vec<usize>, Vec<ChEdge>) {
+        let mut first = Vec::with_capacity(n + 1);
+        let mut edges = Vec::new();
+        first.push(0);
+        for &x in &order {
+            edges.extend(up[x as usize].iter().map(|&(adj, weight)| ChEdge {
+                base: x,
+                adj,
+                weight,
+            }));
+            first.push(edges.len());
+        }
+        (first, edges)
+    };
+    let (first_fwd, edges_fwd) = group(&up_fwd);
+    let (first_bwd, edges_bwd) = group(&up_bwd);
+    ChData {
+        ranks: rank,
+        first_fwd,
+        edges_fwd,
+        first_bwd,
+        edges_bwd,
+    }
+}
@@ -0,0 +1,303 @@
+//! Fused K-best routing + per-hex top-K aggregation with incremental output.
+//!
+//! The node→anchor labels still have to exist as flat [N*K] arrays while the search runs, but
+//! nothing else at N*K scale is built: source indices are rewritten to anchor ids in place, nodes
+//! are ordered by H3 cell per resolution, and each hex's top-K is reduced from its run of nodes and
+//! handed to a Python sink in bounded batches.
+
+use numpy::{PyArray1, PyReadonlyArray1, PyReadonlyArray2};
+use pyo3::prelude::*;
+use rayon::prelude::*;
+use rayon::ThreadPoolBuilder;
+
+use crate::arrow_ffi::ArrowBatch;
+use crate::{
+    build_target_mask, kbest_bucket_labels, kbest_frontier_labels, FRONTIER_PAR_MIN_ITEMS,
+    UNREACHABLE,
+};
+
+/// Hexes reduced per parallel window before rows are appended to the pending batch.
+const HEX_WINDOW: usize = 1 << 16;
+
+/// Per-hex top-K over the K labels of every node in the hex: sort (time, site) and keep the first
+/// K distinct sites, so each site appears once with its minimum time and ties go to the lower id.
+fn reduce_hex(
+    nodes: &[u32],
+    k_node: usize,
+    k_hex: usize,
+    site_s: &[i32],
+    time_s: &[u16],
+    cand: &mut Vec<(u16, i32)>,
+    out: &mut Vec<(i32, u16)>,
+) {
+    cand.clear();
+    out.clear();
+    for &n in nodes {
+        let base = n as usize * k_node;
+        for j in 0..k_node {
+            let site = site_s[base + j];
+            if site < 0 {
+                break;
+            }
+            let ts = time_s[base + j];
+            if ts >= UNREACHABLE {
+                break;
+            }
+            cand.push((ts, site));
+        }
+    }
+    cand.sort_unstable();
+    for &(ts, site) in cand.iter() {
+        if out.iter().any(|&(s, _)| s == site) {
+            continue;
+        }
+        out.push((site, ts));
+        if out.len() == k_hex {
+            break;
+        }
+    }
+}
+
+/// Pending output rows, flushed to the sink as one batch (numpy columns or an `ArrowBatch`).
+struct RowBatch {
+    h3: Vec<u64>,
+    site: Vec<i32>,
+    time: Vec<u16>,
+    res: Vec<i32>,
+}
+
+impl RowBatch {
+    fn new() -> Self {
+        RowBatch {
+            h3: Vec::new(),
+            site: Vec::new(),
+            time: Vec::new(),
+            res: Vec::new(),
+        }
+    }
+    fn len(&self) -> usize {
+        self.h3.len()
+    }
+
+    fn flush(&mut self, py: Python, sink: &PyObject, arrow: bool) -> PyResult<usize> {
+        let n = self.len();
+        if n == 0 {
+            return Ok(0);
+        }
+        if arrow {
+            let batch = ArrowBatch::h3_rows(
+                std::mem::take(&mut self.h3),
+                std::mem::take(&mut self.site),
+                std::mem::take(&mut self.time),
+                std::mem::take(&mut self.res),
+            );
+            sink.call1(py, (Py::new(py, batch)?,))?;
+            return Ok(n);
+        }
+        let h = PyArray1::from_vec_bound(py, std::mem::take(&mut self.h3));
+        let s = PyArray1::from_vec_bound(py, std::mem::take(&mut self.site));
+        let t = PyArray1::from_vec_bound(py, std::mem::take(&mut self.time));
+        let r = PyArray1::from_vec_bound(py, std::mem::take(&mut self.res));
+        sink.call1(py, (h, s, t, r))?;
+        Ok(n)
+    }
+}
+
+/// Fused K-best + H3 top-K. Same routing arguments as `kbest_multisource_bucket_csr`, plus:
+/// - anchor_of_node: [N] int32 anchor id of the source at each node (-1 for non-sources)
+/// - h3_ids: [N,R] uint64 node cells (0 = no cell), resolutions: [R] int32
+/// - sink: callable(h3_id u64[], anchor_int_id i32[], time_s u16[], res i32[]) receiving batches of
+///   about `batch_rows` rows; hexes are emitted in ascending h3 order per resolution, rows by (time, site)
+/// - kernel: "bucket" or "frontier"
+/// - arrow: call the sink with a single `ArrowBatch` (Arrow PyCapsule protocol) instead of four arrays
+/// Returns the total number of rows emitted.
+#[pyfunction(signature = (
+    indptr, indices, w_sec, source_idxs, anchor_of_node, h3_ids, resolutions, k, cutoff_primary_s, cutoff_overflow_s,
+    threads, progress, sink, batch_rows=1_000_000, kernel="bucket", progress_cb=None, arrow=false
+))]
+pub fn kbest_h3_topk_stream(
+    py: Python,
+    indptr: PyReadonlyArray1<i64>,
+    indices: PyReadonlyArray1<i32>,
+    w_sec: PyReadonlyArray1<u16>,
+    source_idxs: PyReadonlyArray1<i32>,
+    anchor_of_node: PyReadonlyArray1<i32>,
+    h3_ids: PyReadonlyArray2<u64>,
+    resolutions: PyReadonlyArray1<i32>,
+    k: usize,
+    cutoff_primary_s: u16,
+    cutoff_overflow_s: u16,
+    threads: usize,
+    progress: bool,
+    sink: PyObject,
+    batch_rows: usize,
+    kernel: &str,
+    progress_cb: Option<PyObject>,
+    arrow: bool,
+) -> PyResult<usize> {
+    let indptr = indptr.as_slice()?;
+    let indices = indices.as_slice()?;
+    let w_sec = w_sec.as_slice()?;
+    let source_idxs = source_idxs.as_slice()?;
+    let anchor_of_node = anchor_of_node.as_slice()?;
+    let res_list = resolutions.as_slice()?;
+    let n_nodes: usize = indptr.len() - 1;
+    let r_len = h3_ids.as_array().shape()[1];
+    let h3 = h3_ids.as_slice()?;
+
+    if anchor_of_node.len() != n_nodes {
+        return Err(pyo3::exceptions::PyValueError::new_err(
+            "anchor_of_node length must match number of nodes",
+        ));
+    }
+    if h3.len() != n_nodes * r_len {
+        return Err(pyo3::exceptions::PyValueError::new_err(
+            "h3_ids row count must match nodes",
+        ));
+    }
+    if res_list.len() != r_len {
+        return Err(pyo3::exceptions::PyValueError::new_err(
+            "resolutions length must match h3_ids columns",
+        ));
+    }
+
+    let (mut site_s, time_s, _) = match kernel {
+        "bucket" => {
+            let (mask, total) = build_target_mask(n_nodes, None);
+            kbest_bucket_labels(
+                py,
+                indptr,
+                indices,
+                w_sec,
+                source_idxs,
+                k,
+                cutoff_primary_s,
+                cutoff_overflow_s,
+                threads,
+                progress,
+                progress_cb.as_ref(),
+                mask.as_deref(),
+                total,
+            )?
+        }
+        "frontier" => kbest_frontier_labels(
+            py,
+            indptr,
+            indices,
+            w_sec,
+            source_idxs,
+            k,
+            cutoff_primary_s,
+            cutoff_overflow_s,
+            threads,
+            progress,
+            progress_cb.as_ref(),
+            None,
+            FRONTIER_PAR_MIN_ITEMS,
+        )?,
+        other => {
+            return Err(pyo3::exceptions::PyValueError::new_err(format!(
+                "unknown kernel '{}'",
+                other
+            )));
+        }
+    };
+
+    let threads_n = if threads == 0 { 1 } else { threads };
+    let pool = ThreadPoolBuilder::new()
+        .num_threads(threads_n)
+        .build()
+        .map_err(|e| {
+            pyo3::exceptions::PyRuntimeError::new_err(format!("Failed to build thread pool: {}", e))
+        })?;
+
+    // Source node index -> anchor id, in place (no second N*K array)
+    py.allow_threads(|| {
+        pool.install(|| {
+            site_s.par_iter_mut().for_each(|s| {
+                if *s >= 0 {
+                    *s = anchor_of_node[*s as usize];
+                }
+            });
+        })
+    });
+
+    let batch_rows = batch_rows.max(1);
+    let mut batch = RowBatch::new();
+    let mut total_rows = 0usize;
+
+    for (ri, &r_val) in res_list.iter().enumerate() {
+        // Labelled nodes ordered by cell; each run of equal cells is one hex
+        let (order, runs) = py.allow_threads(|| {
+            pool.install(|| {
+                let mut order: Vec<u32> = (0..n_nodes as u32)
+                    .into_par_iter()
+                    .filter(|&i| {
+                        let i = i as usize;
+                        h3[i * r_len + ri] != 0 && site_s[i * k] >= 0
+                    })
+                    .collect();
+                order.par_sort_unstable_by_key(|&i| (h3[i as usize * r_len + ri], i));
+                let mut runs: Vec<u32> = Vec::new();
+                for (pos, &i) in order.iter().enumerate() {
+                    if pos == 0
+                        || h3[i as usize * r_len + ri] != h3[order[pos - 1] as usize * r_len + ri]
+                    {
+                        runs.push(pos as u32);
+                    }
+                }
+                runs.push(order.len() as u32);
+                (order, runs)
+            })
+        });
+        let n_hex = runs.len() - 1;
+
+        let mut hex_lo = 0usize;
+        while hex_lo < n_hex {
+            let hex_hi = (hex_lo + HEX_WINDOW).min(n_hex);
+            let rows: Vec<Vec<(u64, i32, u16)>> = py.allow_threads(|| {
+                pool.install(|| {
+                    (hex_lo..hex_hi)
+                        .into_par_iter()
+                        .with_min_len(256)
+                        .fold(
+                            || (Vec::new(), Vec::new(), Vec::new()),
+                            |(mut acc, mut cand, mut top): (
+                                Vec<(u64, i32, u16)>,
+                                Vec<(u16, i32)>,
+                                Vec<(i32, u16)>,
+                            ),
+                             hx| {
+                                let nodes = &order[runs[hx] as usize..runs[hx + 1] as usize];
+                                let cell = h3[nodes[0] as usize * r_len + ri];
+                                reduce_hex(nodes, k, k, &site_s, &time_s, &mut cand, &mut top);
+                                for &(site, ts) in top.iter() {
+                                    acc.push((cell, site, ts));
+                                }
+                                (acc, cand, top)
+                            },
+                        )
+                        .map(|(acc, _, _)| acc)
+                        .collect()
+                })
+            });
+            for part in rows.into_iter() {
+                for (cell, site, ts) in part.into_iter() {
+                    batch.h3.push(cell);
+                    batch.site.push(site);
+                    batch.time.push(ts);
+                    batch.res.push(r_val);
+                }
+            }
+            if batch.len() >= batch_rows {
+                total_rows += batch.flush(py, &sink, arrow)?;
+            }
+            hex_lo = hex_hi;
+        }
+        if progress {
+            eprintln!("[h3-stream] r{}: {} hexes", r_val, n_hex);
+        }
+    }
+    total_rows += batch.flush(py, &sink, arrow)?;
+    Ok(total_rows)
+}
@@ -1,14 +1,20 @@
+mod arrow_ffi;
 mod ch;
+mod ch_parallel;
+mod h3_stream;
+mod multi_label;
+mod stats;
 
-use numpy::{PyArray1, PyArray2, PyReadonlyArray1, PyArrayMethods};
+use h3o::{CellIndex, LatLng, Resolution};
+use numpy::{PyArray1, PyArray2, PyArrayMethods, PyReadonlyArray1};
 use pyo3::prelude::*;
-use std::collections::BinaryHeap;
-use std::cmp::Reverse;
-use std::cmp::min;
-use rustc_hash::FxHashMap;
 use rayon::prelude::*;
 use rayon::ThreadPoolBuilder;
-use h3o::{CellIndex, LatLng, Resolution};
+use rustc_hash::FxHashMap;
+use stats::KernelStats;
+use std::cmp::min;
+use std::cmp::Reverse;
+use std::collections::BinaryHeap;
 
 const UNREACHABLE: u16 = 65535;
 
@@ -29,7 +35,10 @@ fn insert_label_for_node(
     // Find if src already present
     let mut found_j: Option<usize> = None;
     for j in 0..used {
-        if best_src[base + j] == src_idx { found_j = Some(j); break; }
+        if best_src[base + j] == src_idx {
+            found_j = Some(j);
+            break;
+        }
     }
 
     // helper: bubble element at position pos left while times are out of order
@@ -46,7 +55,9 @@ fn insert_label_for_node(
                 best_src[base + j] = sjm1;
                 best_src[base + j - 1] = sj;
                 j -= 1;
-            } else { break; }
+            } else {
+                break;
+            }
         }
     }
 
@@ -66,7 +77,12 @@ fn insert_label_for_node(
             if used < k {
                 // Insert into sorted position by shifting
                 let mut ins = used;
-                for j in 0..used { if t < time_s[base + j] { ins = j; break; } }
+                for j in 0..used {
+                    if t < time_s[base + j] {
+                        ins = j;
+                        break;
+                    }
+                }
                 let mut j2 = used;
                 while j2 > ins {
                     time_s[base + j2] = time_s[base + j2 - 1];
@@ -76,7 +92,9 @@ fn insert_label_for_node(
                 time_s[base + ins] = t;
                 best_src[base + ins] = src_idx;
                 labels_used[node_i] = (used as u8) + 1;
-                if t_is_primary { primary_count[node_i] = primary_count[node_i].saturating_add(1); }
+                if t_is_primary {
+                    primary_count[node_i] = primary_count[node_i].saturating_add(1);
+                }
             } else {
                 // used == k: replacement logic
                 if t_is_primary {
@@ -86,7 +104,9 @@ fn insert_label_for_node(
                         let replaced_primary = worst_t <= cutoff_primary;
                         time_s[base + worst_idx] = t;
                         best_src[base + worst_idx] = src_idx;
-                        if !replaced_primary { primary_count[node_i] = primary_count[node_i].saturating_add(1); }
+                        if !replaced_primary {
+                            primary_count[node_i] = primary_count[node_i].saturating_add(1);
+                        }
                         bubble_left_inner(base, worst_idx, best_src, time_s);
                     }
                 } else {
@@ -97,7 +117,10 @@ fn insert_label_for_node(
                         for j in 0..k {
                             let tj = time_s[base + j];
                             if tj > cutoff_primary {
-                                if worst_over_idx.is_none() || tj > worst_over_t { worst_over_idx = Some(j); worst_over_t = tj; }
+                                if worst_over_idx.is_none() || tj > worst_over_t {
+                                    worst_over_idx = Some(j);
+                                    worst_over_t = tj;
+                                }
                             }
                         }
                         if let Some(widx) = worst_over_idx {
@@ -114,6 +137,28 @@ fn insert_label_for_node(
     }
 }
 
+/// Dominated-label check over a node's K slots (replaces a global per-(node, src) best-time map).
+/// Buckets pop in non-decreasing time, so a candidate (node, src, t) can be dropped when `src` already
+/// holds a slot at this node (its time is <= t), or when all K slots are filled with times <= t:
+/// K distinct sources already beat it here and therefore beat it on every path through this node.
+#[inline]
+fn label_dominated(
+    node_i: usize,
+    k: usize,
+    src_idx: i32,
+    t: u16,
+    best_src: &[i32],
+    time_s: &[u16],
+    labels_used: &[u8],
+) -> bool {
+    let base = node_i * k;
+    let used = labels_used[node_i] as usize;
+    if used == k && t >= time_s[base + k - 1] {
+        return true;
+    }
+    best_src[base..base + used].contains(&src_idx)
+}
+
 #[pyfunction]
 fn kbest_multisource_csr(
     py: Python,
@@ -136,7 +181,7 @@ fn kbest_multisource_csr(
     // A max-heap for each node to store the K best times.
     // We store (time, source_node_index).
     let mut best_results: Vec<BinaryHeap<(u16, i32)>> = vec![BinaryHeap::with_capacity(k); n_nodes];
-    
+
     // The main priority queue for the search. Min-heap.
     // We store Reverse((time, current_node_index, source_node_index)).
     let mut pq: BinaryHeap<Reverse<(u16, i32, i32)>> = BinaryHeap::new();
@@ -176,7 +221,7 @@ fn kbest_multisource_csr(
             let new_time = time + weight;
 
             if new_time < cutoff_s {
-                 // Optimization: if we have K results for v_idx and the new time is not better than the worst, don't push to PQ.
+                // Optimization: if we have K results for v_idx and the new time is not better than the worst, don't push to PQ.
                 let v_bests = &best_results[v_idx as usize];
                 if v_bests.len() == k && new_time >= v_bests.peek().unwrap().0 {
                     continue;
@@ -192,7 +237,7 @@ fn kbest_multisource_csr(
         let time_s_out = PyArray2::new_bound(py, [n_nodes, k], false);
         (best_src_idx_out, time_s_out)
     };
-    
+
     let best_src_idx_out_slice = unsafe { best_src_idx_out.as_slice_mut()? };
     let time_s_out_slice = unsafe { time_s_out.as_slice_mut()? };
 
@@ -203,12 +248,12 @@ fn kbest_multisource_csr(
     for (i, heap) in best_results.into_iter().enumerate() {
         let sorted_bests: Vec<(u16, i32)> = heap.into_sorted_vec();
         for (j, (time, src_idx)) in sorted_bests.into_iter().enumerate() {
-             let idx = i * k + j;
-             best_src_idx_out_slice[idx] = src_idx;
-             time_s_out_slice[idx] = time;
+            let idx = i * k + j;
+            best_src_idx_out_slice[idx] = src_idx;
+            time_s_out_slice[idx] = time;
         }
     }
-    
+
     Ok((best_src_idx_out.into(), time_s_out.into()))
 }
 
@@ -224,8 +269,14 @@ fn kbest_multisource_csr(
 /// - Deterministically merge per-node across chunks into global top-K using the same
 ///   `insert_label_for_node` semantics, iterating candidates in (time, src_idx) order.
 /// This avoids shared mutable state during relaxations and preserves correctness.
+/// Each chunk settles a bucket in rounds of sorted (node, src) items, as the frontier kernel does,
+/// so ties resolve identically and `threads=1` output equals `kbest_multisource_frontier_csr`.
+///
+/// With `stats=True` a third element is returned: a dict of work counters (pops, settled,
+/// relaxations, pruned, peak_queued, labels, bucket_span) and per-phase wall time (see `stats.rs`).
 #[pyfunction(signature = (
-    indptr, indices, w_sec, source_idxs, k, cutoff_primary_s, cutoff_overflow_s, threads, progress, progress_cb=None, targets_idx=None
+    indptr, indices, w_sec, source_idxs, k, cutoff_primary_s, cutoff_overflow_s, threads, progress, progress_cb=None, targets_idx=None,
+    stats=false
 ))]
 fn kbest_multisource_bucket_csr(
     py: Python,
@@ -240,84 +291,183 @@ fn kbest_multisource_bucket_csr(
     progress: bool,
     progress_cb: Option<PyObject>,
     targets_idx: Option<PyReadonlyArray1<i32>>,
-) -> PyResult<(Py<PyArray2<i32>>, Py<PyArray2<u16>>)> {
+    stats: bool,
+) -> PyResult<PyObject> {
     let indptr = indptr.as_slice()?;
     let indices = indices.as_slice()?;
     let w_sec = w_sec.as_slice()?;
     let source_idxs = source_idxs.as_slice()?;
-
     let n_nodes: usize = indptr.len() - 1;
-    // Helper: single-chunk computation
-    fn compute_chunk(
-        indptr: &[i64],
-        indices: &[i32],
-        w_sec: &[u16],
-        min_out: &[u16],
-        source_idxs: &[i32],
-        n_nodes: usize,
-        k: usize,
-        cutoff_primary_s: u16,
-        cutoff_overflow_s: u16,
-        log_progress: bool,
-        is_target: Option<&[u8]>,
-        targets_total: usize,
-    ) -> (Vec<i32>, Vec<u16>) {
-        use std::time::{Instant, Duration};
-
-        let mut best_src_idx_out: Vec<i32> = vec![-1; n_nodes * k];
-        let mut time_s_out: Vec<u16> = vec![UNREACHABLE; n_nodes * k];
-        let mut labels_used: Vec<u8> = vec![0u8; n_nodes];
-        let mut primary_count: Vec<u8> = vec![0u8; n_nodes];
-
-        let buckets_len = (cutoff_overflow_s as usize) + 1;
-        let mut buckets: Vec<Vec<(i32, i32)>> = vec![Vec::new(); buckets_len];
-        let mut active: Vec<bool> = vec![false; buckets_len];
-        // Dial ring-pointer frontier (no heap)
-        let mut active_count: usize = 0;
-        let mut cur_idx: usize = 0;
-        let mut pair_best: FxHashMap<u64, u16> = FxHashMap::default();
-        pair_best.reserve(source_idxs.len() * 8);
-
-        for &s in source_idxs {
-            buckets[0].push((s, s));
-        }
-        if !buckets[0].is_empty() && !active[0] { active[0] = true; active_count += 1; }
-
-        let start_ts = Instant::now();
-        let mut last_log = start_ts;
-        let log_every = Duration::from_secs(5);
-        let mut pops: usize = 0;
-        let mut prim_assigned: usize = 0;
-        let mut nodes_full_primary: usize = 0;
-        let mut remaining_targets: isize = targets_total as isize;
-        while active_count > 0 {
-            if !active[cur_idx] || buckets[cur_idx].is_empty() {
-                if active[cur_idx] && buckets[cur_idx].is_empty() {
-                    active[cur_idx] = false;
-                    active_count -= 1;
+    let targets = match &targets_idx {
+        Some(t) => Some(t.as_slice()?),
+        None => None,
+    };
+    let (target_mask_opt, targets_total) = build_target_mask(n_nodes, targets);
+    let (best_src_idx_vec, time_s_vec, kstats) = kbest_bucket_labels(
+        py,
+        indptr,
+        indices,
+        w_sec,
+        source_idxs,
+        k,
+        cutoff_primary_s,
+        cutoff_overflow_s,
+        threads,
+        progress,
+        progress_cb.as_ref(),
+        target_mask_opt.as_deref(),
+        targets_total,
+    )?;
+    labels_with_stats(
+        py,
+        n_nodes,
+        k,
+        best_src_idx_vec,
+        time_s_vec,
+        stats.then_some(&kstats),
+    )
+}
+
+/// Optional target mask for early stopping: (mask[N] with 1 at each target, number of targets given).
+fn build_target_mask(n_nodes: usize, targets: Option<&[i32]>) -> (Option<Vec<u8>>, usize) {
+    match targets {
+        Some(arr) => {
+            let mut mask: Vec<u8> = vec![0u8; n_nodes];
+            for &u in arr.iter() {
+                let ui = u as usize;
+                if u >= 0 && ui < n_nodes {
+                    mask[ui] = 1;
                 }
-                cur_idx = (cur_idx + 1) % buckets_len;
-                continue;
             }
-            let (u_idx, src_idx) = buckets[cur_idx].pop().unwrap();
-            let du = cur_idx as u16;
+            (Some(mask), arr.len())
+        }
+        None => (None, 0usize),
+    }
+}
+
+/// Copy flat [N*K] label vectors into fresh numpy [N,K] arrays.
+fn labels_to_numpy(
+    py: Python,
+    n_nodes: usize,
+    k: usize,
+    best_src_idx_vec: Vec<i32>,
+    time_s_vec: Vec<u16>,
+) -> PyResult<(Py<PyArray2<i32>>, Py<PyArray2<u16>>)> {
+    let (best_src_idx_out, time_s_out) = unsafe {
+        let best_src_idx_out = PyArray2::new_bound(py, [n_nodes, k], false);
+        let time_s_out = PyArray2::new_bound(py, [n_nodes, k], false);
+        (best_src_idx_out, time_s_out)
+    };
+    let best_src_idx_out_slice = unsafe { best_src_idx_out.as_slice_mut()? };
+    let time_s_out_slice = unsafe { time_s_out.as_slice_mut()? };
+    best_src_idx_out_slice.copy_from_slice(&best_src_idx_vec);
+    time_s_out_slice.copy_from_slice(&time_s_vec);
+    Ok((best_src_idx_out.into(), time_s_out.into()))
+}
+
+/// K-best return value: `(best_src_idx, time_s)`, or `(best_src_idx, time_s, stats)` when stats were requested.
+fn labels_with_stats(
+    py: Python,
+    n_nodes: usize,
+    k: usize,
+    best_src_idx_vec: Vec<i32>,
+    time_s_vec: Vec<u16>,
+    stats: Option<&KernelStats>,
+) -> PyResult<PyObject> {
+    let (src, t) = labels_to_numpy(py, n_nodes, k, best_src_idx_vec, time_s_vec)?;
+    Ok(match stats {
+        Some(st) => (src, t, st.to_dict(py)?).into_py(py),
+        None => (src, t).into_py(py),
+    })
+}
+
+/// Single-chunk Dial K-best over `source_idxs` (the bucket kernel's unit of work).
+///
+/// Each bucket is drained in rounds: the round's (node, src) items are sorted and deduped, then
+/// settled and relaxed in that order; zero-weight edges push into the next round of the same
+/// bucket. Equal-time labels therefore reach a node in ascending source order, the same tie rule
+/// as the frontier kernel, so one chunk produces exactly the frontier kernel's labels.
+fn compute_chunk(
+    indptr: &[i64],
+    indices: &[i32],
+    w_sec: &[u16],
+    source_idxs: &[i32],
+    n_nodes: usize,
+    k: usize,
+    cutoff_primary_s: u16,
+    cutoff_overflow_s: u16,
+    log_progress: bool,
+    is_target: Option<&[u8]>,
+    targets_total: usize,
+) -> (Vec<i32>, Vec<u16>, KernelStats) {
+    use std::time::{Duration, Instant};
+
+    let mut best_src_idx_out: Vec<i32> = vec![-1; n_nodes * k];
+    let mut time_s_out: Vec<u16> = vec![UNREACHABLE; n_nodes * k];
+    let mut labels_used: Vec<u8> = vec![0u8; n_nodes];
+    let mut primary_count: Vec<u8> = vec![0u8; n_nodes];
+
+    let buckets_len = (cutoff_overflow_s as usize) + 1;
+    let mut buckets: Vec<Vec<(i32, i32)>> = vec![Vec::new(); buckets_len];
+    let mut active: Vec<bool> = vec![false; buckets_len];
+    // Dial ring-pointer frontier (no heap)
+    let mut active_count: usize = 0;
+    let mut cur_idx: usize = 0;
+
+    for &s in source_idxs {
+        buckets[0].push((s, s));
+    }
+    if !buckets[0].is_empty() && !active[0] {
+        active[0] = true;
+        active_count += 1;
+    }
+
+    let start_ts = Instant::now();
+    let mut last_log = start_ts;
+    let log_every = Duration::from_secs(5);
+    let mut pops: usize = 0;
+    let mut settled: usize = 0;
+    let mut prim_assigned: usize = 0;
+    let mut nodes_full_primary: usize = 0;
+    let mut remaining_targets: isize = targets_total as isize;
+    let mut queued: u64 = source_idxs.len() as u64;
+    let mut stats = KernelStats {
+        peak_queued: queued,
+        ..Default::default()
+    };
+    'search: while active_count > 0 {
+        if !active[cur_idx] || buckets[cur_idx].is_empty() {
+            if active[cur_idx] && buckets[cur_idx].is_empty() {
+                active[cur_idx] = false;
+                active_count -= 1;
+            }
+            cur_idx = (cur_idx + 1) % buckets_len;
+            continue;
+        }
+        let mut items = std::mem::take(&mut buckets[cur_idx]);
+        let du = cur_idx as u16;
+        pops += items.len();
+        queued -= items.len() as u64;
+        stats.bucket_span = stats.bucket_span.max(cur_idx as u64);
+        items.sort_unstable();
+        items.dedup();
+
+        for (u_idx, src_idx) in items {
             let ui = u_idx as usize;
-            pops += 1;
-
-            // prune per (node,src)
-            let key: u64 = ((ui as u64) << 32) | (src_idx as u32 as u64);
-            if let Some(&best) = pair_best.get(&key) { if du >= best { continue; } }
-            pair_best.insert(key, du);
-
-            // If node already has K primary labels with worst <= du,
-            // no need to record or relax neighbors for this (u, src, du).
-            if (primary_count[ui] as usize) == k {
-                let wp = time_s_out[ui * k + (k - 1)];
-                if du >= wp { continue; }
-                // If even the cheapest outgoing edge can't improve any neighbor, skip relaxing
-                let m = min_out[ui];
-                if m > 0 && du.saturating_add(m) >= wp { continue; }
+
+            // prune per (node,src) against the node's own K slots
+            if label_dominated(
+                ui,
+                k,
+                src_idx,
+                du,
+                &best_src_idx_out,
+                &time_s_out,
+                &labels_used,
+            ) {
+                continue;
             }
+            settled += 1;
 
             // record label under primary/overflow rules
             let before_primary = primary_count[ui] as usize;
@@ -335,7 +485,9 @@ fn kbest_multisource_bucket_csr(
             );
             if du <= cutoff_primary_s {
                 prim_assigned += 1;
-                if before_primary < k && (primary_count[ui] as usize) == k { nodes_full_primary += 1; }
+                if before_primary < k && (primary_count[ui] as usize) == k {
+                    nodes_full_primary += 1;
+                }
             }
 
             // Target-aware early stop: when a target receives its first label, decrement
@@ -343,7 +495,9 @@ fn kbest_multisource_bucket_csr(
                 if let Some(mask) = is_target {
                     if mask[ui] != 0 {
                         remaining_targets -= 1;
-                        if remaining_targets == 0 { break; }
+                        if remaining_targets == 0 {
+                            break 'search;
+                        }
                     }
                 }
             }
@@ -351,96 +505,126 @@ fn kbest_multisource_bucket_csr(
             // relax neighbors
             let start = indptr[ui] as usize;
             let end = indptr[ui + 1] as usize;
+            stats.relaxations += (end - start) as u64;
             for e in start..end {
                 let v = indices[e] as usize;
                 let w = w_sec[e];
                 let nd = du.saturating_add(w);
-                if nd > cutoff_overflow_s { continue; }
+                if nd > cutoff_overflow_s {
+                    stats.pruned += 1;
+                    continue;
+                }
                 // Early prune: if v already has K primary labels and this candidate
                 // is not better than v's current worst primary label, skip.
                 if (primary_count[v] as usize) == k {
                     let worst_p = time_s_out[v * k + (k - 1)];
-                    if nd >= worst_p { continue; }
+                    if nd >= worst_p {
+                        stats.pruned += 1;
+                        continue;
+                    }
+                }
+                if label_dominated(
+                    v,
+                    k,
+                    src_idx,
+                    nd,
+                    &best_src_idx_out,
+                    &time_s_out,
+                    &labels_used,
+                ) {
+                    stats.pruned += 1;
+                    continue;
                 }
-                let vkey: u64 = ((v as u64) << 32) | (src_idx as u32 as u64);
-                if let Some(&best) = pair_best.get(&vkey) { if nd >= best { continue; } }
                 let nd_us = nd as usize;
                 buckets[nd_us].push((indices[e], src_idx));
+                queued += 1;
+                if queued > stats.peak_queued {
+                    stats.peak_queued = queued;
+                }
                 if !active[nd_us] {
-                    active[nd_us] = true; active_count += 1;
+                    active[nd_us] = true;
+                    active_count += 1;
                 }
             }
-
-            // periodic live logging from within chunk
-            if log_progress && last_log.elapsed() >= log_every {
-                let elapsed = start_ts.elapsed().as_secs();
-                eprintln!(
-                    "[kbest:chunk] t={}s cur={} pops={} pairs={} prim_labels={} nodes_full_k={}",
-                    elapsed, cur_idx, pops, pair_best.len(), prim_assigned, nodes_full_primary
-                );
-                last_log = Instant::now();
-            }
-            // After processing one item, if current bucket emptied, deactivate
-            if buckets[cur_idx].is_empty() && active[cur_idx] {
-                active[cur_idx] = false;
-                active_count -= 1;
-            }
         }
 
-        (best_src_idx_out, time_s_out)
+        // periodic live logging from within chunk
+        if log_progress && last_log.elapsed() >= log_every {
+            let elapsed = start_ts.elapsed().as_secs();
+            eprintln!(
+                "[kbest:chunk] t={}s cur={} pops={} settled={} prim_labels={} nodes_full_k={}",
+                elapsed, cur_idx, pops, settled, prim_assigned, nodes_full_primary
+            );
+            last_log = Instant::now();
+        }
+        // After a round, deactivate the bucket unless zero-weight edges refilled it
+        if buckets[cur_idx].is_empty() && active[cur_idx] {
+            active[cur_idx] = false;
+            active_count -= 1;
+        }
     }
 
+    stats.pops = pops as u64;
+    stats.settled = settled as u64;
+    stats.labels = labels_used.iter().map(|&u| u as u64).sum();
+    (best_src_idx_out, time_s_out, stats)
+}
+
+/// Bucket kernel body (see `kbest_multisource_bucket_csr`); returns flat [N*K] label arrays.
+pub(crate) fn kbest_bucket_labels(
+    py: Python,
+    indptr: &[i64],
+    indices: &[i32],
+    w_sec: &[u16],
+    source_idxs: &[i32],
+    k: usize,
+    cutoff_primary_s: u16,
+    cutoff_overflow_s: u16,
+    threads: usize,
+    progress: bool,
+    progress_cb: Option<&PyObject>,
+    target_mask: Option<&[u8]>,
+    targets_total: usize,
+) -> PyResult<(Vec<i32>, Vec<u16>, KernelStats)> {
+    use std::time::Instant;
+    let n_nodes: usize = indptr.len() - 1;
+    let phase_start = Instant::now();
+
     // Threads handling
     let t = if threads == 0 { 1 } else { threads };
     let should_parallel = t > 1 && source_idxs.len() > t * 4; // heuristic: enough work per thread
 
-    // Precompute per-node minimal outgoing edge for neighbor-prune
-    let mut min_out: Vec<u16> = vec![u16::MAX; n_nodes];
-    for ui in 0..n_nodes {
-        let start = indptr[ui] as usize;
-        let end = indptr[ui + 1] as usize;
-        let mut m = u16::MAX;
-        for e in start..end { let w = w_sec[e]; if w < m { m = w; } }
-        if m == u16::MAX { m = 0; }
-        min_out[ui] = m;
-    }
-
-    // Build optional target mask
-    let (target_mask_opt, targets_total): (Option<Vec<u8>>, usize) = if let Some(tidx) = &targets_idx {
-        let arr = tidx.as_slice()?;
-        let mut mask: Vec<u8> = vec![0u8; n_nodes];
-        for &u in arr.iter() {
-            let ui = u as usize;
-            if ui < n_nodes { mask[ui] = 1; }
-        }
-        (Some(mask), arr.len())
-    } else { (None, 0usize) };
+    let mut phases: Vec<(&'static str, f64)> = Vec::new();
 
     if !should_parallel {
         // Single-chunk path (backwards compatible)
-        let (best_src_idx_vec, time_s_vec) = py.allow_threads(|| compute_chunk(
-            indptr, indices, w_sec, &min_out, source_idxs, n_nodes, k, cutoff_primary_s, cutoff_overflow_s, progress,
-            target_mask_opt.as_deref(), targets_total,
-        ));
+        let (best_src_idx_vec, time_s_vec, mut stats) = py.allow_threads(|| {
+            compute_chunk(
+                indptr,
+                indices,
+                w_sec,
+                source_idxs,
+                n_nodes,
+                k,
+                cutoff_primary_s,
+                cutoff_overflow_s,
+                progress,
+                target_mask,
+                targets_total,
+            )
+        });
+        phases.push(("search", phase_start.elapsed().as_secs_f64()));
+        stats.phases = phases;
         if progress {
-            if let Some(cb) = &progress_cb {
-                Python::with_gil(|py| { let _ = cb.call1(py, (1usize, 1usize)); });
+            if let Some(cb) = progress_cb {
+                Python::with_gil(|py| {
+                    let _ = cb.call1(py, (1usize, 1usize));
+                });
             } else {
                 eprintln!("[kbest] chunk {}/{}", 1, 1);
             }
         }
-
-        // Prepare numpy outputs
-        let (best_src_idx_out, time_s_out) = unsafe {
-            let best_src_idx_out = PyArray2::new_bound(py, [n_nodes, k], false);
-            let time_s_out = PyArray2::new_bound(py, [n_nodes, k], false);
-            (best_src_idx_out, time_s_out)
-        };
-        let best_src_idx_out_slice = unsafe { best_src_idx_out.as_slice_mut()? };
-        let time_s_out_slice = unsafe { time_s_out.as_slice_mut()? };
-        best_src_idx_out_slice.copy_from_slice(&best_src_idx_vec);
-        time_s_out_slice.copy_from_slice(&time_s_vec);
-        return Ok((best_src_idx_out.into(), time_s_out.into()));
+        return Ok((best_src_idx_vec, time_s_vec, stats));
     }
 
     // Parallel path: partition sources and compute per-chunk results
@@ -458,43 +642,66 @@ fn kbest_multisource_bucket_csr(
     }
 
     // Scoped thread pool to honor `threads`
-    let pool = ThreadPoolBuilder::new().num_threads(t).build().map_err(|e| PyErr::new::<pyo3::exceptions::PyRuntimeError, _>(format!("Failed to build thread pool: {}", e)))?;
+    let pool = ThreadPoolBuilder::new()
+        .num_threads(t)
+        .build()
+        .map_err(|e| {
+            PyErr::new::<pyo3::exceptions::PyRuntimeError, _>(format!(
+                "Failed to build thread pool: {}",
+                e
+            ))
+        })?;
 
-    use std::sync::{Arc};
     use std::sync::atomic::{AtomicUsize, Ordering};
+    use std::sync::Arc;
     let total_parts = parts.len();
     let counter = Arc::new(AtomicUsize::new(0));
-    let chunk_results: Vec<(Vec<i32>, Vec<u16>)> = py.allow_threads(|| pool.install(|| {
-        parts
-            .par_iter()
-            .map(|&(lo, hi)| {
-                let slice = &source_idxs[lo..hi];
-                // For chunked path, we cannot early stop globally across chunks; pass mask but it won't hit zero typically
-                let res = compute_chunk(indptr, indices, w_sec, &min_out, slice, n_nodes, k, cutoff_primary_s, cutoff_overflow_s, progress,
-                    target_mask_opt.as_deref(), targets_total);
-                if progress {
-                    let done = counter.fetch_add(1, Ordering::Relaxed) + 1;
-                    if let Some(cb) = &progress_cb {
-                        Python::with_gil(|py| { let _ = cb.call1(py, (done, total_parts)); });
-                    } else {
-                        eprintln!("[kbest] chunk {}/{}", done, total_parts);
+    let chunk_results: Vec<(Vec<i32>, Vec<u16>, KernelStats)> = py.allow_threads(|| {
+        pool.install(|| {
+            parts
+                .par_iter()
+                .map(|&(lo, hi)| {
+                    let slice = &source_idxs[lo..hi];
+                    // For chunked path, we cannot early stop globally across chunks; pass mask but it won't hit zero typically
+                    let res = compute_chunk(
+                        indptr,
+                        indices,
+                        w_sec,
+                        slice,
+                        n_nodes,
+                        k,
+                        cutoff_primary_s,
+                        cutoff_overflow_s,
+                        progress,
+                        target_mask,
+                        targets_total,
+                    );
+                    if progress {
+                        let done = counter.fetch_add(1, Ordering::Relaxed) + 1;
+                        if let Some(cb) = progress_cb {
+                            Python::with_gil(|py| {
+                                let _ = cb.call1(py, (done, total_parts));
+                            });
+                        } else {
+                            eprintln!("[kbest] chunk {}/{}", done, total_parts);
+                        }
                     }
-                }
-                res
-            })
-            .collect()
-    }));
+                    res
+                })
+                .collect()
+        })
+    });
+
+    let mut stats = KernelStats::default();
+    for (_, _, chunk_stats) in chunk_results.iter() {
+        stats.absorb(chunk_stats);
+    }
+    phases.push(("search", phase_start.elapsed().as_secs_f64()));
+    let phase_start = Instant::now();
 
     // Global merge per node
-    let (best_src_idx_out, time_s_out) = unsafe {
-        let best_src_idx_out = PyArray2::new_bound(py, [n_nodes, k], false);
-        let time_s_out = PyArray2::new_bound(py, [n_nodes, k], false);
-        (best_src_idx_out, time_s_out)
-    };
-    let best_src_idx_out_slice = unsafe { best_src_idx_out.as_slice_mut()? };
-    let time_s_out_slice = unsafe { time_s_out.as_slice_mut()? };
-    best_src_idx_out_slice.fill(-1);
-    time_s_out_slice.fill(UNREACHABLE);
+    let mut best_src_idx_out: Vec<i32> = vec![-1; n_nodes * k];
+    let mut time_s_out: Vec<u16> = vec![UNREACHABLE; n_nodes * k];
 
     let mut labels_used: Vec<u8> = vec![0u8; n_nodes];
     let mut primary_count: Vec<u8> = vec![0u8; n_nodes];
@@ -506,12 +713,16 @@ fn kbest_multisource_bucket_csr(
         candidates.clear();
         let base = node_i * k;
 
-        for (bs, ts) in chunk_results.iter().map(|(b, t)| (b, t)) {
+        for (bs, ts) in chunk_results.iter().map(|(b, t, _)| (b, t)) {
             for j in 0..k {
                 let s = bs[base + j];
-                if s < 0 { continue; }
+                if s < 0 {
+                    continue;
+                }
                 let t = ts[base + j];
-                if t >= UNREACHABLE { continue; }
+                if t >= UNREACHABLE {
+                    continue;
+                }
                 candidates.push((t, s));
             }
         }
@@ -519,7 +730,9 @@ fn kbest_multisource_bucket_csr(
         // sort by (time, src_idx) for deterministic merge
         candidates.sort_by(|a, b| {
             let ord_t = a.0.cmp(&b.0);
-            if ord_t != std::cmp::Ordering::Equal { return ord_t; }
+            if ord_t != std::cmp::Ordering::Equal {
+                return ord_t;
+            }
             a.1.cmp(&b.1)
         });
 
@@ -529,16 +742,460 @@ fn kbest_multisource_bucket_csr(
                 k,
                 *s,
                 *t,
-                best_src_idx_out_slice,
-                time_s_out_slice,
+                &mut best_src_idx_out,
+                &mut time_s_out,
                 &mut labels_used,
                 &mut primary_count,
                 cutoff_primary_s,
             );
         }
     }
+    phases.push(("merge", phase_start.elapsed().as_secs_f64()));
+    stats.phases = phases;
+    stats.labels = labels_used.iter().map(|&u| u as u64).sum();
 
-    Ok((best_src_idx_out.into(), time_s_out.into()))
+    Ok((best_src_idx_out, time_s_out, stats))
+}
+
+/// Settle one node block of a frontier bucket: insert (node, src) labels at time `t` into the
+/// block-local slots and collect the ones that were kept (only kept labels need relaxing).
+/// `items` must be sorted by (node, src) and all nodes must fall in [node_lo, node_lo + block).
+fn settle_frontier_block(
+    items: &[(u32, i32)],
+    node_lo: usize,
+    k: usize,
+    t: u16,
+    cutoff_primary: u16,
+    best_src: &mut [i32],
+    time_s: &mut [u16],
+    labels_used: &mut [u8],
+    primary_count: &mut [u8],
+    is_target: Option<&[u8]>,
+    accepted: &mut Vec<(u32, i32)>,
+) -> usize {
+    let mut newly_reached_targets = 0usize;
+    for &(node, src) in items {
+        let ui = node as usize - node_lo;
+        let base = ui * k;
+        let used = labels_used[ui] as usize;
+        if label_dominated(ui, k, src, t, best_src, time_s, labels_used) {
+            continue;
+        }
+        insert_label_for_node(
+            ui,
+            k,
+            src,
+            t,
+            best_src,
+            time_s,
+            labels_used,
+            primary_count,
+            cutoff_primary,
+        );
+        let used_after = labels_used[ui] as usize;
+        if best_src[base..base + used_after].contains(&src) {
+            accepted.push((node, src));
+            if used == 0 {
+                if let Some(mask) = is_target {
+                    if mask[node as usize] != 0 {
+                        newly_reached_targets += 1;
+                    }
+                }
+            }
+        }
+    }
+    newly_reached_targets
+}
+
+/// Relax the out-edges of settled labels against a read-only view of the label slots.
+/// Emits (arrival_time, node, src) candidates for later (or the same, on zero-weight edges) buckets
+/// and returns the number of edges scanned.
+fn relax_frontier_labels(
+    accepted: &[(u32, i32)],
+    t: u16,
+    indptr: &[i64],
+    indices: &[i32],
+    w_sec: &[u16],
+    k: usize,
+    cutoff_overflow: u16,
+    best_src: &[i32],
+    time_s: &[u16],
+    labels_used: &[u8],
+    out: &mut Vec<(u16, u32, i32)>,
+) -> usize {
+    let mut scanned = 0usize;
+    for &(node, src) in accepted {
+        let ui = node as usize;
+        let start = indptr[ui] as usize;
+        let end = indptr[ui + 1] as usize;
+        scanned += end - start;
+        for e in start..end {
+            let nd = t.saturating_add(w_sec[e]);
+            if nd > cutoff_overflow {
+                continue;
+            }
+            let v = indices[e] as usize;
+            if label_dominated(v, k, src, nd, best_src, time_s, labels_used) {
+                continue;
+            }
+            out.push((nd, v as u32, src));
+        }
+    }
+    scanned
+}
+
+/// Work-efficient parallel K-best: one shared Dial frontier instead of one traversal per source chunk.
+///
+/// Same arguments, outputs and primary/overflow semantics as `kbest_multisource_bucket_csr`, but each
+/// (node, src) label is settled at most once across all threads:
+/// - Buckets are processed in time order and drained in rounds (zero-weight edges feed the next
+///   round). A round's items are sorted by (node, src) and deduped, so ties at the K-th slot go to
+///   the lowest source index; the bucket kernel uses the same order, so `threads=1` of either
+///   kernel gives identical labels.
+/// - Settle: nodes are split into fixed blocks; each block is owned by exactly one rayon task, which
+///   writes that block's label slots without locks.
+/// - Relax: kept labels are relaxed in parallel against a read-only view of the slots; the
+///   candidates are scattered into their buckets in parallel (one task per target bucket).
+/// Phases with fewer than `par_min_items` items run inline (default 2048; tests lower it to force
+/// the parallel paths on small graphs). Output does not depend on `threads` or `par_min_items`.
+/// `stats=True` returns the same counter dict as `kbest_multisource_bucket_csr`.
+#[pyfunction(signature = (
+    indptr, indices, w_sec, source_idxs, k, cutoff_primary_s, cutoff_overflow_s, threads, progress, progress_cb=None, targets_idx=None,
+    stats=false, par_min_items=FRONTIER_PAR_MIN_ITEMS
+))]
+fn kbest_multisource_frontier_csr(
+    py: Python,
+    indptr: PyReadonlyArray1<i64>,
+    indices: PyReadonlyArray1<i32>,
+    w_sec: PyReadonlyArray1<u16>,
+    source_idxs: PyReadonlyArray1<i32>,
+    k: usize,
+    cutoff_primary_s: u16,
+    cutoff_overflow_s: u16,
+    threads: usize,
+    progress: bool,
+    progress_cb: Option<PyObject>,
+    targets_idx: Option<PyReadonlyArray1<i32>>,
+    stats: bool,
+    par_min_items: usize,
+) -> PyResult<PyObject> {
+    let indptr = indptr.as_slice()?;
+    let indices = indices.as_slice()?;
+    let w_sec = w_sec.as_slice()?;
+    let source_idxs = source_idxs.as_slice()?;
+    let n_nodes: usize = indptr.len() - 1;
+    let targets = match &targets_idx {
+        Some(t) => Some(t.as_slice()?),
+        None => None,
+    };
+    let (target_mask_opt, _) = build_target_mask(n_nodes, targets);
+    let (best_src_idx_vec, time_s_vec, kstats) = kbest_frontier_labels(
+        py,
+        indptr,
+        indices,
+        w_sec,
+        source_idxs,
+        k,
+        cutoff_primary_s,
+        cutoff_overflow_s,
+        threads,
+        progress,
+        progress_cb.as_ref(),
+        target_mask_opt.as_deref(),
+        par_min_items,
+    )?;
+    labels_with_stats(
+        py,
+        n_nodes,
+        k,
+        best_src_idx_vec,
+        time_s_vec,
+        stats.then_some(&kstats),
+    )
+}
+
+/// Bucket size below which a frontier phase runs inline.
+pub(crate) const FRONTIER_PAR_MIN_ITEMS: usize = 2048;
+
+/// Frontier kernel body (see `kbest_multisource_frontier_csr`); returns flat [N*K] label arrays.
+pub(crate) fn kbest_frontier_labels(
+    py: Python,
+    indptr: &[i64],
+    indices: &[i32],
+    w_sec: &[u16],
+    source_idxs: &[i32],
+    k: usize,
+    cutoff_primary_s: u16,
+    cutoff_overflow_s: u16,
+    threads: usize,
+    progress: bool,
+    progress_cb: Option<&PyObject>,
+    is_target: Option<&[u8]>,
+    par_min_items: usize,
+) -> PyResult<(Vec<i32>, Vec<u16>, KernelStats)> {
+    // Nodes per settle task and labels per relax task
+    const BLOCK_NODES: usize = 4096;
+    const RELAX_CHUNK: usize = 1024;
+
+    let n_nodes: usize = indptr.len() - 1;
+
+    if k == 0 || k > u8::MAX as usize {
+        return Err(pyo3::exceptions::PyValueError::new_err(
+            "k must be in 1..=255",
+        ));
+    }
+    if source_idxs
+        .iter()
+        .any(|&s| s < 0 || (s as usize) >= n_nodes)
+    {
+        return Err(pyo3::exceptions::PyValueError::new_err(
+            "source_idxs out of range",
+        ));
+    }
+
+    let t = if threads == 0 { 1 } else { threads };
+    let pool = ThreadPoolBuilder::new()
+        .num_threads(t)
+        .build()
+        .map_err(|e| {
+            PyErr::new::<pyo3::exceptions::PyRuntimeError, _>(format!(
+                "Failed to build thread pool: {}",
+                e
+            ))
+        })?;
+
+    let (best_src_idx_vec, time_s_vec, stats) = py.allow_threads(|| {
+        pool.install(|| {
+            use std::time::{Duration, Instant};
+
+            let mut stats = KernelStats {
+                peak_queued: source_idxs.len() as u64,
+                ..Default::default()
+            };
+            let mut queued: u64 = source_idxs.len() as u64;
+            let mut best_src: Vec<i32> = vec![-1; n_nodes * k];
+            let mut time_s: Vec<u16> = vec![UNREACHABLE; n_nodes * k];
+            let mut labels_used: Vec<u8> = vec![0u8; n_nodes];
+            let mut primary_count: Vec<u8> = vec![0u8; n_nodes];
+
+            let buckets_len = (cutoff_overflow_s as usize) + 1;
+            let mut buckets: Vec<Vec<(u32, i32)>> = vec![Vec::new(); buckets_len];
+            for &s in source_idxs {
+                buckets[0].push((s as u32, s));
+            }
+
+            let mut remaining_targets: usize = is_target
+                .map(|m| m.iter().filter(|&&x| x != 0).count())
+                .unwrap_or(0);
+
+            let start_ts = Instant::now();
+            let mut last_log = start_ts;
+            let log_every = Duration::from_secs(5);
+            let total_minutes = (cutoff_overflow_s as usize) / 60 + 1;
+            let mut minutes_done = 0usize;
+            let mut settled: usize = 0;
+            let mut relaxed: usize = 0;
+
+            'buckets: for d in 0..buckets_len {
+                let du = d as u16;
+                // Zero-weight edges push back into the current bucket, so drain it in rounds
+                while !buckets[d].is_empty() {
+                    let mut items = std::mem::take(&mut buckets[d]);
+                    stats.pops += items.len() as u64;
+                    stats.bucket_span = d as u64;
+                    queued -= items.len() as u64;
+                    if items.len() >= par_min_items {
+                        items.par_sort_unstable();
+                    } else {
+                        items.sort_unstable();
+                    }
+                    items.dedup();
+
+                    // Settle: block-owned writes into the shared label slots
+                    let mut accepted: Vec<(u32, i32)> = Vec::new();
+                    let reached: usize;
+                    if items.len() >= par_min_items && t > 1 {
+                        let items_ref = &items;
+                        let per_block: Vec<(Vec<(u32, i32)>, usize)> = best_src
+                            .par_chunks_mut(BLOCK_NODES * k)
+                            .zip(time_s.par_chunks_mut(BLOCK_NODES * k))
+                            .zip(labels_used.par_chunks_mut(BLOCK_NODES))
+                            .zip(primary_count.par_chunks_mut(BLOCK_NODES))
+                            .enumerate()
+                            .map(|(b, (((bs, ts), lu), pc))| {
+                                let lo = b * BLOCK_NODES;
+                                let hi = lo + BLOCK_NODES;
+                                let s = items_ref.partition_point(|&(n, _)| (n as usize) < lo);
+                                let e = items_ref.partition_point(|&(n, _)| (n as usize) < hi);
+                                let mut acc: Vec<(u32, i32)> = Vec::new();
+                                let mut hit = 0usize;
+                                if s < e {
+                                    hit = settle_frontier_block(
+                                        &items_ref[s..e],
+                                        lo,
+                                        k,
+                                        du,
+                                        cutoff_primary_s,
+                                        bs,
+                                        ts,
+                                        lu,
+                                        pc,
+                                        is_target,
+                                        &mut acc,
+                                    );
+                                }
+                                (acc, hit)
+                            })
+                            .collect();
+                        let mut hit_total = 0usize;
+                        accepted.reserve(per_block.iter().map(|(a, _)| a.len()).sum());
+                        for (acc, hit) in per_block.into_iter() {
+                            accepted.extend(acc);
+                            hit_total += hit;
+                        }
+                        reached = hit_total;
+                    } else {
+                        reached = settle_frontier_block(
+                            &items,
+                            0,
+                            k,
+                            du,
+                            cutoff_primary_s,
+                            &mut best_src,
+                            &mut time_s,
+                            &mut labels_used,
+                            &mut primary_count,
+                            is_target,
+                            &mut accepted,
+                        );
+                    }
+                    settled += accepted.len();
+
+                    if is_target.is_some() {
+                        remaining_targets = remaining_targets.saturating_sub(reached);
+                        if remaining_targets == 0 {
+                            break 'buckets;
+                        }
+                    }
+
+                    // Relax: read-only over the slots, candidates gathered per chunk in input order
+                    let cands: Vec<(Vec<(u16, u32, i32)>, usize)> =
+                        if accepted.len() >= par_min_items && t > 1 {
+                            let (bs, ts, lu) = (&best_src, &time_s, &labels_used);
+                            accepted
+                                .par_chunks(RELAX_CHUNK)
+                                .map(|chunk| {
+                                    let mut out: Vec<(u16, u32, i32)> = Vec::new();
+                                    let scanned = relax_frontier_labels(
+                                        chunk,
+                                        du,
+                                        indptr,
+                                        indices,
+                                        w_sec,
+                                        k,
+                                        cutoff_overflow_s,
+                                        bs,
+                                        ts,
+                                        lu,
+                                        &mut out,
+                                    );
+                                    (out, scanned)
+                                })
+                                .collect()
+                        } else {
+                            let mut out: Vec<(u16, u32, i32)> = Vec::new();
+                            let scanned = relax_frontier_labels(
+                                &accepted,
+                                du,
+                                indptr,
+                                indices,
+                                w_sec,
+                                k,
+                                cutoff_overflow_s,
+                                &best_src,
+                                &time_s,
+                                &labels_used,
+                                &mut out,
+                            );
+                            vec![(out, scanned)]
+                        };
+                    let mut outs: Vec<Vec<(u16, u32, i32)>> = Vec::with_capacity(cands.len());
+                    for (out, scanned) in cands.into_iter() {
+                        relaxed += out.len();
+                        stats.relaxations += scanned as u64;
+                        stats.pruned += (scanned - out.len()) as u64;
+                        queued += out.len() as u64;
+                        outs.push(out);
+                    }
+                    if queued > stats.peak_queued {
+                        stats.peak_queued = queued;
+                    }
+
+                    // Scatter into later buckets. Rounds are sorted before settling, so push order is
+                    // irrelevant: large scatters sort each chunk by arrival time and fill every target
+                    // bucket from its own task.
+                    let n_cands: usize = outs.iter().map(|o| o.len()).sum();
+                    if n_cands >= par_min_items && t > 1 {
+                        outs.par_iter_mut()
+                            .for_each(|o| o.sort_unstable_by_key(|c| c.0));
+                        let hi = outs
+                            .iter()
+                            .filter_map(|o| o.last())
+                            .map(|c| c.0 as usize)
+                            .max()
+                            .unwrap_or(d);
+                        let outs_ref = &outs;
+                        buckets[d..=hi]
+                            .par_iter_mut()
+                            .enumerate()
+                            .for_each(|(i, bucket)| {
+                                let nd = (d + i) as u16;
+                                for o in outs_ref.iter() {
+                                    let s = o.partition_point(|c| c.0 < nd);
+                                    let e = s + o[s..].partition_point(|c| c.0 == nd);
+                                    bucket.extend(o[s..e].iter().map(|&(_, v, src)| (v, src)));
+                                }
+                            });
+                    } else {
+                        for out in outs.into_iter() {
+                            for (nd, v, s) in out.into_iter() {
+                                buckets[nd as usize].push((v, s));
+                            }
+                        }
+                    }
+                }
+
+                if progress {
+                    let minute = d / 60 + 1;
+                    if minute > minutes_done && (d % 60 == 59 || d + 1 == buckets_len) {
+                        minutes_done = minute;
+                        if let Some(cb) = progress_cb {
+                            Python::with_gil(|py| {
+                                let _ = cb.call1(py, (minutes_done, total_minutes));
+                            });
+                        }
+                    }
+                    if last_log.elapsed() >= log_every {
+                        eprintln!(
+                            "[kbest:frontier] t={}s bucket={} settled={} relaxed={}",
+                            start_ts.elapsed().as_secs(),
+                            d,
+                            settled,
+                            relaxed
+                        );
+                        last_log = Instant::now();
+                    }
+                }
+            }
+
+            stats.settled = settled as u64;
+            stats.labels = labels_used.iter().map(|&u| u as u64).sum();
+            stats.phase("search", start_ts);
+            (best_src, time_s, stats)
+        })
+    });
+
+    Ok((best_src_idx_vec, time_s_vec, stats))
 }
 
 /// Compute weakly connected components using both forward and reverse adjacency.
@@ -560,7 +1217,9 @@ fn weakly_connected_components(
     let mut comp_id: Vec<i32> = vec![-1; n_nodes];
     let mut cid: i32 = 0;
     for start in 0..n_nodes {
-        if comp_id[start] >= 0 { continue; }
+        if comp_id[start] >= 0 {
+            continue;
+        }
         let mut q: VecDeque<usize> = VecDeque::new();
         comp_id[start] = cid;
         q.push_back(start);
@@ -570,14 +1229,20 @@ fn weakly_connected_components(
             let e = indptr[u + 1] as usize;
             for idx in s..e {
                 let v = indices[idx] as usize;
-                if comp_id[v] < 0 { comp_id[v] = cid; q.push_back(v); }
+                if comp_id[v] < 0 {
+                    comp_id[v] = cid;
+                    q.push_back(v);
+                }
             }
             // reverse neighbors
             let s2 = indptr_rev[u] as usize;
             let e2 = indptr_rev[u + 1] as usize;
             for idx in s2..e2 {
                 let v = indices_rev[idx] as usize;
-                if comp_id[v] < 0 { comp_id[v] = cid; q.push_back(v); }
+                if comp_id[v] < 0 {
+                    comp_id[v] = cid;
+                    q.push_back(v);
+                }
             }
         }
         cid += 1;
@@ -623,19 +1288,35 @@ fn aggregate_h3_topk(
     let n_nodes = a.shape()[0];
     let kdim = a.shape()[1];
     if time_arr.shape()[0] != n_nodes || time_arr.shape()[1] != kdim {
-        return Err(pyo3::exceptions::PyValueError::new_err("time_s shape must match best_anchor_int"));
+        return Err(pyo3::exceptions::PyValueError::new_err(
+            "time_s shape must match best_anchor_int",
+        ));
     }
     if lats.len() != n_nodes || lons.len() != n_nodes {
-        return Err(pyo3::exceptions::PyValueError::new_err("lats/lons length must match number of nodes"));
+        return Err(pyo3::exceptions::PyValueError::new_err(
+            "lats/lons length must match number of nodes",
+        ));
     }
     let res_list = resolutions.as_slice()?;
-    if res_list.is_empty() { return Err(pyo3::exceptions::PyValueError::new_err("resolutions must be non-empty")); }
+    if res_list.is_empty() {
+        return Err(pyo3::exceptions::PyValueError::new_err(
+            "resolutions must be non-empty",
+        ));
+    }
 
     // Convert to h3o Resolutions up-front
     let mut res_objs: Vec<Resolution> = Vec::with_capacity(res_list.len());
     for &r in res_list {
-        let rr: u8 = if r < 0 { return Err(pyo3::exceptions::PyValueError::new_err("resolution must be >=0")); } else { r as u8 };
-        let ro = Resolution::try_from(rr).map_err(|_| pyo3::exceptions::PyValueError::new_err(format!("invalid H3 resolution: {}", r)))?;
+        let rr: u8 = if r < 0 {
+            return Err(pyo3::exceptions::PyValueError::new_err(
+                "resolution must be >=0",
+            ));
+        } else {
+            r as u8
+        };
+        let ro = Resolution::try_from(rr).map_err(|_| {
+            pyo3::exceptions::PyValueError::new_err(format!("invalid H3 resolution: {}", r))
+        })?;
         res_objs.push(ro);
     }
 
@@ -662,11 +1343,15 @@ fn aggregate_h3_topk(
         // If site exists, keep its minimum time
         for p in vec.iter_mut() {
             if p.0 == site {
-                if ts < p.1 { p.1 = ts; }
+                if ts < p.1 {
+                    p.1 = ts;
+                }
                 // Re-establish order after improvement
                 vec.sort_unstable_by(|x, y| {
                     let o = x.1.cmp(&y.1);
-                    if o != Ordering::Equal { return o; }
+                    if o != Ordering::Equal {
+                        return o;
+                    }
                     x.0.cmp(&y.0)
                 });
                 return;
@@ -676,7 +1361,9 @@ fn aggregate_h3_topk(
             vec.push((site, ts));
             vec.sort_unstable_by(|x, y| {
                 let o = x.1.cmp(&y.1);
-                if o != Ordering::Equal { return o; }
+                if o != Ordering::Equal {
+                    return o;
+                }
                 x.0.cmp(&y.0)
             });
             return;
@@ -685,48 +1372,74 @@ fn aggregate_h3_topk(
         let mut worst_i = 0usize;
         let mut worst_t = 0u16;
         for (i, &(_, t)) in vec.iter().enumerate() {
-            if i == 0 || t > worst_t { worst_i = i; worst_t = t; }
+            if i == 0 || t > worst_t {
+                worst_i = i;
+                worst_t = t;
+            }
         }
         if ts < worst_t {
             vec[worst_i] = (site, ts);
             vec.sort_unstable_by(|x, y| {
                 let o = x.1.cmp(&y.1);
-                if o != Ordering::Equal { return o; }
+                if o != Ordering::Equal {
+                    return o;
+                }
                 x.0.cmp(&y.0)
             });
         }
     }
 
-    let pool = ThreadPoolBuilder::new().num_threads(threads_n).build()
-        .map_err(|e| pyo3::exceptions::PyRuntimeError::new_err(format!("Failed to build thread pool: {}", e)))?;
+    let pool = ThreadPoolBuilder::new()
+        .num_threads(threads_n)
+        .build()
+        .map_err(|e| {
+            pyo3::exceptions::PyRuntimeError::new_err(format!("Failed to build thread pool: {}", e))
+        })?;
 
-    let partials: Vec<Vec<HexMap>> = py.allow_threads(|| pool.install(|| {
-        parts.par_iter().map(|&(lo, hi)| {
-            let mut local: Vec<HexMap> = (0..res_objs.len()).map(|_| FxHashMap::default()).collect();
-            for i in lo..hi {
-                let lat = lats[i] as f64;
-                let lon = lons[i] as f64;
-                // Skip if out of bounds for numerical safety
-                if !(lat.is_finite() && lon.is_finite()) { continue; }
-                let ll = match LatLng::new(lat, lon) { Ok(v) => v, Err(_) => continue };
-                for (ri, &res) in res_objs.iter().enumerate() {
-                    let cell = ll.to_cell(res);
-                    let h3_id: u64 = cell.into();
-                    let map_for_res = local.get_mut(ri).unwrap();
-                    let entry = map_for_res.entry(h3_id).or_insert_with(|| Vec::with_capacity(k));
-                    // iterate labels for this node; keep per-hex top-K online
-                    for j in 0..kdim {
-                        let site = a[[i, j]];
-                        if site < 0 { continue; }
-                        let ts = time_arr[[i, j]];
-                        if ts >= unreachable { continue; }
-                        update_topk(entry, site, ts, k);
+    let partials: Vec<Vec<HexMap>> = py.allow_threads(|| {
+        pool.install(|| {
+            parts
+                .par_iter()
+                .map(|&(lo, hi)| {
+                    let mut local: Vec<HexMap> =
+                        (0..res_objs.len()).map(|_| FxHashMap::default()).collect();
+                    for i in lo..hi {
+                        let lat = lats[i] as f64;
+                        let lon = lons[i] as f64;
+                        // Skip if out of bounds for numerical safety
+                        if !(lat.is_finite() && lon.is_finite()) {
+                            continue;
+                        }
+                        let ll = match LatLng::new(lat, lon) {
+                            Ok(v) => v,
+                            Err(_) => continue,
+                        };
+                        for (ri, &res) in res_objs.iter().enumerate() {
+                            let cell = ll.to_cell(res);
+                            let h3_id: u64 = cell.into();
+                            let map_for_res = local.get_mut(ri).unwrap();
+                            let entry = map_for_res
+                                .entry(h3_id)
+                                .or_insert_with(|| Vec::with_capacity(k));
+                            // iterate labels for this node; keep per-hex top-K online
+                            for j in 0..kdim {
+                                let site = a[[i, j]];
+                                if site < 0 {
+                                    continue;
+                                }
+                                let ts = time_arr[[i, j]];
+                                if ts >= unreachable {
+                                    continue;
+                                }
+                                update_topk(entry, site, ts, k);
+                            }
+                        }
                     }
-                }
-            }
-            local
-        }).collect()
-    }));
+                    local
+                })
+                .collect()
+        })
+    });
 
     // Merge partials into global per-resolution maps
     let mut globals: Vec<HexMap> = (0..res_objs.len()).map(|_| FxHashMap::default()).collect();
@@ -755,7 +1468,9 @@ fn aggregate_h3_topk(
             let mut tmp = pairs.clone();
             tmp.sort_unstable_by(|x, y| {
                 let o = x.1.cmp(&y.1);
-                if o != std::cmp::Ordering::Equal { return o; }
+                if o != std::cmp::Ordering::Equal {
+                    return o;
+                }
                 x.0.cmp(&y.0)
             });
             out_h.reserve(tmp.len());
@@ -793,7 +1508,9 @@ fn compute_h3_for_nodes(
     let lons = lons.as_slice()?;
     let res_list = resolutions.as_slice()?;
     if res_list.is_empty() {
-        return Err(pyo3::exceptions::PyValueError::new_err("resolutions must be non-empty"));
+        return Err(pyo3::exceptions::PyValueError::new_err(
+            "resolutions must be non-empty",
+        ));
     }
     let n_nodes = lats.len();
     let r_len = res_list.len();
@@ -813,7 +1530,10 @@ fn compute_h3_for_nodes(
     let res_map_result = py.allow_threads(|| {
         use std::sync::atomic::{AtomicUsize, Ordering};
         use std::sync::Arc;
-        let thread_pool = ThreadPoolBuilder::new().num_threads(threads_n).build().unwrap();
+        let thread_pool = ThreadPoolBuilder::new()
+            .num_threads(threads_n)
+            .build()
+            .unwrap();
         let max_res = Resolution::try_from(max_res_u8)
             .map_err(|_| format!("invalid resolution {}", max_res_u8))?;
         let mut max_cells: Vec<u64> = vec![0u64; n_nodes];
@@ -899,8 +1619,32 @@ fn compute_h3_for_nodes(
     Ok(arr.into())
 }
 
+/// Keep `site` at its best time in a hex's top-K of (site, time) pairs. A full list drops its
+/// worst pair by (time, site), so ties go to the lower site id whatever order labels arrive in
+/// (the order of `aggregate_h3_topk_sorted` and the fused stream).
+#[inline]
+fn update_topk(entry: &mut Vec<(i32, u16)>, site: i32, ts: u16, k: usize) {
+    if let Some(p) = entry.iter_mut().find(|p| p.0 == site) {
+        p.1 = p.1.min(ts);
+        return;
+    }
+    if entry.len() < k {
+        entry.push((site, ts));
+        return;
+    }
+    let worst = (0..entry.len()).max_by_key(|&i| (entry[i].1, entry[i].0));
+    if let Some(wi) = worst {
+        if (ts, site) < (entry[wi].1, entry[wi].0) {
+            entry[wi] = (site, ts);
+        }
+    }
+}
+
 /// Aggregate using precomputed H3 cell IDs [N,R].
-#[pyfunction]
+/// Returns (h3_id, site_id, time_s, res) numpy arrays, or an `ArrowBatch` with `arrow=True`.
+/// `stats=True` returns `(result, stats)`; for aggregation `pops` counts input labels read,
+/// `pruned` the ones not emitted, `groups` the distinct hexes and `labels` the output rows.
+#[pyfunction(signature = (h3_ids, best_anchor_int, time_s, resolutions, k, unreachable, threads, progress, arrow=false, stats=false))]
 fn aggregate_h3_topk_precached(
     py: Python,
     h3_ids: numpy::PyReadonlyArray2<u64>,
@@ -911,12 +1655,9 @@ fn aggregate_h3_topk_precached(
     unreachable: u16,
     threads: usize,
     progress: bool,
-) -> PyResult<(
-    Py<PyArray1<u64>>, // h3_id
-    Py<PyArray1<i32>>, // site_id
-    Py<PyArray1<u16>>, // time_s
-    Py<PyArray1<i32>>, // res
-)> {
+    arrow: bool,
+    stats: bool,
+) -> PyResult<PyObject> {
     type TopK = Vec<(i32, u16)>; // (site, time)
     type HexMap = FxHashMap<u64, TopK>;
 
@@ -927,14 +1668,26 @@ fn aggregate_h3_topk_precached(
     let kdim = a.shape()[1];
     let r_len = h3_arr.shape()[1];
     if t_arr.shape()[0] != n_nodes || t_arr.shape()[1] != kdim {
-        return Err(pyo3::exceptions::PyValueError::new_err("time_s shape must match best_anchor_int"));
+        return Err(pyo3::exceptions::PyValueError::new_err(
+            "time_s shape must match best_anchor_int",
+        ));
+    }
+    if h3_arr.shape()[0] != n_nodes {
+        return Err(pyo3::exceptions::PyValueError::new_err(
+            "h3_ids row count must match nodes",
+        ));
     }
-    if h3_arr.shape()[0] != n_nodes { return Err(pyo3::exceptions::PyValueError::new_err("h3_ids row count must match nodes")); }
     let res_list = resolutions.as_slice()?;
-    if res_list.len() != r_len { return Err(pyo3::exceptions::PyValueError::new_err("resolutions length must match h3_ids columns")); }
+    if res_list.len() != r_len {
+        return Err(pyo3::exceptions::PyValueError::new_err(
+            "resolutions length must match h3_ids columns",
+        ));
+    }
     let threads_n = if threads == 0 { 1 } else { threads };
 
-    let (out_h, out_s, out_t, out_r) = py.allow_threads(|| {
+    let (out_h, out_s, out_t, out_r, kstats) = py.allow_threads(|| {
+        let mut kstats = KernelStats::default();
+        let t0 = std::time::Instant::now();
         // Partition nodes
         let num_parts = std::cmp::min(threads_n, std::cmp::max(1, n_nodes));
         let mut parts: Vec<(usize, usize)> = Vec::with_capacity(num_parts);
@@ -947,77 +1700,74 @@ fn aggregate_h3_topk_precached(
         }
 
         // Per-part aggregation
-        let pool = ThreadPoolBuilder::new().num_threads(threads_n).build().unwrap();
+        let pool = ThreadPoolBuilder::new()
+            .num_threads(threads_n)
+            .build()
+            .unwrap();
         use std::sync::atomic::{AtomicUsize, Ordering};
         use std::sync::Arc;
         let counter = Arc::new(AtomicUsize::new(0));
         let total_parts = parts.len();
-        let partials: Vec<Vec<HexMap>> = pool.install(|| {
-            parts.par_iter().map(|&(lo, hi)| {
-                let mut local: Vec<HexMap> = (0..r_len).map(|_| FxHashMap::default()).collect();
-                for i in lo..hi {
-                    for ri in 0..r_len {
-                        let h3_id = h3_arr[[i, ri]];
-                        if h3_id == 0 { continue; }
-                        let map_for_res = local.get_mut(ri).unwrap();
-                        let entry = map_for_res.entry(h3_id).or_insert_with(|| Vec::with_capacity(k));
-                        for j in 0..kdim {
-                            let site = a[[i, j]];
-                            if site < 0 { continue; }
-                            let ts = t_arr[[i, j]];
-                            if ts >= unreachable { continue; }
-                            // update_topk inline
-                            let mut found = false;
-                            for p in entry.iter_mut() {
-                                if p.0 == site { if ts < p.1 { p.1 = ts; } found = true; break; }
+        let partials: Vec<(Vec<HexMap>, u64)> = pool.install(|| {
+            parts
+                .par_iter()
+                .map(|&(lo, hi)| {
+                    let mut local: Vec<HexMap> = (0..r_len).map(|_| FxHashMap::default()).collect();
+                    let mut read: u64 = 0;
+                    for i in lo..hi {
+                        for ri in 0..r_len {
+                            let h3_id = h3_arr[[i, ri]];
+                            if h3_id == 0 {
+                                continue;
                             }
-                            if !found {
-                                if entry.len() < k { entry.push((site, ts)); }
-                                else {
-                                    // replace worst if better
-                                    let mut worst_i = 0usize; let mut worst_t = 0u16;
-                                    for (ii, &(_, t)) in entry.iter().enumerate() { if ii==0 || t>worst_t { worst_i=ii; worst_t=t; } }
-                                    if ts < worst_t { entry[worst_i] = (site, ts); }
+                            let map_for_res = local.get_mut(ri).unwrap();
+                            let entry = map_for_res
+                                .entry(h3_id)
+                                .or_insert_with(|| Vec::with_capacity(k));
+                            for j in 0..kdim {
+                                let site = a[[i, j]];
+                                if site < 0 {
+                                    continue;
                                 }
+                                let ts = t_arr[[i, j]];
+                                if ts >= unreachable {
+                                    continue;
+                                }
+                                read += 1;
+                                update_topk(entry, site, ts, k);
                             }
                         }
                     }
-                }
-                if progress {
-                    let done = counter.fetch_add(1, Ordering::Relaxed) + 1;
-                    eprintln!("[agg] part {}/{}", done, total_parts);
-                }
-                local
-            }).collect()
+                    if progress {
+                        let done = counter.fetch_add(1, Ordering::Relaxed) + 1;
+                        eprintln!("[agg] part {}/{}", done, total_parts);
+                    }
+                    (local, read)
+                })
+                .collect()
         });
+        kstats.phase("partials", t0);
 
         // Merge partials into globals
+        let t0 = std::time::Instant::now();
         let mut globals: Vec<HexMap> = (0..r_len).map(|_| FxHashMap::default()).collect();
-        for pr in partials.into_iter() {
+        for (pr, read) in partials.into_iter() {
+            kstats.pops += read;
             for (ri, hm) in pr.into_iter().enumerate() {
                 let g = globals.get_mut(ri).unwrap();
                 for (h3_id, inner) in hm.into_iter() {
                     let gin = g.entry(h3_id).or_insert_with(|| Vec::with_capacity(k));
                     for (site, ts) in inner.into_iter() {
-                        // same update_topk
-                        let mut found = false;
-                        for p in gin.iter_mut() {
-                            if p.0 == site { if ts < p.1 { p.1 = ts; } found = true; break; }
-                        }
-                        if !found {
-                            if gin.len() < k { gin.push((site, ts)); }
-                            else {
-                                let mut worst_i = 0usize; let mut worst_t = 0u16;
-                                for (ii, &(_, t)) in gin.iter().enumerate() { if ii==0 || t>worst_t { worst_i=ii; worst_t=t; } }
-                                if ts < worst_t { gin[worst_i] = (site, ts); }
-                            }
-                        }
+                        update_topk(gin, site, ts, k);
                     }
                 }
             }
         }
 
+        kstats.phase("merge", t0);
+
         // Build outputs
+        let t0 = std::time::Instant::now();
         let mut out_h: Vec<u64> = Vec::new();
         let mut out_s: Vec<i32> = Vec::new();
         let mut out_t: Vec<u16> = Vec::new();
@@ -1028,23 +1778,288 @@ fn aggregate_h3_topk_precached(
                 // sort deterministically by (time, site)
                 let mut tmp = pairs.clone();
                 tmp.sort_unstable_by(|x, y| {
-                    let o = x.1.cmp(&y.1); if o != std::cmp::Ordering::Equal { return o; }
+                    let o = x.1.cmp(&y.1);
+                    if o != std::cmp::Ordering::Equal {
+                        return o;
+                    }
                     x.0.cmp(&y.0)
                 });
-                out_h.reserve(tmp.len()); out_s.reserve(tmp.len()); out_t.reserve(tmp.len()); out_r.reserve(tmp.len());
+                out_h.reserve(tmp.len());
+                out_s.reserve(tmp.len());
+                out_t.reserve(tmp.len());
+                out_r.reserve(tmp.len());
                 for (site, ts) in tmp.into_iter() {
-                    out_h.push(*h3_id); out_s.push(site); out_t.push(ts); out_r.push(r_val);
+                    out_h.push(*h3_id);
+                    out_s.push(site);
+                    out_t.push(ts);
+                    out_r.push(r_val);
                 }
             }
         }
-        (out_h, out_s, out_t, out_r)
+        kstats.phase("emit", t0);
+        // Hexes whose nodes had no valid label hold an empty list and emit nothing
+        kstats.groups = globals
+            .iter()
+            .map(|g| g.values().filter(|v| !v.is_empty()).count() as u64)
+            .sum();
+        kstats.labels = out_h.len() as u64;
+        kstats.pruned = kstats.pops - kstats.labels;
+        (out_h, out_s, out_t, out_r, kstats)
     });
 
+    h3_rows_with_stats(
+        py,
+        out_h,
+        out_s,
+        out_t,
+        out_r,
+        arrow,
+        stats.then_some(&kstats),
+    )
+}
+
+/// Long-format aggregation output as numpy arrays (copied) or an `ArrowBatch` (buffers moved).
+fn h3_rows_to_py(
+    py: Python,
+    out_h: Vec<u64>,
+    out_s: Vec<i32>,
+    out_t: Vec<u16>,
+    out_r: Vec<i32>,
+    arrow: bool,
+) -> PyResult<PyObject> {
+    if arrow {
+        let batch = arrow_ffi::ArrowBatch::h3_rows(out_h, out_s, out_t, out_r);
+        return Ok(Py::new(py, batch)?.into_py(py));
+    }
     let h_arr = PyArray1::from_vec_bound(py, out_h);
     let s_arr = PyArray1::from_vec_bound(py, out_s);
     let t_arr = PyArray1::from_vec_bound(py, out_t);
     let r_arr = PyArray1::from_vec_bound(py, out_r);
-    Ok((h_arr.into(), s_arr.into(), t_arr.into(), r_arr.into()))
+    Ok((h_arr, s_arr, t_arr, r_arr).into_py(py))
+}
+
+/// `h3_rows_to_py`, paired with the stats dict as `(result, stats)` when stats were requested.
+fn h3_rows_with_stats(
+    py: Python,
+    out_h: Vec<u64>,
+    out_s: Vec<i32>,
+    out_t: Vec<u16>,
+    out_r: Vec<i32>,
+    arrow: bool,
+    stats: Option<&KernelStats>,
+) -> PyResult<PyObject> {
+    let rows = h3_rows_to_py(py, out_h, out_s, out_t, out_r, arrow)?;
+    Ok(match stats {
+        Some(st) => (rows, st.to_dict(py)?).into_py(py),
+        None => rows,
+    })
+}
+
+/// Raw pointer that may be shared across rayon tasks writing disjoint indices.
+#[derive(Clone, Copy)]
+struct SyncPtr<T>(*mut T);
+unsafe impl<T> Send for SyncPtr<T> {}
+unsafe impl<T> Sync for SyncPtr<T> {}
+
+/// (h3_id, time_s, site_id) label of one node at one resolution.
+type HexLabel = (u64, u16, i32);
+
+/// 8-bit digit `pass` of a label, least significant first: site (4 bytes), time (2), h3 (8).
+#[inline]
+fn hex_label_digit(x: &HexLabel, pass: usize) -> usize {
+    match pass {
+        0..=3 => (((x.2 as u32) >> (8 * pass)) & 0xFF) as usize,
+        4..=5 => ((x.1 >> (8 * (pass - 4))) & 0xFF) as usize,
+        _ => ((x.0 >> (8 * (pass - 6))) & 0xFF) as usize,
+    }
+}
+
+/// Parallel LSD radix sort of labels by (h3, time, site). Each pass builds per-chunk histograms in
+/// parallel and scatters each chunk to precomputed, disjoint offsets (stable). Passes whose digit is
+/// the same for every label (e.g. the H3 mode/resolution bits) are skipped.
+fn radix_sort_hex_labels(items: &mut Vec<HexLabel>, chunk: usize) {
+    let n = items.len();
+    if n < 2 {
+        return;
+    }
+    let mut buf: Vec<HexLabel> = vec![(0, 0, 0); n];
+    for pass in 0..14 {
+        let hists: Vec<[usize; 256]> = items
+            .par_chunks(chunk)
+            .map(|c| {
+                let mut h = [0usize; 256];
+                for x in c {
+                    h[hex_label_digit(x, pass)] += 1;
+                }
+                h
+            })
+            .collect();
+        let mut total = [0usize; 256];
+        for h in hists.iter() {
+            for d in 0..256 {
+                total[d] += h[d];
+            }
+        }
+        if total.iter().any(|&c| c == n) {
+            continue;
+        }
+
+        // Digit-major, chunk-minor offsets keep the scatter stable
+        let mut offsets: Vec<[usize; 256]> = vec![[0usize; 256]; hists.len()];
+        let mut run = 0usize;
+        for d in 0..256 {
+            for (ci, h) in hists.iter().enumerate() {
+                offsets[ci][d] = run;
+                run += h[d];
+            }
+        }
+        let out = SyncPtr(buf.as_mut_ptr());
+        items
+            .par_chunks(chunk)
+            .zip(offsets.into_par_iter())
+            .for_each(|(c, mut off)| {
+                let out = out;
+                for x in c {
+                    let d = hex_label_digit(x, pass);
+                    // SAFETY: offsets partition [0, n) so every index is written exactly once
+                    unsafe {
+                        *out.0.add(off[d]) = *x;
+                    }
+                    off[d] += 1;
+                }
+            });
+        std::mem::swap(items, &mut buf);
+    }
+}
+
+/// Sort-based alternative to `aggregate_h3_topk_precached` (same inputs and output columns).
+/// Per resolution: gather (h3, time, site) for every valid node label, radix-sort them in parallel,
+/// then one linear pass keeps the first K distinct sites of each hex. No per-hex allocations or
+/// hash maps; rows come out ordered by (res, h3_id, time, site). Needs 2 x 16 bytes per node label
+/// of the current resolution as working memory. `arrow=True` returns an `ArrowBatch`; `stats=True`
+/// returns `(result, stats)` with the same counters as `aggregate_h3_topk_precached`.
+#[pyfunction(signature = (h3_ids, best_anchor_int, time_s, resolutions, k, unreachable, threads, progress, arrow=false, stats=false))]
+fn aggregate_h3_topk_sorted(
+    py: Python,
+    h3_ids: numpy::PyReadonlyArray2<u64>,
+    best_anchor_int: numpy::PyReadonlyArray2<i32>,
+    time_s: numpy::PyReadonlyArray2<u16>,
+    resolutions: PyReadonlyArray1<i32>,
+    k: usize,
+    unreachable: u16,
+    threads: usize,
+    progress: bool,
+    arrow: bool,
+    stats: bool,
+) -> PyResult<PyObject> {
+    const CHUNK: usize = 1 << 16;
+
+    let n_nodes = best_anchor_int.as_array().shape()[0];
+    let kdim = best_anchor_int.as_array().shape()[1];
+    let r_len = h3_ids.as_array().shape()[1];
+    if time_s.as_array().shape()[0] != n_nodes || time_s.as_array().shape()[1] != kdim {
+        return Err(pyo3::exceptions::PyValueError::new_err(
+            "time_s shape must match best_anchor_int",
+        ));
+    }
+    if h3_ids.as_array().shape()[0] != n_nodes {
+        return Err(pyo3::exceptions::PyValueError::new_err(
+            "h3_ids row count must match nodes",
+        ));
+    }
+    let res_list = resolutions.as_slice()?;
+    if res_list.len() != r_len {
+        return Err(pyo3::exceptions::PyValueError::new_err(
+            "resolutions length must match h3_ids columns",
+        ));
+    }
+    let h3 = h3_ids.as_slice()?;
+    let a = best_anchor_int.as_slice()?;
+    let t_arr = time_s.as_slice()?;
+    let threads_n = if threads == 0 { 1 } else { threads };
+    let pool = ThreadPoolBuilder::new()
+        .num_threads(threads_n)
+        .build()
+        .map_err(|e| {
+            pyo3::exceptions::PyRuntimeError::new_err(format!("Failed to build thread pool: {}", e))
+        })?;
+
+    let (out_h, out_s, out_t, out_r, kstats) = py.allow_threads(|| {
+        pool.install(|| {
+            let mut kstats = KernelStats::default();
+            let mut out_h: Vec<u64> = Vec::new();
+            let mut out_s: Vec<i32> = Vec::new();
+            let mut out_t: Vec<u16> = Vec::new();
+            let mut out_r: Vec<i32> = Vec::new();
+            let mut kept: Vec<i32> = Vec::with_capacity(k);
+
+            for ri in 0..r_len {
+                let t0 = std::time::Instant::now();
+                let mut items: Vec<HexLabel> = (0..n_nodes)
+                    .into_par_iter()
+                    .flat_map_iter(|i| {
+                        let cell = h3[i * r_len + ri];
+                        let base = i * kdim;
+                        (0..kdim).filter_map(move |j| {
+                            let site = a[base + j];
+                            let ts = t_arr[base + j];
+                            if cell == 0 || site < 0 || ts >= unreachable {
+                                None
+                            } else {
+                                Some((cell, ts, site))
+                            }
+                        })
+                    })
+                    .collect();
+                kstats.phase("collect", t0);
+                let t0 = std::time::Instant::now();
+                radix_sort_hex_labels(&mut items, CHUNK);
+                kstats.phase("sort", t0);
+
+                let t0 = std::time::Instant::now();
+                let r_val = res_list[ri];
+                let mut cur: u64 = 0;
+                kstats.pops += items.len() as u64;
+                for &(cell, ts, site) in items.iter() {
+                    if cell != cur {
+                        cur = cell;
+                        kept.clear();
+                        kstats.groups += 1;
+                    }
+                    if kept.len() == k || kept.contains(&site) {
+                        continue;
+                    }
+                    kept.push(site);
+                    out_h.push(cell);
+                    out_s.push(site);
+                    out_t.push(ts);
+                    out_r.push(r_val);
+                }
+                kstats.phase("reduce", t0);
+                if progress {
+                    eprintln!(
+                        "[agg:sort] res {} labels={} rows={}",
+                        r_val,
+                        items.len(),
+                        out_h.len()
+                    );
+                }
+            }
+            kstats.labels = out_h.len() as u64;
+            kstats.pruned = kstats.pops - kstats.labels;
+            (out_h, out_s, out_t, out_r, kstats)
+        })
+    });
+
+    h3_rows_with_stats(
+        py,
+        out_h,
+        out_s,
+        out_t,
+        out_r,
+        arrow,
+        stats.then_some(&kstats),
+    )
 }
 
 /// Build CSR from raw arrays (node_ids/lats/lons and edges u/v/oneway and per-edge w_sec).
@@ -1074,7 +2089,9 @@ fn build_csr_from_arrays(
     let oneway = oneway.as_slice()?;
     let w = w_sec.as_slice()?;
     if u.len() != v.len() || u.len() != oneway.len() || u.len() != w.len() {
-        return Err(pyo3::exceptions::PyValueError::new_err("edge arrays must have the same length"));
+        return Err(pyo3::exceptions::PyValueError::new_err(
+            "edge arrays must have the same length",
+        ));
     }
     let n_nodes = node_ids.len();
 
@@ -1082,18 +2099,32 @@ fn build_csr_from_arrays(
     let (indptr_vec, indices_vec, w_sorted) = py.allow_threads(|| {
         let mut map: FxHashMap<i64, i32> = FxHashMap::default();
         map.reserve(n_nodes * 2);
-        for (i, &nid) in node_ids.iter().enumerate() { map.insert(nid, i as i32); }
+        for (i, &nid) in node_ids.iter().enumerate() {
+            map.insert(nid, i as i32);
+        }
 
         // Build directed edges
         let mut src: Vec<i32> = Vec::with_capacity(u.len() * 2);
         let mut dst: Vec<i32> = Vec::with_capacity(u.len() * 2);
         let mut wt: Vec<u16> = Vec::with_capacity(u.len() * 2);
         for i in 0..u.len() {
-            let su = match map.get(&u[i]) { Some(&ix) => ix, None => continue };
-            let sv = match map.get(&v[i]) { Some(&ix) => ix, None => continue };
+            let su = match map.get(&u[i]) {
+                Some(&ix) => ix,
+                None => continue,
+            };
+            let sv = match map.get(&v[i]) {
+                Some(&ix) => ix,
+                None => continue,
+            };
             let wv = w[i];
-            src.push(su); dst.push(sv); wt.push(wv);
-            if oneway[i] == 0 { src.push(sv); dst.push(su); wt.push(wv); }
+            src.push(su);
+            dst.push(sv);
+            wt.push(wv);
+            if oneway[i] == 0 {
+                src.push(sv);
+                dst.push(su);
+                wt.push(wv);
+            }
         }
 
         // Sort by (src, dst)
@@ -1107,13 +2138,21 @@ fn build_csr_from_arrays(
         let mut src_s: Vec<i32> = Vec::with_capacity(m);
         let mut dst_s: Vec<i32> = Vec::with_capacity(m);
         let mut w_s: Vec<u16> = Vec::with_capacity(m);
-        for &idx in &order { src_s.push(src[idx]); dst_s.push(dst[idx]); w_s.push(wt[idx]); }
+        for &idx in &order {
+            src_s.push(src[idx]);
+            dst_s.push(dst[idx]);
+            w_s.push(wt[idx]);
+        }
 
         // Build indptr via counts
         let mut counts: Vec<i64> = vec![0; n_nodes];
-        for &s in &src_s { counts[s as usize] += 1; }
+        for &s in &src_s {
+            counts[s as usize] += 1;
+        }
         let mut indptr: Vec<i64> = vec![0; n_nodes + 1];
-        for i in 0..n_nodes { indptr[i + 1] = indptr[i] + counts[i]; }
+        for i in 0..n_nodes {
+            indptr[i + 1] = indptr[i] + counts[i];
+        }
 
         (indptr, dst_s, w_s)
     });
@@ -1121,20 +2160,33 @@ fn build_csr_from_arrays(
     // Convert to numpy
     let node_ids_arr = PyArray1::from_vec_bound(py, node_ids.to_vec());
     let indptr_arr = PyArray1::from_vec_bound(py, indptr_vec);
-    let indices_arr = PyArray1::from_vec_bound(py, indices_vec.into_iter().map(|x| x as i32).collect());
+    let indices_arr =
+        PyArray1::from_vec_bound(py, indices_vec.into_iter().map(|x| x as i32).collect());
     let w_arr = PyArray1::from_vec_bound(py, w_sorted);
     let lats_arr = PyArray1::from_vec_bound(py, lats.to_vec());
     let lons_arr = PyArray1::from_vec_bound(py, lons.to_vec());
-    Ok((node_ids_arr.into(), indptr_arr.into(), indices_arr.into(), w_arr.into(), lats_arr.into(), lons_arr.into()))
+    Ok((
+        node_ids_arr.into(),
+        indptr_arr.into(),
+        indices_arr.into(),
+        w_arr.into(),
+        lats_arr.into(),
+        lons_arr.into(),
+    ))
 }
 
 #[pymodule]
 fn t_hex(_py: Python, m: &Bound<'_, PyModule>) -> PyResult<()> {
     m.add_class::<ch::CHGraph>()?;
+    m.add_class::<arrow_ffi::ArrowBatch>()?;
     m.add_function(wrap_pyfunction!(kbest_multisource_csr, m)?)?;
     m.add_function(wrap_pyfunction!(kbest_multisource_bucket_csr, m)?)?;
+    m.add_function(wrap_pyfunction!(kbest_multisource_frontier_csr, m)?)?;
+    m.add_function(wrap_pyfunction!(h3_stream::kbest_h3_topk_stream, m)?)?;
+    m.add_function(wrap_pyfunction!(multi_label::nearest_multilabel_csr, m)?)?;
     m.add_function(wrap_pyfunction!(aggregate_h3_topk, m)?)?;
     m.add_function(wrap_pyfunction!(aggregate_h3_topk_precached, m)?)?;
+    m.add_function(wrap_pyfunction!(aggregate_h3_topk_sorted, m)?)?;
     m.add_function(wrap_pyfunction!(compute_h3_for_nodes, m)?)?;
     m.add_function(wrap_pyfunction!(weakly_connected_components, m)?)?;
     m.add_function(wrap_pyfunction!(build_csr_from_arrays, m)?)?;
@@ -0,0 +1,216 @@
+//! Nearest-source times for many labels (e.g. POI categories) in one traversal per 64 labels.
+//!
+//! Every label has its own source set and cutoff. Labels are packed 64 to a `u64` word; one Dial
+//! bucket queue carries (node, label mask) entries and a per-node settled bitset records which
+//! labels already have their final time at that node. With integer weights and a monotone queue the
+//! first time a (node, label) bit is settled is its shortest distance, so each label's column is
+//! identical to a separate `kbest_multisource_bucket_csr(k=1)` run with that label's sources and
+//! cutoff. Words are independent and run in parallel.
+
+use numpy::{PyArray2, PyArrayMethods, PyReadonlyArray1};
+use pyo3::prelude::*;
+use rayon::prelude::*;
+use rayon::ThreadPoolBuilder;
+
+use crate::UNREACHABLE;
+
+const WORD_BITS: usize = 64;
+
+/// Dial search for labels [word*64, word*64+64). Returns the [T, 64] block of target times.
+fn nearest_for_word(
+    indptr: &[i64],
+    indices: &[i32],
+    w_sec: &[u16],
+    label_indptr: &[i64],
+    label_sources: &[i32],
+    cutoffs: &[u16],
+    target_pos: &[i32],
+    n_targets: usize,
+    word: usize,
+) -> Vec<u16> {
+    let n_nodes = indptr.len() - 1;
+    let lo = word * WORD_BITS;
+    let hi = (lo + WORD_BITS).min(cutoffs.len());
+    let max_cut = cutoffs[lo..hi].iter().copied().max().unwrap_or(0) as usize;
+
+    // alive[t]: labels of this word whose cutoff still admits time t
+    let mut alive: Vec<u64> = vec![0; max_cut + 1];
+    for l in lo..hi {
+        let bit = 1u64 << (l - lo);
+        for slot in alive[..=cutoffs[l] as usize].iter_mut() {
+            *slot |= bit;
+        }
+    }
+
+    let mut out: Vec<u16> = vec![UNREACHABLE; n_targets * WORD_BITS];
+    let mut settled: Vec<u64> = vec![0; n_nodes];
+    let mut buckets: Vec<Vec<(u32, u64)>> = vec![Vec::new(); max_cut + 1];
+    let mut remaining: usize = 0;
+    for l in lo..hi {
+        let bit = 1u64 << (l - lo);
+        let (s0, s1) = (label_indptr[l] as usize, label_indptr[l + 1] as usize);
+        if s0 < s1 {
+            remaining += n_targets;
+        }
+        for &s in &label_sources[s0..s1] {
+            buckets[0].push((s as u32, bit));
+        }
+    }
+
+    'outer: for t in 0..=max_cut {
+        let mut i = 0;
+        // Zero-weight edges append to the bucket being drained
+        while i < buckets[t].len() {
+            let (u, mask) = buckets[t][i];
+            i += 1;
+            let ui = u as usize;
+            let new = mask & !settled[ui];
+            if new == 0 {
+                continue;
+            }
+            settled[ui] |= new;
+
+            let tp = target_pos[ui];
+            if tp >= 0 {
+                let base = tp as usize * WORD_BITS;
+                let mut bits = new;
+                while bits != 0 {
+                    let b = bits.trailing_zeros() as usize;
+                    out[base + b] = t as u16;
+                    bits &= bits - 1;
+                }
+                remaining -= new.count_ones() as usize;
+                if remaining == 0 {
+                    break 'outer;
+                }
+            }
+
+            for e in indptr[ui] as usize..indptr[ui + 1] as usize {
+                let nd = t + w_sec[e] as usize;
+                if nd > max_cut {
+                    continue;
+                }
+                let v = indices[e] as usize;
+                let m = new & alive[nd] & !settled[v];
+                if m != 0 {
+                    buckets[nd].push((v as u32, m));
+                }
+            }
+        }
+        buckets[t] = Vec::new();
+    }
+    out
+}
+
+/// Multi-label nearest-source times to a set of target nodes.
+/// - label_indptr: [L+1] int64 offsets into label_sources (CSR of source node indices per label)
+/// - label_sources: int32 node indices
+/// - cutoffs_s: [L] uint16 per-label cutoff; times above it are reported as 65535
+/// - targets_idx: [T] int32 distinct nodes to report (e.g. anchor nodes); repeats raise ValueError
+/// Returns [T, L] uint16 seconds (65535 = unreachable within the label's cutoff).
+#[pyfunction(signature = (indptr, indices, w_sec, label_indptr, label_sources, cutoffs_s, targets_idx, threads, progress))]
+pub fn nearest_multilabel_csr(
+    py: Python,
+    indptr: PyReadonlyArray1<i64>,
+    indices: PyReadonlyArray1<i32>,
+    w_sec: PyReadonlyArray1<u16>,
+    label_indptr: PyReadonlyArray1<i64>,
+    label_sources: PyReadonlyArray1<i32>,
+    cutoffs_s: PyReadonlyArray1<u16>,
+    targets_idx: PyReadonlyArray1<i32>,
+    threads: usize,
+    progress: bool,
+) -> PyResult<Py<PyArray2<u16>>> {
+    let indptr = indptr.as_slice()?;
+    let indices = indices.as_slice()?;
+    let w_sec = w_sec.as_slice()?;
+    let label_indptr = label_indptr.as_slice()?;
+    let label_sources = label_sources.as_slice()?;
+    let cutoffs = cutoffs_s.as_slice()?;
+    let targets = targets_idx.as_slice()?;
+    let n_nodes = indptr.len() - 1;
+    let n_labels = cutoffs.len();
+    let n_targets = targets.len();
+
+    if label_indptr.len() != n_labels + 1 {
+        return Err(pyo3::exceptions::PyValueError::new_err(
+            "label_indptr length must be len(cutoffs_s) + 1",
+        ));
+    }
+    if label_indptr[n_labels] as usize != label_sources.len() {
+        return Err(pyo3::exceptions::PyValueError::new_err(
+            "label_indptr[-1] must equal len(label_sources)",
+        ));
+    }
+    if label_sources
+        .iter()
+        .chain(targets.iter())
+        .any(|&s| s < 0 || s as usize >= n_nodes)
+    {
+        return Err(pyo3::exceptions::PyValueError::new_err(
+            "source/target node index out of range",
+        ));
+    }
+
+    // One row per target node: a repeated node would leave its other rows unset and keep
+    // the early stop (all targets settled) from ever firing
+    let mut target_pos: Vec<i32> = vec![-1; n_nodes];
+    for (i, &t) in targets.iter().enumerate() {
+        if target_pos[t as usize] >= 0 {
+            return Err(pyo3::exceptions::PyValueError::new_err(format!(
+                "targets_idx repeats node {}",
+                t
+            )));
+        }
+        target_pos[t as usize] = i as i32;
+    }
+
+    let n_words = (n_labels + WORD_BITS - 1) / WORD_BITS;
+    let threads_n = if threads == 0 { 1 } else { threads };
+    let pool = ThreadPoolBuilder::new()
+        .num_threads(threads_n)
+        .build()
+        .map_err(|e| {
+            pyo3::exceptions::PyRuntimeError::new_err(format!("Failed to build thread pool: {}", e))
+        })?;
+
+    let blocks: Vec<Vec<u16>> = py.allow_threads(|| {
+        pool.install(|| {
+            (0..n_words)
+                .into_par_iter()
+                .map(|word| {
+                    let block = nearest_for_word(
+                        indptr,
+                        indices,
+                        w_sec,
+                        label_indptr,
+                        label_sources,
+                        cutoffs,
+                        &target_pos,
+                        n_targets,
+                        word,
+                    );
+                    if progress {
+                        eprintln!("[multilabel] word {}/{} done", word + 1, n_words);
+                    }
+                    block
+                })
+                .collect()
+        })
+    });
+
+    // [T, 64] blocks -> row-major [T, L]
+    let mut out: Vec<u16> = vec![UNREACHABLE; n_targets * n_labels];
+    for (word, block) in blocks.iter().enumerate() {
+        let lo = word * WORD_BITS;
+        let width = (n_labels - lo).min(WORD_BITS);
+        for ti in 0..n_targets {
+            out[ti * n_labels + lo..ti * n_labels + lo + width]
+                .copy_from_slice(&block[ti * WORD_BITS..ti * WORD_BITS + width]);
+        }
+    }
+
+    let arr = unsafe { PyArray2::<u16>::new_bound(py, [n_targets, n_labels], false) };
+    unsafe { arr.as_slice_mut()? }.copy_from_slice(&out);
+    Ok(arr.into())
+}
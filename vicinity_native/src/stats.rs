@@ -0,0 +1,73 @@
+//! Per-call counters returned to Python when a kernel is called with `stats=True`.
+
+use pyo3::prelude::*;
+use pyo3::types::PyDict;
+use std::time::Instant;
+
+/// Work counters of one kernel call. Counts are summed over threads/chunks; `peak_queued` and
+/// `bucket_span` are maxima. Kernels that have no notion of a counter leave it at 0.
+#[derive(Default, Clone, Debug)]
+pub(crate) struct KernelStats {
+    /// Queue/bucket items popped
+    pub pops: u64,
+    /// Pops that survived the dominance check and were recorded as labels
+    pub settled: u64,
+    /// Edges scanned from settled labels
+    pub relaxations: u64,
+    /// Scanned edges whose candidate was dropped (over cutoff, dominated, full-K prune)
+    pub pruned: u64,
+    /// Largest number of items waiting in the buckets/queue at once
+    pub peak_queued: u64,
+    /// Distinct output groups of an aggregation (hexes, summed over resolutions)
+    pub groups: u64,
+    /// Filled label slots at the end of the call
+    pub labels: u64,
+    /// Highest bucket (seconds) that was processed
+    pub bucket_span: u64,
+    /// (phase, seconds) in execution order
+    pub phases: Vec<(&'static str, f64)>,
+}
+
+impl KernelStats {
+    /// Fold another chunk's counters into this one (phases are kept from `self`).
+    pub fn absorb(&mut self, other: &KernelStats) {
+        self.pops += other.pops;
+        self.settled += other.settled;
+        self.relaxations += other.relaxations;
+        self.pruned += other.pruned;
+        self.groups += other.groups;
+        self.peak_queued = self.peak_queued.max(other.peak_queued);
+        self.bucket_span = self.bucket_span.max(other.bucket_span);
+    }
+
+    /// Record the time since `start` as phase `name`.
+    pub fn phase(&mut self, name: &'static str, start: Instant) {
+        self.phases.push((name, start.elapsed().as_secs_f64()));
+    }
+
+    pub fn to_dict(&self, py: Python) -> PyResult<PyObject> {
+        let d = PyDict::new_bound(py);
+        d.set_item("pops", self.pops)?;
+        d.set_item("settled", self.settled)?;
+        d.set_item("relaxations", self.relaxations)?;
+        d.set_item("pruned", self.pruned)?;
+        d.set_item("peak_queued", self.peak_queued)?;
+        d.set_item("groups", self.groups)?;
+        d.set_item("labels", self.labels)?;
+        d.set_item("bucket_span", self.bucket_span)?;
+        let phases = PyDict::new_bound(py);
+        let mut wall = 0.0f64;
+        for &(name, secs) in &self.phases {
+            // Repeated phases (e.g. per resolution) accumulate
+            let prev: f64 = match phases.get_item(name)? {
+                Some(v) => v.extract()?,
+                None => 0.0,
+            };
+            phases.set_item(name, prev + secs)?;
+            wall += secs;
+        }
+        d.set_item("phases_s", phases)?;
+        d.set_item("wall_s", wall)?;
+        Ok(d.into_any().unbind())
+    }
+}